@@ -17,6 +17,8 @@ import json
 
 from api.db_utils import db_session, row_to_dict, rows_to_list
 from api.db_connection import convert_placeholders, sql_placeholder, get_db_type
+from auth.auth_manager import invalidate_user_cache
+from api.navigation_utils import invalidate_navigation_cache
 
 admin_api = Blueprint('admin_api', __name__)
 
@@ -55,6 +57,23 @@ def admin_health():
     })
 
 
+@admin_api.route('/api/admin/db-pools', methods=['GET'])
+@admin_required
+def admin_db_pools():
+    """
+    Metriken der DB-Connection-Pools (TAG 220).
+
+    Werte gelten pro Prozess (Gunicorn-Worker), 'pid' zeigt den antwortenden Worker.
+    """
+    from api.db_pool import get_pool_stats, POOL_ENABLED
+    return jsonify({
+        'enabled': POOL_ENABLED,
+        'pid': os.getpid(),
+        'pools': get_pool_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
 # =============================================================================
 # RECHTEVERWALTUNG - TAG 134
 # =============================================================================
@@ -214,6 +233,7 @@ def assign_role(user_id):
 
             conn.commit()
 
+        invalidate_user_cache(user_id)
         return jsonify({'message': f'Rolle "{role_name}" zugewiesen', 'success': True})
 
     except Exception as e:
@@ -255,6 +275,7 @@ def remove_role(user_id):
 
             conn.commit()
 
+        invalidate_user_cache(user_id)
         return jsonify({'message': f'Rolle "{role_name}" entfernt', 'success': True})
 
     except Exception as e:
@@ -289,6 +310,7 @@ def set_user_portal_role(user_id):
                 return jsonify({'error': 'User nicht gefunden'}), 404
             conn.commit()
 
+        invalidate_user_cache(user_id)
         msg = f'Portal-Rolle auf "{portal_role}" gesetzt' if portal_role else 'Portal-Rolle zurückgesetzt (aus LDAP)'
         return jsonify({'message': msg, 'success': True})
 
@@ -436,6 +458,7 @@ def add_feature_access(feature, role):
             
             conn.commit()
         
+        invalidate_user_cache()
         return jsonify({
             'message': f'Rolle "{role}" zu Feature "{feature}" hinzugefügt',
             'success': True
@@ -472,6 +495,7 @@ def remove_feature_access(feature, role):
             
             conn.commit()
         
+        invalidate_user_cache()
         return jsonify({
             'message': f'Rolle "{role}" von Feature "{feature}" entfernt',
             'success': True
@@ -521,6 +545,7 @@ def update_feature_access(feature):
             conn.commit()
         from config.roles_config import clear_feature_access_cache
         clear_feature_access_cache()
+        invalidate_user_cache()
         return jsonify({
             'message': f'Feature "{feature}" aktualisiert',
             'success': True
@@ -567,6 +592,7 @@ def set_role_features(role_name):
             conn.commit()
         from config.roles_config import clear_feature_access_cache
         clear_feature_access_cache()
+        invalidate_user_cache()
         return jsonify({
             'message': f'Rolle "{role_name}": {len(features)} Features gesetzt',
             'success': True
@@ -1393,6 +1419,7 @@ def update_navigation_item(item_id):
             
             conn.commit()
         
+        invalidate_navigation_cache()
         return jsonify({'message': 'Navigation-Item aktualisiert', 'success': True})
     
     except Exception as e:
@@ -1449,6 +1476,7 @@ def create_navigation_item():
             new_id = cursor.fetchone()[0]
             conn.commit()
         
+        invalidate_navigation_cache()
         return jsonify({'message': 'Navigation-Item erstellt', 'id': new_id, 'success': True})
     
     except Exception as e:
@@ -1483,6 +1511,7 @@ def delete_navigation_item(item_id):
             
             conn.commit()
         
+        invalidate_navigation_cache()
         return jsonify({'message': 'Navigation-Item gelöscht', 'success': True})
     
     except Exception as e:
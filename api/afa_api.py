@@ -17,6 +17,7 @@ from flask_login import current_user
 from io import BytesIO
 
 from api.db_utils import db_session, row_to_dict, rows_to_list, locosoft_session
+from api.afa_vin_anreicherung import anreichern
 
 afa_api = Blueprint('afa_api', __name__)
 
@@ -282,112 +283,6 @@ def dashboard():
 # GET /api/afa/abverkauf-uebersicht
 # =============================================================================
 
-def _hole_locosoft_rechnungsdatum_fuer_vins(vins):
-    """
-    Liefert pro VIN das Rechnungsdatum (out_invoice_date) aus Locosoft, falls gesetzt.
-    Rückgabe: dict vin -> ISO-Datumstr oder None. Fahrzeug bleibt in der Liste;
-    Anzeige „Rechnung (Locosoft): dd.mm.yyyy – Abgang in DRIVE buchen“.
-    """
-    if not vins:
-        return {}
-    vins_clean = [v.strip() for v in vins if v and str(v).strip()]
-    if not vins_clean:
-        return {}
-    placeholders = ','.join(['%s'] * len(vins_clean))
-    result = {}
-    try:
-        with locosoft_session() as conn:
-            cur = conn.cursor()
-            cur.execute(f"""
-                SELECT TRIM(v.vin) AS vin, dv.out_invoice_date
-                FROM vehicles v
-                JOIN dealer_vehicles dv ON dv.vehicle_number = v.internal_number
-                    AND dv.dealer_vehicle_type = v.dealer_vehicle_type
-                    AND dv.dealer_vehicle_number = v.dealer_vehicle_number
-                WHERE TRIM(v.vin) IN ({placeholders})
-                    AND dv.out_invoice_date IS NOT NULL
-            """, vins_clean)
-            rows = cur.fetchall()
-        for r in rows:
-            vin = (r[0] or '').strip()
-            if not vin:
-                continue
-            d = r[1]
-            if hasattr(d, 'isoformat'):
-                val = d.isoformat()[:10] if d else None
-            else:
-                val = str(d)[:10] if d else None
-            result[vin] = val
-            if vin.upper() != vin:
-                result[vin.upper()] = val
-        return result
-    except Exception:
-        return {}
-
-
-def _hole_locosoft_verkaufspreise_fuer_vins(vins):
-    """
-    Holt für eine Liste von VINs aus Locosoft die Verkaufspreise (noch nicht verkaufte Fahrzeuge).
-    Priorität: out_estimated_invoice_value (Verkaufspreis/Auszeichnung wie in L132PR Kalkulation),
-    dann out_sale_price_internet, out_sale_price_minimum, zuletzt out_recommended_retail_price.
-    Rückgabe: dict vin -> { verkaufspreis_aktuell, ... }
-    """
-    if not vins:
-        return {}
-    vins_clean = [v.strip() for v in vins if v and str(v).strip()]
-    if not vins_clean:
-        return {}
-    placeholders = ','.join(['%s'] * len(vins_clean))
-    try:
-        with locosoft_session() as conn:
-            cur = conn.cursor()
-            # Join nur über vehicle_number = internal_number (vehicles.dealer_vehicle_type/-number können NULL sein)
-            cur.execute(f"""
-                SELECT TRIM(v.vin) AS vin,
-                    dv.out_estimated_invoice_value,
-                    dv.out_sale_price_internet,
-                    dv.out_sale_price_minimum,
-                    dv.out_recommended_retail_price
-                FROM vehicles v
-                JOIN dealer_vehicles dv ON dv.vehicle_number = v.internal_number
-                WHERE TRIM(v.vin) IN ({placeholders})
-                    AND dv.out_invoice_date IS NULL
-            """, vins_clean)
-            rows = cur.fetchall()
-        result = {}
-        for r in rows:
-            vin = (r[0] or '').strip()
-            if not vin:
-                continue
-            # L132PR „Verkaufspreis incl. MwSt bzw. Rechnungsbetrag“ = out_estimated_invoice_value
-            auszeichnung = float(r[1]) if r[1] is not None else None
-            internet = float(r[2]) if r[2] is not None else None
-            minimum = float(r[3]) if r[3] is not None else None
-            rr = float(r[4]) if r[4] is not None else None
-            # 0,00 als „nicht gepflegt“ – Fallback auf andere Preisfelder
-            def _valid(v):
-                return v is not None and v > 0
-            vk_brutto = (auszeichnung if _valid(auszeichnung) else None) or (
-                internet if _valid(internet) else None) or (
-                minimum if _valid(minimum) else None) or (rr if _valid(rr) else None)
-            # Netto für Vergleich mit Buchwert (Anlagevermögen immer netto): VK_brutto / 1,19
-            vk_netto = round(vk_brutto / 1.19, 2) if vk_brutto is not None else None
-            row_data = {
-                'verkaufspreis_aktuell': vk_netto,
-                'verkaufspreis_brutto': round(vk_brutto, 2) if vk_brutto is not None else None,
-                'out_estimated_invoice_value': auszeichnung,
-                'out_sale_price_internet': internet,
-                'out_sale_price_minimum': minimum,
-                'out_recommended_retail_price': rr,
-            }
-            result[vin] = row_data
-            if vin.upper() != vin:
-                result[vin.upper()] = row_data
-        return result
-    except Exception:
-        return {}
-
-
 @afa_api.route('/api/afa/abverkauf-uebersicht', methods=['GET'])
 def abverkauf_uebersicht():
     """
@@ -432,10 +327,10 @@ def abverkauf_uebersicht():
                 if vin:
                     vins.append(vin)
                 liste.append(f)
-        preise = _hole_locosoft_verkaufspreise_fuer_vins(vins)
+        anreicherung = anreichern(vins, lookups=['verkauf'])
         for f in liste:
             vin = (f.get('vin') or '').strip()
-            loco = (preise.get(vin) or preise.get(vin.upper()) or {}) if vin else {}
+            loco = anreicherung.get(vin.upper(), {}).get('preise') or {}
             f['verkaufspreis_aktuell'] = loco.get('verkaufspreis_aktuell')  # netto (Locosoft brutto / 1,19)
             buch = f.get('buchwert')
             vk = f.get('verkaufspreis_aktuell')
@@ -448,144 +343,6 @@ def abverkauf_uebersicht():
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
-def _hole_erstzulassung_fuer_vins(vins):
-    """
-    Holt aus Locosoft vehicles Erstzulassung, Km-Stand und Marke (makes.description) pro VIN.
-    Rückgabe: (ez_map, km_map, marke_map) jeweils dict vin -> Wert.
-    """
-    if not vins:
-        return {}, {}, {}
-    vins_clean = [v.strip() for v in vins if v and str(v).strip()]
-    if not vins_clean:
-        return {}, {}, {}
-    placeholders = ','.join(['%s'] * len(vins_clean))
-    ez_map = {}
-    km_map = {}
-    marke_map = {}
-    try:
-        with locosoft_session() as conn:
-            cur = conn.cursor()
-            cur.execute(f"""
-                SELECT TRIM(v.vin) AS vin, v.first_registration_date, v.mileage_km,
-                       TRIM(m.description) AS marke
-                FROM vehicles v
-                LEFT JOIN makes m ON v.make_number = m.make_number
-                WHERE TRIM(v.vin) IN ({placeholders})
-            """, vins_clean)
-            rows = cur.fetchall()
-        for r in rows:
-            vin = (r[0] or '').strip()
-            if not vin:
-                continue
-            ez = r[1]
-            if hasattr(ez, 'isoformat'):
-                ez_val = ez.isoformat() if ez else None
-            else:
-                ez_val = str(ez) if ez else None
-            ez_map[vin] = ez_val
-            if vin.upper() != vin:
-                ez_map[vin.upper()] = ez_val
-            km = r[2]
-            if km is not None:
-                try:
-                    km_map[vin] = int(km)
-                    if vin.upper() != vin:
-                        km_map[vin.upper()] = int(km)
-                except (TypeError, ValueError):
-                    km_map[vin] = None
-            marke = (r[3] or '').strip() if r[3] else None
-            if marke:
-                marke_map[vin] = marke
-                if vin.upper() != vin:
-                    marke_map[vin.upper()] = marke
-        return ez_map, km_map, marke_map
-    except Exception:
-        return {}, {}, {}
-
-
-def _hole_brief_locosoft_fuer_vins(vins):
-    """
-    Holt aus Locosoft codes_vehicle_list den Wert des Zusatzcodes 'BRIEF' (KFZ-Brief / Finanzierung)
-    pro VIN. value_text = z.B. 'Genobank' wenn Fahrzeug bei Genobank finanziert.
-    Rückgabe: dict vin -> value_text (str oder None)
-    """
-    if not vins:
-        return {}
-    vins_clean = [v.strip() for v in vins if v and str(v).strip()]
-    if not vins_clean:
-        return {}
-    vins_upper = [v.upper() for v in vins_clean]
-    placeholders = ','.join(['%s'] * len(vins_upper))
-    try:
-        with locosoft_session() as conn:
-            cur = conn.cursor()
-            cur.execute(f"""
-                SELECT UPPER(TRIM(v.vin)) AS vin, TRIM(cv.value_text) AS brief
-                FROM vehicles v
-                INNER JOIN codes_vehicle_list cv ON cv.vehicle_number = v.internal_number
-                WHERE UPPER(TRIM(cv.code)) = 'BRIEF'
-                  AND UPPER(TRIM(v.vin)) IN ({placeholders})
-            """, vins_upper)
-            rows = cur.fetchall()
-        result = {}
-        for r in rows:
-            vin_key = (r[0] or '').strip()
-            brief = (r[1] or '').strip() if r[1] else None
-            if not vin_key:
-                continue
-            result[vin_key] = brief or None
-            for v in vins_clean:
-                if v.upper() == vin_key:
-                    result[v] = brief or None
-        return result
-    except Exception:
-        return {}
-
-
-def _hole_eautoseller_bwa_placements_from_db(vins):
-    """
-    Liest gecachte eAutoSeller-Platzierungen aus eautoseller_bwa_placement (Celery schreibt VINs in Großbuchstaben).
-    Rückgabe: dict vin -> { mobile_platz, total_hits, platz_1_retail_gross, error } (Lookup case-insensitiv).
-    """
-    if not vins:
-        return {}
-    vins_clean = [v.strip() for v in vins if v and len(str(v).strip()) == 17][:50]
-    if not vins_clean:
-        return {}
-    vins_upper = list(dict.fromkeys([v.upper() for v in vins_clean]))
-    placeholders = ','.join(['%s'] * len(vins_upper))
-    result = {}
-    try:
-        with db_session() as conn:
-            cur = conn.cursor()
-            cur.execute(f"""
-                SELECT vin, mobile_platz, total_hits, platz_1_retail_gross, mobile_url, error_message
-                FROM eautoseller_bwa_placement
-                WHERE vin IN ({placeholders})
-            """, vins_upper)
-            rows = cur.fetchall()
-            colnames = [c[0] for c in (cur.description or [])]
-            for r in rows:
-                row = row_to_dict(r, cur) if hasattr(r, 'keys') else dict(zip(colnames, r))
-                vin_db = (row.get('vin') or '').strip()
-                if not vin_db:
-                    continue
-                data = {
-                    'mobile_platz': row.get('mobile_platz'),
-                    'total_hits': row.get('total_hits'),
-                    'platz_1_retail_gross': float(row['platz_1_retail_gross']) if row.get('platz_1_retail_gross') is not None else None,
-                    'mobile_url': row.get('mobile_url'),
-                    'error': row.get('error_message'),
-                }
-                result[vin_db] = data
-                for v in vins_clean:
-                    if v.upper() == vin_db:
-                        result[v] = data
-        return result
-    except Exception:
-        return {}
-
-
 def _eautoseller_bwa_sync_status():
     """
     Liefert Status des BWA-Caches (für Hinweis auf der Seite).
@@ -626,152 +383,6 @@ def _eautoseller_bwa_sync_status():
         return {'last_fetched_at': None, 'total': 0, 'with_platz': 0, 'all_have_error': False, 'sample_error': None}
 
 
-def _hole_zinsen_pro_vin(vins):
-    """
-    Liest aus fahrzeugfinanzierungen die verursachten Zinsen pro VIN (monatlich + gesamt).
-    VIN-Abgleich: 1) case-insensitiv über UPPER(TRIM(vin)), 2) Fallback über vin_kurz (letzte 8 Zeichen).
-    Rückgabe: dict vin -> { zinsen_monat, zinsen_gesamt, finanzinstitut }
-    Bei mehreren Finanzierungen pro VIN: Summen.
-    """
-    if not vins:
-        return {}
-    vins_clean = [v.strip() for v in vins if v and str(v).strip()]
-    if not vins_clean:
-        return {}
-    vins_upper = [v.upper() for v in vins_clean]
-    placeholders = ','.join(['%s'] * len(vins_upper))
-    result = {}
-    try:
-        with db_session() as conn:
-            cur = conn.cursor()
-            # 1) Abgleich über volle VIN (case-insensitiv)
-            cur.execute(f"""
-                SELECT UPPER(TRIM(vin)) AS vin,
-                       COALESCE(SUM(zinsen_letzte_periode), 0) AS zinsen_monat,
-                       COALESCE(SUM(zinsen_gesamt), 0) AS zinsen_gesamt,
-                       MAX(finanzinstitut) AS finanzinstitut
-                FROM fahrzeugfinanzierungen
-                WHERE UPPER(TRIM(vin)) IN ({placeholders}) AND aktiv = true
-                GROUP BY UPPER(TRIM(vin))
-            """, vins_upper)
-            rows = cur.fetchall()
-            colnames = [c[0] for c in (cur.description or [])]
-            for r in rows:
-                row = row_to_dict(r, None) if hasattr(r, 'keys') else dict(zip(colnames, r))
-                vin_key = (row.get('vin') or '').strip()
-                if not vin_key:
-                    continue
-                data = {
-                    'zinsen_monat': round(float(row.get('zinsen_monat') or 0), 2),
-                    'zinsen_gesamt': round(float(row.get('zinsen_gesamt') or 0), 2),
-                    'finanzinstitut': row.get('finanzinstitut'),
-                }
-                result[vin_key] = data
-                for v in vins_clean:
-                    if v.upper() == vin_key:
-                        result[v] = data
-
-            # 2) Fallback: keine Treffer per voller VIN → Abgleich über vin_kurz (letzte 8 Zeichen)
-            matched_upper = {v.upper() for v in vins_clean if v.upper() in result or v in result}
-            unmatched = [v for v in vins_clean if v.upper() not in matched_upper]
-            if unmatched:
-                last8_to_vins = {}
-                for v in unmatched:
-                    key = (v[-8:].upper() if len(v) >= 8 else v.upper())
-                    last8_to_vins.setdefault(key, []).append(v)
-                last8_list = list(last8_to_vins.keys())
-                ph2 = ','.join(['%s'] * len(last8_list))
-                cur.execute(f"""
-                    SELECT UPPER(TRIM(vin_kurz)) AS vin_kurz,
-                           COALESCE(SUM(zinsen_letzte_periode), 0) AS zinsen_monat,
-                           COALESCE(SUM(zinsen_gesamt), 0) AS zinsen_gesamt,
-                           MAX(finanzinstitut) AS finanzinstitut
-                    FROM fahrzeugfinanzierungen
-                    WHERE vin_kurz IS NOT NULL AND TRIM(vin_kurz) != ''
-                      AND UPPER(TRIM(vin_kurz)) IN ({ph2}) AND aktiv = true
-                    GROUP BY UPPER(TRIM(vin_kurz))
-                """, last8_list)
-                rows2 = cur.fetchall()
-                colnames2 = [c[0] for c in (cur.description or [])]
-                for r in rows2:
-                    row = row_to_dict(r, None) if hasattr(r, 'keys') else dict(zip(colnames2, r))
-                    vk = (row.get('vin_kurz') or '').strip()
-                    if not vk:
-                        continue
-                    data = {
-                        'zinsen_monat': round(float(row.get('zinsen_monat') or 0), 2),
-                        'zinsen_gesamt': round(float(row.get('zinsen_gesamt') or 0), 2),
-                        'finanzinstitut': row.get('finanzinstitut'),
-                    }
-                    for v in last8_to_vins.get(vk, []):
-                        result[v] = data
-                        result[v.upper()] = data
-
-            # 3) Genobank: Zinsen berechnen, wenn in DB noch 0 (Import schreibt nur zins_startdatum, keine Zinsen)
-            # Wie bankenspiegel_api: saldo × zinssatz/100 × tage_seit_zinsstart/365
-            zinssatz_genobank = None
-            cur.execute("""
-                SELECT sollzins FROM konten
-                WHERE kontonummer = '4700057908' OR iban LIKE '%%4700057908%%'
-                LIMIT 1
-            """)
-            row_z = cur.fetchone()
-            if row_z and row_z[0] is not None:
-                zinssatz_genobank = float(row_z[0])
-            if zinssatz_genobank is None:
-                cur.execute("SELECT zinssatz FROM ek_finanzierung_konditionen WHERE finanzinstitut = 'Genobank' LIMIT 1")
-                row_z = cur.fetchone()
-                if row_z and row_z[0] is not None:
-                    zinssatz_genobank = float(row_z[0])
-            if zinssatz_genobank is None:
-                zinssatz_genobank = 5.5
-
-            cur.execute(f"""
-                SELECT UPPER(TRIM(vin)) AS vin, zins_startdatum, aktueller_saldo
-                FROM fahrzeugfinanzierungen
-                WHERE finanzinstitut = 'Genobank' AND aktiv = true
-                  AND (zinsen_gesamt IS NULL OR zinsen_gesamt = 0)
-                  AND zins_startdatum IS NOT NULL AND aktueller_saldo > 0
-                  AND UPPER(TRIM(vin)) IN ({placeholders})
-            """, vins_upper)
-            rows_geno = cur.fetchall()
-            for r in rows_geno:
-                vin_key = (r[0] or '').strip()
-                zins_start = r[1]
-                saldo = float(r[2] or 0)
-                if not vin_key or saldo <= 0:
-                    continue
-                try:
-                    if hasattr(zins_start, 'year'):
-                        zins_start_date = zins_start
-                    elif zins_start:
-                        zins_start_date = date.fromisoformat(str(zins_start)[:10])
-                    else:
-                        continue
-                    tage = (date.today() - zins_start_date).days
-                    if tage <= 0:
-                        continue
-                    z_ges = round(saldo * zinssatz_genobank / 100 * tage / 365, 2)
-                    z_monat = round(saldo * zinssatz_genobank / 100 * 30 / 365, 2)
-                except (TypeError, ValueError):
-                    continue
-                data = {
-                    'zinsen_monat': z_monat,
-                    'zinsen_gesamt': z_ges,
-                    'finanzinstitut': 'Genobank',
-                }
-                if vin_key in result and (result[vin_key].get('zinsen_gesamt') or 0) == 0:
-                    result[vin_key].update(data)
-                else:
-                    result[vin_key] = data
-                for v in vins_clean:
-                    if v.upper() == vin_key:
-                        result[v] = result[vin_key]
-        return result
-    except Exception:
-        return {}
-
-
 # Standzeit ab diesem Wert (Tage): quasi nur noch Zwang zur Vermarktung, Zinsenrückholung fraglich
 STANDZEIT_ZWANG_VERMARKTUNG_TAGE = 300
 
@@ -844,17 +455,13 @@ def _get_verkaufsempfehlungen_liste():
             if vin:
                 vins.append(vin)
             liste.append(f)
-    # Rechnungsdatum aus Locosoft: Fahrzeug bleibt in der Liste, Anzeige wenn Rechnung vorhanden (Abgang in DRIVE buchen)
-    rechnungsdatum_map = _hole_locosoft_rechnungsdatum_fuer_vins(vins)
-    preise = _hole_locosoft_verkaufspreise_fuer_vins(vins)
-    zinsen_map = _hole_zinsen_pro_vin(vins)
-    ez_map, km_map, marke_map = _hole_erstzulassung_fuer_vins(vins)
-    brief_map = _hole_brief_locosoft_fuer_vins(vins)
-    # eAutoSeller BWA: aus gecachter Tabelle (gefüllt vom Celery-Task sync_eautoseller_data)
-    placements = _hole_eautoseller_bwa_placements_from_db(vins)
+    # TAG 220: Locosoft (Rechnungsdatum, Preise, EZ/Km/Marke, BRIEF) und Portal (Zinsen, eAutoSeller BWA
+    # aus gecachter Tabelle) parallel über api/afa_vin_anreicherung, gecacht bis zum nächsten Mirror/Sync
+    anreicherung = anreichern(vins)
     for f in liste:
         vin = (f.get('vin') or '').strip()
-        loco = (preise.get(vin) or preise.get(vin.upper()) or {}) if vin else {}
+        info = anreicherung.get(vin.upper(), {})
+        loco = info.get('preise') or {}
         f['verkaufspreis_aktuell'] = loco.get('verkaufspreis_aktuell')
         buch = f.get('buchwert')
         vk = f.get('verkaufspreis_aktuell')
@@ -862,22 +469,21 @@ def _get_verkaufsempfehlungen_liste():
             f['differenz_vk_minus_buchwert'] = round(vk - buch, 2)
         else:
             f['differenz_vk_minus_buchwert'] = None
-        zins = (zinsen_map.get(vin) or zinsen_map.get(vin.upper()) or {}) if vin else {}
+        zins = info.get('zinsen') or {}
         f['zinsen_monat'] = zins.get('zinsen_monat', 0)
         f['zinsen_gesamt'] = zins.get('zinsen_gesamt', 0)
         f['finanzinstitut'] = zins.get('finanzinstitut')
-        f['erstzulassungsdatum'] = (ez_map.get(vin) or ez_map.get(vin.upper())) if vin else None
-        f['km_stand'] = (km_map.get(vin) or km_map.get(vin.upper())) if vin else None
+        f['erstzulassungsdatum'] = info.get('erstzulassung')
+        f['km_stand'] = info.get('km')
         # Marke aus Locosoft (makes.description) hat Vorrang vor AfA-Stammdaten
-        loco_marke = (marke_map.get(vin) or marke_map.get(vin.upper())) if vin else None
-        if loco_marke:
-            f['marke'] = loco_marke
-        f['brief_locosoft'] = (brief_map.get(vin) or brief_map.get(vin.upper())) if vin else None
+        if info.get('marke'):
+            f['marke'] = info['marke']
+        f['brief_locosoft'] = info.get('brief')
         # Rechnungsdatum Locosoft: anzeigen wenn gesetzt (Fahrzeug bleibt in Liste bis Abgang in DRIVE)
-        f['locosoft_rechnungsdatum'] = (rechnungsdatum_map.get(vin) or rechnungsdatum_map.get(vin.upper())) if vin else None
+        f['locosoft_rechnungsdatum'] = info.get('rechnungsdatum')
         f['locosoft_verkauft'] = bool(f.get('locosoft_rechnungsdatum'))
         # eAutoSeller BWA/Bewerter: mobile.de Platz + Treffer + Platz 1 Preis + Link (wie eAutoseller Bestand)
-        placement = (placements.get(vin) or placements.get(vin.upper()) or {}) if vin else {}
+        placement = info.get('placement') or {}
         f['mobile_platz'] = placement.get('mobile_platz')
         f['total_hits'] = placement.get('total_hits')
         f['platz_1_retail_gross'] = placement.get('platz_1_retail_gross')
@@ -1075,8 +681,8 @@ def fahrzeug_detail(fk_id):
         if f.get('status') == 'aktiv':
             vin = (f.get('vin') or '').strip()
             if vin:
-                preise = _hole_locosoft_verkaufspreise_fuer_vins([vin])
-                loco = preise.get(vin) or preise.get(vin.upper()) or {}
+                anreicherung = anreichern([vin], lookups=['verkauf'])
+                loco = anreicherung.get(vin.upper(), {}).get('preise') or {}
                 vk = loco.get('verkaufspreis_aktuell')
                 if vk is not None:
                     f['verkaufspreis_aktuell'] = round(float(vk), 2)
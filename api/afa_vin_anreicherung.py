@@ -0,0 +1,353 @@
+"""
+AfA VIN-Anreicherung — Locosoft- und Portal-Daten pro VIN für Verkaufsempfehlungen/Abverkauf
+============================================================================================
+TAG 220: Ersetzt die Kette _hole_*_fuer_vins in api/afa_api.py (je Helper eine eigene
+Verbindung, nacheinander; Zinsen zusätzlich mit zweitem Durchlauf über die letzten 8 Zeichen).
+
+Ablauf:
+  1. VINs einmal normalisieren (TRIM + UPPER) und Index VIN / letzte 8 Zeichen bilden
+  2. Lookups parallel, jeder auf einer eigenen Pool-Verbindung:
+       verkauf    (Locosoft)  Rechnungsdatum + Verkaufspreise aus dealer_vehicles (eine Abfrage)
+       fahrzeug   (Locosoft)  Erstzulassung, Km-Stand, Marke, Zusatzcode BRIEF (eine Abfrage)
+       zinsen     (Portal)    fahrzeugfinanzierungen über volle VIN und vin_kurz in einer Abfrage,
+                              Genobank-Zinsen berechnet wie bankenspiegel_api
+       placements (Portal)    eAutoSeller BWA-Platzierungen (eautoseller_bwa_placement)
+  3. Ergebnisse in einem Durchlauf zu einem dict VIN (UPPER) -> Felder zusammenführen
+
+Gecacht je VIN-Menge, Lookups und Stichtag (AFA_VIN_CACHE_TTL); Tag 'afa_vin' wird nach
+Locosoft-Mirror, eAutoseller-Sync und den Finanzierungs-Importen (Santander, Hyundai, Stellantis,
+Genobank) invalidiert. Schlägt ein Lookup fehl, fehlen nur dessen Felder und das Ergebnis
+wird nicht gecacht.
+
+Verwendung:
+    from api.afa_vin_anreicherung import anreichern
+    daten = anreichern(vins)                      # alle Lookups
+    preise = anreichern(vins, lookups=['verkauf'])
+    info = daten.get(vin.strip().upper(), {})
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from api.cache_utils import cached_result
+from api.db_utils import db_session, locosoft_session
+
+logger = logging.getLogger(__name__)
+
+AFA_VIN_CACHE_TTL = int(os.getenv('AFA_VIN_CACHE_TTL', str(6 * 3600)))
+AFA_VIN_PARALLEL = int(os.getenv('AFA_VIN_PARALLEL', '4'))
+
+ALLE_LOOKUPS = ('verkauf', 'fahrzeug', 'zinsen', 'placements')
+
+# eAutoSeller-Platzierungen: wie der Celery-Sync nur 17-stellige VINs, max. 50 (älteste zuerst)
+PLACEMENTS_MAX_VINS = 50
+
+# Genobank-Konto für den Sollzins (Fallback: ek_finanzierung_konditionen, dann 5,5 %)
+GENOBANK_KONTONUMMER = '4700057908'
+GENOBANK_ZINSSATZ_DEFAULT = 5.5
+
+
+def normalisiere_vins(vins: Sequence[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    VINs einmal normalisieren: TRIM + UPPER, leere entfernt, Reihenfolge bleibt (inkl. Duplikate).
+    Returns: (vins_norm, letzte8_index) mit letzte8_index: letzte 8 Zeichen -> eindeutige VINs
+    """
+    vins_norm = [str(v).strip().upper() for v in (vins or []) if v and str(v).strip()]
+    letzte8: Dict[str, List[str]] = {}
+    for v in dict.fromkeys(vins_norm):
+        letzte8.setdefault(v[-8:], []).append(v)
+    return vins_norm, letzte8
+
+
+def _placeholders(werte: Sequence[Any]) -> str:
+    return ','.join(['%s'] * len(werte))
+
+
+def _iso(wert, laenge: Optional[int] = None) -> Optional[str]:
+    if not wert:
+        return None
+    text = wert.isoformat() if hasattr(wert, 'isoformat') else str(wert)
+    return text[:laenge] if laenge else text
+
+
+def _float(wert) -> Optional[float]:
+    return float(wert) if wert is not None else None
+
+
+# =============================================================================
+# LOOKUPS (je eine Verbindung, Rückgabe: VIN (UPPER) -> Teil-Felder)
+# =============================================================================
+
+def _lookup_verkauf(index: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Locosoft dealer_vehicles: Rechnungsdatum (out_invoice_date, nur Fahrzeugsatz mit gleichem
+    dealer_vehicle_type/-number) und Verkaufspreise noch nicht fakturierter Fahrzeuge.
+    Preis-Priorität: out_estimated_invoice_value (L132PR), Internet, Minimum, UPE; 0,00 = nicht gepflegt.
+    """
+    vins = index['vins']
+    with locosoft_session() as conn:
+        cur = conn.cursor()
+        # Join nur über vehicle_number = internal_number (vehicles.dealer_vehicle_type/-number können NULL sein)
+        cur.execute(f"""
+            SELECT UPPER(TRIM(v.vin)) AS vin,
+                   dv.out_invoice_date,
+                   (dv.dealer_vehicle_type = v.dealer_vehicle_type
+                    AND dv.dealer_vehicle_number = v.dealer_vehicle_number) AS gleicher_satz,
+                   dv.out_estimated_invoice_value,
+                   dv.out_sale_price_internet,
+                   dv.out_sale_price_minimum,
+                   dv.out_recommended_retail_price
+            FROM vehicles v
+            JOIN dealer_vehicles dv ON dv.vehicle_number = v.internal_number
+            WHERE UPPER(TRIM(v.vin)) IN ({_placeholders(vins)})
+        """, vins)
+        rows = cur.fetchall()
+
+    ergebnis: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        vin = (r[0] or '').strip()
+        if not vin:
+            continue
+        if r[1] is not None:
+            if r[2]:
+                ergebnis.setdefault(vin, {})['rechnungsdatum'] = _iso(r[1], 10)
+            continue
+        auszeichnung, internet, minimum, uvp = (_float(x) for x in r[3:7])
+        vk_brutto = next((p for p in (auszeichnung, internet, minimum, uvp) if p is not None and p > 0), None)
+        ergebnis.setdefault(vin, {})['preise'] = {
+            # Netto für Vergleich mit Buchwert (Anlagevermögen immer netto): VK_brutto / 1,19
+            'verkaufspreis_aktuell': round(vk_brutto / 1.19, 2) if vk_brutto is not None else None,
+            'verkaufspreis_brutto': round(vk_brutto, 2) if vk_brutto is not None else None,
+            'out_estimated_invoice_value': auszeichnung,
+            'out_sale_price_internet': internet,
+            'out_sale_price_minimum': minimum,
+            'out_recommended_retail_price': uvp,
+        }
+    return ergebnis
+
+
+def _lookup_fahrzeug(index: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Locosoft vehicles: Erstzulassung, Km-Stand, Marke (makes.description) und Zusatzcode 'BRIEF'."""
+    vins = index['vins']
+    with locosoft_session() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT UPPER(TRIM(v.vin)) AS vin, v.first_registration_date, v.mileage_km,
+                   TRIM(m.description) AS marke,
+                   cv.vehicle_number IS NOT NULL AS hat_brief,
+                   TRIM(cv.value_text) AS brief
+            FROM vehicles v
+            LEFT JOIN makes m ON v.make_number = m.make_number
+            LEFT JOIN codes_vehicle_list cv ON cv.vehicle_number = v.internal_number
+                AND UPPER(TRIM(cv.code)) = 'BRIEF'
+            WHERE UPPER(TRIM(v.vin)) IN ({_placeholders(vins)})
+        """, vins)
+        rows = cur.fetchall()
+
+    ergebnis: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        vin = (r[0] or '').strip()
+        if not vin:
+            continue
+        f = ergebnis.setdefault(vin, {})
+        f['erstzulassung'] = _iso(r[1])
+        if r[2] is not None:
+            try:
+                f['km'] = int(r[2])
+            except (TypeError, ValueError):
+                f['km'] = None
+        if r[3] and r[3].strip():
+            f['marke'] = r[3].strip()
+        if r[4]:
+            # value_text z. B. 'Genobank' wenn Fahrzeug bei Genobank finanziert
+            f['brief'] = (r[5] or '').strip() or None
+    return ergebnis
+
+
+def _genobank_zinssatz(cur) -> float:
+    cur.execute("""
+        SELECT sollzins FROM konten
+        WHERE kontonummer = %s OR iban LIKE %s
+        LIMIT 1
+    """, (GENOBANK_KONTONUMMER, f"%{GENOBANK_KONTONUMMER}%"))
+    row = cur.fetchone()
+    if row and row[0] is not None:
+        return float(row[0])
+    cur.execute("SELECT zinssatz FROM ek_finanzierung_konditionen WHERE finanzinstitut = 'Genobank' LIMIT 1")
+    row = cur.fetchone()
+    if row and row[0] is not None:
+        return float(row[0])
+    return GENOBANK_ZINSSATZ_DEFAULT
+
+
+def _zins_summe(finanzierungen: List[Any]) -> Dict[str, Any]:
+    """Summen wie SUM/MAX je VIN bzw. vin_kurz (mehrere Finanzierungen pro Fahrzeug)."""
+    institute = [f[4] for f in finanzierungen if f[4] is not None]
+    return {
+        'zinsen_monat': round(float(sum(f[2] for f in finanzierungen if f[2] is not None)), 2),
+        'zinsen_gesamt': round(float(sum(f[3] for f in finanzierungen if f[3] is not None)), 2),
+        'finanzinstitut': max(institute) if institute else None,
+    }
+
+
+def _lookup_zinsen(index: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    fahrzeugfinanzierungen (aktiv): verursachte Zinsen pro VIN (monatlich + gesamt).
+    Abgleich 1) volle VIN, 2) für VINs ohne Treffer vin_kurz (letzte 8 Zeichen) — beides aus einer
+    Abfrage. Genobank: Import schreibt nur zins_startdatum, Zinsen daher
+    saldo × zinssatz/100 × tage_seit_zinsstart/365 (wie bankenspiegel_api).
+    """
+    vins, letzte8 = index['vins'], index['letzte8']
+    kurz = list(letzte8)
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT UPPER(TRIM(vin)) AS vin,
+                   NULLIF(UPPER(TRIM(vin_kurz)), '') AS vin_kurz,
+                   zinsen_letzte_periode, zinsen_gesamt, finanzinstitut,
+                   zins_startdatum, aktueller_saldo
+            FROM fahrzeugfinanzierungen
+            WHERE aktiv = true
+              AND (UPPER(TRIM(vin)) IN ({_placeholders(vins)})
+                   OR UPPER(TRIM(vin_kurz)) IN ({_placeholders(kurz)}))
+        """, vins + kurz)
+        rows = cur.fetchall()
+
+        vin_set = set(vins)
+        pro_vin: Dict[str, List[Any]] = {}
+        pro_kurz: Dict[str, List[Any]] = {}
+        genobank: List[Any] = []
+        for r in rows:
+            vin = (r[0] or '').strip()
+            if vin in vin_set:
+                pro_vin.setdefault(vin, []).append(r)
+                if (r[4] == 'Genobank' and not r[3] and r[5] is not None
+                        and r[6] is not None and float(r[6]) > 0):
+                    genobank.append(r)
+            if r[1] in letzte8:
+                pro_kurz.setdefault(r[1], []).append(r)
+        zinssatz = _genobank_zinssatz(cur) if genobank else GENOBANK_ZINSSATZ_DEFAULT
+
+    zinsen: Dict[str, Dict[str, Any]] = {vin: _zins_summe(fin) for vin, fin in pro_vin.items()}
+    for k, fin in pro_kurz.items():
+        summe = _zins_summe(fin)
+        for vin in letzte8[k]:
+            if vin not in pro_vin:
+                zinsen[vin] = summe
+
+    for r in genobank:
+        try:
+            zins_start = r[5] if hasattr(r[5], 'year') else date.fromisoformat(str(r[5])[:10])
+            tage = (index['stichtag'] - zins_start).days
+        except (TypeError, ValueError):
+            continue
+        if tage <= 0:
+            continue
+        saldo = float(r[6])
+        zinsen[r[0].strip()] = {
+            'zinsen_monat': round(saldo * zinssatz / 100 * 30 / 365, 2),
+            'zinsen_gesamt': round(saldo * zinssatz / 100 * tage / 365, 2),
+            'finanzinstitut': 'Genobank',
+        }
+    return {vin: {'zinsen': z} for vin, z in zinsen.items()}
+
+
+def _lookup_placements(index: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Gecachte eAutoSeller-Platzierungen (Celery sync_eautoseller_data schreibt VINs in Großbuchstaben)."""
+    placement_vins = index['placement_vins']
+    if not placement_vins:
+        return {}
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT vin, mobile_platz, total_hits, platz_1_retail_gross, mobile_url, error_message
+            FROM eautoseller_bwa_placement
+            WHERE vin IN ({_placeholders(placement_vins)})
+        """, placement_vins)
+        rows = cur.fetchall()
+
+    ergebnis: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        vin = (r[0] or '').strip()
+        if not vin:
+            continue
+        ergebnis[vin] = {'placement': {
+            'mobile_platz': r[1],
+            'total_hits': r[2],
+            'platz_1_retail_gross': _float(r[3]),
+            'mobile_url': r[4],
+            'error': r[5],
+        }}
+    return ergebnis
+
+
+_LOOKUPS = {
+    'verkauf': _lookup_verkauf,
+    'fahrzeug': _lookup_fahrzeug,
+    'zinsen': _lookup_zinsen,
+    'placements': _lookup_placements,
+}
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+@cached_result(ttl=AFA_VIN_CACHE_TTL, tags=['afa_vin'])
+def _anreichern(vins_norm: List[str], lookups: List[str], stichtag: str) -> Dict[str, Any]:
+    """Lookups parallel ausführen und in einem Durchlauf zusammenführen (gecacht je Argumenten)."""
+    vins_norm, letzte8 = normalisiere_vins(vins_norm)
+    index = {
+        'vins': list(dict.fromkeys(vins_norm)),
+        'letzte8': letzte8,
+        'placement_vins': list(dict.fromkeys([v for v in vins_norm if len(v) == 17][:PLACEMENTS_MAX_VINS])),
+        'stichtag': date.fromisoformat(stichtag),
+    }
+    with ThreadPoolExecutor(max_workers=max(1, min(AFA_VIN_PARALLEL, len(lookups))),
+                            thread_name_prefix='afa-vin') as pool:
+        futures = {name: pool.submit(_LOOKUPS[name], index) for name in lookups}
+
+    daten: Dict[str, Dict[str, Any]] = {}
+    fehler = []
+    for name, future in futures.items():
+        try:
+            teil = future.result()
+        except Exception as e:
+            logger.warning("AfA VIN-Anreicherung: Lookup '%s' fehlgeschlagen: %s", name, e)
+            fehler.append(name)
+            continue
+        for vin, felder in teil.items():
+            daten.setdefault(vin, {}).update(felder)
+
+    ergebnis = {'vins': daten}
+    if fehler:
+        # Teilergebnis zurückgeben, aber nicht cachen (cached_result überspringt 'error')
+        ergebnis['error'] = f"Lookups fehlgeschlagen: {', '.join(fehler)}"
+    return ergebnis
+
+
+def anreichern(vins: Sequence[str], lookups: Sequence[str] = ALLE_LOOKUPS,
+               stichtag: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Reichert VINs mit Locosoft- und Portal-Daten an.
+
+    Args:
+        vins: VINs in Listenreihenfolge (bestimmt die max. 50 Platzierungs-VINs)
+        lookups: Teilmenge von ALLE_LOOKUPS
+        stichtag: Bezugstag für berechnete Genobank-Zinsen (default: heute)
+
+    Returns:
+        dict VIN (TRIM/UPPER) -> Felder: rechnungsdatum, preise, erstzulassung, km, marke, brief,
+        zinsen, placement (nur vorhandene)
+    """
+    vins_norm, _ = normalisiere_vins(vins)
+    if not vins_norm:
+        return {}
+    unbekannt = set(lookups) - set(ALLE_LOOKUPS)
+    if unbekannt:
+        raise ValueError(f"Unbekannte Lookups: {', '.join(sorted(unbekannt))}")
+    lookups = [name for name in ALLE_LOOKUPS if name in lookups]
+    return _anreichern(vins_norm, lookups, (stichtag or date.today()).isoformat())['vins']
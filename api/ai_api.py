@@ -17,10 +17,15 @@ import json
 import os
 import logging
 import re
-from typing import Optional, Dict, Any
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
 from datetime import date
 
 from decorators.auth_decorators import login_or_api_key_required
+from api.job_offload import offload
 
 logger = logging.getLogger(__name__)
 
@@ -347,7 +352,34 @@ TRANSAKTION_KATEGORIEN_FUER_KI = [
 ]
 
 
+# TAG 220: KI-Fallback im Hintergrund (Celery: kategorisiere_transaktionen_ki)
+KI_KATEGORIE_BATCH_SIZE = 8          # Transaktionen pro Prompt
+KI_KATEGORIE_MAX_PARALLEL = int(os.getenv('LM_STUDIO_MAX_PARALLEL', '3'))  # gleichzeitige Requests
+KI_KATEGORIE_CACHE_TTL = 90 * 86400  # Vorschläge je Fingerprint (Sekunden)
+KI_KATEGORIE_CACHE_PREFIX = 'ki_kat'
+KI_BEISPIELE_TTL = 60                # Few-Shot-Beispiele pro Prozess (Sekunden)
+
+_beispiele_cache: Dict[str, Any] = {'geladen': 0.0, 'beispiele': None}
+_beispiele_lock = threading.Lock()
+_vorschlag_l1: Dict[str, Dict[str, Any]] = {}
+
+
 def _hole_kategorisierung_beispiele(limit: int = 12) -> list:
+    """
+    Few-Shot-Beispiele, pro Prozess KI_BEISPIELE_TTL Sekunden gecacht (TAG 220) –
+    vorher lief die Query bei jedem einzelnen KI-Aufruf.
+    """
+    now = time.monotonic()
+    with _beispiele_lock:
+        if _beispiele_cache['beispiele'] is not None and now - _beispiele_cache['geladen'] < KI_BEISPIELE_TTL:
+            return _beispiele_cache['beispiele'][:limit]
+    beispiele = _lade_kategorisierung_beispiele(limit=20)
+    with _beispiele_lock:
+        _beispiele_cache.update(geladen=now, beispiele=beispiele)
+    return beispiele[:limit]
+
+
+def _lade_kategorisierung_beispiele(limit: int = 12) -> list:
     """Lädt zuletzt vom User bestätigte Kategorisierungen als Few-Shot-Beispiele (nur kategorie_manuell = true = Übernehmen geklickt)."""
     try:
         from api.db_utils import db_session
@@ -405,15 +437,7 @@ def kategorisiere_transaktion_mit_ki(
     betrag_str = f"{betrag:.2f} €" if betrag is not None else "nicht angegeben"
     text = " | ".join(p for p in text_parts if p.strip())
     kategorien_str = ", ".join(TRANSAKTION_KATEGORIEN_FUER_KI)
-
-    beispiele = _hole_kategorisierung_beispiele(limit=12)
-    beispiele_block = ""
-    if beispiele:
-        lines = ["Beispiele aus euren bereits kategorisierten Buchungen (daran orientieren):"]
-        for b in beispiele[:10]:
-            uk = (" / " + b["unterkategorie"]) if b.get("unterkategorie") else ""
-            lines.append(f"- Text: {b['text']} | Betrag: {b['betrag']} → Kategorie: {b['kategorie']}{uk}")
-        beispiele_block = "\n".join(lines) + "\n\n"
+    beispiele_block = _beispiele_block(_hole_kategorisierung_beispiele(limit=12))
 
     prompt = f"""{beispiele_block}Kategorisiere diese Banktransaktion (Autohaus) in genau eine Kategorie.
 Verwendungszweck/Buchungstext/Gegenkonto: {text[:500]}
@@ -441,23 +465,211 @@ Antworte NUR mit diesem JSON, nichts anderes:
     if not response:
         return None
     try:
-        response_clean = response.strip()
-        if response_clean.startswith("```"):
-            lines = response_clean.split("\n")
-            response_clean = "\n".join(lines[1:-1]) if len(lines) > 2 else response_clean
-        out = json.loads(response_clean)
-        k = (out.get("kategorie") or "").strip()
-        if not k:
-            return None
-        return {
-            "kategorie": k,
-            "unterkategorie": (out.get("unterkategorie") or "").strip() or None
-        }
+        out = json.loads(_strip_code_fence(response))
+        return _vorschlag_aus_json(out)
     except json.JSONDecodeError:
         logger.warning("KI Kategorisierung: Kein gültiges JSON - %s", response[:200])
         return None
 
 
+def _beispiele_block(beispiele: list) -> str:
+    if not beispiele:
+        return ""
+    lines = ["Beispiele aus euren bereits kategorisierten Buchungen (daran orientieren):"]
+    for b in beispiele[:10]:
+        uk = (" / " + b["unterkategorie"]) if b.get("unterkategorie") else ""
+        lines.append(f"- Text: {b['text']} | Betrag: {b['betrag']} → Kategorie: {b['kategorie']}{uk}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _strip_code_fence(response: str) -> str:
+    response_clean = response.strip()
+    if response_clean.startswith("```"):
+        lines = response_clean.split("\n")
+        response_clean = "\n".join(lines[1:-1]) if len(lines) > 2 else response_clean
+    return response_clean
+
+
+def _vorschlag_aus_json(out: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(out, dict):
+        return None
+    k = (out.get("kategorie") or "").strip()
+    if not k:
+        return None
+    return {
+        "kategorie": k,
+        "unterkategorie": (out.get("unterkategorie") or "").strip() or None
+    }
+
+
+# ----------------------------------------------------------------------------
+# Batch + Cache (TAG 220)
+# ----------------------------------------------------------------------------
+
+def ki_fingerprint(verwendungszweck: Optional[str], gegenkonto_name: Optional[str],
+                   betrag: Optional[float] = None) -> str:
+    """
+    Normalisierter Schlüssel für wiederkehrende Buchungen: Kleinschreibung, Ziffern
+    (Datum, Rechnungs-/Referenznummern) und Satzzeichen raus, Whitespace zusammengefasst.
+    Das Vorzeichen des Betrags gehört dazu (Einnahme vs. Ausgabe).
+    """
+    def norm(value: Optional[str]) -> str:
+        value = re.sub(r"[\d\W_]+", " ", (value or "").lower())
+        return " ".join(value.split())
+
+    vorzeichen = "" if betrag is None else ("+" if betrag > 0 else "-" if betrag < 0 else "0")
+    roh = f"{norm(verwendungszweck)}|{norm(gegenkonto_name)}|{vorzeichen}"
+    return hashlib.sha1(roh.encode("utf-8")).hexdigest()
+
+
+def _cache_key(fingerprint: str) -> str:
+    return f"{KI_KATEGORIE_CACHE_PREFIX}:{fingerprint}"
+
+
+def _vorschlaege_aus_cache(fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    treffer = {fp: _vorschlag_l1[fp] for fp in fingerprints if fp in _vorschlag_l1}
+    offen = [fp for fp in fingerprints if fp not in treffer]
+    client = get_redis_client()
+    if client is None or not offen:
+        return treffer
+    try:
+        for fp, wert in zip(offen, client.mget([_cache_key(fp) for fp in offen])):
+            if wert:
+                treffer[fp] = json.loads(wert)
+    except Exception as e:
+        _mark_redis_down(e)
+    return treffer
+
+
+def _vorschlaege_speichern(vorschlaege: Dict[str, Dict[str, Any]]):
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    if len(_vorschlag_l1) > 10000:
+        _vorschlag_l1.clear()
+    _vorschlag_l1.update(vorschlaege)
+    client = get_redis_client()
+    if client is None or not vorschlaege:
+        return
+    try:
+        pipe = client.pipeline()
+        for fp, vorschlag in vorschlaege.items():
+            pipe.setex(_cache_key(fp), KI_KATEGORIE_CACHE_TTL, json.dumps(vorschlag))
+        pipe.execute()
+    except Exception as e:
+        _mark_redis_down(e)
+
+
+def _kategorisiere_ki_prompt_batch(batch: List[Dict[str, Any]], beispiele_block: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Ein Prompt für mehrere Transaktionen. Returns: Position im Batch → Vorschlag.
+    Bei unbrauchbarer Antwort: Einzel-Prompts für den Batch (kategorisiere_transaktion_mit_ki).
+    """
+    kategorien_str = ", ".join(TRANSAKTION_KATEGORIEN_FUER_KI)
+    zeilen = []
+    for nr, t in enumerate(batch, start=1):
+        text = " | ".join(p for p in (str(t.get("verwendungszweck") or ""), str(t.get("buchungstext") or ""),
+                                      str(t.get("gegenkonto_name") or "")) if p.strip())
+        betrag = t.get("betrag")
+        betrag_str = f"{float(betrag):.2f} €" if betrag is not None else "nicht angegeben"
+        zeilen.append(f"{nr}. {text[:300]} | Betrag: {betrag_str}")
+
+    prompt = f"""{beispiele_block}Kategorisiere diese {len(batch)} Banktransaktionen (Autohaus), jede in genau eine Kategorie.
+{chr(10).join(zeilen)}
+
+Wähle NUR Kategorien aus: {kategorien_str}
+Unterkategorie kann spezifischer sein (z.B. bei Einkaufsfinanzierung: Stellantis, Santander, Hyundai; bei Personal: Gehalt; bei Lieferanten: Teile, Sonstige).
+
+Antworte NUR mit diesem JSON-Array (ein Eintrag je Nummer), nichts anderes:
+[{{"nr": 1, "kategorie": "Gewählte Kategorie", "unterkategorie": "Unterkategorie oder null"}}]
+"""
+    messages = [
+        {
+            "role": "system",
+            "content": "Du bist ein Buchhalter. Du kategorisierst Bankbuchungen für ein Autohaus. Orientiere dich an den gegebenen Beispielen. Antworte ausschließlich mit gültigem JSON."
+        },
+        {"role": "user", "content": prompt}
+    ]
+    response = lm_studio_client.chat_completion(
+        messages=messages,
+        max_tokens=60 * len(batch) + 50,
+        temperature=0.2
+    )
+    ergebnis: Dict[int, Dict[str, Any]] = {}
+    if response:
+        try:
+            for eintrag in json.loads(_strip_code_fence(response)):
+                vorschlag = _vorschlag_aus_json(eintrag)
+                nr = eintrag.get("nr") if isinstance(eintrag, dict) else None
+                if vorschlag and isinstance(nr, int) and 1 <= nr <= len(batch):
+                    ergebnis[nr - 1] = vorschlag
+        except (json.JSONDecodeError, TypeError):
+            logger.warning("KI Kategorisierung (Batch): Kein gültiges JSON - %s", response[:200])
+
+    if not ergebnis and len(batch) > 1:
+        # Modell kommt mit dem Batch-Format nicht zurecht → einzeln
+        for idx, t in enumerate(batch):
+            vorschlag = kategorisiere_transaktion_mit_ki(
+                verwendungszweck=t.get("verwendungszweck"), buchungstext=t.get("buchungstext"),
+                gegenkonto_name=t.get("gegenkonto_name"), betrag=t.get("betrag"),
+            )
+            if vorschlag:
+                ergebnis[idx] = vorschlag
+    return ergebnis
+
+
+def kategorisiere_transaktionen_mit_ki(transaktionen: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    KI-Vorschläge für mehrere Transaktionen (TAG 220, Celery-Task kategorisiere_transaktionen_ki).
+
+    - gleiche Fingerprints (ki_fingerprint) werden nur einmal angefragt
+    - Vorschläge aus dem Cache (Redis, KI_KATEGORIE_CACHE_TTL) gehen nie ans Modell
+    - KI_KATEGORIE_BATCH_SIZE Transaktionen pro Prompt, höchstens
+      KI_KATEGORIE_MAX_PARALLEL Requests gleichzeitig gegen LM Studio
+
+    Args:
+        transaktionen: Dicts mit id, verwendungszweck, buchungstext, gegenkonto_name, betrag
+
+    Returns:
+        {"vorschlaege": {id: {"kategorie", "unterkategorie"}}, "cache_treffer": int, "ki_anfragen": int}
+    """
+    nach_fingerprint: Dict[str, List[Dict[str, Any]]] = {}
+    for t in transaktionen:
+        betrag = float(t["betrag"]) if t.get("betrag") is not None else None
+        fp = ki_fingerprint(t.get("verwendungszweck"), t.get("gegenkonto_name"), betrag)
+        nach_fingerprint.setdefault(fp, []).append(t)
+
+    vorschlaege_fp = _vorschlaege_aus_cache(list(nach_fingerprint))
+    cache_treffer = len(vorschlaege_fp)
+
+    offen = [(fp, gruppe[0]) for fp, gruppe in nach_fingerprint.items() if fp not in vorschlaege_fp]
+    batches = [offen[i:i + KI_KATEGORIE_BATCH_SIZE] for i in range(0, len(offen), KI_KATEGORIE_BATCH_SIZE)]
+    neu: Dict[str, Dict[str, Any]] = {}
+    if batches:
+        beispiele_block = _beispiele_block(_hole_kategorisierung_beispiele(limit=12))
+        with ThreadPoolExecutor(max_workers=max(1, KI_KATEGORIE_MAX_PARALLEL)) as pool:
+            ergebnisse = pool.map(
+                lambda batch: _kategorisiere_ki_prompt_batch([t for _, t in batch], beispiele_block),
+                batches,
+            )
+            for batch, ergebnis in zip(batches, ergebnisse):
+                for idx, vorschlag in ergebnis.items():
+                    neu[batch[idx][0]] = vorschlag
+        _vorschlaege_speichern(neu)
+        vorschlaege_fp.update(neu)
+
+    vorschlaege = {}
+    for fp, gruppe in nach_fingerprint.items():
+        if fp in vorschlaege_fp:
+            for t in gruppe:
+                vorschlaege[t["id"]] = vorschlaege_fp[fp]
+
+    logger.info("KI Kategorisierung: %s Transaktionen, %s Fingerprints, %s aus Cache, %s Prompts",
+                len(transaktionen), len(nach_fingerprint), cache_treffer, len(batches))
+    return {"vorschlaege": vorschlaege, "cache_treffer": cache_treffer, "ki_anfragen": len(batches)}
+
+
 @ai_api.route('/kategorisiere/transaktion', methods=['POST'])
 @login_required
 def api_kategorisiere_transaktion():
@@ -2154,6 +2366,7 @@ def _fallback_to_allowed_intent(preferred_intent: str) -> str:
 
 @ai_api.route('/query', methods=['POST'])
 @login_or_api_key_required
+@offload('llm')
 def query_business_data_hybrid():
     """
     Hybrid MVP für 'Google-like' Business Query API.
@@ -17,7 +17,6 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from utils.locosoft_helpers import get_locosoft_connection
 from tools.gudat_client import GudatClient
-from api.arbeitskarte_pdf import generate_arbeitskarte_pdf
 
 # Gudat Center aus Standort: 1/2 = Deggendorf, 3 = Landau (KIC pro Center)
 def _gudat_center_from_subsidiary(subsidiary):
@@ -990,6 +989,7 @@ def get_arbeitskarte_pdf(order_number):
                 'error': f'Auftrag {order_number} nicht gefunden'
             }), 404
         
+        from api.arbeitskarte_pdf import generate_arbeitskarte_pdf  # reportlab erst bei Bedarf (TAG 220)
         pdf_bytes = generate_arbeitskarte_pdf(daten)
         
         return send_file(
@@ -21,6 +21,7 @@ from typing import Optional, Dict, List, Any
 # Zentrale DB-Utilities (TAG 117, TAG 136: PostgreSQL-kompatibel)
 from api.db_utils import db_session, row_to_dict, rows_to_list
 from api.db_connection import sql_placeholder, get_db_type, convert_placeholders
+from api.cache_utils import cached_response
 
 # Blueprint erstellen
 bankenspiegel_api = Blueprint('bankenspiegel_api', __name__, url_prefix='/api/bankenspiegel')
@@ -193,6 +194,7 @@ def find_vehicle_by_vin(loco_cursor, vin, fields='marke_modell'):
 
 @bankenspiegel_api.route('/dashboard', methods=['GET'])
 @login_required
+@cached_response(ttl=300, stale_ttl=900, tags=['bankenspiegel'])  # TAG 220
 def get_dashboard():
     """
     GET /api/bankenspiegel/dashboard
@@ -1266,7 +1268,7 @@ def post_transaktionen_kategorisieren():
     POST /api/bankenspiegel/transaktionen/kategorisieren
     Wendet regelbasierte Kategorisierung auf (unkategorisierte) Transaktionen an.
     Body: { "limit": 500, "nur_unkategorisiert": true, "mit_ki": false, "sonstige_neu_pruefen": false, "regeln_ueberschreiben": false }
-    mit_ki=true: nach Regeln noch unkategorisierte per LM Studio vorschlagen (Batch).
+    mit_ki=true: nach Regeln noch unkategorisierte per LM Studio vorschlagen (Celery-Job, liefert ki_job_id).
     sonstige_neu_pruefen=true: bestehende "Sonstige Ausgaben" mit aktuellen Regeln neu prüfen.
     regeln_ueberschreiben=true: Regeln auf die letzten limit Transaktionen erneut anwenden (überschreibt bestehende Kategorie).
     """
@@ -1291,51 +1293,15 @@ def post_transaktionen_kategorisieren():
                 )
 
         if mit_ki:
-            # Bei "Mit KI": immer noch unkategorisierte holen und an LM Studio schicken (max 50)
+            # TAG 220: KI läuft als Celery-Job (Batch-Prompts, Cache je Fingerprint) –
+            # Antwort sofort mit Job-ID, Status über /transaktionen/kategorisieren/ki/<job_id>
             try:
-                from api.ai_api import kategorisiere_transaktion_mit_ki
-                with db_session() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        convert_placeholders("""
-                            SELECT id, verwendungszweck, buchungstext, gegenkonto_name, betrag
-                            FROM transaktionen
-                            WHERE (kategorie IS NULL OR kategorie = '')
-                            ORDER BY buchungsdatum DESC LIMIT 50
-                        """),
-                    )
-                    rows = cursor.fetchall()
-                updates = []
-                for row in rows:
-                    rid = row.get('id') if hasattr(row, 'get') else row[0]
-                    vw = row.get('verwendungszweck') if hasattr(row, 'get') else (row[1] if len(row) > 1 else None)
-                    bt = row.get('buchungstext') if hasattr(row, 'get') else (row[2] if len(row) > 2 else None)
-                    gk = row.get('gegenkonto_name') if hasattr(row, 'get') else (row[3] if len(row) > 3 else None)
-                    betrag = row.get('betrag') if hasattr(row, 'get') else (row[4] if len(row) > 4 else None)
-                    vorschlag = kategorisiere_transaktion_mit_ki(verwendungszweck=vw, buchungstext=bt, gegenkonto_name=gk, betrag=betrag)
-                    if vorschlag and vorschlag.get('kategorie'):
-                        updates.append((vorschlag.get('kategorie'), vorschlag.get('unterkategorie'), rid))
-                ki_count = 0
-                if updates:
-                    ph = sql_placeholder()
-                    with db_session() as conn2:
-                        cur = conn2.cursor()
-                        for kat, unterkat, rid in updates:
-                            cur.execute(
-                                convert_placeholders("""
-                                    UPDATE transaktionen SET kategorie = """ + ph + """, unterkategorie = """ + ph + """ WHERE id = """ + ph
-                                ),
-                                (kat, unterkat, rid),
-                            )
-                            if cur.rowcount > 0:
-                                ki_count += 1
-                        conn2.commit()
-                result['ki_aktualisiert'] = ki_count
+                from celery_app.tasks import kategorisiere_transaktionen_ki
+                job = kategorisiere_transaktionen_ki.delay(limit=50)
+                result['ki_job_id'] = job.id
             except Exception as ki_err:
                 result['ki_fehler'] = str(ki_err)
-                result['ki_aktualisiert'] = 0
-        else:
-            result['ki_aktualisiert'] = 0
+        result['ki_aktualisiert'] = 0
 
         if sonstige_result is not None:
             result['sonstige_neu_pruefen'] = sonstige_result
@@ -1345,6 +1311,31 @@ def post_transaktionen_kategorisieren():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bankenspiegel_api.route('/transaktionen/kategorisieren/ki/<job_id>', methods=['GET'])
+@login_required
+def get_transaktionen_kategorisieren_ki_status(job_id):
+    """
+    GET /api/bankenspiegel/transaktionen/kategorisieren/ki/<job_id>
+    Status des KI-Kategorisierungs-Jobs (TAG 220).
+    Response: { "status": "PENDING|STARTED|SUCCESS|FAILURE", "fertig": bool, "ergebnis": {...} }
+    """
+    try:
+        from celery.result import AsyncResult
+        from celery_app import app as celery_app
+
+        job = AsyncResult(job_id, app=celery_app)
+        response = {'success': True, 'job_id': job_id, 'status': job.status, 'fertig': job.ready()}
+        if job.ready():
+            if job.successful():
+                response['ergebnis'] = job.result
+            else:
+                response['success'] = False
+                response['error'] = str(job.result)
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @bankenspiegel_api.route('/transaktionen/<int:trans_id>/kategorie', methods=['PATCH', 'PUT'])
 @login_required
 def patch_transaktion_kategorie(trans_id):
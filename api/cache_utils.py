@@ -1,24 +1,66 @@
 """
-Cache Utilities - TAG 213
-==========================
+Cache Utilities - TAG 213 / TAG 220
+====================================
 Redis-basiertes Caching für Performance-Optimierung
+
+TAG 220: Generischer Response-Cache (@cached_response) für schwere Endpoints:
+- Key aus Route + normalisierten Query-Parametern + Standort-Scope des Users
+- TTL pro Endpoint, Stale-While-Revalidate (veraltete Antwort sofort, Refresh im Hintergrund)
+- Single-Flight-Lock: bei kaltem Key rechnet nur EIN Worker, die anderen warten kurz
+- Tag-basierte Invalidierung über Redis-Sets (kein KEYS-Scan mehr)
+- L1-Fallback im Prozess, wenn Redis nicht erreichbar ist
+- @cached_result: derselbe Cache für Service-Funktionen (Endpoint + interne Aufrufer)
+
+Beispiel:
+    @bankenspiegel_api.route('/dashboard', methods=['GET'])
+    @login_required
+    @cached_response(ttl=300, stale_ttl=900, tags=['bankenspiegel'])
+    def get_dashboard():
+        ...
+
+    # Nach einem Import:
+    invalidate_cache_tags('bankenspiegel')
 """
+import hashlib
+import inspect
 import json
 import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from functools import wraps
 from datetime import datetime
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, Dict, Iterable, List
+from urllib.parse import urlencode
 
 logger = logging.getLogger(__name__)
 
 # Redis-Client (lazy loading)
 _redis_client = None
+_redis_failed_at = 0.0
+
+# Nach einem Verbindungsfehler erneuter Versuch nach N Sekunden (TAG 220)
+REDIS_RETRY_INTERVAL = 30
+
+# Response-Cache (TAG 220)
+CACHE_PREFIX = 'rc'
+TAG_SET_MIN_TTL = 86400          # Tag-Sets leben mindestens 1 Tag
+LOCK_TIMEOUT = 60                # Single-Flight-Lock (Sekunden)
+LOCK_WAIT = 10.0                 # Max. Wartezeit auf fremde Berechnung (Sekunden)
+LOCK_POLL_INTERVAL = 0.1
+L1_MAX_ENTRIES = 512
+IGNORED_ARGS = ('_', 'nocache')  # Cache-Buster von jQuery/Frontend
 
 
 def get_redis_client():
     """Holt oder erstellt Redis-Client (lazy loading)"""
-    global _redis_client
-    
+    global _redis_client, _redis_failed_at
+
+    # TAG 220: Nach Verbindungsfehler periodisch neu versuchen (statt bis zum Neustart deaktiviert)
+    if _redis_client is False and _redis_failed_at and time.monotonic() - _redis_failed_at > REDIS_RETRY_INTERVAL:
+        _redis_client = None
+
     if _redis_client is None:
         try:
             import redis
@@ -32,106 +74,519 @@ def get_redis_client():
             )
             # Test-Verbindung
             _redis_client.ping()
+            _redis_failed_at = 0.0
             logger.info("✅ Redis-Client initialisiert")
         except ImportError:
-            logger.warning("⚠️ Redis-Package nicht installiert. Caching deaktiviert.")
+            logger.warning("⚠️ Redis-Package nicht installiert. Nutze L1-Cache im Prozess.")
             _redis_client = False  # Marker: Redis nicht verfügbar
+            _redis_failed_at = 0.0  # Kein Retry
         except Exception as e:
-            logger.warning(f"⚠️ Redis-Verbindung fehlgeschlagen: {e}. Caching deaktiviert.")
+            logger.warning(f"⚠️ Redis-Verbindung fehlgeschlagen: {e}. Nutze L1-Cache im Prozess.")
             _redis_client = False  # Marker: Redis nicht verfügbar
-    
+            _redis_failed_at = time.monotonic()
+
     return _redis_client if _redis_client is not False else None
 
 
-def cache_stempeluhr(ttl: int = 10):
+def _mark_redis_down(error: Exception):
+    """Redis-Fehler im Betrieb: auf L1 umschalten, Retry nach REDIS_RETRY_INTERVAL."""
+    global _redis_client, _redis_failed_at
+    logger.warning(f"⚠️ Redis-Fehler: {error}. Nutze L1-Cache.")
+    _redis_client = False
+    _redis_failed_at = time.monotonic()
+
+
+# =============================================================================
+# L1-CACHE (im Prozess, Fallback wenn Redis down)
+# =============================================================================
+
+class _LocalCache:
+    """Kleiner LRU-Cache mit TTL, Tags und Locks - gleiche Semantik wie der Redis-Teil."""
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._locks: Dict[str, float] = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._mutex:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, lifetime: int, tags: Iterable[str] = ()):
+        with self._mutex:
+            self._data[key] = (time.monotonic() + lifetime, value)
+            self._data.move_to_end(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def acquire(self, key: str, timeout: int) -> bool:
+        with self._mutex:
+            now = time.monotonic()
+            if self._locks.get(key, 0) > now:
+                return False
+            self._locks[key] = now + timeout
+            return True
+
+    def release(self, key: str):
+        with self._mutex:
+            self._locks.pop(key, None)
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._mutex:
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                self._data.pop(key, None)
+            return len(keys)
+
+    def clear(self):
+        with self._mutex:
+            self._data.clear()
+            self._tags.clear()
+
+
+_l1 = _LocalCache()
+
+# Lua: Lock nur löschen, wenn er noch uns gehört
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _tag_key(tag: str) -> str:
+    return f"{CACHE_PREFIX}:tag:{tag}"
+
+
+def _cache_read(key: str) -> Optional[Dict[str, Any]]:
+    redis_client = get_redis_client()
+    raw = None
+    if redis_client is not None:
+        try:
+            raw = redis_client.get(key)
+        except Exception as e:
+            _mark_redis_down(e)
+            raw = _l1.get(key)
+    else:
+        raw = _l1.get(key)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _cache_write(key: str, entry: Dict[str, Any], lifetime: int, tags: List[str]):
+    raw = json.dumps(entry, default=str)
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.setex(key, lifetime, raw)
+            for tag in tags:
+                pipe.sadd(_tag_key(tag), key)
+                pipe.expire(_tag_key(tag), max(lifetime, TAG_SET_MIN_TTL))
+            pipe.execute()
+            return
+        except Exception as e:
+            _mark_redis_down(e)
+    _l1.set(key, raw, lifetime, tags)
+
+
+def _acquire_lock(key: str) -> Optional[str]:
+    """Single-Flight-Lock. Returns Token oder None (anderer Worker rechnet)."""
+    token = uuid.uuid4().hex
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            return token if redis_client.set(f"{key}:lock", token, nx=True, ex=LOCK_TIMEOUT) else None
+        except Exception as e:
+            _mark_redis_down(e)
+    return token if _l1.acquire(key, LOCK_TIMEOUT) else None
+
+
+def _release_lock(key: str, token: str):
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"{key}:lock", token)
+            return
+        except Exception as e:
+            _mark_redis_down(e)
+    _l1.release(key)
+
+
+def invalidate_cache_tags(*tags: str) -> int:
     """
-    Decorator für Stempeluhr-Caching.
-    
+    Invalidiert alle Response-Cache-Einträge mit einem der Tags.
+    Nutzt die Tag-Sets (SMEMBERS + UNLINK in Batches) statt KEYS-Scan.
+
+    Returns:
+        Anzahl gelöschter Keys
+    """
+    deleted = 0
+    for tag in tags:
+        deleted += _l1.invalidate_tag(tag)
+
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return deleted
+    try:
+        for tag in tags:
+            tag_key = _tag_key(tag)
+            keys = list(redis_client.smembers(tag_key))
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                redis_client.unlink(*batch)
+                deleted += len(batch)
+            redis_client.delete(tag_key)
+        if deleted:
+            logger.info(f"✅ Cache invalidiert: {deleted} Keys (Tags: {', '.join(tags)})")
+    except Exception as e:
+        logger.warning(f"⚠️ Cache-Invalidierung fehlgeschlagen: {e}")
+    return deleted
+
+
+# =============================================================================
+# RESPONSE-CACHE (TAG 220)
+# =============================================================================
+
+def _user_scope(vary_on_user: bool) -> str:
+    """Standort-Scope des eingeloggten Users (bzw. User-ID bei vary_on_user)."""
+    try:
+        from flask_login import current_user
+        if current_user and current_user.is_authenticated:
+            if vary_on_user:
+                return f"u{current_user.get_id()}"
+            return (getattr(current_user, 'standort_subsidiaries', None) or 'all').replace(',', '-')
+    except Exception:
+        pass
+    return 'anon'
+
+
+def _normalized_args(vary_on: Optional[Iterable[str]]) -> List[tuple]:
+    from flask import request
+
+    allowed = set(vary_on) if vary_on is not None else None
+    items = []
+    for name, values in request.args.lists():
+        if name in IGNORED_ARGS or (allowed is not None and name not in allowed):
+            continue
+        for value in sorted(values):
+            items.append((name, value.strip()))
+    return sorted(items)
+
+
+def build_cache_key(namespace: str, scope: str, args: List[tuple]) -> str:
+    digest = hashlib.sha1(urlencode(args).encode('utf-8')).hexdigest()[:20]
+    return f"{CACHE_PREFIX}:{namespace}:{scope}:{digest}"
+
+
+def _resolve_tags(tags, args: List[tuple]) -> List[str]:
+    if not tags:
+        return []
+    if callable(tags):
+        return list(tags())
+    values = _FormatArgs(args)
+    return [tag.format_map(values) for tag in tags]
+
+
+class _FormatArgs(dict):
+    """Tag-Platzhalter wie 'stempeluhr:{subsidiary}' - fehlende Parameter → ''."""
+
+    def __init__(self, args: List[tuple]):
+        super().__init__()
+        for name, value in args:
+            self.setdefault(name, value)
+
+    def __missing__(self, key):
+        return ''
+
+
+def _is_cacheable(response) -> bool:
+    if response.status_code != 200 or not response.is_json:
+        return False
+    data = response.get_json(silent=True)
+    return data is not None and not (isinstance(data, dict) and data.get('success') is False)
+
+
+def _response_from_entry(entry: Dict[str, Any], status: str, mark_cached: bool):
+    from flask import jsonify
+
+    data = entry['data']
+    if mark_cached and isinstance(data, dict):
+        data = dict(data)
+        # Timestamp aktualisieren (Kompatibilität Stempeluhr, TAG 213)
+        data['timestamp'] = datetime.now().isoformat()
+        data['cached'] = True
+    response = jsonify(data)
+    response.headers['X-Cache'] = status
+    response.headers['Age'] = str(int(max(0, time.time() - entry['created'])))
+    return response
+
+
+def cached_response(ttl: int = 60, stale_ttl: int = 0, tags=None, namespace: Optional[str] = None,
+                    vary_on: Optional[Iterable[str]] = None, vary_on_user: bool = False,
+                    mark_cached: bool = False):
+    """
+    Decorator für JSON-GET-Endpoints.
+
     Args:
-        ttl: Cache-TTL in Sekunden (default: 10)
-    
-    Beispiel:
-        @werkstatt_live_bp.route('/stempeluhr')
-        @cache_stempeluhr(ttl=10)
-        def get_stempeluhr_live():
-            ...
+        ttl: Frische-Dauer in Sekunden
+        stale_ttl: Zusätzliche Sekunden, in denen eine veraltete Antwort sofort ausgeliefert
+                   und im Hintergrund neu berechnet wird (Stale-While-Revalidate)
+        tags: Liste von Tags (Platzhalter mit Query-Parametern möglich, z. B. 'tek:{monat}')
+              oder Callable → invalidate_cache_tags()
+        namespace: Key-Präfix (default: Flask-Endpoint-Name)
+        vary_on: Nur diese Query-Parameter fließen in den Key (default: alle)
+        vary_on_user: Key pro User statt pro Standort-Scope (für personalisierte Daten)
+        mark_cached: 'cached': True / aktueller 'timestamp' in gecachte Antworten schreiben
+
+    Gecacht werden nur 200-JSON-Antworten ohne 'success': False.
+    ?nocache=1 umgeht den Cache.
     """
+    lifetime = ttl + max(0, stale_ttl)
+
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            redis_client = get_redis_client()
-            
-            # Wenn Redis nicht verfügbar, Funktion normal ausführen
-            if redis_client is None:
+            from flask import request, make_response, copy_current_request_context
+
+            if request.method != 'GET' or request.args.get('nocache') == '1':
                 return func(*args, **kwargs)
-            
-            # Cache-Key bauen aus Funktionsname + Parametern
-            from flask import request
-            
-            # Parameter sammeln
-            subsidiary = request.args.get('subsidiary', '')
-            datum = datetime.now().date().isoformat()  # Heute
-            
-            cache_key = f"stempeluhr:{datum}:{subsidiary}"
-            
+
             try:
-                # Cache prüfen
-                cached = redis_client.get(cache_key)
-                if cached:
-                    logger.info(f"✅ Cache-Hit: {cache_key}")
-                    # JSON-Response zurückgeben
-                    from flask import jsonify
-                    cached_data = json.loads(cached)
-                    # Timestamp aktualisieren
-                    cached_data['timestamp'] = datetime.now().isoformat()
-                    cached_data['cached'] = True
-                    return jsonify(cached_data)
-                
-                # Cache-Miss: Funktion ausführen
-                logger.debug(f"❌ Cache-Miss: {cache_key}")
-                result = func(*args, **kwargs)
-                
-                # Nur cachen wenn erfolgreich (200 Status)
-                if hasattr(result, 'status_code') and result.status_code == 200:
-                    # JSON-Response in Dict konvertieren
-                    result_dict = result.get_json()
-                    if result_dict and result_dict.get('success'):
-                        # Cache setzen
-                        redis_client.setex(cache_key, ttl, json.dumps(result_dict))
-                        logger.debug(f"💾 Cache gespeichert: {cache_key} (TTL: {ttl}s)")
-                
-                return result
-                
+                norm_args = _normalized_args(vary_on)
+                key = build_cache_key(namespace or request.endpoint, _user_scope(vary_on_user), norm_args)
+                tag_list = _resolve_tags(tags, norm_args)
             except Exception as e:
-                logger.warning(f"⚠️ Cache-Fehler: {e}. Funktion normal ausführen.")
-                # Bei Cache-Fehler: Funktion normal ausführen
+                logger.warning(f"⚠️ Cache-Key-Fehler: {e}. Funktion normal ausführen.")
                 return func(*args, **kwargs)
-        
+
+            def compute_and_store():
+                response = make_response(func(*args, **kwargs))
+                try:
+                    if _is_cacheable(response):
+                        entry = {'created': time.time(), 'data': response.get_json()}
+                        _cache_write(key, entry, lifetime, tag_list)
+                        logger.debug(f"💾 Cache gespeichert: {key} (TTL: {ttl}s + {stale_ttl}s stale)")
+                except Exception as e:
+                    logger.warning(f"⚠️ Cache-Schreibfehler: {e}")
+                return response
+
+            entry = _cache_read(key)
+            if entry is not None:
+                if time.time() - entry['created'] < ttl:
+                    return _response_from_entry(entry, 'HIT', mark_cached)
+
+                # Stale: sofort ausliefern, ein Worker aktualisiert im Hintergrund
+                token = _acquire_lock(key)
+                if token:
+                    @copy_current_request_context
+                    def refresh():
+                        try:
+                            compute_and_store()
+                        except Exception as e:
+                            logger.warning(f"⚠️ Cache-Refresh fehlgeschlagen ({key}): {e}")
+                        finally:
+                            _release_lock(key, token)
+
+                    threading.Thread(target=refresh, name=f"cache-refresh-{key}", daemon=True).start()
+                return _response_from_entry(entry, 'STALE', mark_cached)
+
+            # Kalter Key: Single-Flight
+            token = _acquire_lock(key)
+            if token:
+                try:
+                    response = compute_and_store()
+                    response.headers['X-Cache'] = 'MISS'
+                    return response
+                finally:
+                    _release_lock(key, token)
+
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                entry = _cache_read(key)
+                if entry is not None:
+                    return _response_from_entry(entry, 'HIT', mark_cached)
+            logger.debug(f"⏱️ Cache-Lock-Timeout: {key} - Funktion selbst ausführen")
+            return func(*args, **kwargs)
+
         return wrapper
     return decorator
 
 
+# =============================================================================
+# ERGEBNIS-CACHE FÜR SERVICE-FUNKTIONEN (TAG 220)
+# =============================================================================
+
+def _is_cacheable_result(result: Any) -> bool:
+    if result is None:
+        return False
+    if isinstance(result, dict) and (result.get('success') is False or 'error' in result):
+        return False
+    return True
+
+
+def cached_result(ttl: int = 60, tags=None, namespace: Optional[str] = None):
+    """
+    Decorator für Service-Funktionen, die sowohl ein Endpoint als auch interne Aufrufer
+    (PDF-Generator, andere APIs) nutzen - gleicher Cache, ohne HTTP-Umweg über localhost.
+
+    Key aus namespace (default: modul.funktion) + Argumenten inkl. Defaults; Tags wie bei
+    cached_response (Platzhalter mit Argumentnamen, z. B. 'tek:{monat}'). Gecacht werden nur
+    JSON-serialisierbare Ergebnisse ohne 'success': False / 'error'. Single-Flight wie
+    cached_response; Treffer liefern eine frische Kopie (JSON), Aufrufer dürfen sie ändern.
+    """
+    def decorator(func: Callable) -> Callable:
+        ns = namespace or f"{func.__module__}.{func.__name__}"
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                # Positional/Keyword/Default einheitlich → gleicher Key für Endpoint und interne Aufrufer
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                call_args = sorted((name, json.dumps(value, default=str)) for name, value in bound.arguments.items())
+                key = build_cache_key(ns, 'fn', call_args)
+                # None → '' wie fehlende Query-Parameter bei cached_response ('stempeluhr:{subsidiary}')
+                tag_list = _resolve_tags(tags, sorted((k, '' if v is None else str(v))
+                                                      for k, v in bound.arguments.items()))
+            except Exception as e:
+                logger.warning(f"⚠️ Cache-Key-Fehler ({ns}): {e}. Funktion normal ausführen.")
+                return func(*args, **kwargs)
+
+            entry = _cache_read(key)
+            if entry is not None and time.time() - entry['created'] < ttl:
+                return entry['data']
+
+            def compute_and_store():
+                result = func(*args, **kwargs)
+                if _is_cacheable_result(result):
+                    try:
+                        _cache_write(key, {'created': time.time(), 'data': result}, ttl, tag_list)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Cache-Schreibfehler ({ns}): {e}")
+                return result
+
+            token = _acquire_lock(key)
+            if token:
+                try:
+                    return compute_and_store()
+                finally:
+                    _release_lock(key, token)
+
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                entry = _cache_read(key)
+                if entry is not None:
+                    return entry['data']
+            return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# STEMPELUHR (TAG 213 - jetzt auf Basis von cached_response)
+# =============================================================================
+
+def cache_stempeluhr(ttl: int = 10):
+    """
+    Decorator für Stempeluhr-Caching.
+
+    Args:
+        ttl: Cache-TTL in Sekunden (default: 10)
+
+    Beispiel:
+        @werkstatt_live_bp.route('/stempeluhr')
+        @cache_stempeluhr(ttl=10)
+        def get_stempeluhr_live():
+            ...
+    """
+    return cached_response(
+        ttl=ttl,
+        namespace='stempeluhr',
+        vary_on=('subsidiary',),
+        tags=('stempeluhr', 'stempeluhr:{subsidiary}'),
+        mark_cached=True,
+    )
+
+
 def invalidate_stempeluhr_cache(subsidiary: Optional[str] = None):
     """
-    Invalidiert Stempeluhr-Cache.
-    
+    Invalidiert Stempeluhr-Cache (und alles mit Stempeluhr-Tags, z. B. Kapazitäts-Forecast).
+
     Args:
-        subsidiary: Optional - nur für bestimmten Betrieb invalidieren
+        subsidiary: Optional - nur für bestimmten Betrieb invalidieren; Ansichten über
+                    alle Betriebe ('stempeluhr:') enthalten ihn ebenfalls
+    """
+    if subsidiary:
+        invalidate_cache_tags(f"stempeluhr:{subsidiary}", "stempeluhr:")
+    else:
+        invalidate_cache_tags("stempeluhr")
+
+
+# =============================================================================
+# JOB-STATUS-KEYS (TAG 220)
+# =============================================================================
+
+STATUS_PREFIX = 'status'
+STATUS_TTL = 8 * 86400           # Status überlebt ein langes Wochenende + Feiertage
+
+
+def set_job_status(name: str, **fields: Any) -> bool:
+    """
+    Schreibt Status-Felder eines Jobs in den Hash status:<name> (z. B. letzter Erfolg).
+    Ersetzt das Durchsuchen des Celery-Result-Backends (KEYS celery-task-meta-*).
+
+    Returns:
+        True wenn geschrieben, False wenn Redis nicht erreichbar
     """
     redis_client = get_redis_client()
     if redis_client is None:
-        return
-    
+        return False
+    key = f"{STATUS_PREFIX}:{name}"
     try:
-        if subsidiary:
-            pattern = f"stempeluhr:*:{subsidiary}"
-        else:
-            pattern = "stempeluhr:*"
-        
-        # Finde alle Keys
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
-            logger.info(f"✅ Cache invalidiert: {len(keys)} Keys gelöscht")
+        pipe = redis_client.pipeline()
+        pipe.hset(key, mapping={k: str(v) for k, v in fields.items()})
+        pipe.expire(key, STATUS_TTL)
+        pipe.execute()
+        return True
     except Exception as e:
-        logger.warning(f"⚠️ Cache-Invalidierung fehlgeschlagen: {e}")
+        _mark_redis_down(e)
+        return False
+
+
+def get_job_status(name: str) -> Optional[Dict[str, str]]:
+    """
+    Liest den Status-Hash eines Jobs.
+
+    Returns:
+        dict (leer, wenn noch nie geschrieben) oder None wenn Redis nicht erreichbar
+    """
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return None
+    try:
+        return redis_client.hgetall(f"{STATUS_PREFIX}:{name}") or {}
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
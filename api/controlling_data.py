@@ -7,6 +7,8 @@ Kapselt die TEK-Datenabfrage-Logik für Nutzung in:
 - PDF (pdf_generator.py)
 
 TAG146: Saubere Trennung von Daten und Präsentation
+TAG 220: Abfragen laufen auf der Tages-Fakt-Tabelle tek_fact_daily (api/tek_fact.py),
+         Fallback loco_journal_accountings solange sie nicht aufgebaut ist.
 SSOT: Breakeven/Prognose (berechne_breakeven_prognose) – eine Logik für Portal und PDF.
 
 Author: Claude AI + Florian Greiner
@@ -17,8 +19,9 @@ import calendar
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
-from api.db_utils import db_session, row_to_dict, get_guv_filter
+from api.db_utils import db_session, row_to_dict
 from api.db_connection import convert_placeholders, get_db_type
+from api.tek_fact import get_tek_quelle
 from utils.werktage import get_werktage_monat
 
 
@@ -76,20 +79,24 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
         firma_filter_kosten = "AND subsidiary_to_company_ref = 2"
         firma_filter_einsatz = "AND subsidiary_to_company_ref = 2"
 
+    # TAG 220: Fakt-Tabelle (Tag × Konto × Firma × Filiale) statt Journal-Scan
+    quelle = get_tek_quelle()
+
     # Umlage-Filter (TAG146: Option zum Ausschalten interner Umlagen)
     umlage_erloese_filter = ""
     umlage_kosten_filter = ""
     if umlage == 'ohne':
         umlage_konten_str = '817051,827051,837051,847051'  # Umlage-Erlöse
         umlage_erloese_filter = f"AND nominal_account_number NOT IN ({umlage_konten_str})"
-        umlage_kosten_filter = """AND NOT (
+        umlage_kosten_filter = f"""AND NOT (
             debit_or_credit = 'H'
             AND substr(CAST(nominal_account_number AS TEXT), 5, 1) = '0'
-            AND (posting_text LIKE '%Kostenumlage%' OR posting_text LIKE '%kostenumlage%')
+            AND {quelle.kostenumlage}
         )"""
 
     # G&V-Abschluss wie in BWA. 743002 (EW Fremdleistungen Landau) einschließen – Globalcube schließt es fälschlich aus (Mapping nicht angepasst).
-    guv_filter = get_guv_filter()
+    # TAG 220: Filter passend zur Quelle (Fakt-Tabelle: Flag statt posting_text)
+    guv_filter = quelle.guv_filter
 
     with db_session() as conn:
         cursor = conn.cursor()
@@ -111,7 +118,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
                     ELSE '9-Andere'
                 END as bereich,
                 SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0 as umsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= %s AND accounting_date < %s
               AND ((nominal_account_number BETWEEN 800000 AND 889999)
                    OR (nominal_account_number BETWEEN 893200 AND 893299))
@@ -134,7 +141,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
                     ELSE '9-Andere'
                 END as bereich,
                 SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0 as einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= %s AND accounting_date < %s
               AND nominal_account_number BETWEEN 700000 AND 799999
               {firma_filter_einsatz}
@@ -180,7 +187,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
             cursor.execute(f"""
                 SELECT COALESCE(SUM(CASE WHEN nominal_account_number BETWEEN 840000 AND 849999 AND nominal_account_number != 847301 AND debit_or_credit = 'H' THEN posted_value
                            WHEN nominal_account_number BETWEEN 840000 AND 849999 AND nominal_account_number != 847301 AND debit_or_credit = 'S' THEN -posted_value ELSE 0 END) / 100.0, 0) as umsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= %s AND accounting_date < %s
                 {firma_filter_umsatz}
                 {guv_filter}
@@ -190,7 +197,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
             cursor.execute(f"""
                 SELECT COALESCE(SUM(CASE WHEN nominal_account_number BETWEEN 740000 AND 749999 AND nominal_account_number != 747301 AND debit_or_credit = 'S' THEN posted_value
                            WHEN nominal_account_number BETWEEN 740000 AND 749999 AND nominal_account_number != 747301 AND debit_or_credit = 'H' THEN -posted_value ELSE 0 END) / 100.0, 0) as einsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= %s AND accounting_date < %s
                 {firma_filter_umsatz}
                 {guv_filter}
@@ -224,7 +231,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
             SELECT
                 COALESCE(SUM(CASE WHEN nominal_account_number = 847301 AND debit_or_credit = 'H' THEN posted_value WHEN nominal_account_number = 847301 AND debit_or_credit = 'S' THEN -posted_value ELSE 0 END) / 100.0, 0) as cp_umsatz,
                 COALESCE(SUM(CASE WHEN nominal_account_number = 747301 AND debit_or_credit = 'S' THEN posted_value WHEN nominal_account_number = 747301 AND debit_or_credit = 'H' THEN -posted_value ELSE 0 END) / 100.0, 0) as cp_einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= %s AND accounting_date < %s
               AND (nominal_account_number = 847301 OR nominal_account_number = 747301)
               {firma_filter_umsatz}
@@ -252,7 +259,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
                              THEN posted_value ELSE 0 END) / 100.0, 0) as umsatz,
                 COALESCE(SUM(CASE WHEN debit_or_credit = 'S' AND nominal_account_number BETWEEN 700000 AND 799999
                              THEN posted_value ELSE 0 END) / 100.0, 0) as einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= %s AND accounting_date < %s
               {firma_filter_umsatz}
               {umlage_erloese_filter}
@@ -288,7 +295,7 @@ def get_tek_data(monat=None, jahr=None, firma='0', standort='0', modus='teil', u
                              THEN posted_value ELSE 0 END) / 100.0, 0) as umsatz,
                 COALESCE(SUM(CASE WHEN debit_or_credit = 'S' AND nominal_account_number BETWEEN 700000 AND 799999
                              THEN posted_value ELSE 0 END) / 100.0, 0) as einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= %s AND accounting_date < %s
               {firma_filter_umsatz}
               {umlage_erloese_filter}
@@ -382,6 +389,7 @@ def berechne_breakeven_prognose_standort(monat: int, jahr: int, aktueller_db1: f
     now = datetime.now()
     stichtag = heute if now.hour >= 19 else (heute - timedelta(days=1))
     kosten_von_str, kosten_bis_str = _letzte_4_abgeschlossene_monate()
+    quelle = get_tek_quelle()
 
     with db_session() as conn:
         cursor = conn.cursor()
@@ -405,7 +413,7 @@ def berechne_breakeven_prognose_standort(monat: int, jahr: int, aktueller_db1: f
                                    OR nominal_account_number BETWEEN 487000 AND 487099
                                    OR nominal_account_number BETWEEN 491000 AND 497999))
                     THEN CASE WHEN debit_or_credit='S' THEN posted_value ELSE -posted_value END ELSE 0 END) / 100.0, 0) as direkte
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
             {firma_filter_kosten}
         """), (kosten_von_str, kosten_bis_str))
@@ -417,7 +425,7 @@ def berechne_breakeven_prognose_standort(monat: int, jahr: int, aktueller_db1: f
 
         cursor.execute(convert_placeholders(f"""
             SELECT COALESCE(SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0, 0) as umsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND ((nominal_account_number BETWEEN 800000 AND 889999) OR (nominal_account_number BETWEEN 893200 AND 893299))
               AND nominal_account_number NOT BETWEEN 498000 AND 498999
@@ -427,7 +435,7 @@ def berechne_breakeven_prognose_standort(monat: int, jahr: int, aktueller_db1: f
         operativ_umsatz = float(row_to_dict(row).get('umsatz') or 0) if row else 0
         cursor.execute(convert_placeholders(f"""
             SELECT COALESCE(SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0, 0) as einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND nominal_account_number BETWEEN 700000 AND 799999
               {firma_filter_einsatz}
@@ -438,7 +446,7 @@ def berechne_breakeven_prognose_standort(monat: int, jahr: int, aktueller_db1: f
 
         cursor.execute(convert_placeholders(f"""
             SELECT COUNT(DISTINCT accounting_date) as tage
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND nominal_account_number BETWEEN 700000 AND 899999
               {firma_filter_einsatz}
@@ -494,6 +502,7 @@ def berechne_breakeven_prognose(monat: int, jahr: int, aktueller_db1: float,
     now = datetime.now()
     stichtag = heute if now.hour >= 19 else (heute - timedelta(days=1))
     kosten_von_str, kosten_bis_str = _letzte_4_abgeschlossene_monate()
+    quelle = get_tek_quelle()
 
     umsatz_anteil = 1.0
     umsatz_firma = 0
@@ -503,16 +512,16 @@ def berechne_breakeven_prognose(monat: int, jahr: int, aktueller_db1: float,
             cursor = conn.cursor()
             cursor.execute(convert_placeholders(f"""
                 SELECT COALESCE(SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0, 0) as umsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= ? AND accounting_date < ?
                   AND nominal_account_number BETWEEN 800000 AND 889999
                   {firma_filter_umsatz}
             """), (kosten_von_str, kosten_bis_str))
             row = cursor.fetchone()
             umsatz_firma = float(row_to_dict(row).get('umsatz') or 0) if row else 0
-            cursor.execute(convert_placeholders("""
+            cursor.execute(convert_placeholders(f"""
                 SELECT COALESCE(SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0, 0) as umsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= ? AND accounting_date < ?
                   AND nominal_account_number BETWEEN 800000 AND 889999
             """), (kosten_von_str, kosten_bis_str))
@@ -550,7 +559,7 @@ def berechne_breakeven_prognose(monat: int, jahr: int, aktueller_db1: float,
                           OR (nominal_account_number BETWEEN 438000 AND 438999 AND substr(CAST(nominal_account_number AS TEXT), 5, 1) IN ('1','2','3','6','7'))
                           OR (nominal_account_number BETWEEN 891000 AND 896999 AND NOT (nominal_account_number BETWEEN 893200 AND 893299)))
                     THEN CASE WHEN debit_or_credit='S' THEN posted_value ELSE -posted_value END ELSE 0 END) / 100.0, 0) as indirekte
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
             {kosten_filter}
         """), (kosten_von_str, kosten_bis_str))
@@ -567,7 +576,7 @@ def berechne_breakeven_prognose(monat: int, jahr: int, aktueller_db1: float,
 
         cursor.execute(convert_placeholders(f"""
             SELECT COALESCE(SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0, 0) as umsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND ((nominal_account_number BETWEEN 800000 AND 889999) OR (nominal_account_number BETWEEN 893200 AND 893299))
               AND nominal_account_number NOT BETWEEN 498000 AND 498999
@@ -577,7 +586,7 @@ def berechne_breakeven_prognose(monat: int, jahr: int, aktueller_db1: float,
         operativ_umsatz = float(row_to_dict(row).get('umsatz') or 0) if row else 0
         cursor.execute(convert_placeholders(f"""
             SELECT COALESCE(SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0, 0) as einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND nominal_account_number BETWEEN 700000 AND 799999
               {firma_filter_einsatz}
@@ -588,7 +597,7 @@ def berechne_breakeven_prognose(monat: int, jahr: int, aktueller_db1: float,
 
         cursor.execute(convert_placeholders(f"""
             SELECT COUNT(DISTINCT accounting_date) as tage
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND nominal_account_number BETWEEN 700000 AND 899999
               {firma_filter_einsatz}
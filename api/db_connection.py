@@ -10,6 +10,7 @@ Konfiguration via Environment-Variablen oder .env:
     DB_NAME=drive_portal
     DB_USER=drive_user
     DB_PASSWORD=xxx
+    PORTAL_POOL_SIZE=5, PORTAL_POOL_MAX_OVERFLOW=10   (Connection-Pool, TAG 220)
 
 Verwendung:
     from api.db_connection import get_db, get_db_type
@@ -18,7 +19,7 @@ Verwendung:
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM employees")
     rows = cursor.fetchall()
-    conn.close()
+    conn.close()   # PostgreSQL: gibt die Verbindung an den Pool zurück (api/db_pool.py)
 
 Falls wieder SQLite genutzt werden soll (z. B. lokal ohne PostgreSQL):
     1. In .env: DB_TYPE=sqlite setzen
@@ -27,8 +28,10 @@ Falls wieder SQLite genutzt werden soll (z. B. lokal ohne PostgreSQL):
 
 import os
 import sqlite3
-from typing import Optional, Any
+import uuid
+from typing import Any, Callable, Iterator, List, Optional
 from contextlib import contextmanager
+from functools import lru_cache
 
 # Versuche psycopg2 zu importieren (optional)
 try:
@@ -39,31 +42,65 @@ try:
 except ImportError:
     PSYCOPG2_AVAILABLE = False
 
+from api.db_pool import POOL_ENABLED, get_pool
+
 
 # =============================================================================
 # HYBRID ROW - Unterstützt Index UND Dict Zugriff (TAG 139)
 # =============================================================================
 
+class RowSchema:
+    """
+    Spalten-Schema eines Result-Sets (TAG 220).
+
+    Wird einmal pro cursor.description berechnet und von allen Rows geteilt:
+    keys = Spaltennamen, index = {spaltenname: position} für O(1)-Lookup.
+    Bei doppelten Spaltennamen gewinnt (wie früher bei keys.index) die erste Spalte.
+    """
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        index = {}
+        for i, key in enumerate(self.keys):
+            index.setdefault(key, i)
+        self.index = index
+
+
+@lru_cache(maxsize=512)
+def _schema_for_keys(keys: tuple) -> RowSchema:
+    """Schema-Cache: gleiche Queries (gleiche Spalten) teilen sich ein RowSchema."""
+    return RowSchema(keys)
+
+
+def schema_from_description(description) -> RowSchema:
+    """RowSchema aus DB-API cursor.description"""
+    return _schema_for_keys(tuple(desc[0] for desc in description) if description else ())
+
+
 class HybridRow:
     """
     Row-Klasse die sowohl Index-Zugriff (row[0]) als auch Dict-Zugriff (row['name']) unterstützt.
     Löst das Problem unterschiedlicher Zugriffsmuster im Code.
+
+    TAG 220: Kompakte Row – hält nur das Werte-Tuple und einen Verweis auf das
+    gemeinsame RowSchema des Result-Sets. row['name'] ist ein Dict-Lookup statt
+    linearer Suche (keys.index). Benchmark: scripts/benchmarks/bench_hybrid_row.py
     """
-    __slots__ = ('_values', '_keys')
+    __slots__ = ('_values', '_schema')
 
     def __init__(self, values, keys):
-        object.__setattr__(self, '_values', tuple(values))
-        object.__setattr__(self, '_keys', tuple(keys))
+        object.__setattr__(self, '_values', values if type(values) is tuple else tuple(values))
+        object.__setattr__(self, '_schema', keys if isinstance(keys, RowSchema) else _schema_for_keys(tuple(keys)))
 
     def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return self._values[self._schema.index[key]]
+            except KeyError:
+                raise KeyError(key) from None
         if isinstance(key, int):
             return self._values[key]
-        elif isinstance(key, str):
-            try:
-                idx = self._keys.index(key)
-                return self._values[idx]
-            except ValueError:
-                raise KeyError(key)
         raise TypeError(f"Invalid key type: {type(key)}")
 
     def __len__(self):
@@ -73,58 +110,70 @@ class HybridRow:
         return iter(self._values)
 
     def get(self, key, default=None):
+        if isinstance(key, str):
+            idx = self._schema.index.get(key)
+            return default if idx is None else self._values[idx]
         try:
             return self[key]
         except (KeyError, IndexError):
             return default
 
     def keys(self):
-        return self._keys
+        return self._schema.keys
 
     def values(self):
         return self._values
 
     def items(self):
-        return zip(self._keys, self._values)
+        return zip(self._schema.keys, self._values)
 
     def __repr__(self):
-        return f"HybridRow({dict(zip(self._keys, self._values))})"
+        return f"HybridRow({dict(zip(self._schema.keys, self._values))})"
 
 
 class HybridCursor:
     """
     Wrapper-Cursor der HybridRow zurückgibt statt Tuple.
     Unterstützt sowohl Index als auch Dict Zugriff.
+
+    TAG 220: Das RowSchema wird einmal pro Result-Set berechnet (nicht pro Row).
     """
     def __init__(self, cursor):
         self._cursor = cursor
         self._description = None
+        self._schema = None
 
     def execute(self, query, params=None):
         result = self._cursor.execute(query, params)
         self._description = self._cursor.description
+        self._schema = None
         return result
 
+    def _get_schema(self) -> RowSchema:
+        if self._schema is None:
+            # Named (server-side) Cursor liefern description erst nach dem ersten Fetch
+            self._schema = schema_from_description(self._description or self._cursor.description)
+        return self._schema
+
     def fetchone(self):
         row = self._cursor.fetchone()
         if row is None:
             return None
-        keys = [desc[0] for desc in self._description] if self._description else []
-        return HybridRow(row, keys)
+        return HybridRow(row, self._get_schema())
 
     def fetchall(self):
         rows = self._cursor.fetchall()
         if not rows:
             return []
-        keys = [desc[0] for desc in self._description] if self._description else []
-        return [HybridRow(row, keys) for row in rows]
+        schema = self._get_schema()
+        return [HybridRow(row, schema) for row in rows]
 
     def fetchmany(self, size=None):
-        rows = self._cursor.fetchmany(size)
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
         if not rows:
             return []
-        keys = [desc[0] for desc in self._description] if self._description else []
-        return [HybridRow(row, keys) for row in rows]
+        schema = self._get_schema()
+        return [HybridRow(row, schema) for row in rows]
 
     @property
     def description(self):
@@ -261,6 +310,17 @@ def _get_sqlite_connection(use_dict_cursor: bool = True):
     return conn
 
 
+def _connect_postgresql():
+    """Neue (ungepoolte) PostgreSQL-Verbindung zur Portal-DB aufbauen"""
+    return psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+
 def _get_postgresql_connection(use_dict_cursor: bool = True):
     """PostgreSQL-Verbindung herstellen"""
     if not PSYCOPG2_AVAILABLE:
@@ -269,13 +329,11 @@ def _get_postgresql_connection(use_dict_cursor: bool = True):
             "Bitte 'pip install psycopg2-binary' ausführen oder DB_TYPE=sqlite setzen."
         )
 
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
+    # TAG 220: Verbindung aus dem prozessweiten Pool statt neuem Handshake pro Request
+    if POOL_ENABLED:
+        conn = get_pool('portal', _connect_postgresql, pool_size=5, max_overflow=10).getconn()
+    else:
+        conn = _connect_postgresql()
 
     # TAG 139: HybridConnection wrappen für Index UND Dict Zugriff
     # HybridRow unterstützt: row[0] (Index) UND row['name'] (Dict)
@@ -301,6 +359,89 @@ def get_db_context(use_dict_cursor: bool = True):
         conn.close()
 
 
+# =============================================================================
+# STREAMING (SERVER-SIDE CURSOR) - TAG 220
+# =============================================================================
+
+# Default-Batchgröße für Server-Side-Cursor (Rows pro Roundtrip)
+DEFAULT_STREAM_BATCH_SIZE = 2000
+
+
+def iter_query_batches(conn, query: str, params=None, batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+                       cursor_name: Optional[str] = None) -> Iterator[List[HybridRow]]:
+    """
+    Führt eine Query über einen benannten Server-Side-Cursor aus und liefert
+    die Rows batchweise (Liste von HybridRow), ohne das ganze Result-Set zu laden.
+
+    Der Speicherbedarf ist durch batch_size begrenzt – geeignet für Exporte über
+    loco_journal_accountings & Co. Die Connection bleibt offen (Aufrufer schließt sie).
+    PostgreSQL: DECLARE ... CURSOR, benötigt eine Transaktion (kein autocommit).
+    SQLite: normaler Cursor mit fetchmany().
+
+    Verwendung:
+        with db_session() as conn:
+            for batch in iter_query_batches(conn, "SELECT ...", params, batch_size=5000):
+                for row in batch:
+                    ...
+    """
+    if isinstance(conn, sqlite3.Connection):
+        cursor = conn.cursor()
+    else:
+        # Rohe psycopg2-/Pool-Connections (z. B. Locosoft) ebenfalls als HybridRow liefern
+        hybrid = conn if isinstance(conn, HybridConnection) else HybridConnection(conn)
+        cursor = hybrid.cursor(name=cursor_name or f"drive_stream_{uuid.uuid4().hex[:12]}")
+        cursor._cursor.itersize = batch_size
+
+    try:
+        cursor.execute(query, params)
+        schema = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if isinstance(rows[0], HybridRow):
+                yield rows
+            else:
+                if schema is None:
+                    schema = schema_from_description(cursor.description)
+                yield [HybridRow(row, schema) for row in rows]
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+def iter_query_rows(conn, query: str, params=None, batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+                    cursor_name: Optional[str] = None) -> Iterator[HybridRow]:
+    """Wie iter_query_batches(), aber Row für Row."""
+    for batch in iter_query_batches(conn, query, params, batch_size, cursor_name):
+        yield from batch
+
+
+def stream_query(query: str, params=None, batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+                 connection_factory: Optional[Callable[[], Any]] = None) -> Iterator[HybridRow]:
+    """
+    Generator, der eine eigene Connection öffnet, die Rows per Server-Side-Cursor
+    streamt und die Connection am Ende (auch bei Abbruch des Generators) zurückgibt.
+
+    Für Streaming-Responses, bei denen die Query erst während des Sendens läuft
+    (siehe api/streaming_utils.py).
+
+    Args:
+        connection_factory: Default get_db (Portal); für Locosoft get_locosoft_connection
+    """
+    conn = (connection_factory or get_db)()
+    try:
+        yield from iter_query_rows(conn, query, params, batch_size)
+    finally:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        conn.close()
+
+
 # =============================================================================
 # SQL COMPATIBILITY HELPERS
 # =============================================================================
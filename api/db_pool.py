@@ -0,0 +1,401 @@
+"""
+Connection-Pool für Portal- und Locosoft-PostgreSQL
+====================================================
+TAG 220: Prozessweiter, fork-sicherer Pool statt psycopg2.connect() pro Request
+
+Bisher hat jeder Aufruf von get_db() / get_locosoft_connection() einen neuen
+TCP+Auth-Handshake gemacht (Liveboard-Polling, Stempeluhr, TEK → hunderte pro Minute).
+Der Pool hält pro Ziel (portal, locosoft) eine begrenzte Anzahl offener Verbindungen.
+
+Eigenschaften:
+- Getrennte Größe pro Ziel (pool_size + max_overflow, via Environment konfigurierbar)
+- Validierung beim Auschecken (closed-Flag, SELECT 1 nach längerer Leerlaufzeit)
+- Recycling nach Maximalalter (max_age)
+- Fork-sicher: nach fork() (Gunicorn/Celery prefork) wird der Pool im Kind verworfen
+- Metriken (in_use, Wartevorgänge, Checkout-Latenz) für /api/admin/db-pools
+
+Verwendung (intern, über db_connection.get_db() bzw. db_utils.get_locosoft_connection()):
+    pool = get_pool('locosoft', connect_func, pool_size=5, max_overflow=5)
+    conn = pool.getconn()       # PooledConnection (verhält sich wie psycopg2-Connection)
+    ...
+    conn.close()                # gibt die Verbindung an den Pool zurück
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    PSYCOPG2_AVAILABLE = True
+except ImportError:
+    PSYCOPG2_AVAILABLE = False
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Pool global abschaltbar (z. B. für Debugging): DB_POOL_ENABLED=0
+POOL_ENABLED = os.getenv('DB_POOL_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+# Anzahl Latenz-Messungen für p95-Berechnung
+_LATENCY_SAMPLES = 1000
+
+
+class PoolTimeoutError(Exception):
+    """Keine freie Verbindung innerhalb von checkout_timeout verfügbar."""
+
+
+class PooledConnection:
+    """
+    Proxy um eine psycopg2-Connection aus dem Pool.
+
+    Verhält sich wie die echte Connection (Attribute, cursor(), commit(), autocommit = ...),
+    close() schließt aber nicht, sondern gibt die Verbindung an den Pool zurück.
+    """
+    __slots__ = ('_pool', '_conn', '_entry')
+
+    def __init__(self, pool: 'ConnectionPool', conn, entry: dict):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_entry', entry)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            if name == 'closed':
+                return 1
+            raise _interface_error('connection already closed')
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise _interface_error('connection already closed')
+        setattr(conn, name, value)
+
+    def close(self):
+        """Verbindung an den Pool zurückgeben (idempotent)."""
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            return
+        object.__setattr__(self, '_conn', None)
+        self._pool.putconn(conn, object.__getattribute__(self, '_entry'))
+
+    # psycopg2-Semantik: "with conn:" = Transaktionsblock (commit/rollback), kein close
+    def __enter__(self):
+        self.__getattr__('__enter__')()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.__getattr__('__exit__')(exc_type, exc_val, exc_tb)
+
+    def __del__(self):
+        # Sicherheitsnetz für Code-Pfade ohne close(): Verbindung nicht verlieren
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __repr__(self):
+        conn = object.__getattribute__(self, '_conn')
+        return f"<PooledConnection pool={self._pool.name!r} conn={conn!r}>"
+
+
+def _interface_error(msg: str) -> Exception:
+    if PSYCOPG2_AVAILABLE:
+        return psycopg2.InterfaceError(msg)
+    return RuntimeError(msg)
+
+
+class ConnectionPool:
+    """
+    Thread-sicherer Connection-Pool mit Validierung, Max-Age-Recycling und Metriken.
+
+    Args:
+        name: Name des Ziels (z. B. 'portal', 'locosoft')
+        connect_func: Funktion, die eine neue psycopg2-Connection liefert
+        pool_size: Anzahl Verbindungen, die im Leerlauf offen gehalten werden
+        max_overflow: Zusätzliche Verbindungen bei Last (werden bei Rückgabe geschlossen)
+        max_age: Sekunden, nach denen eine Verbindung recycelt wird
+        checkout_timeout: Max. Wartezeit in Sekunden, wenn alle Verbindungen belegt sind
+        validate_after: Leerlauf in Sekunden, ab dem beim Auschecken SELECT 1 geprüft wird
+    """
+
+    def __init__(self, name: str, connect_func: Callable[[], Any], pool_size: int = 5,
+                 max_overflow: int = 5, max_age: int = 1800, checkout_timeout: float = 10.0,
+                 validate_after: int = 30):
+        self.name = name
+        self._connect_func = connect_func
+        self.pool_size = max(0, pool_size)
+        self.max_overflow = max(0, max_overflow)
+        self.max_age = max_age
+        self.checkout_timeout = checkout_timeout
+        self.validate_after = validate_after
+
+        self._cond = threading.Condition(threading.Lock())
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()          # [(conn, entry)] – entry: {'created': ts, 'last_used': ts}
+        self._total = 0               # offene Verbindungen (idle + in use)
+        self._in_use = 0
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'validation_failures': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+
+    # -------------------------------------------------------------------------
+    # Fork-Sicherheit
+    # -------------------------------------------------------------------------
+
+    def _check_fork(self):
+        """
+        Nach fork() gehören die geerbten Sockets dem Elternprozess.
+        Sie dürfen im Kind weder benutzt noch geschlossen werden (PQfinish würde
+        die Verbindung des Elternprozesses beenden) – daher nur Referenzen festhalten.
+        """
+        if self._pid != os.getpid():
+            orphans = [conn for conn, _ in self._idle]
+            if orphans:
+                _FORK_ORPHANS.extend(orphans)
+            logger.debug(f"DB-Pool '{self.name}': Fork erkannt, Pool im Kindprozess neu initialisiert")
+            self._reset_state()
+
+    # -------------------------------------------------------------------------
+    # Checkout / Checkin
+    # -------------------------------------------------------------------------
+
+    def getconn(self) -> PooledConnection:
+        """Verbindung aus dem Pool holen (ggf. neu aufbauen oder warten)."""
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+
+        while True:
+            conn = entry = None
+            create = False
+            with self._cond:
+                self._check_fork()
+                if self._idle:
+                    conn, entry = self._idle.pop()
+                    self._in_use += 1
+                elif self._total < self.pool_size + self.max_overflow:
+                    self._total += 1
+                    self._in_use += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"DB-Pool '{self.name}' erschöpft: {self._total} Verbindungen belegt "
+                            f"(Timeout {self.checkout_timeout}s)"
+                        )
+                    if not waited:
+                        self._stats['waits'] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if create:
+                try:
+                    conn = self._connect_func()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                now = time.time()
+                entry = {'created': now, 'last_used': now}
+                with self._cond:
+                    self._stats['created'] += 1
+            elif not self._validate(conn, entry):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._stats['checkouts'] += 1
+                self._latencies.append(time.monotonic() - start)
+            return PooledConnection(self, conn, entry)
+
+    def _validate(self, conn, entry: dict) -> bool:
+        """Prüft eine Leerlauf-Verbindung vor der Herausgabe."""
+        now = time.time()
+        if conn.closed:
+            self._count('validation_failures')
+            return False
+        if self.max_age and now - entry['created'] > self.max_age:
+            self._count('recycled')
+            return False
+        if self.validate_after is not None and now - entry['last_used'] > self.validate_after:
+            try:
+                cur = conn.cursor()
+                cur.execute('SELECT 1')
+                cur.fetchone()
+                cur.close()
+                if not conn.autocommit:
+                    conn.rollback()
+            except Exception as e:
+                logger.warning(f"DB-Pool '{self.name}': Verbindung ungültig ({e}), wird ersetzt")
+                self._count('validation_failures')
+                return False
+        return True
+
+    def putconn(self, conn, entry: dict):
+        """Verbindung zurückgeben: Transaktion zurückrollen, Session-Flags zurücksetzen."""
+        with self._cond:
+            foreign = self._pid != os.getpid()
+        if foreign:
+            # Verbindung stammt aus dem Elternprozess – nicht anfassen
+            _FORK_ORPHANS.append(conn)
+            return
+
+        reusable = not conn.closed
+        if reusable:
+            try:
+                if PSYCOPG2_AVAILABLE and conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    reusable = False
+                else:
+                    conn.rollback()
+                    if conn.autocommit:
+                        conn.autocommit = False
+            except Exception:
+                reusable = False
+
+        entry['last_used'] = time.time()
+        with self._cond:
+            self._in_use -= 1
+            if reusable and len(self._idle) < self.pool_size:
+                self._idle.append((conn, entry))
+                self._cond.notify()
+                return
+            self._total -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    def _discard(self, conn):
+        with self._cond:
+            self._total -= 1
+            self._in_use -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    def _count(self, key: str):
+        with self._cond:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Alle Leerlauf-Verbindungen schließen (z. B. beim Worker-Shutdown)."""
+        with self._cond:
+            self._check_fork()
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._stats['closed'] += len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # -------------------------------------------------------------------------
+    # Metriken
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._check_fork()
+            latencies = sorted(self._latencies)
+            result = {
+                'name': self.name,
+                'pid': self._pid,
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'max_age': self.max_age,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'total': self._total,
+                **self._stats,
+            }
+        if latencies:
+            result['checkout_ms_avg'] = round(sum(latencies) / len(latencies) * 1000, 3)
+            result['checkout_ms_p95'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3)
+            result['checkout_ms_max'] = round(latencies[-1] * 1000, 3)
+        else:
+            result['checkout_ms_avg'] = result['checkout_ms_p95'] = result['checkout_ms_max'] = None
+        return result
+
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+# Geerbte Verbindungen aus dem Elternprozess (siehe ConnectionPool._check_fork)
+_FORK_ORPHANS: list = []
+
+
+def get_pool(name: str, connect_func: Callable[[], Any], **kwargs) -> ConnectionPool:
+    """
+    Liefert den Pool für ein Ziel (wird beim ersten Aufruf angelegt).
+
+    Größen können per Environment überschrieben werden, z. B. für name='locosoft':
+        LOCOSOFT_POOL_SIZE, LOCOSOFT_POOL_MAX_OVERFLOW, LOCOSOFT_POOL_MAX_AGE,
+        LOCOSOFT_POOL_TIMEOUT
+    """
+    pool = _POOLS.get(name)
+    if pool is not None:
+        return pool
+    with _POOLS_LOCK:
+        pool = _POOLS.get(name)
+        if pool is None:
+            prefix = name.upper()
+            kwargs['pool_size'] = _env_int(f'{prefix}_POOL_SIZE', kwargs.get('pool_size', 5))
+            kwargs['max_overflow'] = _env_int(f'{prefix}_POOL_MAX_OVERFLOW', kwargs.get('max_overflow', 5))
+            kwargs['max_age'] = _env_int(f'{prefix}_POOL_MAX_AGE', kwargs.get('max_age', 1800))
+            kwargs['checkout_timeout'] = _env_int(f'{prefix}_POOL_TIMEOUT', int(kwargs.get('checkout_timeout', 10)))
+            pool = ConnectionPool(name, connect_func, **kwargs)
+            _POOLS[name] = pool
+            logger.info(
+                f"DB-Pool '{name}' angelegt (size={pool.pool_size}, overflow={pool.max_overflow}, "
+                f"max_age={pool.max_age}s)"
+            )
+    return pool
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Metriken aller Pools dieses Prozesses."""
+    return {name: pool.stats() for name, pool in list(_POOLS.items())}
+
+
+def close_all_pools():
+    """Leerlauf-Verbindungen aller Pools schließen."""
+    for pool in list(_POOLS.values()):
+        pool.close_all()
@@ -26,6 +26,7 @@ Verwendung:
 """
 
 import os
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 from contextlib import contextmanager
 
@@ -35,8 +36,11 @@ from api.db_connection import (
     get_db_context,
     get_db_type,
     convert_placeholders,
-    sql_placeholder
+    sql_placeholder,
+    stream_query,
+    DEFAULT_STREAM_BATCH_SIZE,
 )
+from api.db_pool import POOL_ENABLED, get_pool
 
 # =============================================================================
 # PORTAL-DATENBANK VERBINDUNGEN (nutzt db_connection.py)
@@ -87,36 +91,37 @@ def db_session():
 # LOCOSOFT DATENBANK VERBINDUNGEN (EXTERNE PostgreSQL)
 # =============================================================================
 
-def get_locosoft_connection():
-    """
-    Erstellt Verbindung zur externen Locosoft PostgreSQL-Datenbank.
+LOCOSOFT_CREDENTIALS_PATH = '/opt/greiner-portal/config/credentials.json'
 
-    WARNUNG: Bevorzuge locosoft_session() Context Manager für automatisches Cleanup!
 
-    Konfiguration:
-    - Host: 10.80.80.8:5432
-    - Database: loco_auswertung_db
-    - User: loco_auswertung_benutzer
-    - Password: loco (aus credentials.json)
+@lru_cache(maxsize=1)
+def _get_locosoft_credentials() -> Dict[str, Any]:
+    """
+    Locosoft-Zugangsdaten aus credentials.json (einmal pro Prozess gelesen).
+
+    TAG 220: Vorher wurde die Datei bei jedem get_locosoft_connection() neu gelesen.
     """
-    import psycopg2
     import json
 
-    credentials_path = '/opt/greiner-portal/config/credentials.json'
-    if os.path.exists(credentials_path):
-        with open(credentials_path, 'r') as f:
+    if os.path.exists(LOCOSOFT_CREDENTIALS_PATH):
+        with open(LOCOSOFT_CREDENTIALS_PATH, 'r') as f:
             creds = json.load(f)
-            locosoft_creds = creds.get('locosoft_postgresql', {})
-    else:
-        # Fallback
-        locosoft_creds = {
-            'host': '10.80.80.8',
-            'port': 5432,
-            'database': 'loco_auswertung_db',
-            'user': 'loco_auswertung_benutzer',
-            'password': 'loco'
-        }
+            return creds.get('locosoft_postgresql', {})
+    # Fallback
+    return {
+        'host': '10.80.80.8',
+        'port': 5432,
+        'database': 'loco_auswertung_db',
+        'user': 'loco_auswertung_benutzer',
+        'password': 'loco'
+    }
+
+
+def _connect_locosoft():
+    """Neue (ungepoolte) Verbindung zur Locosoft PostgreSQL-Datenbank aufbauen"""
+    import psycopg2
 
+    locosoft_creds = _get_locosoft_credentials()
     return psycopg2.connect(
         host=locosoft_creds.get('host', '10.80.80.8'),
         port=locosoft_creds.get('port', 5432),
@@ -126,6 +131,27 @@ def get_locosoft_connection():
     )
 
 
+def get_locosoft_connection():
+    """
+    Holt Verbindung zur externen Locosoft PostgreSQL-Datenbank.
+
+    WARNUNG: Bevorzuge locosoft_session() Context Manager für automatisches Cleanup!
+
+    TAG 220: Verbindung kommt aus dem Locosoft-Pool (api/db_pool.py);
+    conn.close() gibt sie an den Pool zurück. Größe via LOCOSOFT_POOL_SIZE /
+    LOCOSOFT_POOL_MAX_OVERFLOW.
+
+    Konfiguration:
+    - Host: 10.80.80.8:5432
+    - Database: loco_auswertung_db
+    - User: loco_auswertung_benutzer
+    - Password: loco (aus credentials.json)
+    """
+    if not POOL_ENABLED:
+        return _connect_locosoft()
+    return get_pool('locosoft', _connect_locosoft, pool_size=3, max_overflow=7).getconn()
+
+
 @contextmanager
 def locosoft_session():
     """
@@ -192,6 +218,19 @@ def rows_to_list(rows: List, cursor=None) -> List[Dict[str, Any]]:
     return [row_to_dict(row, cursor) for row in rows if row is not None]
 
 
+# =============================================================================
+# STREAMING (SERVER-SIDE CURSOR) - TAG 220
+# =============================================================================
+
+def stream_portal_query(query: str, params=None, batch_size: int = DEFAULT_STREAM_BATCH_SIZE):
+    """
+    Streamt eine Portal-Query per Server-Side-Cursor (Generator von HybridRows).
+
+    Öffnet/schließt die Connection selbst – für Streaming-Responses (api/streaming_utils.py).
+    """
+    return stream_query(convert_placeholders(query), params, batch_size, connection_factory=get_db)
+
+
 # =============================================================================
 # QUERY HELPERS
 # =============================================================================
@@ -9,8 +9,7 @@ import os
 import json
 import logging
 
-# eAutoseller Client
-from lib.eautoseller_client import EAutosellerClient
+# eAutoseller Client (lib.eautoseller_client) wird in get_client() importiert: bs4 erst bei Bedarf laden (TAG 220)
 from api.db_utils import db_session
 
 logger = logging.getLogger(__name__)
@@ -117,6 +116,7 @@ def get_eautoseller_credentials():
 
 def get_client():
     """Erstellt eAutoseller Client"""
+    from lib.eautoseller_client import EAutosellerClient
     creds = get_eautoseller_credentials()
     client = EAutosellerClient(
         username=creds.get('username', 'fGreiner'),
@@ -127,6 +127,7 @@ def get_client():
 
 def get_swagger_client():
     """Erstellt eAutoseller Client für Swagger API"""
+    from lib.eautoseller_client import EAutosellerClient
     creds = get_eautoseller_credentials()
     client = EAutosellerClient(
         username=creds.get('username', 'fGreiner'),
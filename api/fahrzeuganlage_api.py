@@ -15,6 +15,7 @@ from flask_login import login_required, current_user
 
 from api.db_connection import get_db
 from api.db_utils import db_session
+from api.job_offload import offload
 
 logger = logging.getLogger(__name__)
 
@@ -455,6 +456,7 @@ def vin_decode():
 
 @fahrzeuganlage_api.route("/dat-vin-lookup", methods=["GET", "POST"])
 @login_required
+@offload('dat')
 def dat_vin_lookup():
     """VIN bei DAT (SilverDAT myClaim) abfragen – liefert Marke, Handelsbezeichnung, HSN/TSN, DAT-Europa-Code.
     Pro Abruf fallen Kosten an (z. B. ~1 €). Konfiguration: DAT_URL, DAT_USER, DAT_PASSWORD in config/.env.
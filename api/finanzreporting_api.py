@@ -18,9 +18,9 @@ from flask import Blueprint, jsonify, request, Response
 from datetime import datetime, date
 from typing import Dict, List, Optional, Any
 import io
-import csv
-from api.db_utils import db_session, row_to_dict, rows_to_list
+from api.db_utils import db_session, row_to_dict, rows_to_list, stream_portal_query
 from api.db_connection import convert_placeholders
+from api.streaming_utils import peek_first, stream_csv_response
 
 finanzreporting_api = Blueprint('finanzreporting_api', __name__)
 
@@ -479,13 +479,20 @@ def export_cube_data():
             sql += f" ORDER BY {', '.join(order_parts)}"
         
         # Daten abfragen
-        with db_session() as conn:
-            cursor = conn.cursor()
-            cursor.execute(convert_placeholders(sql), params)
-            rows = cursor.fetchall()
-        
-        if not rows:
-            return jsonify({'error': 'Keine Daten gefunden'}), 404
+        # TAG 220: CSV wird per Server-Side-Cursor gestreamt (konstanter Speicher),
+        # Excel braucht das komplette Result-Set (openpyxl)
+        if export_format == 'csv':
+            first, rows = peek_first(stream_portal_query(sql, params))
+            if first is None:
+                return jsonify({'error': 'Keine Daten gefunden'}), 404
+        else:
+            with db_session() as conn:
+                cursor = conn.cursor()
+                cursor.execute(convert_placeholders(sql), params)
+                rows = cursor.fetchall()
+
+            if not rows:
+                return jsonify({'error': 'Keine Daten gefunden'}), 404
         
         # Spalten-Namen bestimmen
         column_names = []
@@ -508,48 +515,39 @@ def export_cube_data():
         
         # CSV-Export
         if export_format == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-            
-            # Header
-            writer.writerow(column_names)
-            
-            # Daten
-            for row in rows:
-                row_dict = row_to_dict(row, cursor)
-                row_data = []
-                
-                # Dimensionen
-                for dim in dimensionen:
-                    if dim == 'zeit':
-                        row_data.append(row_dict.get('zeit', ''))
-                    elif dim == 'standort':
-                        row_data.append(row_dict.get('standort', ''))
-                    elif dim == 'kst':
-                        row_data.append(row_dict.get('kst', ''))
-                    elif dim == 'konto':
-                        row_data.append(row_dict.get('konto', ''))
-                
-                # Measures
-                for measure in measures:
-                    value = row_dict.get(measure, 0)
-                    if measure == 'betrag':
-                        row_data.append(str(float(value or 0)).replace('.', ','))
-                    else:
-                        row_data.append(str(value or 0).replace('.', ','))
-                
-                writer.writerow(row_data)
+            def csv_rows():
+                for row in rows:
+                    row_dict = row_to_dict(row)
+                    row_data = []
+                    
+                    # Dimensionen
+                    for dim in dimensionen:
+                        if dim == 'zeit':
+                            row_data.append(row_dict.get('zeit', ''))
+                        elif dim == 'standort':
+                            row_data.append(row_dict.get('standort', ''))
+                        elif dim == 'kst':
+                            row_data.append(row_dict.get('kst', ''))
+                        elif dim == 'konto':
+                            row_data.append(row_dict.get('konto', ''))
+                    
+                    # Measures
+                    for measure in measures:
+                        value = row_dict.get(measure, 0)
+                        if measure == 'betrag':
+                            row_data.append(str(float(value or 0)).replace('.', ','))
+                        else:
+                            row_data.append(str(value or 0).replace('.', ','))
+                    
+                    yield row_data
             
-            output.seek(0)
             filename = f"finanzreporting_cube_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
-            return Response(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={
-                    'Content-Disposition': f'attachment; filename={filename}',
-                    'Content-Type': 'text/csv; charset=utf-8-sig'
-                }
+            return stream_csv_response(
+                csv_rows(),
+                header=column_names,
+                filename=filename,
+                content_type='text/csv; charset=utf-8-sig'
             )
         
         # Excel-Export (via pandas, falls verfügbar)
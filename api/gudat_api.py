@@ -27,12 +27,16 @@ from flask import Blueprint, jsonify, request
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
 
 from gudat_client import GudatClient
+from api.cache_utils import cached_result
 
 logger = logging.getLogger(__name__)
 
 # Blueprint erstellen
 gudat_bp = Blueprint('gudat', __name__, url_prefix='/api/gudat')
 
+# Kapazitätsdaten ändern sich nur durch Umplanung in Gudat (TAG 220)
+WORKLOAD_CACHE_TTL = 60
+
 # Client-Cache: pro Center (deggendorf, landau) oder '' für Default
 _clients = {}
 
@@ -91,6 +95,83 @@ def get_gudat_client(center: str = None) -> GudatClient:
     return _clients[key]
 
 
+# =============================================================================
+# Service-Funktionen (TAG 220)
+# Werden von den Endpoints UND direkt im Prozess genutzt (GudatData.get_kapazitaet,
+# Kapazitätsplanung) - kein HTTP-Aufruf auf localhost:5000 mehr.
+# =============================================================================
+
+def _check_session_error(data: dict, center: str = None):
+    err = data.get('error', '')
+    if 'Login' in err or '401' in err or 'Session' in err:
+        _invalidate_gudat_client(center)
+
+
+@cached_result(ttl=WORKLOAD_CACHE_TTL, tags=['werkstatt'])
+def get_workload_data(center: str = None, date: str = None) -> dict:
+    """
+    Kapazitäts-Summary eines Tages.
+
+    Returns:
+        Daten von GudatClient.get_workload_summary(); bei Gudat-Fehlern {'error': ...}
+    Raises:
+        ValueError: Center nicht konfiguriert / Credentials fehlen
+    """
+    client = get_gudat_client(center=center)
+    data = client.get_workload_summary(date)
+    if 'error' in data:
+        _check_session_error(data, center)
+    return data
+
+
+def _teams_per_day(raw_data: list) -> dict:
+    """Rohe Workload-Daten → {datum: [Team-Daten]} (TAG 200)"""
+    teams_per_day = {}
+    for team in raw_data:
+        team_name = team.get('name', '')
+        team_id = team.get('id')
+        category = team.get('category_name', '')
+
+        for date, day_data in team.get('data', {}).items():
+            if date not in teams_per_day:
+                teams_per_day[date] = []
+
+            teams_per_day[date].append({
+                'id': team_id,
+                'name': team_name,
+                'category': category,
+                'capacity': day_data.get('base_workload', 0),
+                'planned': day_data.get('planned_workload', 0),
+                'free': day_data.get('free_workload', 0),
+                'absent': day_data.get('absence_workload', 0),
+                'plannable': day_data.get('plannable_workload', 0),
+                'utilization': round(day_data.get('planned_workload', 0) / day_data.get('base_workload', 0) * 100, 1) if day_data.get('base_workload', 0) > 0 else 0,
+                'status': 'overloaded' if day_data.get('free_workload', 0) < 0 else ('warning' if day_data.get('free_workload', 0) < day_data.get('base_workload', 0) * 0.1 else 'ok')
+            })
+    return teams_per_day
+
+
+@cached_result(ttl=WORKLOAD_CACHE_TTL, tags=['werkstatt'])
+def get_workload_week_data(center: str = None, start_date: str = None, with_teams: bool = False) -> dict:
+    """
+    Wochen-Kapazitäts-Übersicht; mit with_teams zusätzlich 'teams_per_day' (TAG 200).
+
+    Returns:
+        Daten von GudatClient.get_week_overview(); bei Gudat-Fehlern {'error': ...}
+    """
+    client = get_gudat_client(center=center)
+    data = client.get_week_overview(start_date)
+    if 'error' in data:
+        _check_session_error(data, center)
+        return data
+
+    if with_teams:
+        raw_data = client.get_workload_raw(start_date, days=7)
+        if raw_data:
+            data['teams_per_day'] = _teams_per_day(raw_data)
+    return data
+
+
 # =============================================================================
 # Endpoints
 # =============================================================================
@@ -128,19 +209,11 @@ def get_workload():
     Returns:
         JSON mit Kapazitäts-Summary
     """
+    center = request.args.get('center', type=str)
     try:
-        date = request.args.get('date')
-        center = request.args.get('center', type=str)
-        
-        client = get_gudat_client(center=center)
-        data = client.get_workload_summary(date)
-        
+        data = get_workload_data(center=center, date=request.args.get('date'))
         if 'error' in data:
-            err = data.get('error', '')
-            if 'Login' in err or '401' in err or 'Session' in err:
-                _invalidate_gudat_client(center)
             return jsonify(data), 400
-        
         return jsonify(data)
         
     except ValueError as e:
@@ -166,49 +239,13 @@ def get_workload_week():
         Wenn with_teams=true: Enthält auch 'teams_per_day' mit Team-Daten pro Tag
     """
     try:
-        start_date = request.args.get('start_date')
-        with_teams = request.args.get('with_teams', 'false').lower() == 'true'
-        center = request.args.get('center', type=str)
-        
-        client = get_gudat_client(center=center)
-        data = client.get_week_overview(start_date)
-        
+        data = get_workload_week_data(
+            center=request.args.get('center', type=str),
+            start_date=request.args.get('start_date'),
+            with_teams=request.args.get('with_teams', 'false').lower() == 'true'
+        )
         if 'error' in data:
-            err = data.get('error', '')
-            if 'Login' in err or '401' in err or 'Session' in err:
-                _invalidate_gudat_client(center)
             return jsonify(data), 400
-        
-        # TAG 200: Team-Daten pro Tag hinzufügen
-        if with_teams:
-            raw_data = client.get_workload_raw(start_date, days=7)
-            if raw_data:
-                # Gruppiere nach Datum
-                teams_per_day = {}
-                for team in raw_data:
-                    team_name = team.get('name', '')
-                    team_id = team.get('id')
-                    category = team.get('category_name', '')
-                    
-                    for date, day_data in team.get('data', {}).items():
-                        if date not in teams_per_day:
-                            teams_per_day[date] = []
-                        
-                        teams_per_day[date].append({
-                            'id': team_id,
-                            'name': team_name,
-                            'category': category,
-                            'capacity': day_data.get('base_workload', 0),
-                            'planned': day_data.get('planned_workload', 0),
-                            'free': day_data.get('free_workload', 0),
-                            'absent': day_data.get('absence_workload', 0),
-                            'plannable': day_data.get('plannable_workload', 0),
-                            'utilization': round(day_data.get('planned_workload', 0) / day_data.get('base_workload', 0) * 100, 1) if day_data.get('base_workload', 0) > 0 else 0,
-                            'status': 'overloaded' if day_data.get('free_workload', 0) < 0 else ('warning' if day_data.get('free_workload', 0) < day_data.get('base_workload', 0) * 0.1 else 'ok')
-                        })
-                
-                data['teams_per_day'] = teams_per_day
-        
         return jsonify(data)
         
     except Exception as e:
@@ -542,18 +542,23 @@ class GudatData:
         logger.debug("Gudat-Cache geleert")
 
     @classmethod
-    def get_kapazitaet(cls) -> Dict[str, Any]:
+    def get_kapazitaet(cls, center: Optional[str] = None) -> Dict[str, Any]:
         """
         Holt Kapazitäts-Daten aus der Gudat API.
 
         TAG 153: Aus werkstatt_live_api.py migriert.
+        TAG 220: Ruft die Service-Funktionen aus api.gudat_api direkt im Prozess auf
+        (vorher HTTP auf localhost:5000/api/gudat/workload → zwei belegte Worker pro Abfrage).
+        Gemeinsamer Ergebnis-Cache mit den /api/gudat/workload-Endpoints.
 
-        Ruft /api/gudat/workload auf und transformiert die Daten.
         Echte Werkstatt-Kapazität = nur interne Mechanik-Teams:
         - Allgemeine Reparatur (ID 2)
         - Diagnosetechnik (ID 3)
         - NW/GW (ID 5)
 
+        Args:
+            center: deggendorf | landau (None = Deggendorf)
+
         Returns:
             {
                 'success': True,
@@ -564,51 +569,43 @@ class GudatData:
                 'status': 'warning',  # ok/warning/critical
                 'teams': [...],
                 'interne_teams': [...],
+                'externe_teams': [...],
                 'woche': [...],
+                'center': 'deggendorf',
                 'source': 'gudat'
             }
+            Bei Fehlern: {'success': False, 'error': ..., 'center': ..., 'source': 'gudat'}
 
         MIGRATION-NOTE:
             Bei Locosoft SOAP: listAvailableTimes() für Kapazitäten nutzen.
         """
-        import requests
+        from api.gudat_api import get_workload_data, get_workload_week_data
 
         # Interne Mechanik-Teams (echte Werkstatt-Kapazität)
         INTERNE_TEAMS = {2, 3, 5}  # Allgemeine Reparatur, Diagnosetechnik, NW/GW
 
         try:
-            # Lokalen Gudat-API Endpunkt aufrufen
-            response = requests.get(
-                'http://localhost:5000/api/gudat/workload',
-                timeout=10
-            )
-
-            if response.status_code != 200:
-                return {
-                    'success': False,
-                    'error': f'Gudat API Fehler: {response.status_code}',
-                    'source': 'gudat'
-                }
-
-            data = response.json()
+            data = get_workload_data(center=center)
 
             if 'error' in data:
                 return {
                     'success': False,
                     'error': data['error'],
+                    'center': center or 'deggendorf',
                     'source': 'gudat'
                 }
 
-            # Wochen-Daten holen
-            week_response = requests.get(
-                'http://localhost:5000/api/gudat/workload/week',
-                timeout=10
-            )
-            week_data = week_response.json() if week_response.status_code == 200 else {}
+            # Wochen-Daten (Fehler hier nur → leere Woche, wie bisher)
+            try:
+                week_data = get_workload_week_data(center=center)
+            except Exception as e:
+                logger.warning(f"Gudat Wochen-Kapazität (center={center}): {e}")
+                week_data = {}
 
             # Nur interne Teams für Kapazität zählen
             teams = data.get('teams', [])
             interne_teams = [t for t in teams if t.get('id') in INTERNE_TEAMS]
+            externe_teams = [t for t in teams if t.get('id') not in INTERNE_TEAMS]
 
             # Kapazität nur aus internen Teams berechnen
             intern_kapazitaet = sum(t.get('capacity', 0) for t in interne_teams)
@@ -632,30 +629,21 @@ class GudatData:
                 'auslastung': intern_auslastung,
                 'status': status,
                 'teams': teams,  # Alle Teams für Detail-Ansicht
-                'interne_teams': interne_teams,
-                'woche': week_data.get('days', []),
+                'interne_teams': interne_teams,  # Echte Kapazität (Monteure/Stunden)
+                'externe_teams': externe_teams,  # Externe Dienstleister (Gudat-Kapazität, nicht unsere)
+                'woche': (week_data or {}).get('days', []),
                 'timestamp': data.get('timestamp', datetime.now().isoformat()),
+                'center': center or 'deggendorf',
                 'hinweis': 'Kapazität = nur Allgemeine Reparatur + Diagnosetechnik + NW/GW',
                 'source': 'gudat'
             }
 
-        except requests.exceptions.Timeout:
-            return {
-                'success': False,
-                'error': 'Gudat API Timeout',
-                'source': 'gudat'
-            }
-        except requests.exceptions.ConnectionError:
-            return {
-                'success': False,
-                'error': 'Gudat API nicht erreichbar',
-                'source': 'gudat'
-            }
         except Exception as e:
-            logger.error(f"Fehler bei Gudat Kapazität: {e}")
+            logger.error(f"Fehler bei Gudat Kapazität (center={center}): {e}")
             return {
                 'success': False,
                 'error': str(e),
+                'center': center or 'deggendorf',
                 'source': 'gudat'
             }
 
@@ -10,6 +10,7 @@ from flask_login import login_required, current_user
 
 from api.db_utils import db_session, row_to_dict, rows_to_list
 from decorators.auth_decorators import admin_required
+from api.job_offload import offload
 
 logger = logging.getLogger(__name__)
 
@@ -229,6 +230,7 @@ def health():
 
 @hilfe_api.route('/ki/erweitern', methods=['POST'])
 @admin_required
+@offload('llm')
 def ki_erweitern():
     """
     POST /api/hilfe/ki/erweitern – Artikel mit KI (LM Studio / Bedrock) erweitern.
@@ -18,7 +18,6 @@ Endpoints:
 """
 
 from flask import Blueprint, request, jsonify
-import pandas as pd
 from datetime import datetime, date
 from decimal import Decimal, ROUND_HALF_UP
 import os
@@ -33,7 +32,8 @@ jahrespraemie_api = Blueprint('jahrespraemie_api', __name__, url_prefix='/api/ja
 
 def parse_date(d):
     """Datum aus verschiedenen Formaten parsen"""
-    if pd.isna(d) or str(d) in ['00.00.0000', 'nan', '', 'None', 'NaT']:
+    # TAG 220: ohne pandas (NaN/NaT/NA aus dem Excel-Import stringifizieren zu 'nan'/'NaT'/'<NA>')
+    if d is None or str(d) in ['00.00.0000', 'nan', '', 'None', 'NaT', '<NA>']:
         return None
     try:
         d_str = str(d).split(' ')[0]
@@ -517,6 +517,7 @@ def upload_lohnjournal(berechnung_id):
     file.save(temp_path)
 
     try:
+        import pandas as pd  # TAG 220: nur für den Excel-Upload, nicht beim App-Import laden
         df = pd.read_excel(temp_path, sheet_name='01446_Mon_AN', header=0)
 
         df_clean = df[[
@@ -0,0 +1,353 @@
+"""
+Job-Offload für langsame Web-Requests - TAG 220
+================================================
+Die Gunicorn-Worker sind synchron (config/gunicorn.conf.py): ein Request, der auf ein
+LLM (LM Studio/Bedrock), DAT oder Graph wartet, blockiert den ganzen Worker-Prozess
+für die volle Latenz - Dashboards warten dann auf freie Worker.
+
+Mit @offload(kategorie) läuft die View auf Wunsch des Clients im Hintergrund:
+- Client sendet 'Prefer: respond-async' (oder ?async=1 / "async": true im JSON-Body)
+- Antwort sofort 202 mit job_id, status_url, stream_url; der Worker ist wieder frei
+- Die View läuft in einem Thread-Pool je Kategorie im Worker-Prozess mit kopiertem Request-Kontext
+  (current_user, request.get_json(), Auth-Modus bleiben gleich) - die View selbst
+  ändert sich nicht, ohne Prefer-Header antwortet sie wie bisher synchron (API-Key-Clients)
+- Job-Status + Ergebnis liegen in Redis (job:<id>), jeder Worker kann Polls beantworten
+- Pro Kategorie gilt eine Obergrenze gleichzeitiger Jobs über alle Worker
+  (Redis-Semaphore; ohne Redis pro Prozess), z. B. max. 2 parallele LLM-Aufrufe
+
+Abfrage:
+    GET /api/jobs/<job_id>         → {'status': queued|running|done|error, 'ergebnis': ..., 'http_status': ...}
+    GET /api/jobs/<job_id>/stream  → Server-Sent Events (status, done); endet spätestens nach
+                                      JOB_SSE_MAX_SECONDS, EventSource verbindet automatisch neu
+
+Frontend: static/js/jobs.js (DriveJobs.fetch) - wie fetch(), wartet auf das Job-Ergebnis.
+
+Celery wird hier bewusst nicht genutzt: die Views brauchen den Request-/User-Kontext, und die
+Celery-Worker sind mit Imports/Syncs ausgelastet. Celery bleibt für geplante Jobs.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from flask import Blueprint, Response, jsonify, request, url_for, make_response, copy_current_request_context
+from flask_login import current_user
+
+from api.cache_utils import get_redis_client, _mark_redis_down
+from decorators.auth_decorators import login_or_api_key_required
+
+logger = logging.getLogger(__name__)
+
+# Gleichzeitige Jobs je Kategorie (über alle Gunicorn-Worker)
+CATEGORY_LIMITS = {
+    'llm': int(os.environ.get('JOB_LIMIT_LLM', '2')),
+    'dat': int(os.environ.get('JOB_LIMIT_DAT', '4')),
+    'mail': int(os.environ.get('JOB_LIMIT_MAIL', '4')),
+}
+DEFAULT_LIMIT = 4
+
+# Hintergrund-Threads pro Kategorie und Worker-Prozess (höchstens das Kategorie-Limit);
+# ein eigener Pool je Kategorie, damit auf einen LLM-Slot wartende Jobs DAT/Mail nicht blockieren
+JOB_THREADS = int(os.environ.get('JOB_THREADS_PER_WORKER', '4'))
+
+JOB_PREFIX = 'job'
+JOB_TTL = 3600                 # Ergebnis 1 h abrufbar
+JOB_MAX_RUNTIME = 600          # danach gilt ein laufender Job als abgebrochen (Worker-Neustart)
+SLOT_POLL_INTERVAL = 0.5       # Warten auf freien Kategorie-Slot
+JOB_SSE_POLL = 0.5
+JOB_SSE_MAX_SECONDS = 25       # SSE hält einen Sync-Worker - kurz halten, Client verbindet neu
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+# Fallback ohne Redis (nur innerhalb des Prozesses abrufbar)
+_local_jobs: Dict[str, Dict[str, str]] = {}
+_local_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_local_lock = threading.Lock()
+
+# Lua: abgelaufene Slots entfernen, Slot vergeben wenn unter dem Limit
+_ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+
+def _get_executor(kategorie: str) -> ThreadPoolExecutor:
+    """Ein Pool pro Kategorie und Prozess (Gunicorn forkt nach dem Import)."""
+    global _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executors.clear()
+            _executor_pid = os.getpid()
+        executor = _executors.get(kategorie)
+        if executor is None:
+            threads = max(1, min(JOB_THREADS, CATEGORY_LIMITS.get(kategorie, DEFAULT_LIMIT)))
+            executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"job-{kategorie}")
+            _executors[kategorie] = executor
+        return executor
+
+
+# =============================================================================
+# JOB-STATUS
+# =============================================================================
+
+def _job_key(job_id: str) -> str:
+    return f"{JOB_PREFIX}:{job_id}"
+
+
+def _save_job(job_id: str, **fields: Any):
+    mapping = {k: v if isinstance(v, str) else json.dumps(v, default=str) for k, v in fields.items()}
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(_job_key(job_id), mapping=mapping)
+            pipe.expire(_job_key(job_id), JOB_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            _mark_redis_down(e)
+    with _local_lock:
+        _local_jobs.setdefault(job_id, {}).update(mapping)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job-Status inkl. Ergebnis (None wenn unbekannt/abgelaufen)."""
+    raw = None
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            raw = redis_client.hgetall(_job_key(job_id)) or None
+        except Exception as e:
+            _mark_redis_down(e)
+    if raw is None:
+        with _local_lock:
+            raw = dict(_local_jobs.get(job_id) or {}) or None
+    if raw is None:
+        return None
+
+    job = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+           for k, v in raw.items()}
+    for field in ('ergebnis', 'http_status', 'erstellt', 'gestartet', 'beendet'):
+        if field in job:
+            try:
+                job[field] = json.loads(job[field])
+            except ValueError:
+                pass
+
+    # Worker während des Laufs beendet (Deploy/Neustart) → nicht ewig 'running'
+    if job.get('status') in ('queued', 'running'):
+        seit = job.get('gestartet') or job.get('erstellt') or 0
+        if time.time() - float(seit) > JOB_MAX_RUNTIME:
+            job['status'] = 'error'
+            job['error'] = 'Job abgebrochen (Zeitüberschreitung oder Worker-Neustart)'
+    return job
+
+
+# =============================================================================
+# KATEGORIE-LIMIT
+# =============================================================================
+
+def _acquire_slot(kategorie: str, token: str) -> bool:
+    limit = CATEGORY_LIMITS.get(kategorie, DEFAULT_LIMIT)
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            now = time.time()
+            return bool(redis_client.eval(
+                _ACQUIRE_SLOT_SCRIPT, 1, f"{JOB_PREFIX}:slots:{kategorie}",
+                now, now - JOB_MAX_RUNTIME, limit, token, JOB_MAX_RUNTIME
+            ))
+        except Exception as e:
+            _mark_redis_down(e)
+    with _local_lock:
+        semaphore = _local_semaphores.setdefault(kategorie, threading.BoundedSemaphore(limit))
+    if semaphore.acquire(blocking=False):
+        with _local_lock:
+            _local_jobs.setdefault(f"slot:{token}", {})['kategorie'] = kategorie
+        return True
+    return False
+
+
+def _release_slot(kategorie: str, token: str):
+    with _local_lock:
+        local = _local_jobs.pop(f"slot:{token}", None)
+    if local is not None:
+        _local_semaphores[kategorie].release()
+        return
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            redis_client.zrem(f"{JOB_PREFIX}:slots:{kategorie}", token)
+        except Exception as e:
+            _mark_redis_down(e)
+
+
+# =============================================================================
+# AUSFÜHRUNG
+# =============================================================================
+
+def _owner() -> str:
+    try:
+        if current_user and current_user.is_authenticated:
+            return f"u{current_user.get_id()}"
+    except Exception:
+        pass
+    return request.environ.get('drive.auth_mode', 'anon')
+
+
+def submit(kategorie: str, func: Callable, *args, owner: str = '', name: str = '', **kwargs) -> str:
+    """
+    Führt func(*args, **kwargs) im Hintergrund aus (Kategorie-Limit beachtet).
+    func liefert (ergebnis, http_status) oder nur ergebnis (JSON-serialisierbar).
+
+    Returns:
+        job_id
+    """
+    job_id = uuid.uuid4().hex
+    _save_job(job_id, status='queued', kategorie=kategorie, owner=owner, name=name or func.__name__,
+              erstellt=time.time())
+
+    def run():
+        while not _acquire_slot(kategorie, job_id):
+            time.sleep(SLOT_POLL_INTERVAL)
+        _save_job(job_id, status='running', gestartet=time.time())
+        try:
+            result = func(*args, **kwargs)
+            ergebnis, http_status = result if isinstance(result, tuple) else (result, 200)
+            _save_job(job_id, status='done', ergebnis=ergebnis, http_status=http_status, beendet=time.time())
+        except Exception as e:
+            logger.exception(f"Job {job_id} ({name or func.__name__}) fehlgeschlagen")
+            _save_job(job_id, status='error', error=str(e), beendet=time.time())
+        finally:
+            _release_slot(kategorie, job_id)
+
+    _get_executor(kategorie).submit(run)
+    return job_id
+
+
+def _async_requested() -> bool:
+    if 'respond-async' in request.headers.get('Prefer', '').lower():
+        return True
+    if request.args.get('async') in ('1', 'true'):
+        return True
+    if request.is_json:
+        body = request.get_json(silent=True)
+        return isinstance(body, dict) and body.get('async') is True
+    return False
+
+
+def offload(kategorie: str):
+    """
+    Decorator für langsame Views (nach @route/@login_required): auf Wunsch des Clients
+    (Prefer: respond-async) im Hintergrund ausführen und 202 mit job_id antworten.
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _async_requested():
+                return view(*args, **kwargs)
+
+            # Body vor dem Kopieren des Kontexts einlesen (Stream ist danach nicht mehr lesbar)
+            request.get_data(cache=True)
+
+            @copy_current_request_context
+            def run_view():
+                response = make_response(view(*args, **kwargs))
+                payload = response.get_json(silent=True)
+                if payload is None:
+                    payload = {'success': False, 'error': 'Keine JSON-Antwort'}
+                return payload, response.status_code
+
+            job_id = submit(kategorie, run_view, owner=_owner(), name=request.endpoint)
+            response = jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('jobs_api.get_job_status', job_id=job_id),
+                'stream_url': url_for('jobs_api.stream_job', job_id=job_id),
+            })
+            response.status_code = 202
+            response.headers['Location'] = response.get_json()['status_url']
+            return response
+
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+jobs_api = Blueprint('jobs_api', __name__, url_prefix='/api/jobs')
+
+
+def _job_for_request(job_id: str):
+    job = get_job(job_id)
+    if job is None or job.get('owner') not in ('', _owner()):
+        return None
+    return job
+
+
+def _job_payload(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {'success': job.get('status') != 'error', 'job_id': job_id, 'status': job.get('status')}
+    if job.get('status') == 'done':
+        payload['ergebnis'] = job.get('ergebnis')
+        payload['http_status'] = job.get('http_status')
+    if job.get('error'):
+        payload['error'] = job['error']
+    return payload
+
+
+@jobs_api.route('/<job_id>', methods=['GET'])
+@login_or_api_key_required
+def get_job_status(job_id):
+    """GET /api/jobs/<job_id> - Status; bei 'done' mit Ergebnis der View und deren HTTP-Status."""
+    job = _job_for_request(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job nicht gefunden oder abgelaufen'}), 404
+    return jsonify(_job_payload(job_id, job))
+
+
+@jobs_api.route('/<job_id>/stream', methods=['GET'])
+@login_or_api_key_required
+def stream_job(job_id):
+    """
+    GET /api/jobs/<job_id>/stream - Server-Sent Events: 'status' bei Änderung, 'done' mit Ergebnis.
+    Hält den (Sync-)Worker höchstens JOB_SSE_MAX_SECONDS; danach Reconnect durch den Browser.
+    """
+    if _job_for_request(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job nicht gefunden oder abgelaufen'}), 404
+
+    def events():
+        yield 'retry: 1000\n\n'
+        deadline = time.monotonic() + JOB_SSE_MAX_SECONDS
+        letzter_status = None
+        while time.monotonic() < deadline:
+            job = get_job(job_id)
+            if job is None:
+                yield 'event: done\ndata: {"success": false, "error": "Job abgelaufen"}\n\n'
+                return
+            payload = _job_payload(job_id, job)
+            if job.get('status') in ('done', 'error'):
+                yield f"event: done\ndata: {json.dumps(payload, default=str)}\n\n"
+                return
+            if job.get('status') != letzter_status:
+                letzter_status = job.get('status')
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+            time.sleep(JOB_SSE_POLL)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,608 @@
+#!/usr/bin/env python3
+"""
+Lager-Snapshot für Renner & Penner - TAG 220
+=============================================
+Vorklassifizierter Lagerbestand (parts_stock ⋈ parts_master) als Tabelle lager_snapshot
+im Portal und spaltenweise im Speicher jedes Workers.
+
+Vorher: jeder Aufruf von /renner-penner, /renner, /penner, /leichen, /statistik und
+/export lief über den kompletten Join in Locosoft (inkl. drei UPPER(description) NOT LIKE)
+und kategorisierte danach Zeile für Zeile in Python. Jetzt sind alle Ansichten Filter
+und Sortierungen über vorberechnete Spalten.
+
+Aufbau (refresh_lager_snapshot, Celery nach sync_teile und locosoft_mirror):
+    1 Query gegen Locosoft → Kategorisierung → lager_snapshot (DELETE + INSERT in einer
+    Transaktion) → Version in Redis erhöhen → Response-Cache 'renner_penner' leeren
+
+Zeilen:
+    betrieb = stock_no   je Lager (früher get_base_query)
+    betrieb IS NULL      je Teilenummer über alle Lager (früher get_aggregated_by_part_query)
+
+Lesen:
+    from api.lager_snapshot import get_lager_snapshot
+
+    snap = get_lager_snapshot()
+    for i in snap.auswahl('teil', min_wert=50, sort='lagerwert', limit=600):
+        teil = snap.zeile(i)
+
+Reichweite, Tage seit Abgang und Kategorie hängen vom Tagesdatum ab: stammt der Snapshot
+von einem früheren Tag, werden die abgeleiteten Spalten beim Laden neu berechnet.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLE = 'lager_snapshot'
+SNAPSHOT_VERSION_KEY = 'lager_snapshot:version'
+SNAPSHOT_VERSION_CHECK_INTERVAL = 5   # Redis-Version höchstens alle N Sekunden prüfen
+# Ohne Redis: spätestens nach N Sekunden neu aus der Tabelle laden
+SNAPSHOT_MAX_AGE = int(os.environ.get('LAGER_SNAPSHOT_MAX_AGE', '900'))
+INSERT_CHUNK_SIZE = 1000
+
+# Lagerleichen: kein Abgang seit mehr als 24 Monaten
+LEICHE_TAGE = 730
+PENNER_TAGE = 365
+
+# Ein Query gegen Locosoft: alle Lagerzeilen mit Bestand. Die Ausschlüsse der Analyse
+# (AT-Teile, Kaution, Rücklaufteil, Altteil-Wert) werden als Flag 'analyse' mitgeliefert,
+# weil /statistik über den gesamten Bestand rechnet. COALESCE(..., FALSE) entspricht dem
+# früheren WHERE (NULL in parts_type/description → Zeile ausgeschlossen).
+LOCOSOFT_QUERY = """
+    SELECT
+        ps.part_number,
+        ps.stock_no                                         AS betrieb,
+        pm.description,
+        pm.parts_type,
+        pm.part_number IS NOT NULL                          AS hat_stamm,
+        COALESCE(pm.parts_type NOT IN (1, 60, 65)
+                 AND UPPER(pm.description) NOT LIKE '%KAUTION%'
+                 AND UPPER(pm.description) NOT LIKE '%RUECKLAUFTEIL%'
+                 AND UPPER(pm.description) NOT LIKE '%ALTT%WERT%', FALSE) AS analyse,
+        ps.stock_level::float8                              AS bestand,
+        ps.usage_value::float8                              AS ek_preis,
+        pm.rr_price::float8                                 AS vk_preis,
+        (ps.stock_level * ps.usage_value)::float8           AS wert,
+        ROUND((ps.stock_level * ps.usage_value)::numeric, 2)::float8 AS lagerwert,
+        ps.sales_current_year::float8                       AS verkauf_aktuell,
+        ps.sales_previous_year::float8                      AS verkauf_vorjahr,
+        ps.last_outflow_date                                AS letzter_abgang,
+        ps.last_inflow_date                                 AS letzter_zugang,
+        ps.minimum_stock_level::float8                      AS mindestbestand
+    FROM parts_stock ps
+    LEFT JOIN parts_master pm ON ps.part_number = pm.part_number
+    WHERE ps.stock_level > 0
+"""
+
+# Rohspalten (aus Locosoft) + abgeleitete Spalten (abhängig vom Stand-Datum)
+ROH_SPALTEN = (
+    'part_number', 'betrieb', 'description', 'parts_type', 'hat_stamm', 'analyse',
+    'bestand', 'ek_preis', 'vk_preis', 'wert', 'lagerwert',
+    'verkauf_aktuell', 'verkauf_vorjahr', 'letzter_abgang', 'letzter_zugang', 'mindestbestand',
+)
+ABGELEITETE_SPALTEN = (
+    'verkauf_12m', 'tage_seit_abgang', 'kategorie', 'status_icon', 'prioritaet', 'empfehlung',
+    'reichweite_monate', 'umschlag_jahr', 'verkauf_monat_avg',
+)
+SPALTEN = ROH_SPALTEN + ABGELEITETE_SPALTEN
+
+KATEGORIEN = ('renner', 'penner', 'leiche', 'normal')
+
+
+def kategorisiere_teil(row):
+    """
+    Kategorisiert ein Teil basierend auf Umschlag und Reichweite.
+
+    Returns: dict mit kategorie, status_icon, prioritaet, empfehlung
+    """
+    bestand = float(row['bestand'] or 0)
+    verkauf_12m = float(row['verkauf_12m'] or 0)
+    lagerwert = float(row['lagerwert'] or 0)
+    tage_seit_abgang = row['tage_seit_abgang']
+
+    # Monatlicher Durchschnittsverkauf
+    verkauf_monat = verkauf_12m / 12 if verkauf_12m > 0 else 0
+
+    # Reichweite in Monaten (wie lange reicht der Bestand?)
+    reichweite = bestand / verkauf_monat if verkauf_monat > 0 else 999
+
+    # Umschlagshäufigkeit (Verkäufe / Bestand pro Jahr)
+    umschlag = verkauf_12m / bestand if bestand > 0 else 0
+
+    result = {
+        'reichweite_monate': round(reichweite, 1) if reichweite < 999 else None,
+        'umschlag_jahr': round(umschlag, 2),
+        'verkauf_monat_avg': round(verkauf_monat, 2)
+    }
+
+    # LEICHE: Kein Verkauf seit 24+ Monaten UND Bestand > 0
+    if tage_seit_abgang and tage_seit_abgang > 730:
+        result['kategorie'] = 'leiche'
+        result['status_icon'] = '💀'
+        result['prioritaet'] = 1
+        result['empfehlung'] = 'Sofort handeln! Rückgabe an Lieferant oder Abschreibung prüfen'
+        return result
+
+    # PENNER: Kein/kaum Verkauf oder sehr lange Reichweite
+    if tage_seit_abgang and tage_seit_abgang > 365:
+        result['kategorie'] = 'penner'
+        result['status_icon'] = '🔴'
+        result['prioritaet'] = 2
+        result['empfehlung'] = 'Abverkauf oder Rückgabe prüfen'
+        return result
+
+    # PENNER nur bei hoher Reichweite, wenn NICHT kürzlich verkauft (Bugfix: Teile mit
+    # letztem Abgang z.B. heute sind aktive Läufer, keine Ladenhüter)
+    if reichweite > 24:
+        tage_ok = tage_seit_abgang is None or tage_seit_abgang > 90
+        if tage_ok:
+            result['kategorie'] = 'penner'
+            result['status_icon'] = '🔴'
+            result['prioritaet'] = 2
+            result['empfehlung'] = 'Bestand zu hoch - Abverkauf prüfen'
+            return result
+        # Kürzlich verkauft (≤90 Tage) trotz hoher Reichweite → normal, nur Hinweis
+        result['kategorie'] = 'normal'
+        result['status_icon'] = '🟡'
+        result['prioritaet'] = 4
+        result['empfehlung'] = 'Bestand hoch, Abverkauf aktiv - beobachten'
+        return result
+
+    # RENNER: Hoher Umschlag oder niedrige Reichweite
+    if umschlag > 6 or (reichweite < 2 and verkauf_monat > 0):
+        result['kategorie'] = 'renner'
+        result['status_icon'] = '🟢'
+        result['prioritaet'] = 3
+        result['empfehlung'] = 'Nachbestellen prüfen - geringer Bestand!'
+        return result
+
+    if reichweite < 3:
+        result['kategorie'] = 'renner'
+        result['status_icon'] = '🟢'
+        result['prioritaet'] = 3
+        result['empfehlung'] = 'Bestand niedrig - Nachbestellung empfohlen'
+        return result
+
+    # NORMAL: Alles andere
+    result['kategorie'] = 'normal'
+    result['status_icon'] = '🟡'
+    result['prioritaet'] = 4
+    result['empfehlung'] = 'Bestand ok'
+
+    return result
+
+
+def _runde(value: Optional[float], stellen: int = 2) -> Optional[float]:
+    """Kaufmännisch runden wie PostgreSQL ROUND(numeric)."""
+    if value is None:
+        return None
+    quant = Decimal(1).scaleb(-stellen)
+    return float(Decimal(repr(value)).quantize(quant, rounding=ROUND_HALF_UP))
+
+
+def _ableiten(zeile: Dict[str, Any], heute: date):
+    """Datumsabhängige Spalten (wie CURRENT_DATE in der früheren Query) + Kategorie."""
+    if zeile['betrieb'] is not None:
+        zeile['verkauf_12m'] = (zeile['verkauf_aktuell'] or 0) + (zeile['verkauf_vorjahr'] or 0) * (heute.month / 12)
+    abgang = zeile['letzter_abgang']
+    zeile['tage_seit_abgang'] = (heute - abgang).days if abgang else None
+    zeile.update(kategorisiere_teil(zeile))
+
+
+def _max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if a >= b else b
+
+
+def _summe(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def _baue_zeilen(roh: Iterable[Dict[str, Any]], heute: date) -> List[Dict[str, Any]]:
+    """
+    Lagerzeilen ableiten und je Teilenummer über alle Lager verdichten
+    (GROUP BY part_number, description, parts_type – nur Zeilen der Analyse).
+    """
+    zeilen = []
+    gruppen: Dict[tuple, Dict[str, Any]] = {}
+    for r in roh:
+        zeile = {name: r[name] for name in ROH_SPALTEN}
+        _ableiten(zeile, heute)
+        zeilen.append(zeile)
+        if not zeile['analyse']:
+            continue
+
+        key = (zeile['part_number'], zeile['description'], zeile['parts_type'])
+        teil = gruppen.get(key)
+        if teil is None:
+            gruppen[key] = dict(zeile, betrieb=None, letzter_zugang=None)
+            continue
+        for name in ('bestand', 'wert', 'lagerwert', 'verkauf_aktuell', 'verkauf_vorjahr',
+                     'verkauf_12m', 'mindestbestand'):
+            teil[name] = _summe(teil[name], zeile[name])
+        for name in ('ek_preis', 'vk_preis', 'letzter_abgang'):
+            teil[name] = _max(teil[name], zeile[name])
+
+    for teil in gruppen.values():
+        if teil['lagerwert'] is not None:
+            teil['lagerwert'] = _runde(teil['lagerwert'])
+        _ableiten(teil, heute)
+        zeilen.append(teil)
+    return zeilen
+
+
+# =============================================================================
+# SPALTENWEISE DARSTELLUNG
+# =============================================================================
+
+def _desc_nulls_last(werte: List, i: int):
+    v = werte[i]
+    return (v is None, -(v or 0))
+
+
+class LagerSnapshot:
+    """
+    Lagerbestand spaltenweise (eine Liste pro Spalte) mit vorberechneten Sortierungen,
+    Kategorie-Summen und /statistik-Kennzahlen.
+
+    Gruppen:
+        'lager'  Zeilen je Lager der Analyse (ohne AT-Teile/Kaution/...)
+        'teil'   je Teilenummer über alle Lager
+        'alle'   alle Lagerzeilen mit Bestand (Basis für /statistik)
+    """
+
+    SORTIERUNGEN = {
+        'lagerwert': ('lagerwert',),
+        'verkauf_12m': ('verkauf_12m',),
+        'tage': ('tage_seit_abgang',),
+        'tage_lagerwert': ('tage_seit_abgang', 'lagerwert'),
+    }
+
+    def __init__(self, zeilen: List[Dict[str, Any]], stand: datetime, heute: date,
+                 version: Optional[str] = None):
+        self.stand = stand          # Zeitpunkt des Aufbaus aus Locosoft
+        self.heute = heute          # Tag, für den Tage/Reichweite/Kategorie abgeleitet sind
+        self.version = version
+        self.anzahl = len(zeilen)
+        self.spalten: Dict[str, list] = {name: [z[name] for z in zeilen] for name in SPALTEN}
+
+        betrieb = self.spalten['betrieb']
+        analyse = self.spalten['analyse']
+        self._gruppen = {
+            'alle': [i for i in range(self.anzahl) if betrieb[i] is not None],
+            'lager': [i for i in range(self.anzahl) if betrieb[i] is not None and analyse[i]],
+            'teil': [i for i in range(self.anzahl) if betrieb[i] is None],
+        }
+        self._sortiert: Dict[tuple, List[int]] = {}
+        self._lock = threading.Lock()
+        self.kategorie_summen = self._kategorie_summen()
+        self.statistik = self._statistik()
+
+    # ------------------------------------------------------------------
+    # Zugriff
+    # ------------------------------------------------------------------
+
+    def zeile(self, i: int) -> Dict[str, Any]:
+        """Zeile i als dict (Spaltennamen wie die frühere Query + Kategorie-Felder)."""
+        return {name: werte[i] for name, werte in self.spalten.items()}
+
+    def _reihenfolge(self, gruppe: str, sort: str) -> List[int]:
+        key = (gruppe, sort)
+        order = self._sortiert.get(key)
+        if order is None:
+            felder = [self.spalten[name] for name in self.SORTIERUNGEN[sort]]
+            order = sorted(self._gruppen[gruppe],
+                           key=lambda i: tuple(_desc_nulls_last(werte, i) for werte in felder))
+            with self._lock:
+                self._sortiert[key] = order
+        return order
+
+    def auswahl(self, gruppe: str, betrieb: Optional[int] = None, marke: Optional[int] = None,
+                min_wert: Optional[float] = None, sort: str = 'lagerwert', limit: Optional[int] = None,
+                kategorien: Optional[Iterable[str]] = None, nur_verkauft: bool = False,
+                min_tage: Optional[int] = None) -> List[int]:
+        """
+        Zeilen-Indizes einer Gruppe, gefiltert und sortiert (absteigend, NULL zuletzt).
+
+        Args:
+            min_wert: lagerwert >= min_wert
+            kategorien: nur diese Kategorien (z. B. {'penner', 'leiche'})
+            nur_verkauft: verkauf_12m > 0
+            min_tage: kein Abgang seit mehr als min_tage Tagen (oder nie)
+        """
+        sp = self.spalten
+        kategorien = set(kategorien) if kategorien else None
+        treffer = []
+        for i in self._reihenfolge(gruppe, sort):
+            if betrieb is not None and sp['betrieb'][i] != betrieb:
+                continue
+            if marke is not None and sp['parts_type'][i] != marke:
+                continue
+            if min_wert is not None and (sp['lagerwert'][i] is None or sp['lagerwert'][i] < min_wert):
+                continue
+            if nur_verkauft and not sp['verkauf_12m'][i] > 0:
+                continue
+            if min_tage is not None and sp['tage_seit_abgang'][i] is not None and sp['tage_seit_abgang'][i] <= min_tage:
+                continue
+            if kategorien is not None and sp['kategorie'][i] not in kategorien:
+                continue
+            treffer.append(i)
+            if limit is not None and len(treffer) >= limit:
+                break
+        return treffer
+
+    # ------------------------------------------------------------------
+    # Vorberechnete Aggregate
+    # ------------------------------------------------------------------
+
+    def _kategorie_summen(self) -> Dict[Any, Dict[str, Dict[str, float]]]:
+        """
+        Anzahl/Lagerwert je Kategorie: Schlüssel None = je Teilenummer über alle Lager,
+        sonst stock_no (Lagerzeilen der Analyse).
+        """
+        sp = self.spalten
+        summen = defaultdict(lambda: {k: {'anzahl': 0, 'lagerwert': 0.0} for k in KATEGORIEN})
+        for gruppe in ('teil', 'lager'):
+            for i in self._gruppen[gruppe]:
+                eintrag = summen[sp['betrieb'][i]][sp['kategorie'][i]]
+                eintrag['anzahl'] += 1
+                eintrag['lagerwert'] += sp['lagerwert'][i] or 0
+        for kategorien in summen.values():
+            for eintrag in kategorien.values():
+                eintrag['lagerwert'] = round(eintrag['lagerwert'], 2)
+        return dict(summen)
+
+    def _statistik(self) -> Dict[str, Any]:
+        """Kennzahlen für /statistik über den gesamten Bestand (ohne Analyse-Ausschlüsse)."""
+        sp = self.spalten
+        alle = self._gruppen['alle']
+
+        def wert_summe(indizes):
+            werte = [sp['wert'][i] for i in indizes if sp['wert'][i] is not None]
+            return _runde(sum(werte)) if werte else None
+
+        mit_abgang = [i for i in alle if sp['letzter_abgang'][i] is not None]
+        bestand = [sp['bestand'][i] for i in mit_abgang if sp['bestand'][i] is not None]
+        tage = [sp['tage_seit_abgang'][i] for i in mit_abgang]
+        gesamt = {
+            'anzahl_artikel': len({sp['part_number'][i] for i in mit_abgang}),
+            'stueck_gesamt': _runde(sum(bestand), 0) if bestand else None,
+            'lagerwert_gesamt': wert_summe(mit_abgang),
+            'avg_tage_seit_abgang': _runde(sum(tage) / len(tage), 0) if tage else None,
+        }
+
+        def gruppiert(feld, nur_stamm=False):
+            indizes = defaultdict(list)
+            for i in alle:
+                if nur_stamm and not sp['hat_stamm'][i]:
+                    continue
+                indizes[sp[feld][i]].append(i)
+            result = [{
+                feld: key,
+                'anzahl': len({sp['part_number'][i] for i in idx}),
+                'lagerwert': wert_summe(idx),
+            } for key, idx in indizes.items()]
+            # ORDER BY lagerwert DESC (NULL zuerst wie in PostgreSQL)
+            result.sort(key=lambda r: (r['lagerwert'] is not None, -(r['lagerwert'] or 0)))
+            return result
+
+        leichen = [i for i in alle if sp['tage_seit_abgang'][i] is None or sp['tage_seit_abgang'][i] > LEICHE_TAGE]
+        penner = [i for i in alle
+                  if sp['tage_seit_abgang'][i] is not None and PENNER_TAGE <= sp['tage_seit_abgang'][i] <= LEICHE_TAGE]
+        return {
+            'gesamt': gesamt,
+            'nach_marke': gruppiert('parts_type', nur_stamm=True),
+            'nach_betrieb': gruppiert('betrieb'),
+            'leichen': {'anzahl': len(leichen), 'lagerwert': wert_summe(leichen)},
+            'penner': {'anzahl': len(penner), 'lagerwert': wert_summe(penner)},
+        }
+
+
+# =============================================================================
+# AUFBAU (Celery nach sync_teile / locosoft_mirror)
+# =============================================================================
+
+def ensure_lager_snapshot_table(conn):
+    """lager_snapshot anlegen, falls die Migration noch nicht lief (ohne Commit)."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+            part_number        TEXT NOT NULL,
+            betrieb            INTEGER,
+            description        TEXT,
+            parts_type         INTEGER,
+            hat_stamm          BOOLEAN NOT NULL DEFAULT FALSE,
+            analyse            BOOLEAN NOT NULL DEFAULT FALSE,
+            bestand            DOUBLE PRECISION,
+            ek_preis           DOUBLE PRECISION,
+            vk_preis           DOUBLE PRECISION,
+            wert               DOUBLE PRECISION,
+            lagerwert          DOUBLE PRECISION,
+            verkauf_aktuell    DOUBLE PRECISION,
+            verkauf_vorjahr    DOUBLE PRECISION,
+            letzter_abgang     DATE,
+            letzter_zugang     DATE,
+            mindestbestand     DOUBLE PRECISION,
+            verkauf_12m        DOUBLE PRECISION,
+            tage_seit_abgang   INTEGER,
+            kategorie          VARCHAR(10),
+            status_icon        VARCHAR(8),
+            prioritaet         SMALLINT,
+            empfehlung         TEXT,
+            reichweite_monate  DOUBLE PRECISION,
+            umschlag_jahr      DOUBLE PRECISION,
+            verkauf_monat_avg  DOUBLE PRECISION,
+            stand              TIMESTAMP NOT NULL
+        )
+    """)
+
+
+def _lade_locosoft() -> List[Dict[str, Any]]:
+    from api.db_utils import locosoft_session
+
+    with locosoft_session() as loco_conn:
+        cursor = loco_conn.cursor()
+        cursor.execute(LOCOSOFT_QUERY)
+        namen = [col[0] for col in cursor.description]
+        return [dict(zip(namen, row)) for row in cursor.fetchall()]
+
+
+def _bump_version():
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.incr(SNAPSHOT_VERSION_KEY)
+    except Exception as e:
+        _mark_redis_down(e)
+
+
+def refresh_lager_snapshot() -> Dict[str, Any]:
+    """
+    Snapshot aus Locosoft neu aufbauen und in lager_snapshot schreiben
+    (DELETE + INSERT in einer Transaktion – Leser sehen alten oder neuen Stand).
+
+    Returns:
+        {'zeilen': Lagerzeilen, 'teile': Teilenummern (Analyse), 'sekunden': Dauer}
+    """
+    from api.db_utils import db_session
+
+    started = time.monotonic()
+    stand = datetime.now().replace(microsecond=0)
+    zeilen = _baue_zeilen(_lade_locosoft(), stand.date())
+
+    with db_session() as conn:
+        ensure_lager_snapshot_table(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"DELETE FROM {SNAPSHOT_TABLE}")
+        spalten = ', '.join(SPALTEN + ('stand',))
+        platzhalter = '(' + ', '.join(['%s'] * (len(SPALTEN) + 1)) + ')'
+        for start in range(0, len(zeilen), INSERT_CHUNK_SIZE):
+            chunk = zeilen[start:start + INSERT_CHUNK_SIZE]
+            params = [value for z in chunk for value in [z[name] for name in SPALTEN] + [stand]]
+            cursor.execute(
+                f"INSERT INTO {SNAPSHOT_TABLE} ({spalten}) VALUES {', '.join([platzhalter] * len(chunk))}",
+                params,
+            )
+
+    invalidate_lager_snapshot()
+    teile = sum(1 for z in zeilen if z['betrieb'] is None)
+    sekunden = round(time.monotonic() - started, 1)
+    logger.info(f"Lager-Snapshot: {len(zeilen) - teile:,} Lagerzeilen, {teile:,} Teile in {sekunden}s")
+    return {'zeilen': len(zeilen) - teile, 'teile': teile, 'sekunden': sekunden}
+
+
+# =============================================================================
+# LESEN (Cache pro Prozess)
+# =============================================================================
+
+_snapshot_lock = threading.Lock()
+_snapshot_state = {
+    'snapshot': None,       # LagerSnapshot
+    'version': None,        # Redis-Version beim Laden
+    'loaded_at': 0.0,
+    'checked_at': 0.0,
+}
+
+
+def _redis_version() -> Optional[str]:
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        return client.get(SNAPSHOT_VERSION_KEY) or '0'
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+
+
+def invalidate_lager_snapshot():
+    """Nach einem Neuaufbau: alle Worker laden beim nächsten Zugriff neu."""
+    with _snapshot_lock:
+        _snapshot_state['snapshot'] = None
+    _bump_version()
+    try:
+        from api.cache_utils import invalidate_cache_tags
+        invalidate_cache_tags('renner_penner')
+    except Exception as e:
+        logger.warning(f"Response-Cache-Invalidierung (renner_penner) fehlgeschlagen: {e}")
+
+
+def _lade_snapshot(version: Optional[str]) -> LagerSnapshot:
+    """Snapshot aus lager_snapshot laden; fehlt er, direkt aus Locosoft aufbauen (ohne Speichern)."""
+    from api.db_utils import db_session
+
+    heute = date.today()
+    zeilen, stand = [], None
+    try:
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(SPALTEN)}, stand FROM {SNAPSHOT_TABLE}")
+            for row in cursor.fetchall():
+                zeilen.append({name: row[pos] for pos, name in enumerate(SPALTEN)})
+                stand = row[len(SPALTEN)]
+    except Exception as e:
+        # Tabelle fehlt (Migration/erster Aufbau noch nicht gelaufen)
+        logger.warning(f"Lager-Snapshot nicht lesbar ({e}) - baue aus Locosoft auf")
+        zeilen = []
+
+    if not zeilen:
+        stand = datetime.now().replace(microsecond=0)
+        return LagerSnapshot(_baue_zeilen(_lade_locosoft(), heute), stand, heute, version)
+
+    if stand.date() != heute:
+        # Stand von gestern o. ä.: Tage/Reichweite/Kategorie für heute neu ableiten
+        lager = [z for z in zeilen if z['betrieb'] is not None]
+        return LagerSnapshot(_baue_zeilen(lager, heute), stand, heute, version)
+    return LagerSnapshot(zeilen, stand, heute, version)
+
+
+def get_lager_snapshot() -> LagerSnapshot:
+    """Aktueller Snapshot (pro Prozess gecacht, Version über Redis abgeglichen)."""
+    state = _snapshot_state
+    with _snapshot_lock:
+        now = time.monotonic()
+        snapshot = state['snapshot']
+        if snapshot is not None and now - state['checked_at'] >= SNAPSHOT_VERSION_CHECK_INTERVAL:
+            state['checked_at'] = now
+            version = _redis_version()
+            if version is None:
+                veraltet = now - state['loaded_at'] >= SNAPSHOT_MAX_AGE
+            else:
+                veraltet = version != state['version']
+            if veraltet or snapshot.heute != date.today():
+                snapshot = None
+
+        if snapshot is None:
+            # Unter dem Lock: bei kaltem Cache lädt nur ein Thread, die anderen warten
+            version = _redis_version()
+            snapshot = _lade_snapshot(version)
+            now = time.monotonic()
+            state.update(snapshot=snapshot, version=version, loaded_at=now, checked_at=now)
+        return snapshot
+
+
+if __name__ == '__main__':
+    # Manueller Aufbau: python -m api.lager_snapshot
+    logging.basicConfig(level=logging.INFO)
+    ergebnis = refresh_lager_snapshot()
+    print(f"Lager-Snapshot aufgebaut: {ergebnis['zeilen']:,} Lagerzeilen, {ergebnis['teile']:,} Teile "
+          f"({ergebnis['sekunden']}s)")
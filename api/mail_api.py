@@ -12,12 +12,14 @@ from datetime import datetime, date, timedelta
 
 # Lokale Imports
 from .graph_mail_connector import GraphMailConnector
+from .job_offload import offload
 from reports.auftragseingang_report_builder import build_auftragseingang_report_package
 
 mail_api = Blueprint('mail_api', __name__, url_prefix='/api/mail')
 
 
 @mail_api.route('/auftragseingang/send', methods=['POST'])
+@offload('mail')
 def send_auftragseingang_report():
     """
     POST /api/mail/auftragseingang/send
@@ -11,12 +11,11 @@ REST API für Machine Learning Vorhersagen:
 
 TAG 97: Mechaniker-Namen hinzugefügt (JOIN mit employees-Tabelle)
 TAG 119: V2-Modell Support (XGBoost, 22 Features)
+TAG 220: pandas wird erst bei der ersten Vorhersage geladen, nicht beim App-Import
 """
 
 from flask import Blueprint, jsonify, request
 import pickle
-import numpy as np
-import pandas as pd
 import os
 
 from api.db_utils import db_session, rows_to_list
@@ -93,6 +92,8 @@ def get_training_data():
     """Lädt Trainingsdaten für Statistiken - V2 Features bevorzugt"""
     global _training_data
     if _training_data is None:
+        import pandas as pd  # TAG 220: erst bei Bedarf laden (Worker-Start/RSS)
+
         # Priorität: V2 Features > V2 Zeiten > V1
         data_path_v2_features = f"{DATA_DIR}/auftraege_features_v2.csv"
         data_path_v2 = f"{DATA_DIR}/auftraege_mit_zeiten_v2.csv"
@@ -356,6 +357,7 @@ def predict_auftragsdauer():
             km_stand
         ]
 
+        import pandas as pd
         features = pd.DataFrame([feature_values], columns=feature_names)
 
         # Vorhersage
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+ML-Modell-Registry - TAG 220
+=============================
+Prozessweiter Cache für das Auftragsdauer-Modell (DRIVE), die Label-Encoder,
+die Metadaten, die Labour-Correction-Faktoren und die Mechaniker-Effizienz.
+
+Vorher wurden Modell und Encoder pro Request per pickle.load() geladen und die
+Mechaniker-Effizienz pro Request aus auftraege_features_v5.csv berechnet.
+Jetzt:
+- Laden einmal pro Prozess, Hot-Reload wenn der Symlink auftragsdauer_model.pkl
+  auf eine neue Version zeigt (oder sich mtime einer Datei ändert)
+- Vektorisiertes Label-Encoding (Dict-Lookup statt LabelEncoder.transform pro Wert)
+- Ein predict()-Aufruf für alle Aufträge (predict_minutes)
+- Mechaniker-Effizienz wird beim Retrain vorberechnet (export_mechaniker_effizienz)
+
+Verwendung:
+    from api.ml_model_registry import get_model_bundle, predict_minutes
+
+    bundle = get_model_bundle()
+    if bundle:
+        minuten = predict_minutes(bundle, feature_frame)
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = "/opt/greiner-portal/data/ml/models"
+ML_DATA_DIR = "/opt/greiner-portal/data/ml"
+MODEL_PATH = f"{MODEL_DIR}/auftragsdauer_model.pkl"
+ENCODERS_PATHS = [
+    f"{MODEL_DIR}/label_encoders_v2_tag119.pkl",
+    f"{MODEL_DIR}/label_encoders.pkl",
+]
+METADATA_PATH = f"{MODEL_DIR}/model_metadata_v2_tag119.pkl"
+LABOUR_CORRECTIONS_PATH = f"{ML_DATA_DIR}/labour_corrections.json"
+TRAINING_DATA_PATH = f"{ML_DATA_DIR}/auftraege_features_v5.csv"
+EFFIZIENZ_PATH = f"{MODEL_DIR}/mechaniker_effizienz.json"
+
+# Wie oft (Sekunden) höchstens auf geänderte Modell-Dateien geprüft wird
+RELOAD_CHECK_INTERVAL = int(os.environ.get('ML_RELOAD_CHECK_INTERVAL', '30'))
+
+
+class ModelBundle:
+    """Geladenes Modell inkl. Encoder, Metadaten und Lookup-Tabellen."""
+
+    def __init__(self, model, encoders, metadata, labour_corrections, mechaniker_effizienz, fingerprint):
+        self.model = model
+        self.encoders = encoders or {}
+        self.metadata = metadata or {}
+        self.labour_corrections = labour_corrections or {}
+        self.mechaniker_effizienz = mechaniker_effizienz or {}
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        # Klasse → Code je Encoder (entspricht LabelEncoder.transform)
+        self._encoder_maps: Dict[str, Dict[Any, int]] = {}
+
+    @property
+    def model_features(self) -> List[str]:
+        """Feature-Namen in der Reihenfolge, die das Modell erwartet."""
+        if hasattr(self.model, 'feature_names_in_'):
+            return list(self.model.feature_names_in_)
+        return list(self.metadata.get('feature_names') or [])
+
+    @property
+    def version(self) -> str:
+        return self.metadata.get('version') or os.path.basename(self.fingerprint[0] or 'unknown')
+
+    def encoder_map(self, name: str) -> Dict[Any, int]:
+        mapping = self._encoder_maps.get(name)
+        if mapping is None:
+            encoder = self.encoders.get(name)
+            classes = getattr(encoder, 'classes_', None)
+            mapping = {cls: idx for idx, cls in enumerate(classes)} if classes is not None else {}
+            self._encoder_maps[name] = mapping
+        return mapping
+
+    def encode(self, name: str, values: Iterable[Any], default: int = 0) -> np.ndarray:
+        """
+        Vektorisiertes Label-Encoding.
+        Unbekannte Werte (und fehlender Encoder) → default, wie bisher im try/except.
+        """
+        mapping = self.encoder_map(name)
+        get = mapping.get
+        return np.fromiter((get(v, default) for v in values), dtype=np.int64)
+
+
+_lock = threading.Lock()
+_bundle: Optional[ModelBundle] = None
+_last_check = 0.0
+
+
+def _encoders_path() -> Optional[str]:
+    for path in ENCODERS_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _file_sig(path: Optional[str]):
+    if not path:
+        return None
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _fingerprint():
+    """Symlink-Ziel + mtimes aller Dateien → Änderung löst Reload aus."""
+    encoders_path = _encoders_path()
+    return (
+        os.path.realpath(MODEL_PATH) if os.path.exists(MODEL_PATH) else None,
+        _file_sig(MODEL_PATH),
+        encoders_path,
+        _file_sig(encoders_path),
+        _file_sig(METADATA_PATH),
+        _file_sig(LABOUR_CORRECTIONS_PATH),
+        _file_sig(EFFIZIENZ_PATH),
+    )
+
+
+def _load_pickle(path: Optional[str]):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _load_json(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _load_effizienz() -> Dict[int, float]:
+    """Vorberechnete Effizienz laden; Fallback (einmal pro Modell-Load): aus CSV berechnen."""
+    data = _load_json(EFFIZIENZ_PATH)
+    if data:
+        return {int(k): float(v) for k, v in data.get('mechaniker', {}).items()}
+    if os.path.exists(TRAINING_DATA_PATH):
+        logger.info(f"ML-Registry: {EFFIZIENZ_PATH} fehlt - berechne Effizienz einmalig aus CSV")
+        return compute_mechaniker_effizienz(TRAINING_DATA_PATH)
+    return {}
+
+
+def _load_bundle(fingerprint) -> Optional[ModelBundle]:
+    if not fingerprint[0]:
+        logger.warning(f"ML-Registry: Modell nicht gefunden: {MODEL_PATH}")
+        return None
+    model = _load_pickle(MODEL_PATH)
+    bundle = ModelBundle(
+        model=model,
+        encoders=_load_pickle(fingerprint[2]),
+        metadata=_load_pickle(METADATA_PATH),
+        labour_corrections=_load_json(LABOUR_CORRECTIONS_PATH),
+        mechaniker_effizienz=_load_effizienz(),
+        fingerprint=fingerprint,
+    )
+    logger.info(f"ML-Registry: Modell geladen ({fingerprint[0]}, {len(bundle.model_features)} Features)")
+    return bundle
+
+
+def get_model_bundle(force_reload: bool = False) -> Optional[ModelBundle]:
+    """
+    Aktuelles ModelBundle (oder None, falls kein Modell vorhanden).
+    Thread-safe; Datei-Check höchstens alle RELOAD_CHECK_INTERVAL Sekunden.
+    """
+    global _bundle, _last_check
+
+    now = time.monotonic()
+    if not force_reload and _bundle is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return _bundle
+
+    with _lock:
+        if not force_reload and _bundle is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+            return _bundle
+        _last_check = now
+        fingerprint = _fingerprint()
+        if force_reload or _bundle is None or _bundle.fingerprint != fingerprint:
+            try:
+                _bundle = _load_bundle(fingerprint)
+            except Exception as e:
+                # Altes Bundle behalten (z. B. Retrain schreibt gerade)
+                logger.error(f"ML-Registry: Laden fehlgeschlagen: {e}")
+                _last_check = 0.0 if _bundle is None else now
+        return _bundle
+
+
+def predict_minutes(bundle: ModelBundle, features) -> np.ndarray:
+    """Ein predict()-Aufruf für alle Zeilen; leere Eingabe → leeres Array."""
+    if len(features) == 0:
+        return np.empty(0)
+    return np.asarray(bundle.model.predict(features), dtype=float)
+
+
+def labour_correction(bundle: ModelBundle, labour_op: str, labour_t: str):
+    """
+    DRIVE V5.1 Correction-Faktor.
+    Hierarchie: 1) Op+Type, 2) Op, 3) Type, 4) 1.0
+
+    Returns:
+        (factor, source)
+    """
+    corrections = bundle.labour_corrections
+    if corrections:
+        # 1. Exakter Match: Op + Type
+        by_op_type = corrections.get('by_operation_and_type', {})
+        if labour_op and labour_t in by_op_type.get(labour_op, {}):
+            return by_op_type[labour_op][labour_t]['factor'], f'{labour_op}+{labour_t}'
+        # 2. Fallback: Operation aggregiert
+        if labour_op in corrections.get('by_operation', {}):
+            return corrections['by_operation'][labour_op], labour_op
+        # 3. Fallback: Type global (G=1.24, W=0.94, I=1.08)
+        if labour_t in corrections.get('by_type', {}):
+            return corrections['by_type'][labour_t], f'type:{labour_t}'
+    return 1.0, 'default'
+
+
+def compute_mechaniker_effizienz(data_path: str = TRAINING_DATA_PATH) -> Dict[int, float]:
+    """Effizienz = SOLL/IST * 100 je Mechaniker (höher = schneller als Vorgabe)."""
+    import pandas as pd
+
+    df = pd.read_csv(data_path, usecols=['mechaniker_nr', 'ist_dauer_min', 'soll_dauer_min'])
+    eff = df.groupby('mechaniker_nr')[['ist_dauer_min', 'soll_dauer_min']].mean()
+    werte = (eff['soll_dauer_min'] / eff['ist_dauer_min']) * 100
+    return {int(nr): round(float(wert), 1) for nr, wert in werte.items() if np.isfinite(wert)}
+
+
+def export_mechaniker_effizienz(data_path: str = TRAINING_DATA_PATH, target_path: str = EFFIZIENZ_PATH) -> int:
+    """
+    Mechaniker-Effizienz vorberechnen (nach dem Retrain, siehe celery_app.tasks.ml_retrain).
+    Schreibt atomar (tmp + rename), damit Leser nie eine halbe Datei sehen.
+
+    Returns:
+        Anzahl Mechaniker
+    """
+    effizienz = compute_mechaniker_effizienz(data_path)
+    payload = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source': data_path,
+        'mechaniker': {str(k): v for k, v in sorted(effizienz.items())},
+    }
+    tmp_path = f"{target_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, target_path)
+    return len(effizienz)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    anzahl = export_mechaniker_effizienz()
+    print(f"Mechaniker-Effizienz exportiert: {anzahl} Mechaniker → {EFFIZIENZ_PATH}")
@@ -15,58 +15,35 @@ Endpunkte:
 
 from flask import Blueprint, jsonify, request
 from flask_login import login_required
-import pickle
 import os
 import numpy as np
 import pandas as pd
 from datetime import datetime
 
-ml_prediction_api = Blueprint('ml_prediction_api', __name__, url_prefix='/api/ml')
+# Modell-Pfade (TAG 220: geladen wird über api.ml_model_registry)
+from api.ml_model_registry import MODEL_PATH, get_model_bundle, predict_minutes
 
-# Modell-Pfade
-MODEL_DIR = "/opt/greiner-portal/data/ml/models"
-MODEL_PATH = f"{MODEL_DIR}/auftragsdauer_model.pkl"
-ENCODERS_PATH = f"{MODEL_DIR}/label_encoders_v2_tag119.pkl"
-METADATA_PATH = f"{MODEL_DIR}/model_metadata_v2_tag119.pkl"
+ml_prediction_api = Blueprint('ml_prediction_api', __name__, url_prefix='/api/ml')
 
-# Globale Variablen für geladenes Modell
-_model = None
-_encoders = None
-_metadata = None
+# Fallback: Standard-Feature-Liste (falls Metadaten fehlen)
+DEFAULT_FEATURE_NAMES = [
+    'vorgabe_aw', 'betrieb', 'wochentag', 'monat', 'start_stunde',
+    'kalenderwoche', 'urgency', 'anzahl_positionen', 'anzahl_teile',
+    'charge_type', 'power_kw', 'cubic_capacity', 'km_stand',
+    'fahrzeug_alter_jahre', 'productivity_factor', 'years_experience',
+    'meister', 'marke_encoded', 'auftragstyp_encoded', 'labour_type_encoded'
+]
 
 
 def load_model():
-    """Lädt das Modell lazy beim ersten Request"""
-    global _model, _encoders, _metadata
-
-    if _model is not None:
-        return _model, _encoders, _metadata
-
-    try:
-        # Modell laden
-        if os.path.exists(MODEL_PATH):
-            with open(MODEL_PATH, 'rb') as f:
-                _model = pickle.load(f)
-            print(f"ML-Modell geladen: {MODEL_PATH}")
-        else:
-            print(f"WARNUNG: Modell nicht gefunden: {MODEL_PATH}")
-            return None, None, None
-
-        # Encoders laden
-        if os.path.exists(ENCODERS_PATH):
-            with open(ENCODERS_PATH, 'rb') as f:
-                _encoders = pickle.load(f)
-
-        # Metadata laden
-        if os.path.exists(METADATA_PATH):
-            with open(METADATA_PATH, 'rb') as f:
-                _metadata = pickle.load(f)
-
-        return _model, _encoders, _metadata
-
-    except Exception as e:
-        print(f"Fehler beim Laden des ML-Modells: {e}")
+    """
+    Liefert (model, encoders, metadata) aus der Modell-Registry.
+    TAG 220: einmal pro Prozess geladen, Hot-Reload bei neuem Symlink-Ziel.
+    """
+    bundle = get_model_bundle()
+    if bundle is None:
         return None, None, None
+    return bundle.model, bundle.encoders, bundle.metadata
 
 
 def prepare_features(data, encoders=None):
@@ -139,6 +116,27 @@ def get_feature_vector(features, feature_names):
     return np.array(vector).reshape(1, -1)
 
 
+def build_feature_matrix(auftraege, feature_names, bundle):
+    """
+    Feature-Matrix (n × Features) für Batch-Vorhersagen.
+    Kategorische Spalten werden spaltenweise encodiert (Dict-Lookup statt
+    LabelEncoder.transform pro Auftrag).
+    """
+    rows = [prepare_features(auftrag) for auftrag in auftraege]
+    frame = pd.DataFrame(rows)
+
+    for cat_col in ['marke', 'auftragstyp', 'labour_type']:
+        if cat_col in bundle.encoders:
+            frame[f'{cat_col}_encoded'] = bundle.encode(cat_col, frame[cat_col].astype(str))
+        else:
+            frame[f'{cat_col}_encoded'] = 0
+
+    for name in feature_names:
+        if name not in frame.columns:
+            frame[name] = 0
+    return frame[feature_names].to_numpy()
+
+
 @ml_prediction_api.route('/predict/auftragsdauer', methods=['GET', 'POST'])
 def predict_auftragsdauer():
     """
@@ -203,14 +201,7 @@ def predict_auftragsdauer():
         if metadata and 'feature_names' in metadata:
             feature_names = metadata['feature_names']
         else:
-            # Fallback: Standard-Feature-Liste
-            feature_names = [
-                'vorgabe_aw', 'betrieb', 'wochentag', 'monat', 'start_stunde',
-                'kalenderwoche', 'urgency', 'anzahl_positionen', 'anzahl_teile',
-                'charge_type', 'power_kw', 'cubic_capacity', 'km_stand',
-                'fahrzeug_alter_jahre', 'productivity_factor', 'years_experience',
-                'meister', 'marke_encoded', 'auftragstyp_encoded', 'labour_type_encoded'
-            ]
+            feature_names = DEFAULT_FEATURE_NAMES
 
         X = get_feature_vector(features, feature_names)
 
@@ -266,9 +257,9 @@ def predict_batch():
         ]
     }
     """
-    model, encoders, metadata = load_model()
+    bundle = get_model_bundle()
 
-    if model is None:
+    if bundle is None:
         return jsonify({
             'success': False,
             'error': 'ML-Modell nicht verfügbar'
@@ -285,29 +276,23 @@ def predict_batch():
             }), 400
 
         # Feature-Namen
-        if metadata and 'feature_names' in metadata:
-            feature_names = metadata['feature_names']
+        if 'feature_names' in bundle.metadata:
+            feature_names = bundle.metadata['feature_names']
         else:
-            feature_names = [
-                'vorgabe_aw', 'betrieb', 'wochentag', 'monat', 'start_stunde',
-                'kalenderwoche', 'urgency', 'anzahl_positionen', 'anzahl_teile',
-                'charge_type', 'power_kw', 'cubic_capacity', 'km_stand',
-                'fahrzeug_alter_jahre', 'productivity_factor', 'years_experience',
-                'meister', 'marke_encoded', 'auftragstyp_encoded', 'labour_type_encoded'
-            ]
-
-        predictions = []
-        for i, auftrag in enumerate(auftraege):
-            features = prepare_features(auftrag, encoders)
-            X = get_feature_vector(features, feature_names)
-            pred = model.predict(X)[0]
-            pred = max(5, min(600, pred))
-
-            predictions.append({
+            feature_names = DEFAULT_FEATURE_NAMES
+
+        # TAG 220: eine Feature-Matrix für alle Aufträge, ein predict()-Aufruf
+        X = build_feature_matrix(auftraege, feature_names, bundle)
+        preds = np.clip(predict_minutes(bundle, X), 5, 600)
+
+        predictions = [
+            {
                 'index': i,
-                'ist_dauer_min': round(pred, 0),
+                'ist_dauer_min': round(float(pred), 0),
                 'vorgabe_aw': auftrag.get('vorgabe_aw', 0)
-            })
+            }
+            for i, (auftrag, pred) in enumerate(zip(auftraege, preds))
+        ]
 
         return jsonify({
             'success': True,
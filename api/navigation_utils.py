@@ -1,12 +1,234 @@
 """
 Navigation Utilities - TAG 190
 Zentrale Funktionen für DB-basierte Navigation
+
+TAG 220: Cache über Requests hinweg
+- navigation_items werden pro Prozess einmal geladen (inkl. geerbter requires_feature)
+- fertige Menübäume pro Fingerprint (Portal-Rolle, Feature-Menge) vorberechnet
+- Versionszähler in Redis (NAV_VERSION_KEY): invalidate_navigation_cache() nach Änderungen
+  über die Admin-API → alle Worker laden beim nächsten Check neu
+- NAVIGATION_CACHE_TTL als Obergrenze für Änderungen direkt per SQL-Migration
 """
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
 from flask_login import current_user
 from flask import has_request_context, g
 from api.db_connection import get_db
 from api.db_utils import rows_to_list
 
+logger = logging.getLogger(__name__)
+
+# TAG 220: Navigation-Cache
+NAV_CACHE_TTL = int(os.environ.get('NAVIGATION_CACHE_TTL', '300'))  # Sekunden, 0 = aus
+NAV_VERSION_KEY = 'nav:version'
+NAV_VERSION_CHECK_INTERVAL = 5   # Redis-Version höchstens alle N Sekunden prüfen
+NAV_MAX_TREES = 256              # vorberechnete Bäume pro Prozess
+
+_nav_lock = threading.Lock()
+_nav_state = {
+    'items': None,          # aktive navigation_items (unverändert aus DB)
+    'effective': None,      # id → effektives requires_feature (eigenes oder geerbt)
+    'version': None,        # Redis-Version beim Laden
+    'loaded_at': 0.0,
+    'checked_at': 0.0,
+    'trees': {},            # Fingerprint → Menübaum
+}
+
+
+def _redis_version() -> Optional[str]:
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        return client.get(NAV_VERSION_KEY) or '0'
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+
+
+def invalidate_navigation_cache():
+    """Nach Änderungen an navigation_items aufrufen (Admin-API, Migrations-Skripte)."""
+    with _nav_lock:
+        _nav_state['items'] = None
+        _nav_state['trees'] = {}
+
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.incr(NAV_VERSION_KEY)
+    except Exception as e:
+        _mark_redis_down(e)
+
+
+def _load_navigation_items() -> Tuple[List[dict], Dict[int, Optional[str]]]:
+    """Aktive Items + effektives requires_feature aus der DB."""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # Alle aktiven Items laden
+    cursor.execute('''
+        SELECT 
+            id,
+            parent_id,
+            label,
+            url,
+            icon,
+            order_index,
+            requires_feature,
+            role_restriction,
+            is_dropdown,
+            is_header,
+            is_divider,
+            active,
+            category
+        FROM navigation_items
+        WHERE active = true
+        ORDER BY order_index, label
+    ''')
+    
+    all_items = rows_to_list(cursor.fetchall())
+    conn.close()
+    
+    # Effektives requires_feature: Einträge ohne eigenes Feature erben vom Eltern-Menü
+    # (damit alle Menüs rechtsbeschränkt sind; z.B. Werkstatt-Kinder nur bei Berechtigung)
+    effective_feature_by_id = {}
+    for item in all_items:
+        effective_feature_by_id[item['id']] = (item.get('requires_feature') or '').strip() or None
+    changed = True
+    while changed:
+        changed = False
+        for item in all_items:
+            if effective_feature_by_id.get(item['id']):
+                continue
+            pid = item.get('parent_id')
+            if pid and pid in effective_feature_by_id and effective_feature_by_id.get(pid):
+                effective_feature_by_id[item['id']] = effective_feature_by_id[pid]
+                changed = True
+    
+    return all_items, effective_feature_by_id
+
+
+def _navigation_source() -> Tuple[List[dict], Dict[int, Optional[str]]]:
+    """Items aus dem Prozess-Cache; neu laden bei TTL-Ablauf oder neuer Redis-Version."""
+    now = time.monotonic()
+    with _nav_lock:
+        items, effective = _nav_state['items'], _nav_state['effective']
+        fresh = items is not None and NAV_CACHE_TTL > 0 and now - _nav_state['loaded_at'] < NAV_CACHE_TTL
+        if fresh and now - _nav_state['checked_at'] < NAV_VERSION_CHECK_INTERVAL:
+            return items, effective
+        cached_version = _nav_state['version']
+
+    version = _redis_version()
+    if fresh and version == cached_version:
+        with _nav_lock:
+            _nav_state['checked_at'] = now
+        return items, effective
+
+    all_items, effective = _load_navigation_items()
+    logger.debug(f"Navigation neu geladen: {len(all_items)} Items (Version {version})")
+    with _nav_lock:
+        _nav_state.update(items=all_items, effective=effective, version=version,
+                          loaded_at=now, checked_at=now, trees={})
+    return all_items, effective
+
+
+def _build_tree(all_items: List[dict], effective_feature_by_id: Dict[int, Optional[str]],
+                role: str, features: FrozenSet[str], bypass_features: bool,
+                bypass_roles: bool) -> List[dict]:
+    """
+    Gefilterter Menübaum für Rolle + Feature-Menge.
+    Arbeitet auf Kopien – die gecachten Items bleiben unverändert.
+    """
+    # Filter: Nur Items auf die User Zugriff hat (Python-Filterung)
+    filtered_items = []
+    for item in all_items:
+        # Prüfe Feature-Zugriff (effektiv: eigenes oder geerbtes Feature)
+        eff = effective_feature_by_id.get(item['id'])
+        if eff and not bypass_features and eff not in features:
+            continue
+        
+        # Prüfe Rollen-Restriktion (einzelne Rolle oder kommasep. Liste)
+        if item.get('role_restriction'):
+            allowed_roles = [r.strip() for r in str(item['role_restriction']).split(',') if r.strip()]
+            if role not in allowed_roles and not bypass_roles:
+                continue
+        
+        filtered_items.append(item)
+    
+    # Eltern von sichtbaren Items nachziehen (damit z.B. "Werkstatt" erscheint,
+    # wenn User nur Feature "fahrzeuganlage" hat, nicht "aftersales")
+    all_items_by_id = {item['id']: item for item in all_items}
+    filtered_ids = {item['id'] for item in filtered_items}
+    while True:
+        to_add = []
+        for item in filtered_items:
+            pid = item.get('parent_id')
+            if pid and pid not in filtered_ids and pid in all_items_by_id:
+                to_add.append(all_items_by_id[pid])
+                filtered_ids.add(pid)
+        if not to_add:
+            break
+        filtered_items.extend(to_add)
+    
+    # Struktur als Baum aufbauen (auf Kopien)
+    filtered_items = [dict(item) for item in filtered_items]
+    items_by_id = {item['id']: item for item in filtered_items}
+    root_items = []
+    
+    for item in filtered_items:
+        if item['parent_id']:
+            parent = items_by_id.get(item['parent_id'])
+            if parent:
+                if 'children' not in parent:
+                    parent['children'] = []
+                parent['children'].append(item)
+        else:
+            root_items.append(item)
+    
+    # Rekursiv: Dropdowns ohne sichtbare Kinder ausblenden (auf allen Ebenen)
+    def remove_empty_dropdowns(items):
+        result = []
+        for item in list(items):
+            if item.get('is_dropdown') and item.get('children'):
+                item['children'] = remove_empty_dropdowns(item['children'])
+            if item.get('is_dropdown') and len(item.get('children', [])) == 0:
+                continue  # Leeres Dropdown weglassen
+            result.append(item)
+        return result
+    
+    return remove_empty_dropdowns(root_items)
+
+
+def _cached_tree(role: str, features: FrozenSet[str], bypass_features: bool,
+                 bypass_roles: bool) -> List[dict]:
+    """Menübaum pro Fingerprint einmal berechnen, danach aus dem Prozess-Cache."""
+    all_items, effective = _navigation_source()
+    fingerprint = (role, features, bypass_features, bypass_roles)
+    with _nav_lock:
+        tree = _nav_state['trees'].get(fingerprint)
+        source_unchanged = _nav_state['items'] is all_items
+    if tree is not None:
+        return tree
+
+    tree = _build_tree(all_items, effective, role, features, bypass_features, bypass_roles)
+    with _nav_lock:
+        # Nur ablegen, wenn zwischenzeitlich nicht neu geladen wurde
+        if source_unchanged and _nav_state['items'] is all_items:
+            if len(_nav_state['trees']) >= NAV_MAX_TREES:
+                _nav_state['trees'] = {}
+            _nav_state['trees'][fingerprint] = tree
+    return tree
+
 
 def get_navigation_for_user():
     """
@@ -15,6 +237,7 @@ def get_navigation_for_user():
     
     TAG 192: ROLLBACK - Zurück zur Python-Filterung (SQL-Filterung verursachte Performance-Probleme)
     TAG 192: CACHING - Per-Request-Cache in Flask g (verhindert mehrfaches Laden)
+    TAG 220: Baum aus dem Prozess-Cache pro (Portal-Rolle, Feature-Menge) - Ergebnis nicht verändern
     """
     # TAG 192: Per-Request-Cache (verhindert mehrfaches Laden pro Request)
     if has_request_context():
@@ -22,114 +245,12 @@ def get_navigation_for_user():
             return g.navigation_items
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Alle aktiven Items laden
-        cursor.execute('''
-            SELECT 
-                id,
-                parent_id,
-                label,
-                url,
-                icon,
-                order_index,
-                requires_feature,
-                role_restriction,
-                is_dropdown,
-                is_header,
-                is_divider,
-                active,
-                category
-            FROM navigation_items
-            WHERE active = true
-            ORDER BY order_index, label
-        ''')
-        
-        all_items = rows_to_list(cursor.fetchall())
-        conn.close()
-        
-        # Effektives requires_feature: Einträge ohne eigenes Feature erben vom Eltern-Menü
-        # (damit alle Menüs rechtsbeschränkt sind; z.B. Werkstatt-Kinder nur bei Berechtigung)
-        all_items_by_id = {item['id']: item for item in all_items}
-        effective_feature_by_id = {}
-        for item in all_items:
-            effective_feature_by_id[item['id']] = (item.get('requires_feature') or '').strip() or None
-        changed = True
-        while changed:
-            changed = False
-            for item in all_items:
-                if effective_feature_by_id.get(item['id']):
-                    continue
-                pid = item.get('parent_id')
-                if pid and pid in effective_feature_by_id and effective_feature_by_id.get(pid):
-                    effective_feature_by_id[item['id']] = effective_feature_by_id[pid]
-                    changed = True
-        
-        # Filter: Nur Items auf die User Zugriff hat (Python-Filterung)
-        filtered_items = []
         user_role = getattr(current_user, 'portal_role', 'mitarbeiter') if hasattr(current_user, 'portal_role') else 'mitarbeiter'
+        features = frozenset(getattr(current_user, 'allowed_features', None) or ())
         
-        for item in all_items:
-            # Prüfe Feature-Zugriff (effektiv: eigenes oder geerbtes Feature)
-            eff = effective_feature_by_id.get(item['id'])
-            if eff:
-                if not (hasattr(current_user, 'can_access_feature') and 
-                        current_user.can_access_feature(eff)):
-                    continue
-            
-            # Prüfe Rollen-Restriktion (einzelne Rolle oder kommasep. Liste)
-            if item.get('role_restriction'):
-                allowed_roles = [r.strip() for r in str(item['role_restriction']).split(',') if r.strip()]
-                if user_role not in allowed_roles:
-                    # Admin sieht alles
-                    if not (hasattr(current_user, 'can_access_feature') and 
-                            current_user.can_access_feature('admin')):
-                        continue
-            
-            filtered_items.append(item)
-        
-        # Eltern von sichtbaren Items nachziehen (damit z.B. "Werkstatt" erscheint,
-        # wenn User nur Feature "fahrzeuganlage" hat, nicht "aftersales")
-        all_items_by_id = {item['id']: item for item in all_items}
-        filtered_ids = {item['id'] for item in filtered_items}
-        while True:
-            to_add = []
-            for item in filtered_items:
-                pid = item.get('parent_id')
-                if pid and pid not in filtered_ids and pid in all_items_by_id:
-                    to_add.append(all_items_by_id[pid])
-                    filtered_ids.add(pid)
-            if not to_add:
-                break
-            filtered_items.extend(to_add)
-        
-        # Struktur als Baum aufbauen
-        items_by_id = {item['id']: item for item in filtered_items}
-        root_items = []
-        
-        for item in filtered_items:
-            if item['parent_id']:
-                parent = items_by_id.get(item['parent_id'])
-                if parent:
-                    if 'children' not in parent:
-                        parent['children'] = []
-                    parent['children'].append(item)
-            else:
-                root_items.append(item)
-        
-        # Rekursiv: Dropdowns ohne sichtbare Kinder ausblenden (auf allen Ebenen)
-        def remove_empty_dropdowns(items):
-            result = []
-            for item in list(items):
-                if item.get('is_dropdown') and item.get('children'):
-                    item['children'] = remove_empty_dropdowns(item['children'])
-                if item.get('is_dropdown') and len(item.get('children', [])) == 0:
-                    continue  # Leeres Dropdown weglassen
-                result.append(item)
-            return result
-        
-        root_items = remove_empty_dropdowns(root_items)
+        # Admin sieht alle Rollen-Restriktionen, Features nur laut allowed_features
+        root_items = _cached_tree(user_role, features, bypass_features=False,
+                                  bypass_roles='admin' in features)
         
         # TAG 192: In Flask g speichern (Per-Request-Cache)
         if has_request_context():
@@ -152,82 +273,10 @@ def get_navigation_for_role(role: str, allowed_features: set):
     if allowed_features is None:
         allowed_features = set()
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, parent_id, label, url, icon, order_index,
-                   requires_feature, role_restriction, is_dropdown, is_header, is_divider, active, category
-            FROM navigation_items
-            WHERE active = true
-            ORDER BY order_index, label
-        ''')
-        all_items = rows_to_list(cursor.fetchall())
-        conn.close()
-
-        all_items_by_id = {item['id']: item for item in all_items}
-        effective_feature_by_id = {}
-        for item in all_items:
-            effective_feature_by_id[item['id']] = (item.get('requires_feature') or '').strip() or None
-        changed = True
-        while changed:
-            changed = False
-            for item in all_items:
-                if effective_feature_by_id.get(item['id']):
-                    continue
-                pid = item.get('parent_id')
-                if pid and pid in effective_feature_by_id and effective_feature_by_id.get(pid):
-                    effective_feature_by_id[item['id']] = effective_feature_by_id[pid]
-                    changed = True
-
-        filtered_items = []
         is_admin = role == 'admin'
-        for item in all_items:
-            eff = effective_feature_by_id.get(item['id'])
-            if eff:
-                if not is_admin and eff not in allowed_features:
-                    continue
-            if item.get('role_restriction'):
-                allowed_roles = [r.strip() for r in str(item['role_restriction']).split(',') if r.strip()]
-                if role not in allowed_roles and not is_admin:
-                    continue
-            filtered_items.append(item)
-
-        filtered_ids = {item['id'] for item in filtered_items}
-        while True:
-            to_add = []
-            for item in filtered_items:
-                pid = item.get('parent_id')
-                if pid and pid not in filtered_ids and pid in all_items_by_id:
-                    to_add.append(all_items_by_id[pid])
-                    filtered_ids.add(pid)
-            if not to_add:
-                break
-            filtered_items.extend(to_add)
-
-        items_by_id = {item['id']: item for item in filtered_items}
-        root_items = []
-        for item in filtered_items:
-            if item['parent_id']:
-                parent = items_by_id.get(item['parent_id'])
-                if parent:
-                    if 'children' not in parent:
-                        parent['children'] = []
-                    parent['children'].append(item)
-            else:
-                root_items.append(item)
-
-        def remove_empty_dropdowns(items):
-            result = []
-            for item in list(items):
-                if item.get('is_dropdown') and item.get('children'):
-                    item['children'] = remove_empty_dropdowns(item['children'])
-                if item.get('is_dropdown') and len(item.get('children', [])) == 0:
-                    continue
-                result.append(item)
-            return result
-
-        root_items = remove_empty_dropdowns(root_items)
-        return root_items
+        # Kopie: Aufrufer (Admin-API) darf das Ergebnis verändern
+        return copy.deepcopy(_cached_tree(role, frozenset(allowed_features),
+                                          bypass_features=is_admin, bypass_roles=is_admin))
     except Exception as e:
         import traceback
         print(f"⚠️ get_navigation_for_role: {e}")
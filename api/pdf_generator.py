@@ -12,9 +12,43 @@ from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from io import BytesIO
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, date
+from functools import wraps
 import re
 
+# TAG 220: Drill-Down-Abfragen (Absatzwege, Konten, Details, Clean Park) pro Versandlauf
+# nur einmal ausführen – alle TEK-PDFs eines Laufs teilen sich die Ergebnisse
+_tek_lookup_cache: ContextVar = ContextVar('tek_lookup_cache', default=None)
+
+
+@contextmanager
+def shared_tek_lookups():
+    """
+    Innerhalb des Blocks werden die get_tek_*_direct-Abfragen je Argumentkombination
+    nur einmal ausgeführt (z. B. Gesamt-, Bereichs- und Verkauf-PDF desselben Standorts).
+    Die Ergebnisse werden von den Renderern nur gelesen.
+    """
+    token = _tek_lookup_cache.set({})
+    try:
+        yield
+    finally:
+        _tek_lookup_cache.reset(token)
+
+
+def _shared_per_run(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _tek_lookup_cache.get()
+        if cache is None:
+            return func(*args, **kwargs)
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = func(*args, **kwargs)
+        return cache[key]
+    return wrapper
+
 
 def format_currency(value):
     """Formatiert als Euro"""
@@ -529,6 +563,7 @@ def format_currency_short(value):
         return "0 €"
 
 
+@_shared_per_run
 def get_tek_cleanpark_direct(firma, standort, von_heute, bis_heute, von_monat, bis_monat):
     """Holt Clean-Park-Erlöse (847301) und -Aufwand (747301) für TEK-KST-Zeile. Returns dict mit heute_umsatz, heute_einsatz, monat_umsatz, monat_einsatz."""
     from api.db_connection import get_db, convert_placeholders
@@ -568,6 +603,7 @@ def get_tek_cleanpark_direct(firma, standort, von_heute, bis_heute, von_monat, b
         return {'heute_umsatz': 0, 'heute_einsatz': 0, 'monat_umsatz': 0, 'monat_einsatz': 0}
 
 
+@_shared_per_run
 def get_tek_absatzwege_direct(bereich, firma, standort, monat, jahr, heute_datum=None):
     """Holt Absatzwege-Daten direkt aus DRIVE DB (drive_portal) - Single Source of Truth (nur für NW/GW). Modul-Level für Wiederverwendung in TEK Verkauf-PDF."""
     from api.db_connection import get_db, convert_placeholders
@@ -842,6 +878,7 @@ def get_tek_absatzwege_direct(bereich, firma, standort, monat, jahr, heute_datum
     return {'absatzwege': []}
 
 
+@_shared_per_run
 def get_tek_detail_data_direct(bereich, firma, standort, monat, jahr, heute_datum=None):
     """Holt detaillierte TEK-Daten (umsatz_gruppen + einsatz_gruppen) aus DRIVE DB. Modul-Level für Wiederverwendung in TEK Service-PDF."""
     from api.db_connection import get_db, convert_placeholders
@@ -922,6 +959,7 @@ def get_tek_detail_data_direct(bereich, firma, standort, monat, jahr, heute_datu
     return empty
 
 
+@_shared_per_run
 def get_tek_bereich_konten_direct(bereich, firma, standort, monat, jahr, heute_datum=None):
     """Holt Konten-Details für 3-Teile und 4-Lohn (wie Absatzwege für NW/GW): pro Konto Umsatz/Einsatz Heute+Monat, gepaart 83+73 bzw. 84+74."""
     from api.db_connection import get_db, convert_placeholders
@@ -2288,39 +2326,22 @@ def generate_tek_verkauf_pdf(data: dict, standort_name: str = None) -> bytes:
         jahr_num = jahr_num or heute.year
 
     def get_absatzwege_drill_down(bereich, firma, standort, monat, jahr):
-        """Holt Absatzwege-Daten via API /api/tek/detail"""
-        import requests
+        """Absatzwege via tek_detail_daten (Logik von /api/tek/detail, TAG 220: ohne HTTP-Selbstaufruf)"""
         try:
-            params = {
-                'bereich': bereich,
-                'firma': firma,
-                'standort': standort,
-                'monat': monat,
-                'jahr': jahr,
-                'ebene': 'gruppen'
-            }
-            response = requests.get('http://127.0.0.1:5000/api/tek/detail', params=params, timeout=30)
-            if response.status_code == 200:
-                return response.json().get('absatzwege', [])
+            from routes.controlling_routes import tek_detail_daten
+            # str/int wie beim Query-String - Filter vergleichen mit '1'/'2', Cache-Key wie beim Endpoint
+            return tek_detail_daten(bereich=bereich, firma=str(firma), standort=str(standort),
+                                    monat=int(monat), jahr=int(jahr), ebene='gruppen').get('absatzwege', [])
         except Exception as e:
             print(f"⚠️  Fehler beim Abrufen von Absatzwegen: {e}")
         return []
 
     def get_modelle_drill_down(bereich, firma, standort, monat, jahr):
-        """Holt Modell-Daten via API /api/tek/modelle"""
-        import requests
+        """Modelle via tek_modelle_daten (Logik von /api/tek/modelle, TAG 220: ohne HTTP-Selbstaufruf)"""
         try:
-            params = {
-                'bereich': bereich,
-                'firma': firma,
-                'standort': standort,
-                'monat': monat,
-                'jahr': jahr,
-                'gruppierung': 'modell'
-            }
-            response = requests.get('http://127.0.0.1:5000/api/tek/modelle', params=params, timeout=30)
-            if response.status_code == 200:
-                return response.json().get('modelle', [])
+            from routes.controlling_routes import tek_modelle_daten
+            return tek_modelle_daten(bereich=bereich, firma=str(firma), standort=str(standort),
+                                     monat=int(monat), jahr=int(jahr), gruppierung='modell').get('modelle', [])
         except Exception as e:
             print(f"⚠️  Fehler beim Abrufen von Modellen: {e}")
         return []
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Marktpreis-Crawl-Engine für Penner-Teile - TAG 220
+===================================================
+Batch-Abruf der Marktpreise (eBay, Daparto) für PreisvergleichService.update_all_penner.
+
+Vorher: Teil für Teil strikt sequenziell – eBay-Request, Daparto-Request, je mit
+_rate_limit-Sleep davor, danach zwei einzelne DB-Schreibvorgänge. Die Laufzeit war
+die Summe aller Sleeps und HTTP-Latenzen (100 Teile ≈ 6-8 Minuten).
+
+Jetzt:
+- Pro Quelle ein eigener Worker-Pool (Parallelität begrenzt) und ein Token-Bucket
+  (Rate = bisheriger Mindestabstand, kleiner Burst) – die Quellen laufen gleichzeitig,
+  HTTP-Latenzen überlappen, die Höflichkeits-Rate pro Quelle bleibt eingehalten
+- Bedingte Requests: ETag/Last-Modified der letzten Antwort liegen in raw_data je
+  Quelle; bei 304 Not Modified wird das vorherige Ergebnis übernommen
+- Reihenfolge: Teile ohne gültigen Cache-Eintrag zuerst, darin nach Lagerwert absteigend.
+  Läuft das Zeitbudget ab, fehlen nur die Teile mit dem geringsten Lagerwert; der
+  nächste Lauf beginnt mit genau diesen (Rotation über die ganze Penner-Liste)
+- Ergebnisse werden fortlaufend in Batches (ein Upsert inkl. Locosoft-Stammdaten) geschrieben
+
+Threads statt asyncio: Scraping läuft über requests/BeautifulSoup, wie im restlichen Service.
+
+Verwendung:
+    from api.preisvergleich_crawler import MarktpreisCrawler
+
+    service = get_preisvergleich_service()
+    stats = MarktpreisCrawler(service, budget_sekunden=270).run(service.get_penner_teile(50, None))
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import requests
+
+from api.preisvergleich_service import (
+    RATE_LIMIT_EBAY,
+    RATE_LIMIT_DAPARTO,
+    CACHE_DURATION_HOURS,
+    USER_AGENT,
+    ebay_url,
+    daparto_url,
+    parse_ebay_html,
+    parse_daparto_html,
+    leeres_ergebnis,
+    quelle_ergebnis,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parallele Requests pro Quelle (Rate begrenzt weiterhin der Token-Bucket)
+PARALLEL_EBAY = int(os.environ.get('PREISVERGLEICH_PARALLEL_EBAY', '2'))
+PARALLEL_DAPARTO = int(os.environ.get('PREISVERGLEICH_PARALLEL_DAPARTO', '2'))
+
+# Mindestabstand zwischen Requests je Quelle (Sekunden); Standard wie bei der Einzelabfrage
+INTERVALL_EBAY = float(os.environ.get('PREISVERGLEICH_INTERVALL_EBAY', str(RATE_LIMIT_EBAY)))
+INTERVALL_DAPARTO = float(os.environ.get('PREISVERGLEICH_INTERVALL_DAPARTO', str(RATE_LIMIT_DAPARTO)))
+
+# Token-Bucket: max. Requests am Stück, bevor die Rate greift
+BURST = int(os.environ.get('PREISVERGLEICH_BURST', '2'))
+
+# Ergebnisse pro Cache-Upsert
+WRITE_BATCH_SIZE = 25
+
+# Teile, die innerhalb dieser Zeit abgefragt wurden, kommen ans Ende der Reihenfolge
+RECRAWL_NACH_STUNDEN = float(os.environ.get('PREISVERGLEICH_RECRAWL_STUNDEN', str(CACHE_DURATION_HOURS)))
+
+HTTP_TIMEOUT = 10
+
+
+# =============================================================================
+# TOKEN-BUCKET
+# =============================================================================
+
+class TokenBucket:
+    """Thread-sicherer Token-Bucket: rate Tokens/Sekunde, höchstens burst gespeichert."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Wartet auf ein Token. False, wenn es erst nach deadline (time.monotonic()) frei würde –
+        dann wird nicht gewartet.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class Quelle(NamedTuple):
+    """Konfiguration einer Marktpreis-Quelle."""
+    name: str
+    url: Callable[[str], str]
+    parse: Callable[[str], tuple]
+    intervall: float        # Mindestabstand in Sekunden (Token-Bucket-Rate = 1/intervall)
+    parallel: int
+
+
+QUELLEN = (
+    Quelle('ebay', ebay_url, parse_ebay_html, INTERVALL_EBAY, PARALLEL_EBAY),
+    Quelle('daparto', daparto_url, parse_daparto_html, INTERVALL_DAPARTO, PARALLEL_DAPARTO),
+)
+
+
+# =============================================================================
+# CRAWLER
+# =============================================================================
+
+class MarktpreisCrawler:
+    """
+    Ein Crawl-Lauf über eine Liste von Penner-Teilen (siehe Modul-Docstring).
+
+    Args:
+        service: PreisvergleichService (Empfehlung, Cache lesen/schreiben)
+        budget_sekunden: nach Ablauf keine neuen Requests; offene Teile zählen als 'offen'
+        quellen: Quellen-Konfiguration (Standard: QUELLEN)
+        session_factory: erzeugt die requests.Session je Worker-Thread
+    """
+
+    def __init__(self, service, budget_sekunden: Optional[float] = None,
+                 quellen=QUELLEN, session_factory: Optional[Callable] = None):
+        self.service = service
+        self.budget_sekunden = budget_sekunden
+        self.quellen = tuple(quellen)
+        self._session_factory = session_factory or self._neue_session
+        self._local = threading.local()
+        self._buckets = {q.name: TokenBucket(1.0 / q.intervall, BURST) for q in self.quellen}
+        self._deadline: Optional[float] = None
+        self._stats_lock = threading.Lock()
+        self._nicht_geaendert = 0
+
+    @staticmethod
+    def _neue_session() -> requests.Session:
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Language': 'de-DE,de;q=0.9,en;q=0.8',
+        })
+        return session
+
+    def _session(self) -> requests.Session:
+        # requests.Session ist nicht garantiert thread-sicher → eine pro Worker
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._session_factory()
+        return session
+
+    # =========================================================================
+    # REIHENFOLGE
+    # =========================================================================
+
+    def priorisieren(self, teile: List[Dict], stand: Dict[str, Dict]) -> List[Dict]:
+        """Fällige Teile (kein/alter Cache-Eintrag) zuerst, jeweils nach Lagerwert absteigend."""
+        alter_max = timedelta(hours=RECRAWL_NACH_STUNDEN)
+
+        def faellig(teil) -> bool:
+            abgefragt = (stand.get(teil['part_number']) or {}).get('abgefragt_am')
+            if abgefragt is None:
+                return True
+            return datetime.now(abgefragt.tzinfo) - abgefragt > alter_max
+
+        return sorted(teile, key=lambda t: (not faellig(t), -float(t.get('lagerwert') or 0)))
+
+    # =========================================================================
+    # ABRUF EINER QUELLE
+    # =========================================================================
+
+    def _abrufen(self, quelle: Quelle, teilenummer: str, vorher: Optional[Dict]) -> Optional[Dict]:
+        """Ergebnis-Dict der Quelle; None, wenn das Zeitbudget vor dem Request abgelaufen ist."""
+        if not self._buckets[quelle.name].acquire(self._deadline):
+            return None
+
+        headers = {}
+        if vorher:
+            if vorher.get('etag'):
+                headers['If-None-Match'] = vorher['etag']
+            if vorher.get('last_modified'):
+                headers['If-Modified-Since'] = vorher['last_modified']
+
+        result = leeres_ergebnis(quelle.name)
+        try:
+            response = self._session().get(quelle.url(teilenummer), headers=headers, timeout=HTTP_TIMEOUT)
+            if response.status_code == 304 and vorher:
+                with self._stats_lock:
+                    self._nicht_geaendert += 1
+                logger.debug(f"{quelle.name} {teilenummer}: 304 Not Modified")
+                return dict(vorher)
+            response.raise_for_status()
+
+            preise, angebote = quelle.parse(response.text)
+            result = quelle_ergebnis(quelle.name, preise, angebote)
+            result['etag'] = response.headers.get('ETag')
+            result['last_modified'] = response.headers.get('Last-Modified')
+            logger.debug(f"{quelle.name} {teilenummer}: {len(preise)} Angebote gefunden")
+
+        except requests.RequestException as e:
+            result['error'] = f"Request failed: {str(e)}"
+            logger.warning(f"{quelle.name} Scraping {teilenummer} fehlgeschlagen: {e}")
+        except Exception as e:
+            result['error'] = str(e)
+            logger.exception(f"{quelle.name} Scraping {teilenummer} Fehler")
+
+        return result
+
+    # =========================================================================
+    # LAUF
+    # =========================================================================
+
+    def run(self, teile: List[Dict]) -> Dict:
+        """
+        Fragt alle Teile ab und schreibt die Ergebnisse fortlaufend in penner_marktpreise.
+
+        Returns:
+            {'gesamt', 'erfolgreich', 'fehler', 'offen', 'nicht_geaendert', 'dauer_sekunden'}
+        """
+        start = time.monotonic()
+        self._deadline = start + self.budget_sekunden if self.budget_sekunden else None
+        self._nicht_geaendert = 0
+
+        stand = self.service._load_cache_batch([t['part_number'] for t in teile])
+        teile = self.priorisieren(teile, stand)
+
+        erfolgreich = 0
+        fehler = 0
+        offen = 0
+        batch = []
+
+        pools = {q.name: ThreadPoolExecutor(max_workers=q.parallel, thread_name_prefix=f"preis-{q.name}")
+                 for q in self.quellen}
+        try:
+            # Alle Aufträge in Prioritätsreihenfolge einreihen – die Pools arbeiten FIFO
+            auftraege = []
+            for teil in teile:
+                vorher = (stand.get(teil['part_number']) or {}).get('quellen', {})
+                futures = [pools[q.name].submit(self._abrufen, q, teil['part_number'], vorher.get(q.name))
+                           for q in self.quellen]
+                auftraege.append((teil, futures))
+
+            for i, (teil, futures) in enumerate(auftraege):
+                quellen = [f.result() for f in futures]
+                if any(q is None for q in quellen):
+                    offen += 1
+                    continue
+
+                try:
+                    result = self.service.build_marktpreis(
+                        teil['part_number'], quellen,
+                        ek_preis=float(teil.get('ek_preis') or 0),
+                        tage_seit_abgang=int(teil.get('tage_seit_abgang') or 0)
+                    )
+                except Exception as e:
+                    logger.warning(f"Fehler bei {teil['part_number']}: {e}")
+                    fehler += 1
+                    continue
+
+                batch.append((teil, result))
+                if result['zusammenfassung'].get('anzahl_angebote', 0) > 0:
+                    erfolgreich += 1
+                else:
+                    fehler += 1
+
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    self.service._save_batch_to_cache(batch)
+                    batch = []
+                    logger.info(f"Fortschritt: {i + 1}/{len(teile)} Teile verarbeitet")
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+            self.service._save_batch_to_cache(batch)
+
+        dauer = time.monotonic() - start
+        logger.info(f"Update abgeschlossen: {erfolgreich} erfolgreich, {fehler} ohne Angebote, "
+                    f"{offen} offen (Zeitbudget), {self._nicht_geaendert} unverändert (304), {dauer:.1f}s")
+
+        return {
+            'gesamt': len(teile),
+            'erfolgreich': erfolgreich,
+            'fehler': fehler,
+            'offen': offen,
+            'nicht_geaendert': self._nicht_geaendert,
+            'dauer_sekunden': round(dauer, 1)
+        }
@@ -9,6 +9,7 @@ Features:
 - Daparto Preisvergleich
 - 24h Cache in PostgreSQL
 - Ampel-System für Verkaufschancen
+- Batch-Update aller Penner über die Crawl-Engine (api/preisvergleich_crawler.py, TAG 220)
 
 Erstellt: TAG 142 (2025-12-29)
 """
@@ -89,6 +90,120 @@ def get_locosoft_connection():
 # =============================================================================
 # SCRAPING FUNKTIONEN
 # =============================================================================
+# URL-Bau und HTML-Parsing sind von den Requests getrennt, damit Einzelabfrage
+# (scrape_ebay/scrape_daparto) und Crawl-Engine (api/preisvergleich_crawler.py)
+# dieselbe Auswertung nutzen.
+
+PREIS_PATTERN = re.compile(r'(\d+)[,.](\d{2})')
+
+
+def _tnr_clean(teilenummer: str) -> str:
+    return teilenummer.replace(' ', '').replace('-', '')
+
+
+def ebay_url(teilenummer: str) -> str:
+    return f"https://www.ebay.de/sch/i.html?_nkw={urllib.parse.quote(_tnr_clean(teilenummer))}&_sacat=131090&LH_BIN=1"
+
+
+def daparto_url(teilenummer: str) -> str:
+    return f"https://www.daparto.de/Suche?q={urllib.parse.quote(_tnr_clean(teilenummer))}"
+
+
+def leeres_ergebnis(source: str) -> Dict:
+    """Ergebnis-Dict einer Quelle ohne Treffer."""
+    return {
+        'source': source,
+        'success': False,
+        'anzahl_angebote': 0,
+        'preis_min': None,
+        'preis_max': None,
+        'preis_avg': None,
+        'angebote': [],
+        'error': None
+    }
+
+
+def quelle_ergebnis(source: str, preise: List[float], angebote: List[Dict]) -> Dict:
+    """Ergebnis-Dict einer Quelle aus geparsten Preisen/Angeboten."""
+    result = leeres_ergebnis(source)
+    if preise:
+        result['success'] = True
+        result['anzahl_angebote'] = len(preise)
+        result['preis_min'] = min(preise)
+        result['preis_max'] = max(preise)
+        result['preis_avg'] = round(sum(preise) / len(preise), 2)
+        result['angebote'] = angebote[:10]  # Max 10 Angebote
+    return result
+
+
+def parse_ebay_html(html: str):
+    """eBay Suchergebnisse → (preise, angebote)."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    preise = []
+    angebote = []
+
+    # eBay Suchergebnisse parsen
+    for item in soup.select('.s-item'):
+        # Preis extrahieren
+        preis_elem = item.select_one('.s-item__price')
+        if not preis_elem:
+            continue
+
+        preis_text = preis_elem.get_text()
+
+        # "EUR 45,99" -> 45.99
+        match = PREIS_PATTERN.search(preis_text)
+        if match:
+            preis = float(f"{match.group(1)}.{match.group(2)}")
+
+            # Nur realistische Preise (1€ - 5000€)
+            if 1 <= preis <= 5000:
+                preise.append(preis)
+
+                # Titel und Link
+                titel_elem = item.select_one('.s-item__title')
+                link_elem = item.select_one('.s-item__link')
+
+                angebote.append({
+                    'titel': titel_elem.get_text() if titel_elem else '',
+                    'preis': preis,
+                    'url': link_elem.get('href') if link_elem else ''
+                })
+
+    return preise, angebote
+
+
+def parse_daparto_html(html: str):
+    """Daparto Produkt-Cards → (preise, angebote); Daparto liefert keine Einzelangebote."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    preise = []
+
+    # Daparto Produkt-Cards parsen
+    for item in soup.select('.product-card, .article-item, [data-price]'):
+        # Preis aus data-attribute oder Text
+        preis_attr = item.get('data-price')
+        if preis_attr:
+            try:
+                preis = float(preis_attr)
+                preise.append(preis)
+                continue
+            except ValueError:
+                pass
+
+        # Fallback: Text parsen
+        preis_elem = item.select_one('.price, .product-price')
+        if preis_elem:
+            preis_text = preis_elem.get_text()
+            match = PREIS_PATTERN.search(preis_text)
+            if match:
+                preis = float(f"{match.group(1)}.{match.group(2)}")
+                if 1 <= preis <= 5000:
+                    preise.append(preis)
+
+    return preise, []
+
 
 class PreisvergleichService:
     """
@@ -160,65 +275,14 @@ class PreisvergleichService:
         """
         self._rate_limit('ebay', RATE_LIMIT_EBAY)
 
-        result = {
-            'source': 'ebay',
-            'success': False,
-            'anzahl_angebote': 0,
-            'preis_min': None,
-            'preis_max': None,
-            'preis_avg': None,
-            'angebote': [],
-            'error': None
-        }
+        result = leeres_ergebnis('ebay')
 
         try:
-            # Teilenummer bereinigen
-            tnr_clean = teilenummer.replace(' ', '').replace('-', '')
-            url = f"https://www.ebay.de/sch/i.html?_nkw={urllib.parse.quote(tnr_clean)}&_sacat=131090&LH_BIN=1"
-
-            response = self._session.get(url, timeout=10)
+            response = self._session.get(ebay_url(teilenummer), timeout=10)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            preise = []
-            angebote = []
-
-            # eBay Suchergebnisse parsen
-            for item in soup.select('.s-item'):
-                # Preis extrahieren
-                preis_elem = item.select_one('.s-item__price')
-                if not preis_elem:
-                    continue
-
-                preis_text = preis_elem.get_text()
-
-                # "EUR 45,99" -> 45.99
-                match = re.search(r'(\d+)[,.](\d{2})', preis_text)
-                if match:
-                    preis = float(f"{match.group(1)}.{match.group(2)}")
-
-                    # Nur realistische Preise (1€ - 5000€)
-                    if 1 <= preis <= 5000:
-                        preise.append(preis)
-
-                        # Titel und Link
-                        titel_elem = item.select_one('.s-item__title')
-                        link_elem = item.select_one('.s-item__link')
-
-                        angebote.append({
-                            'titel': titel_elem.get_text() if titel_elem else '',
-                            'preis': preis,
-                            'url': link_elem.get('href') if link_elem else ''
-                        })
-
-            if preise:
-                result['success'] = True
-                result['anzahl_angebote'] = len(preise)
-                result['preis_min'] = min(preise)
-                result['preis_max'] = max(preise)
-                result['preis_avg'] = round(sum(preise) / len(preise), 2)
-                result['angebote'] = angebote[:10]  # Max 10 Angebote
+            preise, angebote = parse_ebay_html(response.text)
+            result = quelle_ergebnis('ebay', preise, angebote)
 
             logger.info(f"eBay Scraping {teilenummer}: {len(preise)} Angebote gefunden")
 
@@ -247,57 +311,14 @@ class PreisvergleichService:
         """
         self._rate_limit('daparto', RATE_LIMIT_DAPARTO)
 
-        result = {
-            'source': 'daparto',
-            'success': False,
-            'anzahl_angebote': 0,
-            'preis_min': None,
-            'preis_max': None,
-            'preis_avg': None,
-            'angebote': [],
-            'error': None
-        }
+        result = leeres_ergebnis('daparto')
 
         try:
-            tnr_clean = teilenummer.replace(' ', '').replace('-', '')
-            url = f"https://www.daparto.de/Suche?q={urllib.parse.quote(tnr_clean)}"
-
-            response = self._session.get(url, timeout=10)
+            response = self._session.get(daparto_url(teilenummer), timeout=10)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            preise = []
-            angebote = []
-
-            # Daparto Produkt-Cards parsen
-            for item in soup.select('.product-card, .article-item, [data-price]'):
-                # Preis aus data-attribute oder Text
-                preis_attr = item.get('data-price')
-                if preis_attr:
-                    try:
-                        preis = float(preis_attr)
-                        preise.append(preis)
-                        continue
-                    except ValueError:
-                        pass
-
-                # Fallback: Text parsen
-                preis_elem = item.select_one('.price, .product-price')
-                if preis_elem:
-                    preis_text = preis_elem.get_text()
-                    match = re.search(r'(\d+)[,.](\d{2})', preis_text)
-                    if match:
-                        preis = float(f"{match.group(1)}.{match.group(2)}")
-                        if 1 <= preis <= 5000:
-                            preise.append(preis)
-
-            if preise:
-                result['success'] = True
-                result['anzahl_angebote'] = len(preise)
-                result['preis_min'] = min(preise)
-                result['preis_max'] = max(preise)
-                result['preis_avg'] = round(sum(preise) / len(preise), 2)
+            preise, angebote = parse_daparto_html(response.text)
+            result = quelle_ergebnis('daparto', preise, angebote)
 
             logger.info(f"Daparto Scraping {teilenummer}: {len(preise)} Angebote gefunden")
 
@@ -365,7 +386,17 @@ class PreisvergleichService:
         daparto_result = self.scrape_daparto(teilenummer)
         quellen.append(daparto_result)
 
-        # Zusammenfassung berechnen
+        result = self.build_marktpreis(teilenummer, quellen,
+                                       ek_preis=ek_preis, tage_seit_abgang=tage_seit_abgang)
+
+        # In Cache speichern
+        self._save_to_cache(teilenummer, result)
+
+        return result
+
+    def build_marktpreis(self, teilenummer: str, quellen: List[Dict],
+                         ek_preis: float = None, tage_seit_abgang: int = None) -> Dict:
+        """Zusammenfassung + Empfehlung aus den Ergebnissen der einzelnen Quellen."""
         alle_preise = []
         erfolgreiche_quellen = 0
 
@@ -388,7 +419,7 @@ class PreisvergleichService:
             ek_preis=ek_preis, tage_seit_abgang=tage_seit_abgang
         )
 
-        result = {
+        return {
             'teilenummer': teilenummer,
             'timestamp': datetime.now().isoformat(),
             'quellen': quellen,
@@ -396,11 +427,6 @@ class PreisvergleichService:
             'empfehlung': empfehlung
         }
 
-        # In Cache speichern
-        self._save_to_cache(teilenummer, result)
-
-        return result
-
     def _generate_empfehlung(self, zusammenfassung: Dict, quellen: List,
                               ek_preis: float = None, tage_seit_abgang: int = None) -> Dict:
         """
@@ -590,12 +616,130 @@ class PreisvergleichService:
         except Exception as e:
             logger.exception(f"Cache-Speichern fehlgeschlagen: {e}")
 
+    def _load_cache_batch(self, teilenummern: List[str]) -> Dict[str, Dict]:
+        """
+        Letzter Stand mehrerer Teile in einer Query (für die Crawl-Engine).
+
+        Returns:
+            {part_number: {'abgefragt_am': datetime, 'quellen': {source: quelle_dict}}}
+        """
+        if not teilenummern:
+            return {}
+        try:
+            conn = get_drive_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute("""
+                SELECT part_number, abgefragt_am, raw_data
+                FROM penner_marktpreise
+                WHERE part_number = ANY(%s)
+            """, [list(teilenummern)])
+            rows = cur.fetchall()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Cache-Abruf (Batch) fehlgeschlagen: {e}")
+            return {}
+
+        stand = {}
+        for row in rows:
+            try:
+                quellen = json.loads(row['raw_data']) if row['raw_data'] else []
+            except ValueError:
+                quellen = []
+            stand[row['part_number']] = {
+                'abgefragt_am': row['abgefragt_am'],
+                'quellen': {q.get('source'): q for q in quellen if isinstance(q, dict)},
+            }
+        return stand
+
+    def _save_batch_to_cache(self, eintraege: List[tuple]):
+        """
+        Speichert mehrere Marktpreise inkl. Locosoft-Stammdaten in einem Statement.
+
+        Args:
+            eintraege: [(teil, result)] – teil wie aus get_penner_teile(), result wie get_marktpreis()
+        """
+        if not eintraege:
+            return
+        values = []
+        params = []
+        for teil, data in eintraege:
+            zusammenfassung = data.get('zusammenfassung', {})
+            empfehlung = data.get('empfehlung', {})
+            values.append("(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), %s, "
+                          "%s, %s, %s, %s, %s, %s)")
+            params.extend([
+                data['teilenummer'],
+                zusammenfassung.get('anzahl_quellen'),
+                zusammenfassung.get('anzahl_angebote'),
+                zusammenfassung.get('preis_min'),
+                zusammenfassung.get('preis_max'),
+                zusammenfassung.get('preis_avg'),
+                empfehlung.get('verkaufspreis'),
+                empfehlung.get('plattform'),
+                empfehlung.get('chance', 'unbekannt'),
+                empfehlung.get('lagerkosten'),
+                empfehlung.get('mindestpreis'),
+                empfehlung.get('marge_nach_lagerkosten'),
+                json.dumps(data.get('quellen', [])),
+                teil.get('description'),
+                teil.get('ek_preis'),
+                teil.get('vk_preis'),
+                teil.get('bestand'),
+                teil.get('lagerwert'),
+                teil.get('tage_seit_abgang'),
+            ])
+
+        try:
+            conn = get_drive_connection()
+            cur = conn.cursor()
+            cur.execute(f"""
+                INSERT INTO penner_marktpreise (
+                    part_number, anzahl_quellen, anzahl_angebote,
+                    preis_min, preis_max, preis_avg,
+                    empf_verkaufspreis, empf_plattform, verkaufschance,
+                    lagerkosten, mindestpreis, marge_nach_lagerkosten,
+                    abgefragt_am, aktualisiert_am, raw_data,
+                    beschreibung, ek_preis, vk_preis, bestand, lagerwert, tage_seit_abgang
+                ) VALUES {', '.join(values)}
+                ON CONFLICT (part_number)
+                DO UPDATE SET
+                    anzahl_quellen = EXCLUDED.anzahl_quellen,
+                    anzahl_angebote = EXCLUDED.anzahl_angebote,
+                    preis_min = EXCLUDED.preis_min,
+                    preis_max = EXCLUDED.preis_max,
+                    preis_avg = EXCLUDED.preis_avg,
+                    empf_verkaufspreis = EXCLUDED.empf_verkaufspreis,
+                    empf_plattform = EXCLUDED.empf_plattform,
+                    verkaufschance = EXCLUDED.verkaufschance,
+                    lagerkosten = EXCLUDED.lagerkosten,
+                    mindestpreis = EXCLUDED.mindestpreis,
+                    marge_nach_lagerkosten = EXCLUDED.marge_nach_lagerkosten,
+                    abgefragt_am = NOW(),
+                    aktualisiert_am = NOW(),
+                    raw_data = EXCLUDED.raw_data,
+                    beschreibung = EXCLUDED.beschreibung,
+                    ek_preis = EXCLUDED.ek_preis,
+                    vk_preis = EXCLUDED.vk_preis,
+                    bestand = EXCLUDED.bestand,
+                    lagerwert = EXCLUDED.lagerwert,
+                    tage_seit_abgang = EXCLUDED.tage_seit_abgang
+            """, params)
+            conn.commit()
+            cur.close()
+            conn.close()
+
+            logger.debug(f"Cache aktualisiert für {len(eintraege)} Teile")
+
+        except Exception as e:
+            logger.exception(f"Cache-Speichern (Batch) fehlgeschlagen: {e}")
+
     # =========================================================================
     # BATCH-VERARBEITUNG
     # =========================================================================
 
-    def get_penner_teile(self, min_lagerwert: float = 50.0, limit: int = 500) -> List[Dict]:
-        """Holt alle Penner-Teile aus Locosoft."""
+    def get_penner_teile(self, min_lagerwert: float = 50.0, limit: Optional[int] = 500) -> List[Dict]:
+        """Holt alle Penner-Teile aus Locosoft, nach Lagerwert absteigend (limit=None: alle)."""
         try:
             conn = get_locosoft_connection()
             cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -634,70 +778,37 @@ class PreisvergleichService:
             logger.exception("Fehler beim Laden der Penner-Teile")
             return []
 
-    def update_all_penner(self, min_lagerwert: float = 50.0, limit: int = 100) -> Dict:
+    def update_all_penner(self, min_lagerwert: float = 50.0, limit: Optional[int] = 100,
+                          budget_sekunden: Optional[float] = None) -> Dict:
         """
         Aktualisiert Marktpreise für alle Penner-Teile.
 
         Berücksichtigt jetzt auch Lagerkosten (10% p.a.) bei der Empfehlung.
+        TAG 220: läuft über die Crawl-Engine (api/preisvergleich_crawler.py) – Quellen
+        parallel mit Token-Bucket je Quelle, bedingte Requests, Reihenfolge nach Lagerwert,
+        Cache-Schreiben in Batches.
 
         Args:
             min_lagerwert: Nur Teile mit mindestens diesem Lagerwert
-            limit: Maximale Anzahl zu aktualisierender Teile
+            limit: Maximale Anzahl zu aktualisierender Teile (None = alle Penner)
+            budget_sekunden: Zeitbudget; danach werden keine neuen Requests mehr gestartet
 
         Returns:
             {
                 'gesamt': int,
                 'erfolgreich': int,
                 'fehler': int,
+                'offen': int,             # wegen Zeitbudget nicht abgefragt
+                'nicht_geaendert': int,   # Quellen-Antworten 304 Not Modified
                 'dauer_sekunden': float
             }
         """
-        start = time.time()
+        from api.preisvergleich_crawler import MarktpreisCrawler
 
         teile = self.get_penner_teile(min_lagerwert, limit)
         logger.info(f"Starte Marktpreis-Update für {len(teile)} Teile (inkl. Lagerkosten-Berechnung)")
 
-        erfolgreich = 0
-        fehler = 0
-
-        for i, teil in enumerate(teile):
-            try:
-                # EK-Preis und Lagerzeit aus Locosoft-Daten für Lagerkosten-Berechnung
-                ek_preis = float(teil.get('ek_preis') or 0)
-                tage_seit_abgang = int(teil.get('tage_seit_abgang') or 0)
-
-                # Marktpreis abrufen MIT Lagerkosten-Daten
-                result = self.get_marktpreis(
-                    teil['part_number'],
-                    use_cache=False,
-                    ek_preis=ek_preis,
-                    tage_seit_abgang=tage_seit_abgang
-                )
-
-                # Locosoft-Daten in Cache aktualisieren
-                self._update_locosoft_data(teil['part_number'], teil)
-
-                if result.get('zusammenfassung', {}).get('anzahl_angebote', 0) > 0:
-                    erfolgreich += 1
-                else:
-                    fehler += 1
-
-                if (i + 1) % 10 == 0:
-                    logger.info(f"Fortschritt: {i + 1}/{len(teile)} Teile verarbeitet")
-
-            except Exception as e:
-                logger.warning(f"Fehler bei {teil['part_number']}: {e}")
-                fehler += 1
-
-        dauer = time.time() - start
-        logger.info(f"Update abgeschlossen: {erfolgreich} erfolgreich, {fehler} ohne Angebote, {dauer:.1f}s")
-
-        return {
-            'gesamt': len(teile),
-            'erfolgreich': erfolgreich,
-            'fehler': fehler,
-            'dauer_sekunden': round(dauer, 1)
-        }
+        return MarktpreisCrawler(self, budget_sekunden=budget_sekunden).run(teile)
 
     def _update_locosoft_data(self, teilenummer: str, data: Dict):
         """Aktualisiert Locosoft-Stammdaten im Cache."""
@@ -17,6 +17,10 @@ Endpoints:
 - GET /api/lager/statistik - Zusammenfassung Lagerwert/Kategorien
 - GET /api/lager/export - CSV-Export
 
+TAG 220: Alle Ansichten lesen den vorklassifizierten Lager-Snapshot (api/lager_snapshot.py,
+aufgebaut nach sync_teile / locosoft_mirror) statt pro Aufruf parts_stock ⋈ parts_master
+in Locosoft zu scannen und Zeile für Zeile zu kategorisieren.
+
 Author: Claude
 Date: 2025-12-28 (TAG 141)
 """
@@ -35,6 +39,8 @@ import io
 
 # Zentrale DB-Utilities
 from api.db_utils import get_locosoft_connection
+from api.cache_utils import cached_response
+from api.lager_snapshot import LEICHE_TAGE, get_lager_snapshot, kategorisiere_teil  # noqa: F401 (Re-Export)
 
 # Logging
 logger = logging.getLogger(__name__)
@@ -58,180 +64,13 @@ PARTS_TYPE_NAMES = {
 # BETRIEB_NAMEN wird jetzt aus standort_utils importiert (SSOT)
 
 
-def kategorisiere_teil(row):
-    """
-    Kategorisiert ein Teil basierend auf Umschlag und Reichweite.
-
-    Returns: dict mit kategorie, status_icon, prioritaet, empfehlung
-    """
-    bestand = float(row['bestand'] or 0)
-    verkauf_12m = float(row['verkauf_12m'] or 0)
-    lagerwert = float(row['lagerwert'] or 0)
-    tage_seit_abgang = row['tage_seit_abgang']
-
-    # Monatlicher Durchschnittsverkauf
-    verkauf_monat = verkauf_12m / 12 if verkauf_12m > 0 else 0
-
-    # Reichweite in Monaten (wie lange reicht der Bestand?)
-    reichweite = bestand / verkauf_monat if verkauf_monat > 0 else 999
-
-    # Umschlagshäufigkeit (Verkäufe / Bestand pro Jahr)
-    umschlag = verkauf_12m / bestand if bestand > 0 else 0
-
-    result = {
-        'reichweite_monate': round(reichweite, 1) if reichweite < 999 else None,
-        'umschlag_jahr': round(umschlag, 2),
-        'verkauf_monat_avg': round(verkauf_monat, 2)
-    }
-
-    # LEICHE: Kein Verkauf seit 24+ Monaten UND Bestand > 0
-    if tage_seit_abgang and tage_seit_abgang > 730:
-        result['kategorie'] = 'leiche'
-        result['status_icon'] = '💀'
-        result['prioritaet'] = 1
-        result['empfehlung'] = 'Sofort handeln! Rückgabe an Lieferant oder Abschreibung prüfen'
-        return result
-
-    # PENNER: Kein/kaum Verkauf oder sehr lange Reichweite
-    if tage_seit_abgang and tage_seit_abgang > 365:
-        result['kategorie'] = 'penner'
-        result['status_icon'] = '🔴'
-        result['prioritaet'] = 2
-        result['empfehlung'] = 'Abverkauf oder Rückgabe prüfen'
-        return result
-
-    # PENNER nur bei hoher Reichweite, wenn NICHT kürzlich verkauft (Bugfix: Teile mit
-    # letztem Abgang z.B. heute sind aktive Läufer, keine Ladenhüter)
-    if reichweite > 24:
-        tage_ok = tage_seit_abgang is None or tage_seit_abgang > 90
-        if tage_ok:
-            result['kategorie'] = 'penner'
-            result['status_icon'] = '🔴'
-            result['prioritaet'] = 2
-            result['empfehlung'] = 'Bestand zu hoch - Abverkauf prüfen'
-            return result
-        # Kürzlich verkauft (≤90 Tage) trotz hoher Reichweite → normal, nur Hinweis
-        result['kategorie'] = 'normal'
-        result['status_icon'] = '🟡'
-        result['prioritaet'] = 4
-        result['empfehlung'] = 'Bestand hoch, Abverkauf aktiv - beobachten'
-        return result
-
-    # RENNER: Hoher Umschlag oder niedrige Reichweite
-    if umschlag > 6 or (reichweite < 2 and verkauf_monat > 0):
-        result['kategorie'] = 'renner'
-        result['status_icon'] = '🟢'
-        result['prioritaet'] = 3
-        result['empfehlung'] = 'Nachbestellen prüfen - geringer Bestand!'
-        return result
-
-    if reichweite < 3:
-        result['kategorie'] = 'renner'
-        result['status_icon'] = '🟢'
-        result['prioritaet'] = 3
-        result['empfehlung'] = 'Bestand niedrig - Nachbestellung empfohlen'
-        return result
-
-    # NORMAL: Alles andere
-    result['kategorie'] = 'normal'
-    result['status_icon'] = '🟡'
-    result['prioritaet'] = 4
-    result['empfehlung'] = 'Bestand ok'
-
-    return result
-
-
-def get_base_query():
-    """Basis-Query für Lagerbestand mit Kategorisierung.
-
-    WICHTIG: Ausgeschlossen werden:
-    - parts_type 1, 60, 65 = AT-Teile (Austauschteile/Garantie-Rückläufer)
-    - Teile mit "KAUTION" oder "RUECKLAUFTEIL" in Beschreibung (Pfand/Garantie)
-    """
-    return """
-        WITH lager_analyse AS (
-            SELECT
-                ps.part_number,
-                pm.description,
-                pm.parts_type,
-                ps.stock_no as betrieb,
-                ps.stock_level as bestand,
-                ps.usage_value as ek_preis,
-                pm.rr_price as vk_preis,
-                ROUND((ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert,
-                ps.sales_current_year as verkauf_aktuell,
-                ps.sales_previous_year as verkauf_vorjahr,
-                -- Verkauf letzte 12 Monate (gewichtet)
-                COALESCE(ps.sales_current_year, 0) +
-                    (COALESCE(ps.sales_previous_year, 0) *
-                     (EXTRACT(MONTH FROM CURRENT_DATE)::numeric / 12)) as verkauf_12m,
-                ps.last_outflow_date as letzter_abgang,
-                ps.last_inflow_date as letzter_zugang,
-                -- PostgreSQL: DATE - DATE = INTEGER (Tage)
-                (CURRENT_DATE - ps.last_outflow_date) as tage_seit_abgang,
-                ps.minimum_stock_level as mindestbestand
-            FROM parts_stock ps
-            JOIN parts_master pm ON ps.part_number = pm.part_number
-            WHERE ps.stock_level > 0
-            -- Garantie/Gewährleistung ausschließen:
-            AND pm.parts_type NOT IN (1, 60, 65)  -- AT-Teile (Austausch/Garantie)
-            AND UPPER(pm.description) NOT LIKE '%KAUTION%'  -- Pfand-Teile
-            AND UPPER(pm.description) NOT LIKE '%RUECKLAUFTEIL%'  -- Garantie-Rückläufer
-            AND UPPER(pm.description) NOT LIKE '%ALTT%WERT%'  -- Altteil-Wert
-        )
-        SELECT * FROM lager_analyse
-    """
-
-
-def get_aggregated_by_part_query():
-    """Wie get_base_query(), aber pro Teilenummer aggregiert (alle Standorte zusammengefasst).
-
-    Jede Teilenummer erscheint nur einmal → genau eine Kategorie (kein „sowohl Renner als auch Penner“).
-    """
-    return """
-        WITH lager_analyse AS (
-            SELECT
-                ps.part_number,
-                pm.description,
-                pm.parts_type,
-                ps.stock_no as betrieb,
-                ps.stock_level as bestand,
-                ps.usage_value as ek_preis,
-                pm.rr_price as vk_preis,
-                ROUND((ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert,
-                ps.sales_current_year as verkauf_aktuell,
-                ps.sales_previous_year as verkauf_vorjahr,
-                COALESCE(ps.sales_current_year, 0) +
-                    (COALESCE(ps.sales_previous_year, 0) *
-                     (EXTRACT(MONTH FROM CURRENT_DATE)::numeric / 12)) as verkauf_12m,
-                ps.last_outflow_date as letzter_abgang,
-                (CURRENT_DATE - ps.last_outflow_date) as tage_seit_abgang,
-                ps.minimum_stock_level as mindestbestand
-            FROM parts_stock ps
-            JOIN parts_master pm ON ps.part_number = pm.part_number
-            WHERE ps.stock_level > 0
-            AND pm.parts_type NOT IN (1, 60, 65)
-            AND UPPER(pm.description) NOT LIKE '%KAUTION%'
-            AND UPPER(pm.description) NOT LIKE '%RUECKLAUFTEIL%'
-            AND UPPER(pm.description) NOT LIKE '%ALTT%WERT%'
-        )
-        SELECT
-            part_number,
-            description,
-            parts_type,
-            SUM(bestand)::numeric as bestand,
-            SUM(lagerwert)::numeric as lagerwert,
-            MAX(ek_preis)::numeric as ek_preis,
-            MAX(vk_preis)::numeric as vk_preis,
-            SUM(verkauf_aktuell)::numeric as verkauf_aktuell,
-            SUM(verkauf_vorjahr)::numeric as verkauf_vorjahr,
-            SUM(verkauf_12m)::numeric as verkauf_12m,
-            MAX(letzter_abgang) as letzter_abgang,
-            (CURRENT_DATE - MAX(letzter_abgang)) as tage_seit_abgang,
-            SUM(mindestbestand)::numeric as mindestbestand
-        FROM lager_analyse
-        GROUP BY part_number, description, parts_type
-    """
+# /renner-penner: sort-Parameter → Sortierung im Snapshot (absteigend, NULL zuletzt)
+SORT_MAP = {
+    'lagerwert': 'lagerwert',
+    'reichweite': 'tage',
+    'umschlag': 'verkauf_12m',
+    'tage': 'tage',
+}
 
 
 # =============================================================================
@@ -249,6 +88,7 @@ def health_check():
 
 
 @renner_penner_bp.route('/renner-penner', methods=['GET'])
+@cached_response(ttl=900, stale_ttl=3600, tags=['renner_penner'])  # TAG 220
 def get_renner_penner():
     """
     GET /api/lager/renner-penner
@@ -271,42 +111,27 @@ def get_renner_penner():
         sort = request.args.get('sort', 'lagerwert')
         limit = request.args.get('limit', 200, type=int)
 
-        conn = get_locosoft_connection()
-        conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        snap = get_lager_snapshot()
 
-        # Ohne Betriebsfilter: pro Teilenummer aggregieren (alle Standorte), damit jede Nummer nur in einer Kategorie landet
-        if betrieb:
-            query = get_base_query()
-            where_clauses = [f"lagerwert >= {min_wert}", f"betrieb = {betrieb}"]
-            if marke is not None:
-                where_clauses.append(f"parts_type = {marke}")
-            query += " WHERE " + " AND ".join(where_clauses)
-        else:
-            query = "SELECT * FROM (" + get_aggregated_by_part_query().strip() + ") agg WHERE lagerwert >= " + str(min_wert)
-            if marke is not None:
-                query += f" AND parts_type = {marke}"
-
-        sort_map = {
-            'lagerwert': 'lagerwert DESC',
-            'reichweite': 'tage_seit_abgang DESC NULLS LAST',
-            'umschlag': 'verkauf_12m DESC',
-            'tage': 'tage_seit_abgang DESC NULLS LAST'
-        }
-        query += f" ORDER BY {sort_map.get(sort, 'lagerwert DESC')}"
-        query += f" LIMIT {limit * 3}"
-
-        cur.execute(query)
-        rows = cur.fetchall()
-
-        # Kategorisierung
+        # Ohne Betriebsfilter: pro Teilenummer aggregiert (alle Standorte), damit jede Nummer nur in einer Kategorie landet
+        indizes = snap.auswahl(
+            'lager' if betrieb else 'teil',
+            betrieb=betrieb or None,
+            marke=marke,
+            min_wert=min_wert,
+            sort=SORT_MAP.get(sort, 'lagerwert'),
+            limit=limit * 3,
+        )
+
+        # Kategorisierung (vorberechnet im Snapshot)
         renner = []
         penner = []
         leichen = []
         normal = []
 
-        for row in rows:
-            rb = row.get('betrieb')
+        for i in indizes:
+            row = snap.zeile(i)
+            rb = row['betrieb']
             teil = {
                 'part_number': row['part_number'],
                 'beschreibung': row['description'],
@@ -321,15 +146,18 @@ def get_renner_penner():
                 'verkauf_aktuell': float(row['verkauf_aktuell'] or 0),
                 'verkauf_vorjahr': float(row['verkauf_vorjahr'] or 0),
                 'verkauf_12m': float(row['verkauf_12m'] or 0),
-                'letzter_abgang': row['letzter_abgang'].strftime('%d.%m.%Y') if row.get('letzter_abgang') else None,
-                'tage_seit_abgang': row.get('tage_seit_abgang'),
-                'mindestbestand': float(row['mindestbestand'] or 0)
+                'letzter_abgang': row['letzter_abgang'].strftime('%d.%m.%Y') if row['letzter_abgang'] else None,
+                'tage_seit_abgang': row['tage_seit_abgang'],
+                'mindestbestand': float(row['mindestbestand'] or 0),
+                'reichweite_monate': row['reichweite_monate'],
+                'umschlag_jahr': row['umschlag_jahr'],
+                'verkauf_monat_avg': row['verkauf_monat_avg'],
+                'kategorie': row['kategorie'],
+                'status_icon': row['status_icon'],
+                'prioritaet': row['prioritaet'],
+                'empfehlung': row['empfehlung'],
             }
 
-            # Kategorisierung hinzufügen
-            kat = kategorisiere_teil(row)
-            teil.update(kat)
-
             # In richtige Liste einsortieren
             if teil['kategorie'] == 'renner':
                 renner.append(teil)
@@ -353,15 +181,13 @@ def get_renner_penner():
         else:
             result_list = None
 
-        cur.close()
-        conn.close()
-
         # Zusammenfassung
         alle_teile = renner + penner + leichen + normal
 
         return jsonify({
             'success': True,
             'timestamp': datetime.now().isoformat(),
+            'stand': snap.stand.isoformat(),
             'filter': {
                 'betrieb': betrieb,
                 'marke': marke,
@@ -406,6 +232,7 @@ def get_renner_penner():
 
 
 @renner_penner_bp.route('/renner', methods=['GET'])
+@cached_response(ttl=900, stale_ttl=3600, tags=['renner_penner'])  # TAG 220
 def get_renner():
     """
     GET /api/lager/renner
@@ -417,26 +244,14 @@ def get_renner():
         betrieb = request.args.get('betrieb', type=int)
         limit = request.args.get('limit', 50, type=int)
 
-        conn = get_locosoft_connection()
-        conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = get_base_query()
-        where = ["lagerwert >= 20", "verkauf_12m > 0"]
-
-        if betrieb:
-            where.append(f"betrieb = {betrieb}")
-
-        query += " WHERE " + " AND ".join(where)
-        query += " ORDER BY verkauf_12m DESC LIMIT 500"
-
-        cur.execute(query)
-        rows = cur.fetchall()
+        snap = get_lager_snapshot()
+        indizes = snap.auswahl('lager', betrieb=betrieb or None, min_wert=20, nur_verkauft=True,
+                               sort='verkauf_12m', limit=500)
 
         renner = []
-        for row in rows:
-            kat = kategorisiere_teil(row)
-            if kat['kategorie'] == 'renner':
+        for i in indizes:
+            row = snap.zeile(i)
+            if row['kategorie'] == 'renner':
                 teil = {
                     'part_number': row['part_number'],
                     'beschreibung': row['description'],
@@ -444,10 +259,10 @@ def get_renner():
                     'bestand': float(row['bestand'] or 0),
                     'lagerwert': float(row['lagerwert'] or 0),
                     'verkauf_12m': float(row['verkauf_12m'] or 0),
-                    'reichweite_monate': kat['reichweite_monate'],
-                    'umschlag_jahr': kat['umschlag_jahr'],
-                    'empfehlung': kat['empfehlung'],
-                    'status_icon': kat['status_icon']
+                    'reichweite_monate': row['reichweite_monate'],
+                    'umschlag_jahr': row['umschlag_jahr'],
+                    'empfehlung': row['empfehlung'],
+                    'status_icon': row['status_icon']
                 }
                 renner.append(teil)
 
@@ -457,9 +272,6 @@ def get_renner():
         # Nach Reichweite sortieren (niedrigste zuerst = dringend)
         renner.sort(key=lambda x: x['reichweite_monate'] or 0)
 
-        cur.close()
-        conn.close()
-
         return jsonify({
             'success': True,
             'timestamp': datetime.now().isoformat(),
@@ -474,6 +286,7 @@ def get_renner():
 
 
 @renner_penner_bp.route('/penner', methods=['GET'])
+@cached_response(ttl=900, stale_ttl=3600, tags=['renner_penner'])  # TAG 220
 def get_penner():
     """
     GET /api/lager/penner
@@ -486,26 +299,14 @@ def get_penner():
         min_wert = request.args.get('min_wert', 100, type=float)
         limit = request.args.get('limit', 50, type=int)
 
-        conn = get_locosoft_connection()
-        conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = get_base_query()
-        where = [f"lagerwert >= {min_wert}"]
-
-        if betrieb:
-            where.append(f"betrieb = {betrieb}")
-
-        query += " WHERE " + " AND ".join(where)
-        query += " ORDER BY tage_seit_abgang DESC NULLS LAST, lagerwert DESC LIMIT 500"
-
-        cur.execute(query)
-        rows = cur.fetchall()
+        snap = get_lager_snapshot()
+        indizes = snap.auswahl('lager', betrieb=betrieb or None, min_wert=min_wert,
+                               sort='tage_lagerwert', limit=500)
 
         penner = []
-        for row in rows:
-            kat = kategorisiere_teil(row)
-            if kat['kategorie'] in ['penner', 'leiche']:
+        for i in indizes:
+            row = snap.zeile(i)
+            if row['kategorie'] in ['penner', 'leiche']:
                 teil = {
                     'part_number': row['part_number'],
                     'beschreibung': row['description'],
@@ -515,18 +316,15 @@ def get_penner():
                     'verkauf_12m': float(row['verkauf_12m'] or 0),
                     'letzter_abgang': row['letzter_abgang'].strftime('%d.%m.%Y') if row['letzter_abgang'] else 'Nie',
                     'tage_seit_abgang': row['tage_seit_abgang'],
-                    'kategorie': kat['kategorie'],
-                    'empfehlung': kat['empfehlung'],
-                    'status_icon': kat['status_icon']
+                    'kategorie': row['kategorie'],
+                    'empfehlung': row['empfehlung'],
+                    'status_icon': row['status_icon']
                 }
                 penner.append(teil)
 
                 if len(penner) >= limit:
                     break
 
-        cur.close()
-        conn.close()
-
         return jsonify({
             'success': True,
             'timestamp': datetime.now().isoformat(),
@@ -554,52 +352,16 @@ def get_leichen():
         min_wert = request.args.get('min_wert', 50, type=float)
         limit = request.args.get('limit', 100, type=int)
 
-        conn = get_locosoft_connection()
-        conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = """
-            SELECT
-                ps.part_number,
-                pm.description,
-                pm.parts_type,
-                ps.stock_no as betrieb,
-                ps.stock_level as bestand,
-                ps.usage_value as ek_preis,
-                ROUND((ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert,
-                ps.last_outflow_date as letzter_abgang,
-                ps.last_inflow_date as letzter_zugang,
-                (CURRENT_DATE - ps.last_outflow_date) as tage_seit_abgang
-            FROM parts_stock ps
-            JOIN parts_master pm ON ps.part_number = pm.part_number
-            WHERE ps.stock_level > 0
-            AND (
-                ps.last_outflow_date < CURRENT_DATE - INTERVAL '730 days'
-                OR ps.last_outflow_date IS NULL
-            )
-            AND (ps.stock_level * ps.usage_value) >= %s
-            -- Garantie/Gewährleistung ausschließen:
-            AND pm.parts_type NOT IN (1, 60, 65)
-            AND UPPER(pm.description) NOT LIKE '%KAUTION%'
-            AND UPPER(pm.description) NOT LIKE '%RUECKLAUFTEIL%'
-            AND UPPER(pm.description) NOT LIKE '%ALTT%WERT%'
-        """
-        params = [min_wert]
-
-        if betrieb:
-            query += " AND ps.stock_no = %s"
-            params.append(betrieb)
-
-        query += " ORDER BY lagerwert DESC LIMIT %s"
-        params.append(limit)
-
-        cur.execute(query, params)
-        rows = cur.fetchall()
+        snap = get_lager_snapshot()
+        # Kein Abgang seit mehr als 730 Tagen oder nie
+        indizes = snap.auswahl('lager', betrieb=betrieb or None, min_wert=min_wert,
+                               min_tage=LEICHE_TAGE, sort='lagerwert', limit=limit)
 
         leichen = []
         total_wert = 0
 
-        for row in rows:
+        for i in indizes:
+            row = snap.zeile(i)
             wert = float(row['lagerwert'] or 0)
             total_wert += wert
 
@@ -618,9 +380,6 @@ def get_leichen():
                 'empfehlung': 'Sofort Rückgabe/Abschreibung prüfen!'
             })
 
-        cur.close()
-        conn.close()
-
         return jsonify({
             'success': True,
             'timestamp': datetime.now().isoformat(),
@@ -641,95 +400,33 @@ def get_statistik():
     GET /api/lager/statistik
 
     Zusammenfassung: Lagerwert nach Kategorien und Marken.
+    Kennzahlen sind im Snapshot vorberechnet (gesamter Bestand, ohne Analyse-Ausschlüsse).
     """
     try:
-        conn = get_locosoft_connection()
-        conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Gesamt-Statistik
-        # In PostgreSQL: DATE - DATE = INTEGER (Tage), kein EXTRACT nötig
-        cur.execute("""
-            SELECT
-                COUNT(DISTINCT ps.part_number) as anzahl_artikel,
-                ROUND(SUM(ps.stock_level)::numeric, 0) as stueck_gesamt,
-                ROUND(SUM(ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert_gesamt,
-                ROUND(AVG(CURRENT_DATE - ps.last_outflow_date)::numeric, 0) as avg_tage_seit_abgang
-            FROM parts_stock ps
-            WHERE ps.stock_level > 0
-            AND ps.last_outflow_date IS NOT NULL
-        """)
-        gesamt = cur.fetchone()
-
-        # Nach Marke/Teile-Typ
-        cur.execute("""
-            SELECT
-                pm.parts_type,
-                COUNT(DISTINCT ps.part_number) as anzahl,
-                ROUND(SUM(ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert
-            FROM parts_stock ps
-            JOIN parts_master pm ON ps.part_number = pm.part_number
-            WHERE ps.stock_level > 0
-            GROUP BY pm.parts_type
-            ORDER BY lagerwert DESC
-        """)
-        nach_marke = []
-        for row in cur.fetchall():
-            nach_marke.append({
-                'parts_type': row['parts_type'],
-                'marke': PARTS_TYPE_NAMES.get(row['parts_type'], f"Typ {row['parts_type']}"),
-                'anzahl': row['anzahl'],
-                'lagerwert': float(row['lagerwert'] or 0)
-            })
-
-        # Nach Betrieb
-        cur.execute("""
-            SELECT
-                ps.stock_no as betrieb,
-                COUNT(DISTINCT ps.part_number) as anzahl,
-                ROUND(SUM(ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert
-            FROM parts_stock ps
-            WHERE ps.stock_level > 0
-            GROUP BY ps.stock_no
-            ORDER BY lagerwert DESC
-        """)
-        nach_betrieb = []
-        for row in cur.fetchall():
-            nach_betrieb.append({
-                'betrieb': row['betrieb'],
-                'betrieb_name': BETRIEB_NAMEN.get(row['betrieb'], f"Betrieb {row['betrieb']}"),
-                'anzahl': row['anzahl'],
-                'lagerwert': float(row['lagerwert'] or 0)
-            })
-
-        # Leichen-Wert (24+ Monate)
-        cur.execute("""
-            SELECT
-                COUNT(*) as anzahl,
-                ROUND(SUM(ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert
-            FROM parts_stock ps
-            WHERE ps.stock_level > 0
-            AND (ps.last_outflow_date < CURRENT_DATE - INTERVAL '730 days' OR ps.last_outflow_date IS NULL)
-        """)
-        leichen_stats = cur.fetchone()
-
-        # Penner-Wert (12-24 Monate)
-        cur.execute("""
-            SELECT
-                COUNT(*) as anzahl,
-                ROUND(SUM(ps.stock_level * ps.usage_value)::numeric, 2) as lagerwert
-            FROM parts_stock ps
-            WHERE ps.stock_level > 0
-            AND ps.last_outflow_date BETWEEN CURRENT_DATE - INTERVAL '730 days' AND CURRENT_DATE - INTERVAL '365 days'
-        """)
-        penner_stats = cur.fetchone()
-
-        cur.close()
-        conn.close()
+        snap = get_lager_snapshot()
+        statistik = snap.statistik
+        gesamt = statistik['gesamt']
+        leichen_stats = statistik['leichen']
+        penner_stats = statistik['penner']
+
+        nach_marke = [{
+            'parts_type': row['parts_type'],
+            'marke': PARTS_TYPE_NAMES.get(row['parts_type'], f"Typ {row['parts_type']}"),
+            'anzahl': row['anzahl'],
+            'lagerwert': float(row['lagerwert'] or 0)
+        } for row in statistik['nach_marke']]
+
+        nach_betrieb = [{
+            'betrieb': row['betrieb'],
+            'betrieb_name': BETRIEB_NAMEN.get(row['betrieb'], f"Betrieb {row['betrieb']}"),
+            'anzahl': row['anzahl'],
+            'lagerwert': float(row['lagerwert'] or 0)
+        } for row in statistik['nach_betrieb']]
 
         return jsonify({
             'success': True,
             'timestamp': datetime.now().isoformat(),
+            'stand': snap.stand.isoformat(),
             'gesamt': {
                 'anzahl_artikel': gesamt['anzahl_artikel'],
                 'stueck_gesamt': float(gesamt['stueck_gesamt'] or 0),
@@ -748,6 +445,8 @@ def get_statistik():
                     'beschreibung': '12-24 Monate ohne Verkauf'
                 }
             },
+            # TAG 220: Kategorien je Teilenummer über alle Lager (wie /renner-penner ohne Betrieb)
+            'kategorien': snap.kategorie_summen.get(None, {}),
             'nach_marke': nach_marke,
             'nach_betrieb': nach_betrieb
         })
@@ -896,21 +595,8 @@ def export_csv():
         betrieb = request.args.get('betrieb', type=int)
         min_wert = request.args.get('min_wert', 50, type=float)
 
-        conn = get_locosoft_connection()
-        conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = get_base_query()
-        where = [f"lagerwert >= {min_wert}"]
-
-        if betrieb:
-            where.append(f"betrieb = {betrieb}")
-
-        query += " WHERE " + " AND ".join(where)
-        query += " ORDER BY lagerwert DESC LIMIT 5000"
-
-        cur.execute(query)
-        rows = cur.fetchall()
+        snap = get_lager_snapshot()
+        indizes = snap.auswahl('lager', betrieb=betrieb or None, min_wert=min_wert, sort='lagerwert', limit=5000)
 
         # CSV erstellen
         output = io.StringIO()
@@ -925,11 +611,11 @@ def export_csv():
         ])
 
         # Daten
-        for row in rows:
-            kat = kategorisiere_teil(row)
+        for i in indizes:
+            row = snap.zeile(i)
 
             # Kategorie-Filter
-            if kategorie != 'alle' and kat['kategorie'] != kategorie:
+            if kategorie != 'alle' and row['kategorie'] != kategorie:
                 continue
 
             writer.writerow([
@@ -937,21 +623,18 @@ def export_csv():
                 row['description'],
                 PARTS_TYPE_NAMES.get(row['parts_type'], '?'),
                 BETRIEB_NAMEN.get(row['betrieb'], '?'),
-                kat['kategorie'].upper(),
+                row['kategorie'].upper(),
                 str(float(row['bestand'] or 0)).replace('.', ','),
                 str(float(row['ek_preis'] or 0)).replace('.', ','),
                 str(float(row['lagerwert'] or 0)).replace('.', ','),
                 str(float(row['verkauf_12m'] or 0)).replace('.', ','),
-                str(kat['reichweite_monate'] or '').replace('.', ','),
-                str(kat['umschlag_jahr'] or 0).replace('.', ','),
+                str(row['reichweite_monate'] or '').replace('.', ','),
+                str(row['umschlag_jahr'] or 0).replace('.', ','),
                 row['letzter_abgang'].strftime('%d.%m.%Y') if row['letzter_abgang'] else '',
                 row['tage_seit_abgang'] or '',
-                kat['empfehlung']
+                row['empfehlung']
             ])
 
-        cur.close()
-        conn.close()
-
         # Response
         output.seek(0)
         filename = f"renner_penner_{kategorie}_{datetime.now().strftime('%Y%m%d')}.csv"
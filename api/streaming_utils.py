@@ -0,0 +1,101 @@
+"""
+Streaming-Responses für Exporte - TAG 220
+==========================================
+CSV-Antworten, die Zeile für Zeile erzeugt werden statt das komplette
+Result-Set im Speicher aufzubauen (Gunicorn-Worker-RSS bleibt konstant).
+
+Zusammen mit dem Server-Side-Cursor-Generator aus db_utils:
+
+    from api.db_utils import stream_portal_query
+    from api.streaming_utils import stream_csv_response
+
+    rows = stream_portal_query("SELECT konto, betrag FROM ...", params)
+    return stream_csv_response(
+        ([r['konto'], r['betrag']] for r in rows),
+        header=['Konto', 'Betrag'],
+        filename='export.csv',
+    )
+
+Hinweis: Die Query läuft erst, wenn der Client liest. Fehler, die vorher
+erkannt werden sollen (z. B. "Keine Daten" → 404), mit peek_first() prüfen.
+"""
+
+import csv
+from itertools import chain
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Response, stream_with_context
+
+# Zeilen pro Chunk, der an den Client geschrieben wird
+DEFAULT_CHUNK_ROWS = 500
+
+
+class _LineBuffer:
+    """Minimaler File-Ersatz für csv.writer: sammelt geschriebene Zeilen."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def write(self, value: str):
+        self.parts.append(value)
+
+    def pop(self) -> str:
+        data = ''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def peek_first(iterable: Iterable) -> Tuple[Optional[Any], Iterator]:
+    """
+    Holt das erste Element eines Iterators, ohne es zu verlieren.
+
+    Returns:
+        (erstes Element oder None, Iterator inkl. erstem Element)
+    """
+    iterator = iter(iterable)
+    for first in iterator:
+        return first, chain([first], iterator)
+    return None, iter(())
+
+
+def iter_csv(rows: Iterable[Iterable[Any]], header: Optional[List[str]] = None, delimiter: str = ';',
+             chunk_rows: int = DEFAULT_CHUNK_ROWS, bom: bool = False) -> Iterator[str]:
+    """CSV-Text in Chunks zu je chunk_rows Zeilen erzeugen."""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+    if bom:
+        buffer.write('\ufeff')
+    if header:
+        writer.writerow(header)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= chunk_rows:
+            yield buffer.pop()
+            count = 0
+    rest = buffer.pop()
+    if rest:
+        yield rest
+
+
+def stream_csv_response(rows: Iterable[Iterable[Any]], header: Optional[List[str]] = None,
+                        filename: str = 'export.csv', delimiter: str = ';',
+                        content_type: str = 'text/csv; charset=utf-8', bom: bool = False) -> Response:
+    """
+    Streaming-CSV-Download.
+
+    Args:
+        rows: Iterable von Zeilen (Listen/Tuples) – idealerweise ein Generator über
+              stream_portal_query()
+        header: Spaltenüberschriften
+        bom: UTF-8-BOM voranstellen (Excel-Kompatibilität)
+    """
+    return Response(
+        stream_with_context(iter_csv(rows, header, delimiter, bom=bom)),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'Content-Type': content_type,
+        }
+    )
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+TEK Fakt-Tabelle - TAG 220
+===========================
+Vorverdichtung von loco_journal_accountings für TEK, Breakeven-Prognose und
+VM/VJ-Vergleiche (tek_fact_daily, siehe migrations/add_tek_fact_daily_table.sql).
+
+Granularität: Tag × Konto × Firma × Filiale × Soll/Haben × G&V-Flag × Kostenumlage-Flag.
+Die Spalten heißen wie im Journal, daher laufen die bestehenden Filter-Strings
+(firma_filter_umsatz/_einsatz/_kosten, umlage_erloese_filter) und die Bereichs-CASEs
+unverändert; nur posting_text wird durch die beiden Flags ersetzt.
+
+Pflege:
+    Der Locosoft-Mirror ruft refresh_tek_fact() in derselben Transaktion wie den
+    Journal-Sync auf (voll: aus der Shadow-Tabelle vor dem Swap, inkrementell: ab
+    Fensterbeginn). Journal und Fakt-Tabelle sind damit immer auf demselben Stand.
+
+Lesen:
+    from api.tek_fact import get_tek_quelle
+
+    quelle = get_tek_quelle()
+    cursor.execute(f"SELECT ... FROM {quelle.tabelle} WHERE ... {quelle.guv_filter}")
+
+Solange kein vollständiger Aufbau vorliegt (Migration/Mirror noch nicht gelaufen,
+letzter Refresh fehlgeschlagen), liefert get_tek_quelle() das Journal.
+"""
+
+import logging
+import threading
+import time
+from datetime import date
+from typing import NamedTuple, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+FACT_TABLE = 'tek_fact_daily'
+JOURNAL_TABLE = 'loco_journal_accountings'
+SYNC_STATE_TABLE = 'loco_sync_state'
+
+# Wie lange (Sekunden) der Status "Fakt-Tabelle nutzbar" pro Prozess gecacht wird
+STATUS_CHECK_INTERVAL = 60
+
+GUV_BEDINGUNG = "COALESCE(posting_text LIKE '%%G&V-Abschluss%%', FALSE)"
+KOSTENUMLAGE_BEDINGUNG = ("COALESCE(posting_text LIKE '%%Kostenumlage%%' "
+                          "OR posting_text LIKE '%%kostenumlage%%', FALSE)")
+
+
+class TekQuelle(NamedTuple):
+    """Tabelle + quellenspezifische Filter-Fragmente für TEK-Abfragen."""
+    tabelle: str
+    guv_filter: str             # wie get_guv_filter(): "AND ..." (G&V-Abschluss ausschließen)
+    kostenumlage: str           # Bedingung "Buchungstext enthält Kostenumlage" (ohne AND)
+
+    @property
+    def ist_fakt(self) -> bool:
+        return self.tabelle == FACT_TABLE
+
+
+JOURNAL_QUELLE = TekQuelle(
+    tabelle=JOURNAL_TABLE,
+    guv_filter="AND (posting_text IS NULL OR posting_text NOT LIKE '%%G&V-Abschluss%%')",
+    kostenumlage="(posting_text LIKE '%%Kostenumlage%%' OR posting_text LIKE '%%kostenumlage%%')",
+)
+FAKT_QUELLE = TekQuelle(
+    tabelle=FACT_TABLE,
+    guv_filter="AND NOT ist_guv_abschluss",
+    kostenumlage="ist_kostenumlage",
+)
+
+_status_lock = threading.Lock()
+_fakt_nutzbar: Optional[bool] = None
+_status_checked = 0.0
+
+
+# =============================================================================
+# LESEN
+# =============================================================================
+
+def _fakt_status_laden() -> bool:
+    from api.db_utils import db_session, row_to_dict
+
+    try:
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT status, last_full_at
+                FROM {SYNC_STATE_TABLE}
+                WHERE table_name = %s
+            """, (FACT_TABLE,))
+            row = cursor.fetchone()
+    except Exception as e:
+        # Sync-State-Tabelle fehlt o. Ä. → Journal
+        logger.debug(f"TEK-Fakt: Status nicht lesbar ({e}) - nutze Journal")
+        return False
+    if not row:
+        return False
+    row = row_to_dict(row)
+    return row['status'] == 'ok' and row['last_full_at'] is not None
+
+
+def get_tek_quelle() -> TekQuelle:
+    """
+    Quelle für TEK-Abfragen: Fakt-Tabelle, sofern vollständig aufgebaut und der
+    letzte Refresh erfolgreich war, sonst loco_journal_accountings.
+    """
+    global _fakt_nutzbar, _status_checked
+
+    now = time.monotonic()
+    if _fakt_nutzbar is None or now - _status_checked >= STATUS_CHECK_INTERVAL:
+        with _status_lock:
+            if _fakt_nutzbar is None or now - _status_checked >= STATUS_CHECK_INTERVAL:
+                _fakt_nutzbar = _fakt_status_laden()
+                _status_checked = now
+    return FAKT_QUELLE if _fakt_nutzbar else JOURNAL_QUELLE
+
+
+def reset_tek_quelle_cache():
+    """Status beim nächsten get_tek_quelle() neu lesen (z. B. nach manuellem Refresh)."""
+    global _fakt_nutzbar
+    with _status_lock:
+        _fakt_nutzbar = None
+
+
+# =============================================================================
+# PFLEGE (Locosoft-Mirror)
+# =============================================================================
+
+def ensure_tek_fact_table(conn):
+    """tek_fact_daily anlegen, falls die Migration noch nicht lief (ohne Commit)."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FACT_TABLE} (
+            accounting_date            DATE NOT NULL,
+            nominal_account_number     BIGINT,
+            subsidiary_to_company_ref  BIGINT,
+            branch_number              BIGINT,
+            debit_or_credit            VARCHAR(1),
+            ist_guv_abschluss          BOOLEAN NOT NULL DEFAULT FALSE,
+            ist_kostenumlage           BOOLEAN NOT NULL DEFAULT FALSE,
+            posted_value               BIGINT NOT NULL DEFAULT 0,
+            buchungen                  INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_tek_fact_daily_datum_konto
+            ON {FACT_TABLE} (accounting_date, nominal_account_number)
+    """)
+
+
+def _vollstaendig_aufgebaut(cursor) -> bool:
+    cursor.execute(f"""
+        SELECT status = 'ok' AND last_full_at IS NOT NULL
+        FROM {SYNC_STATE_TABLE}
+        WHERE table_name = %s
+    """, (FACT_TABLE,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def _save_state(cursor, mode: str, rows: int, seconds: float, hwm: Optional[str],
+                status: str = 'ok', error: Optional[str] = None):
+    cursor.execute(f"""
+        INSERT INTO {SYNC_STATE_TABLE}
+            (table_name, strategy, hwm_column, hwm_value, last_run_at, last_full_at,
+             last_mode, rows_last_run, duration_s, status, error)
+        VALUES (%s, 'date_window', 'accounting_date', %s, NOW(),
+                CASE WHEN %s = 'full' AND %s = 'ok' THEN NOW() END, %s, %s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            hwm_value     = COALESCE(EXCLUDED.hwm_value, {SYNC_STATE_TABLE}.hwm_value),
+            last_run_at   = NOW(),
+            last_full_at  = COALESCE(EXCLUDED.last_full_at, {SYNC_STATE_TABLE}.last_full_at),
+            last_mode     = EXCLUDED.last_mode,
+            rows_last_run = EXCLUDED.rows_last_run,
+            duration_s    = EXCLUDED.duration_s,
+            status        = EXCLUDED.status,
+            error         = EXCLUDED.error
+    """, (FACT_TABLE, hwm, mode, status, mode, rows, seconds, status, error))
+
+
+def refresh_tek_fact(conn, source_table: str = JOURNAL_TABLE,
+                     von: Optional[Union[date, str]] = None) -> int:
+    """
+    Fakt-Tabelle aus dem Journal neu verdichten (DELETE + INSERT ... SELECT ... GROUP BY).
+
+    Läuft in der Transaktion des Aufrufers (kein Commit) – der Mirror committet Journal,
+    Fakt-Tabelle und Sync-State gemeinsam. Ein Fehler wird per SAVEPOINT isoliert: der
+    Journal-Sync bleibt gültig, die Fakt-Tabelle wird als 'error' markiert (Leser nutzen
+    dann das Journal, der nächste Lauf baut voll neu auf).
+
+    Args:
+        conn: psycopg2-Verbindung auf das Portal (Tupel-Cursor genügt)
+        source_table: Journal-Tabelle (beim Voll-Sync die Shadow-Tabelle vor dem Swap)
+        von: Fensterbeginn (inkrementell); None = alles neu aufbauen
+
+    Returns:
+        Anzahl Fakt-Zeilen im neu aufgebauten Bereich (-1 bei Fehler)
+    """
+    started = time.monotonic()
+    cursor = conn.cursor()
+    ensure_tek_fact_table(conn)
+
+    # Fenster nur, wenn es einen vollständigen, fehlerfreien Stand gibt
+    if von is not None and not _vollstaendig_aufgebaut(cursor):
+        logger.info("TEK-Fakt: kein vollständiger Stand vorhanden - baue komplett neu auf")
+        von = None
+    mode = 'full' if von is None else 'date_window'
+
+    cursor.execute("SAVEPOINT tek_fact")
+    try:
+        where = "WHERE accounting_date IS NOT NULL"
+        params = ()
+        if von is not None:
+            cursor.execute(f"DELETE FROM {FACT_TABLE} WHERE accounting_date >= %s", (von,))
+            where += " AND accounting_date >= %s"
+            params = (von,)
+        else:
+            cursor.execute(f"DELETE FROM {FACT_TABLE}")
+
+        cursor.execute(f"""
+            INSERT INTO {FACT_TABLE}
+                (accounting_date, nominal_account_number, subsidiary_to_company_ref, branch_number,
+                 debit_or_credit, ist_guv_abschluss, ist_kostenumlage, posted_value, buchungen)
+            SELECT
+                accounting_date,
+                nominal_account_number,
+                subsidiary_to_company_ref,
+                branch_number,
+                debit_or_credit,
+                {GUV_BEDINGUNG},
+                {KOSTENUMLAGE_BEDINGUNG},
+                COALESCE(SUM(posted_value), 0),
+                COUNT(*)
+            FROM "{source_table}"
+            {where}
+            GROUP BY 1, 2, 3, 4, 5, 6, 7
+        """, params)
+        rows = cursor.rowcount
+        cursor.execute(f"SELECT MAX(accounting_date)::text FROM {FACT_TABLE}")
+        hwm = cursor.fetchone()[0]
+        _save_state(cursor, mode, rows, round(time.monotonic() - started, 1), hwm)
+        cursor.execute("RELEASE SAVEPOINT tek_fact")
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT tek_fact")
+        logger.error(f"TEK-Fakt: Refresh fehlgeschlagen: {e}")
+        _save_state(cursor, mode, 0, round(time.monotonic() - started, 1), None,
+                    status='error', error=str(e)[:1000])
+        return -1
+
+    logger.info(f"TEK-Fakt: {rows:,} Zeilen ({mode}{'' if von is None else f' ab {von}'}) "
+                f"in {time.monotonic() - started:.1f}s")
+    return rows
+
+
+if __name__ == '__main__':
+    # Manueller Voll-Aufbau: python -m api.tek_fact
+    logging.basicConfig(level=logging.INFO)
+    from api.db_utils import db_session
+
+    with db_session() as conn:
+        anzahl = refresh_tek_fact(conn)
+    print(f"TEK-Fakt-Tabelle aufgebaut: {anzahl:,} Zeilen")
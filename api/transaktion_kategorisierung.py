@@ -5,13 +5,22 @@ Regelbasierte Zuordnung + optional LM Studio für Unkategorisierte.
 
 Kategorien werden in transaktionen.kategorie und transaktionen.unterkategorie gespeichert.
 Reihenfolge der Regeln: erste Übereinstimmung gewinnt.
+
+TAG 220: Regeln werden einmal zu einem Multi-Pattern-Matcher kompiliert (Trie-Regex je
+Vorzeichen-Klasse, siehe KategorieMatcher). kategorisiere_batch() streamt die Zeilen per
+Server-Side-Cursor und schreibt pro Chunk ein UPDATE ... FROM (VALUES ...) – ein
+Neu-Kategorisieren der gesamten Historie (limit=None) dauert Sekunden statt Minuten.
 """
 
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Iterable
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# TAG 220: Zeilen pro Bulk-UPDATE (UPDATE ... FROM VALUES)
+UPDATE_CHUNK_SIZE = 1000
+
 # =============================================================================
 # REGELN (erste Übereinstimmung gewinnt; Groß-/Kleinschreibung egal)
 # =============================================================================
@@ -85,6 +94,130 @@ def _suchtext(verwendungszweck: Optional[str], buchungstext: Optional[str], gege
     return " ".join(p for p in parts if p).lower()
 
 
+# =============================================================================
+# REGEL-COMPILER (TAG 220)
+# =============================================================================
+
+def _vorzeichen(betrag: Optional[float]) -> int:
+    """Vorzeichen-Klasse: 1 (positiv), -1 (negativ), 0 (null oder unbekannt)."""
+    if betrag is None:
+        return 0
+    return 1 if betrag > 0 else -1 if betrag < 0 else 0
+
+
+def _regel_gilt(regel: Dict[str, Any], vorzeichen: int) -> bool:
+    """Vorzeichen-Bedingung der Regel (nur_bei_betrag_positiv / _negativ)."""
+    if regel.get("nur_bei_betrag_positiv") and vorzeichen <= 0:
+        return False
+    if regel.get("nur_bei_betrag_negativ") and vorzeichen >= 0:
+        return False
+    return True
+
+
+def _trie_regex(begriffe: Iterable[str]) -> str:
+    """
+    Regex-Alternation als Präfixbaum: pro Textposition wird nur der passende Zweig
+    probiert (statt alle Begriffe nacheinander). Greedy → längster Treffer je Position.
+    """
+    trie: Dict[str, Any] = {}
+    for begriff in begriffe:
+        node = trie
+        for ch in begriff:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        alternativen = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alternativen:
+            return ""
+        body = alternativen[0] if len(alternativen) == 1 else "(?:" + "|".join(alternativen) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class KategorieMatcher:
+    """
+    Kompilierte Regeln: ein Pattern je Vorzeichen-Klasse, gleiche Semantik wie die
+    lineare Regel-Schleife (erste Regel in TRANSAKTION_KATEGORIEN_REGELN gewinnt).
+
+    Pro Textposition liefert die Lookahead-Suche den längsten Begriff; alle anderen
+    dort beginnenden Begriffe sind Präfixe davon. Je Begriff ist daher die beste
+    Regel über alle seine Präfix-Begriffe vorberechnet – das Minimum über alle
+    Positionen ist die erste passende Regel.
+    """
+
+    def __init__(self, regeln: List[Dict[str, Any]]):
+        self.regeln = regeln
+        self._klassen = {v: self._compile(v) for v in (1, -1, 0)}
+
+    def _compile(self, vorzeichen: int):
+        prioritaet: Dict[str, int] = {}
+        auffang = None  # erste anwendbare Regel ohne Begriffe (Sonstige Ausgaben/Einnahmen)
+        for idx, regel in enumerate(self.regeln):
+            if not _regel_gilt(regel, vorzeichen):
+                continue
+            begriffe = regel.get("begriffe") or []
+            if not begriffe:
+                if auffang is None and self._auffang_passt(regel, vorzeichen):
+                    auffang = idx
+                continue
+            for begriff in begriffe:
+                prioritaet.setdefault(begriff.lower(), idx)
+
+        # Beste Regel je Begriff inkl. aller Begriffe, die Präfix davon sind
+        beste = {
+            begriff: min(idx for kurz, idx in prioritaet.items() if begriff.startswith(kurz))
+            for begriff in prioritaet
+        }
+        pattern = re.compile("(?=(" + _trie_regex(beste) + "))") if beste else None
+        return pattern, beste, auffang
+
+    @staticmethod
+    def _auffang_passt(regel: Dict[str, Any], vorzeichen: int) -> bool:
+        # Sonstige-Regel: nur anwenden wenn betrag bekannt und Vorzeichen passt
+        if regel["kategorie"] == "Sonstige Ausgaben":
+            return vorzeichen < 0
+        if regel["kategorie"] == "Sonstige Einnahmen":
+            return vorzeichen > 0
+        return False
+
+    def match(self, text: str, betrag: Optional[float]) -> Tuple[Optional[str], Optional[str]]:
+        """(kategorie, unterkategorie) für bereits normalisierten Suchtext (siehe _suchtext)."""
+        vorzeichen = _vorzeichen(betrag)
+        pattern, beste, auffang = self._klassen[vorzeichen]
+
+        treffer = auffang
+        if pattern is not None and text:
+            for m in pattern.finditer(text):
+                idx = beste[m.group(1)]
+                if treffer is None or idx < treffer:
+                    treffer = idx
+                    if idx == 0:
+                        break
+        if treffer is not None:
+            regel = self.regeln[treffer]
+            return (regel["kategorie"], regel.get("unterkategorie"))
+
+        # Kein Treffer -> nach Vorzeichen
+        if vorzeichen < 0:
+            return ("Sonstige Ausgaben", None)
+        if vorzeichen > 0:
+            return ("Sonstige Einnahmen", None)
+        return (None, None)
+
+
+_matcher: Optional[KategorieMatcher] = None
+
+
+def get_matcher() -> KategorieMatcher:
+    """Kompilierter Matcher für TRANSAKTION_KATEGORIEN_REGELN (einmal pro Prozess)."""
+    global _matcher
+    if _matcher is None or _matcher.regeln is not TRANSAKTION_KATEGORIEN_REGELN:
+        _matcher = KategorieMatcher(TRANSAKTION_KATEGORIEN_REGELN)
+    return _matcher
+
+
 def apply_rules(
     verwendungszweck: Optional[str] = None,
     buchungstext: Optional[str] = None,
@@ -98,44 +231,7 @@ def apply_rules(
         (kategorie, unterkategorie) oder (None, None) wenn keine Regel passt.
     """
     text = _suchtext(verwendungszweck, buchungstext, gegenkonto_name)
-    if not text and not any(b for r in TRANSAKTION_KATEGORIEN_REGELN for b in r["begriffe"]):
-        # Nur Sonstige-Regeln haben leere begriffe
-        if betrag is not None:
-            if betrag < 0:
-                return ("Sonstige Ausgaben", None)
-            if betrag > 0:
-                return ("Sonstige Einnahmen", None)
-        return (None, None)
-
-    for regel in TRANSAKTION_KATEGORIEN_REGELN:
-        # Optional: Regel nur bei positivem oder negativem Betrag
-        if regel.get("nur_bei_betrag_positiv"):
-            if betrag is None or betrag <= 0:
-                continue
-        if regel.get("nur_bei_betrag_negativ"):
-            if betrag is None or betrag >= 0:
-                continue
-
-        begriffe = regel.get("begriffe") or []
-        if not begriffe:
-            # Sonstige-Regel: nur anwenden wenn betrag bekannt
-            if betrag is not None:
-                if regel["kategorie"] == "Sonstige Ausgaben" and betrag < 0:
-                    return (regel["kategorie"], regel["unterkategorie"])
-                if regel["kategorie"] == "Sonstige Einnahmen" and betrag > 0:
-                    return (regel["kategorie"], regel["unterkategorie"])
-            continue
-        for begriff in begriffe:
-            if begriff.lower() in text:
-                return (regel["kategorie"], regel["unterkategorie"])
-
-    # Kein Treffer -> nach Vorzeichen
-    if betrag is not None:
-        if betrag < 0:
-            return ("Sonstige Ausgaben", None)
-        if betrag > 0:
-            return ("Sonstige Einnahmen", None)
-    return (None, None)
+    return get_matcher().match(text, betrag)
 
 
 def get_kategorien_liste() -> List[Dict[str, Any]]:
@@ -220,9 +316,39 @@ def kategorisiere_transaktion_in_db(
     return cursor.rowcount > 0
 
 
+def bulk_update_kategorien(cursor, updates: List[Tuple[int, str, Optional[str]]],
+                           nur_unkategorisiert: bool = False) -> int:
+    """
+    Schreibt (id, kategorie, unterkategorie) mit einem UPDATE ... FROM (VALUES ...).
+    Unveränderte Zeilen werden nicht angefasst.
+
+    nur_unkategorisiert: nur Zeilen schreiben, die beim UPDATE noch keine Kategorie haben –
+    eine während der (KI-)Klassifizierung manuell gesetzte Kategorie bleibt erhalten.
+
+    Returns:
+        Anzahl tatsächlich geänderter Zeilen
+    """
+    if not updates:
+        return 0
+    values = ", ".join(["(%s, %s, %s)"] * len(updates))
+    params = [wert for update in updates for wert in update]
+    guard = "AND (t.kategorie IS NULL OR t.kategorie = '')" if nur_unkategorisiert else ""
+    cursor.execute(f"""
+        UPDATE transaktionen AS t
+        SET kategorie = v.kategorie, unterkategorie = v.unterkategorie, kategorie_manuell = false
+        FROM (VALUES {values}) AS v(id, kategorie, unterkategorie)
+        WHERE t.id = v.id::integer
+          AND (t.kategorie IS DISTINCT FROM v.kategorie
+               OR t.unterkategorie IS DISTINCT FROM v.unterkategorie
+               OR t.kategorie_manuell IS DISTINCT FROM false)
+          {guard}
+    """, params)
+    return cursor.rowcount
+
+
 def kategorisiere_batch(
     conn,
-    limit: int = 500,
+    limit: Optional[int] = 500,
     nur_unkategorisiert: bool = True,
     overwrite: bool = False,
     nur_sonstige_ausgaben: bool = False,
@@ -233,61 +359,67 @@ def kategorisiere_batch(
     Bei nur_sonstige_ausgaben=True: nur Zeilen mit kategorie = 'Sonstige Ausgaben' laden
     und mit overwrite=True neu prüfen (z. B. nach erweiterten Regeln).
 
+    TAG 220: limit=None = gesamte Historie. Zeilen werden per Server-Side-Cursor gestreamt,
+    im Speicher klassifiziert und je UPDATE_CHUNK_SIZE mit einem Bulk-UPDATE geschrieben
+    (ein Commit am Ende).
+
     Returns:
-        { "aktualisiert": int, "übersprungen": int, "fehler": int, "beispiele": [...] }
+        { "aktualisiert": int, "unveraendert": int, "uebersprungen": int, "fehler": int, "beispiele": [...] }
     """
-    from api.db_connection import sql_placeholder, convert_placeholders
-
-    ph = sql_placeholder()
-    cursor = conn.cursor()
+    from api.db_connection import iter_query_batches
 
     if nur_sonstige_ausgaben:
         where = " AND kategorie = 'Sonstige Ausgaben'"
         overwrite = True
     else:
         where = " AND (kategorie IS NULL OR kategorie = '')" if nur_unkategorisiert else ""
-    cursor.execute(
-        convert_placeholders("""
-            SELECT id, verwendungszweck, buchungstext, gegenkonto_name, betrag
-            FROM transaktionen
-            WHERE 1=1 """ + where + """
-            ORDER BY buchungsdatum DESC, id DESC
-            LIMIT """ + str(int(limit))
-        ),
-    )
-    rows = cursor.fetchall()
+    query = """
+        SELECT id, verwendungszweck, buchungstext, gegenkonto_name, betrag
+        FROM transaktionen
+        WHERE 1=1 """ + where + """
+        ORDER BY buchungsdatum DESC, id DESC
+    """
+    if limit is not None:
+        query += " LIMIT " + str(int(limit))
+
+    matcher = get_matcher()
+    cursor = conn.cursor()
 
+    gelesen = 0
     aktualisiert = 0
     uebersprungen = 0
     fehler = 0
     beispiele = []
+    updates: List[Tuple[int, str, Optional[str]]] = []
 
-    for row in rows:
-        rid = row.get("id") if hasattr(row, "get") else row[0]
-        vw = row.get("verwendungszweck") if hasattr(row, "get") else (row[1] if len(row) > 1 else None)
-        bt = row.get("buchungstext") if hasattr(row, "get") else (row[2] if len(row) > 2 else None)
-        gk = row.get("gegenkonto_name") if hasattr(row, "get") else (row[3] if len(row) > 3 else None)
-        betrag = row.get("betrag") if hasattr(row, "get") else (row[4] if len(row) > 4 else None)
-
-        kat, unterkat = apply_rules(verwendungszweck=vw, buchungstext=bt, gegenkonto_name=gk, betrag=betrag)
-        if kat is None:
-            uebersprungen += 1
-            continue
+    def flush():
+        nonlocal aktualisiert, fehler
         try:
-            cursor.execute(
-                convert_placeholders("""
-                    UPDATE transaktionen SET kategorie = """ + ph + """, unterkategorie = """ + ph + """, kategorie_manuell = false
-                    WHERE id = """ + ph
-                ),
-                (kat, unterkat, rid),
+            cursor.execute("SAVEPOINT kategorisierung")
+            aktualisiert += bulk_update_kategorien(
+                cursor, updates, nur_unkategorisiert=nur_unkategorisiert and not overwrite
             )
-            if cursor.rowcount > 0:
-                aktualisiert += 1
-                if len(beispiele) < 5:
-                    beispiele.append({"id": rid, "kategorie": kat, "unterkategorie": unterkat})
+            cursor.execute("RELEASE SAVEPOINT kategorisierung")
         except Exception as e:
-            logger.warning("Kategorisierung Transaktion %s: %s", rid, e)
-            fehler += 1
+            cursor.execute("ROLLBACK TO SAVEPOINT kategorisierung")
+            logger.warning("Kategorisierung: Bulk-UPDATE für %s Transaktionen fehlgeschlagen: %s", len(updates), e)
+            fehler += len(updates)
+        updates.clear()
+
+    for batch in iter_query_batches(conn, query, batch_size=UPDATE_CHUNK_SIZE):
+        for row in batch:
+            gelesen += 1
+            text = _suchtext(row.get("verwendungszweck"), row.get("buchungstext"), row.get("gegenkonto_name"))
+            kat, unterkat = matcher.match(text, row.get("betrag"))
+            if kat is None:
+                uebersprungen += 1
+                continue
+            updates.append((row["id"], kat, unterkat))
+            if len(beispiele) < 5:
+                beispiele.append({"id": row["id"], "kategorie": kat, "unterkategorie": unterkat})
+            if len(updates) >= UPDATE_CHUNK_SIZE:
+                flush()
+    flush()
 
     try:
         conn.commit()
@@ -296,7 +428,26 @@ def kategorisiere_batch(
 
     return {
         "aktualisiert": aktualisiert,
+        "unveraendert": gelesen - uebersprungen - fehler - aktualisiert,
         "uebersprungen": uebersprungen,
         "fehler": fehler,
         "beispiele": beispiele,
     }
+
+
+if __name__ == "__main__":
+    # Gesamte Historie nach Regeländerung neu kategorisieren:
+    #   python -m api.transaktion_kategorisierung [--alle]
+    # ohne --alle: nur unkategorisierte Transaktionen
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    from api.db_utils import db_session
+
+    alle = "--alle" in sys.argv
+    start = time.monotonic()
+    with db_session() as conn:
+        ergebnis = kategorisiere_batch(conn, limit=None, nur_unkategorisiert=not alle, overwrite=alle)
+    ergebnis.pop("beispiele", None)
+    print(f"Kategorisierung: {ergebnis} in {time.monotonic() - start:.1f}s")
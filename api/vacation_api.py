@@ -57,6 +57,16 @@ from api.db_connection import (
     sql_placeholder
 )
 
+# TAG 220: Mengenbasierte Validierung (eine Query pro Datumsbereich statt pro Tag)
+from api.vacation_validation import (
+    load_work_weekday_intervals,
+    work_weekdays_at,
+    count_working_days,
+    contingent_days,
+    check_max_absence,
+    to_date,
+)
+
 # Approver Service importieren
 from api.vacation_approver_service import (
     get_approvers_for_employee,
@@ -193,70 +203,9 @@ def _check_max_absence_per_dept_location(cursor, employee_id, dates_list, vacati
     Prüft ob durch die neue Buchung die Grenze (Default 50%, editierbar pro Abteilung/Standort) überschritten würde.
     vacation_type_id: 1 = Urlaub, 9 = Schulung (nur diese prüfen).
     Returns: None wenn OK; sonst (blocked_dates, max_percent, current_absent, total) für Fehlermeldung.
+    TAG 220: alle Tage mit einer Query (api.vacation_validation.check_max_absence)
     """
-    if not dates_list or vacation_type_id not in (1, 9):
-        return None
-    try:
-        q = "SELECT department_name, COALESCE(NULLIF(TRIM(location), ''), 'Deggendorf') as loc FROM employees WHERE id = " + sql_placeholder() + " AND aktiv = true"
-        cursor.execute(convert_placeholders(q), (employee_id,))
-        row = cursor.fetchone()
-        if not row:
-            return None
-        department_name, location = row[0], (row[1] or '') or 'Deggendorf'
-        # Standort: Landau vs Deggendorf (einheitlich für Abgleich)
-        loc_normalized = 'Landau' if location and 'landau' in str(location).lower() else 'Deggendorf'
-
-        # Max-% aus Tabelle (Default 50)
-        max_percent = 50
-        try:
-            cursor.execute(convert_placeholders("""
-                SELECT max_absence_percent FROM department_absence_limits
-                WHERE department_name = """ + sql_placeholder() + """ AND location = """ + sql_placeholder()),
-                (department_name, loc_normalized))
-            r = cursor.fetchone()
-            if r:
-                max_percent = int(r[0])
-        except Exception:
-            pass
-
-        # SQL: Standort = Landau wenn location "landau" enthält, sonst Deggendorf
-        loc_case = "CASE WHEN LOWER(COALESCE(e.location,'')) LIKE '%landau%' THEN 'Landau' ELSE 'Deggendorf' END"
-        ph = sql_placeholder()
-        cursor.execute(convert_placeholders(f"""
-            SELECT COUNT(*) FROM employees e
-            WHERE e.department_name = {ph}
-              AND {loc_case} = {ph}
-              AND e.aktiv = true
-        """), (department_name, loc_normalized))
-        total = cursor.fetchone()[0] or 0
-        if total == 0:
-            return None
-
-        blocked = []
-        first_absent = 0
-        for d in dates_list:
-            cursor.execute(convert_placeholders(f"""
-                SELECT COUNT(DISTINCT vb.employee_id)
-                FROM vacation_bookings vb
-                JOIN employees e ON e.id = vb.employee_id
-                WHERE e.department_name = {ph}
-                  AND {loc_case} = {ph}
-                  AND e.aktiv = true
-                  AND vb.booking_date = {ph}
-                  AND vb.vacation_type_id IN (1, 9)
-                  AND vb.status IN ('pending', 'approved')
-            """), (department_name, loc_normalized, d))
-            absent = cursor.fetchone()[0] or 0
-            if (absent + 1) / total > max_percent / 100.0:
-                blocked.append(d)
-                if first_absent == 0:
-                    first_absent = absent
-        if blocked:
-            return (sorted(blocked), max_percent, first_absent, total)
-        return None
-    except Exception:
-        # Tabelle department_absence_limits kann fehlen
-        return None
+    return check_max_absence(cursor, employee_id, dates_list, vacation_type_id)
 
 
 # E-Mail-Konfiguration
@@ -427,63 +376,26 @@ def _get_work_weekdays_for_employee_at_date(cursor, employee_id, d):
             date_val = datetime.strptime(str(d)[:10], '%Y-%m-%d').date()
         except Exception:
             return {0, 1, 2, 3, 4}
-    cursor.execute("""
-        SELECT work_weekdays FROM employee_working_time_models
-        WHERE employee_id = %s AND start_date <= %s AND (end_date IS NULL OR end_date >= %s)
-        ORDER BY start_date DESC LIMIT 1
-    """, (employee_id, date_val, date_val))
-    row = cursor.fetchone()
-    if not row or not row[0]:
-        return {0, 1, 2, 3, 4}
-    raw = str(row[0]).strip()
-    if not raw:
-        return {0, 1, 2, 3, 4}
-    try:
-        return set(int(x.strip()) for x in raw.split(',') if x.strip().isdigit())
-    except Exception:
-        return {0, 1, 2, 3, 4}
+    return work_weekdays_at(load_work_weekday_intervals(cursor, employee_id, [date_val]), date_val)
 
 
 def _count_working_days_for_employee(cursor, employee_id, dates, day_part='full'):
     """
     Zählt nur Arbeitstage (nicht Wochenende, nicht Nicht-Arbeitstage laut Arbeitszeitmodell).
     Rückgabe: Anzahl Tage, die vom Urlaubskonto abgezogen werden.
+    TAG 220: Arbeitszeitmodelle für den ganzen Bereich mit einer Query
     """
-    day_val = 1.0 if day_part == 'full' else 0.5
-    total = 0.0
-    for d in dates:
-        try:
-            if hasattr(d, 'weekday'):
-                date_obj = d
-            else:
-                date_obj = datetime.strptime(str(d)[:10], '%Y-%m-%d').date()
-            wd = date_obj.weekday()  # 0=Mo, 6=So
-        except Exception:
-            total += day_val
-            continue
-        if wd >= 5:  # Sa, So
-            continue
-        work = _get_work_weekdays_for_employee_at_date(cursor, employee_id, date_obj)
-        if wd in work:
-            total += day_val
-    return total
+    return count_working_days(load_work_weekday_intervals(cursor, employee_id, dates), dates, day_part)
 
 
-def _contingent_days_for_booking(employee_id, booking_date, day_part, cursor):
+def _contingent_days_for_booking(employee_id, booking_date, day_part, cursor, intervals=None):
     """
     contingent_days für eine Urlaubsbuchung (type_id=1): 0 wenn Nicht-Arbeitstag/Wochenende, sonst 1.0/0.5.
+    intervals: bereits geladene Arbeitszeitmodelle (load_work_weekday_intervals) – spart die Query pro Tag.
     """
-    try:
-        date_obj = datetime.strptime(str(booking_date)[:10], '%Y-%m-%d').date()
-    except Exception:
-        return 1.0 if day_part == 'full' else 0.5
-    wd = date_obj.weekday()
-    if wd >= 5:
-        return 0
-    work = _get_work_weekdays_for_employee_at_date(cursor, employee_id, date_obj)
-    if wd not in work:
-        return 0
-    return 1.0 if day_part == 'full' else 0.5
+    if intervals is None:
+        intervals = load_work_weekday_intervals(cursor, employee_id, [booking_date])
+    return contingent_days(intervals, booking_date, day_part)
 
 
 def _get_non_work_weekdays_for_employee_year(cursor, employee_id, year):
@@ -2062,32 +1974,41 @@ def approve_batch_vacation():
         bookings_data = []
         with db_session() as conn:
             cursor = conn.cursor()
-            for bid in booking_ids:
-                cursor.execute("""
-                    SELECT vb.id, vb.employee_id, vb.status, vb.booking_date, vb.day_part,
-                           vb.vacation_type_id, vt.name as vacation_type,
-                           e.first_name || ' ' || e.last_name as employee_name,
-                           e.email as employee_email, e.department_name
-                    FROM vacation_bookings vb
-                    JOIN employees e ON vb.employee_id = e.id
-                    LEFT JOIN vacation_types vt ON vb.vacation_type_id = vt.id
-                    WHERE vb.id = %s
-                """, (bid,))
-                row = cursor.fetchone()
+            # TAG 220: alle Buchungen mit einer Query laden, genehmigen mit einem UPDATE
+            try:
+                ids = [int(b) for b in booking_ids]
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'booking_ids müssen Zahlen sein'}), 400
+            cursor.execute("""
+                SELECT vb.id, vb.employee_id, vb.status, vb.booking_date, vb.day_part,
+                       vb.vacation_type_id, vt.name as vacation_type,
+                       e.first_name || ' ' || e.last_name as employee_name,
+                       e.email as employee_email, e.department_name
+                FROM vacation_bookings vb
+                JOIN employees e ON vb.employee_id = e.id
+                LEFT JOIN vacation_types vt ON vb.vacation_type_id = vt.id
+                WHERE vb.id = ANY(%s)
+            """, (ids,))
+            rows_by_id = {row[0]: row for row in cursor.fetchall()}
+            to_approve = []
+            for bid in dict.fromkeys(ids):
+                row = rows_by_id.get(bid)
                 if not row:
                     continue
                 if row[2] != 'pending':
                     continue
                 if not is_admin and row[1] not in team_ids:
                     continue
-                upd = f"""
+                to_approve.append(row)
+            if to_approve:
+                cursor.execute("""
                     UPDATE vacation_bookings
-                    SET status = 'approved', approved_by = {sql_placeholder()}, approved_at = {sql_placeholder()},
-                    comment = CASE WHEN comment IS NULL OR comment = '' THEN {sql_placeholder()} ELSE comment || ' | Genehmigt: ' || {sql_placeholder()} END
-                    WHERE id = {sql_placeholder()}
-                """
-                upd = convert_placeholders(upd)
-                cursor.execute(upd, (employee_id, datetime.now().isoformat(), comment, comment, bid))
+                    SET status = 'approved', approved_by = %s, approved_at = %s,
+                    comment = CASE WHEN comment IS NULL OR comment = '' THEN %s ELSE comment || ' | Genehmigt: ' || %s END
+                    WHERE id = ANY(%s)
+                """, (employee_id, datetime.now().isoformat(), comment, comment, [row[0] for row in to_approve]))
+            for row in to_approve:
+                bid = row[0]
                 approved.append(bid)
                 bdate = row[3]
                 if hasattr(bdate, 'isoformat'):
@@ -3535,14 +3456,13 @@ def book_vacation_batch():
                     }), 400
 
             # Prüfe ob bereits Buchungen existieren (nur pending/approved blockieren – rejected zählt nicht)
-            existing = []
-            for d in dates:
-                query = f"SELECT id, status FROM vacation_bookings WHERE employee_id = {sql_placeholder()} AND booking_date = {sql_placeholder()} AND status IN ('pending', 'approved')"
-                query = convert_placeholders(query)
-                cursor.execute(query, (employee_id, d))
-                row = cursor.fetchone()
-                if row:
-                    existing.append(d)
+            # TAG 220: eine Query für alle Tage
+            cursor.execute("""
+                SELECT DISTINCT booking_date FROM vacation_bookings
+                WHERE employee_id = %s AND booking_date = ANY(%s::date[]) AND status IN ('pending', 'approved')
+            """, (employee_id, dates))
+            booked = {to_date(row[0]) for row in cursor.fetchall()}
+            existing = [d for d in dates if to_date(d) in booked]
 
             if existing:
                 return jsonify({
@@ -3585,8 +3505,9 @@ def book_vacation_batch():
             if '?' in insert_query:
                 print(f"⚠️ WARNUNG: convert_placeholders() hat nicht funktioniert! Query enthält noch ?: {insert_query[:100]}")
                 print(f"⚠️ DB_TYPE: {get_db_type()}")
+            intervals = load_work_weekday_intervals(cursor, employee_id, dates) if vacation_type_id == 1 else None
             for d in dates:
-                cont_days = _contingent_days_for_booking(employee_id, d, day_part, cursor) if vacation_type_id == 1 else None
+                cont_days = _contingent_days_for_booking(employee_id, d, day_part, cursor, intervals) if vacation_type_id == 1 else None
                 cursor.execute(insert_query, (employee_id, d, vacation_type_id, day_part, initial_status, comment, datetime.now().isoformat(), cont_days))
                 if use_returning:
                     row = cursor.fetchone()
@@ -0,0 +1,211 @@
+"""
+Urlaubs-Validierung mengenbasiert - TAG 220
+============================================
+Prüfungen für book / book-batch / Masseneingabe über einen ganzen Datumsbereich:
+
+- Arbeitszeitmodelle eines MA: EINE Query für alle Modelle, die den Bereich berühren,
+  danach Arbeitstage/contingent_days pro Datum im Speicher
+- Max. Abwesenheit Abteilung/Standort: EINE Query mit Abwesenden je Datum (GROUP BY),
+  nur aktiv mit VACATION_ABSENCE_CAP_ENABLED=1 (siehe ABSENCE_CAP_ENABLED)
+
+Vorher: eine Query pro Datum (3 Wochen book-batch → Dutzende Roundtrips allein für
+Arbeitstage, Kontingent und Abwesenheitsgrenze). Ergebnisse sind identisch zu den
+bisherigen Einzelprüfungen in api/vacation_api.py.
+
+Verwendung:
+    from api.vacation_validation import load_work_weekday_intervals, contingent_days
+
+    intervals = load_work_weekday_intervals(cursor, employee_id, dates)
+    for d in dates:
+        cont = contingent_days(intervals, d, day_part)
+"""
+
+import os
+from datetime import date, datetime
+from typing import Iterable, List, NamedTuple, Optional, Set
+
+# Ohne Arbeitszeitmodell (oder work_weekdays NULL/leer): Mo–Fr
+DEFAULT_WORK_WEEKDAYS = frozenset({0, 1, 2, 3, 4})
+
+# Max. Abwesenheit Abteilung/Standort durchsetzen: bisher nie wirksam (die alte Einzelabfrage
+# scheiterte am unescapten '%landau%', der Fehler wurde verschluckt) → erst bewusst einschalten
+ABSENCE_CAP_ENABLED = os.getenv('VACATION_ABSENCE_CAP_ENABLED', '0').lower() not in ('0', 'false', 'no')
+
+# Standort-Normalisierung wie in employees.location (Landau vs. Deggendorf)
+LOC_CASE = "CASE WHEN LOWER(COALESCE(e.location,'')) LIKE '%%landau%%' THEN 'Landau' ELSE 'Deggendorf' END"
+
+
+class WorkWeekdayInterval(NamedTuple):
+    """Gültigkeitszeitraum eines Arbeitszeitmodells mit seinen Arbeitstagen (0=Mo..6=So)."""
+    start_date: date
+    end_date: Optional[date]
+    weekdays: frozenset
+
+
+def to_date(d) -> Optional[date]:
+    """date/datetime oder 'YYYY-MM-DD...' → date (None bei ungültigem Wert)."""
+    if isinstance(d, datetime):
+        return d.date()
+    if hasattr(d, 'year'):
+        return d
+    try:
+        return datetime.strptime(str(d)[:10], '%Y-%m-%d').date()
+    except Exception:
+        return None
+
+
+def _parse_weekdays(raw) -> frozenset:
+    """work_weekdays ('0,1,2,3,4') → Menge; NULL/leer → Mo–Fr."""
+    if not raw:
+        return DEFAULT_WORK_WEEKDAYS
+    raw = str(raw).strip()
+    if not raw:
+        return DEFAULT_WORK_WEEKDAYS
+    try:
+        return frozenset(int(x.strip()) for x in raw.split(',') if x.strip().isdigit())
+    except Exception:
+        return DEFAULT_WORK_WEEKDAYS
+
+
+# =============================================================================
+# ARBEITSZEITMODELLE
+# =============================================================================
+
+def load_work_weekday_intervals(cursor, employee_id, dates: Iterable) -> List[WorkWeekdayInterval]:
+    """
+    Alle Arbeitszeitmodelle des MA, die den Bereich min(dates)..max(dates) berühren (eine Query).
+    Sortiert nach start_date absteigend – wie ORDER BY start_date DESC LIMIT 1 der Einzelabfrage.
+    """
+    parsed = [d for d in (to_date(d) for d in dates) if d is not None]
+    if not parsed:
+        return []
+    cursor.execute("""
+        SELECT start_date, end_date, work_weekdays FROM employee_working_time_models
+        WHERE employee_id = %s AND start_date <= %s AND (end_date IS NULL OR end_date >= %s)
+        ORDER BY start_date DESC
+    """, (employee_id, max(parsed), min(parsed)))
+    return [
+        WorkWeekdayInterval(to_date(row[0]), to_date(row[1]) if row[1] else None, _parse_weekdays(row[2]))
+        for row in cursor.fetchall()
+    ]
+
+
+def work_weekdays_at(intervals: List[WorkWeekdayInterval], d: date) -> Set[int]:
+    """Arbeitstage am Datum d: jüngstes gültiges Modell, sonst Mo–Fr."""
+    for interval in intervals:
+        if interval.start_date <= d and (interval.end_date is None or interval.end_date >= d):
+            return set(interval.weekdays)
+    return set(DEFAULT_WORK_WEEKDAYS)
+
+
+def count_working_days(intervals: List[WorkWeekdayInterval], dates: Iterable, day_part: str = 'full') -> float:
+    """
+    Zählt nur Arbeitstage (nicht Wochenende, nicht Nicht-Arbeitstage laut Arbeitszeitmodell).
+    Ungültige Datumswerte zählen wie bisher voll.
+    """
+    day_val = 1.0 if day_part == 'full' else 0.5
+    total = 0.0
+    for d in dates:
+        date_obj = to_date(d)
+        if date_obj is None:
+            total += day_val
+            continue
+        wd = date_obj.weekday()  # 0=Mo, 6=So
+        if wd >= 5:  # Sa, So
+            continue
+        if wd in work_weekdays_at(intervals, date_obj):
+            total += day_val
+    return total
+
+
+def contingent_days(intervals: List[WorkWeekdayInterval], booking_date, day_part: str):
+    """contingent_days für eine Urlaubsbuchung: 0 bei Nicht-Arbeitstag/Wochenende, sonst 1.0/0.5."""
+    date_obj = to_date(booking_date)
+    if date_obj is None:
+        return 1.0 if day_part == 'full' else 0.5
+    wd = date_obj.weekday()
+    if wd >= 5:
+        return 0
+    if wd not in work_weekdays_at(intervals, date_obj):
+        return 0
+    return 1.0 if day_part == 'full' else 0.5
+
+
+# =============================================================================
+# MAX. ABWESENHEIT PRO ABTEILUNG / STANDORT
+# =============================================================================
+
+def check_max_absence(cursor, employee_id, dates_list, vacation_type_id):
+    """
+    Max. Abwesenheit pro Abteilung und Standort (nur planbar: Urlaub + Schulung; Krankheit nicht).
+    Abwesende für alle Tage in einer Query (GROUP BY booking_date), Bewertung im Speicher.
+
+    Returns: None wenn OK; sonst (blocked_dates, max_percent, current_absent, total) für Fehlermeldung.
+    Ohne VACATION_ABSENCE_CAP_ENABLED immer None (bisheriges Verhalten).
+    """
+    if not ABSENCE_CAP_ENABLED or not dates_list or vacation_type_id not in (1, 9):
+        return None
+    try:
+        cursor.execute("""
+            SELECT department_name, COALESCE(NULLIF(TRIM(location), ''), 'Deggendorf') as loc
+            FROM employees WHERE id = %s AND aktiv = true
+        """, (employee_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        department_name, location = row[0], (row[1] or '') or 'Deggendorf'
+        # Standort: Landau vs Deggendorf (einheitlich für Abgleich)
+        loc_normalized = 'Landau' if location and 'landau' in str(location).lower() else 'Deggendorf'
+
+        # Max-% aus Tabelle (Default 50)
+        max_percent = 50
+        try:
+            cursor.execute("""
+                SELECT max_absence_percent FROM department_absence_limits
+                WHERE department_name = %s AND location = %s
+            """, (department_name, loc_normalized))
+            r = cursor.fetchone()
+            if r:
+                max_percent = int(r[0])
+        except Exception:
+            pass
+
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM employees e
+            WHERE e.department_name = %s
+              AND {LOC_CASE} = %s
+              AND e.aktiv = true
+        """, (department_name, loc_normalized))
+        total = cursor.fetchone()[0] or 0
+        if total == 0:
+            return None
+
+        tage = {d: to_date(d) for d in dates_list}
+        cursor.execute(f"""
+            SELECT vb.booking_date, COUNT(DISTINCT vb.employee_id)
+            FROM vacation_bookings vb
+            JOIN employees e ON e.id = vb.employee_id
+            WHERE e.department_name = %s
+              AND {LOC_CASE} = %s
+              AND e.aktiv = true
+              AND vb.booking_date = ANY(%s::date[])
+              AND vb.vacation_type_id IN (1, 9)
+              AND vb.status IN ('pending', 'approved')
+            GROUP BY vb.booking_date
+        """, (department_name, loc_normalized, sorted({str(t) for t in tage.values() if t})))
+        absent_by_date = {to_date(r[0]): r[1] or 0 for r in cursor.fetchall()}
+
+        blocked = []
+        first_absent = 0
+        for d in dates_list:
+            absent = absent_by_date.get(tage[d], 0)
+            if (absent + 1) / total > max_percent / 100.0:
+                blocked.append(d)
+                if first_absent == 0:
+                    first_absent = absent
+        if blocked:
+            return (sorted(blocked), max_percent, first_absent, total)
+        return None
+    except Exception:
+        # Tabelle department_absence_limits kann fehlen
+        return None
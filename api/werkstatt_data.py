@@ -46,6 +46,8 @@ from api.standort_utils import BETRIEB_NAMEN
 # SSOT: KPI-Berechnungen
 from utils.kpi_definitions import berechne_anwesenheitsgrad
 
+from api.cache_utils import cached_result
+
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -73,6 +75,9 @@ ARBEITSZEIT_START = time(7, 0)   # 07:00 Uhr
 ARBEITSZEIT_ENDE = time(17, 0)   # 17:00 Uhr
 STUNDEN_PRO_TAG = 10.0           # Effektive Arbeitsstunden
 
+# Kapazitäts-Forecast: Cache je Betrieb/Zeitraum (zusätzlich invalidiert bei Stempeluhr-Änderungen)
+FORECAST_CACHE_TTL = 60
+
 
 # =============================================================================
 # HILFSFUNKTIONEN (VOR KLASSE)
@@ -347,32 +352,27 @@ class WerkstattData:
             for b_leerlauf in LEERLAUF_AUFTRAEGE_PRO_BETRIEB.values():
                 leerlauf_auftraege.extend(b_leerlauf)
             leerlauf_auftraege = list(set(leerlauf_auftraege))  # Duplikate entfernen
-        
-        # Filter für Leerlaufaufträge aufbauen
-        leerlauf_filter = ""
-        if leerlauf_auftraege:
-            leerlauf_filter = f"AND t.order_number != ALL(ARRAY[{','.join(map(str, leerlauf_auftraege))}])"
-        else:
-            # Fallback: Nur Order 31 ausschließen (wie bisher)
-            leerlauf_filter = "AND t.order_number > 31"
 
-        # TAG 194: REFACTORED - Nutze neue separate Funktionen
-        # NEUIMPLEMENTIERUNG TAG 196: Einfache, korrekte Funktionen nach Locosoft-Definition
-        # 
+        # TAG 220: Alle Rohdaten in einem Durchlauf (times + labours je einmal,
+        # abgeschlossene Tage/Zeiträume gecacht) - siehe api/werkstatt_leistung.py.
+        # Werte identisch zu get_vorgabezeit_aus_labours, get_stempelzeit_aus_times,
+        # get_anwesenheit_aus_times, get_stempelzeit_locosoft, get_stempelzeit_leistungsgrad.
+        from api.werkstatt_leistung import get_leistung_rohdaten
+        leistung_roh = get_leistung_rohdaten(von, bis, leerlauf_auftraege)
+
         # 1. VORGABEZEIT (AW-Anteil) aus labours
-        vorgabezeit_data = WerkstattData.get_vorgabezeit_aus_labours(von, bis)
-        
+        vorgabezeit_data = leistung_roh['vorgabezeit']
+
         # 2. STEMPELZEIT (St-Anteil) aus times type=2 - OHNE 0.75 Faktor!
-        stempelzeit_data = WerkstattData.get_stempelzeit_aus_times(von, bis)
-        
+        stempelzeit_data = leistung_roh['stempelzeit']
+
         # 3. ANWESENHEIT aus times type=1
-        anwesenheit_data = WerkstattData.get_anwesenheit_aus_times(von, bis)
-        
-        # Legacy-Funktionen (für Kompatibilität, werden nicht mehr verwendet)
-        stempelzeit_locosoft = WerkstattData.get_stempelzeit_locosoft(von, bis, leerlauf_filter)
-        stempelzeit_leistungsgrad = WerkstattData.get_stempelzeit_leistungsgrad(von, bis, leerlauf_filter)
-        stempelungen_roh = WerkstattData.get_stempelungen_roh(von, bis)
-        
+        anwesenheit_data = leistung_roh['anwesenheit']
+
+        # Locosoft-Stempelzeit (Tage, Aufträge, Zeit-Spanne als Anwesenheits-Fallback)
+        stempelzeit_locosoft = leistung_roh['stempelzeit_locosoft']
+        stempelzeit_leistungsgrad = leistung_roh['stempelzeit_leistungsgrad']
+
         # NEUIMPLEMENTIERUNG TAG 196: Einfache, korrekte Zuordnung
         # 
         # REGEL: Stempelzeit ≤ Anwesenheit (IMMER!)
@@ -406,14 +406,14 @@ class WerkstattData:
                 if anwesenheit_fallback_std >= stempelzeit_std:
                     # Fallback ist plausibel (Zeit-Spanne ≥ Stempelzeit)
                     anwesenheit_std = anwesenheit_fallback_std
-                    print(f"WerkstattData.get_mechaniker_leistung: MA {emp_nr}: "
-                          f"type=1 Daten unvollständig ({anwesenheit_std_roh:.1f} Std < Stempelzeit {stempelzeit_std:.1f} Std). "
-                          f"Verwende Fallback: Zeit-Spanne {anwesenheit_std:.1f} Std")
+                    logger.debug(f"WerkstattData.get_mechaniker_leistung: MA {emp_nr}: "
+                                 f"type=1 Daten unvollständig ({anwesenheit_std_roh:.1f} Std < Stempelzeit {stempelzeit_std:.1f} Std). "
+                                 f"Verwende Fallback: Zeit-Spanne {anwesenheit_std:.1f} Std")
                 else:
                     # Letzter Fallback: Stempelzeit + 20% Puffer (für Pausen, Leerlauf)
                     anwesenheit_std = stempelzeit_std * 1.2
-                    print(f"WerkstattData.get_mechaniker_leistung: MA {emp_nr}: "
-                          f"Keine plausiblen Anwesenheitsdaten. Verwende Stempelzeit × 1.2 = {anwesenheit_std:.1f} Std")
+                    logger.debug(f"WerkstattData.get_mechaniker_leistung: MA {emp_nr}: "
+                                 f"Keine plausiblen Anwesenheitsdaten. Verwende Stempelzeit × 1.2 = {anwesenheit_std:.1f} Std")
             elif anwesenheit_std_roh == 0 and stempelzeit_std > 0:
                 # Keine type=1 Daten vorhanden, verwende Fallback
                 if anwesenheit_fallback_std >= stempelzeit_std:
@@ -564,71 +564,64 @@ class WerkstattData:
         else:
             gesamt_produktivitaet = round(gesamt_stempelzeit_std / gesamt_anwesenheit_std * 100, 1) if gesamt_anwesenheit_std > 0 else None
         
-        # Anzahl Arbeitstage
-        with locosoft_session() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT COUNT(DISTINCT DATE(start_time)) as count
-                FROM times
-                WHERE type = 2 AND start_time >= %s AND start_time < %s + INTERVAL '1 day'
-            """, [von, bis])
-            anzahl_tage = cursor.fetchone()['count'] or 0
-
-            # Anwesenheitsgrad berechnen (TAG 181 - SSOT)
-            # FIX TAG 196: Verwende bereits berechnete anwesenheitsgrad Werte aus kpis,
-            # da diese die korrekten Arbeitstage im Zeitraum verwenden!
-            # Die Funktion berechne_anwesenheitsgrad_fuer_mechaniker_liste() würde sonst
-            # die falschen 'tage' (Tage mit Stempelungen) verwenden.
-            gesamt_anwesend_h = sum(m.get('anwesenheit_std', m.get('anwesenheit', 0) / 60) for m in mechaniker_liste)
-            # Berechne Gesamt-Bezahlt aus Arbeitstagen im Zeitraum
-            arbeitstage_gesamt = 0
-            current = von
-            while current <= bis:
-                if current.weekday() < 5:  # Mo-Fr
-                    arbeitstage_gesamt += 1
-                current += timedelta(days=1)
-            gesamt_bezahlt_h = arbeitstage_gesamt * 8.0 * len(mechaniker_liste)  # Arbeitstage × 8h × Anzahl Mechaniker
-            gesamt_anwesenheitsgrad = berechne_anwesenheitsgrad(gesamt_anwesend_h, gesamt_bezahlt_h) if gesamt_bezahlt_h > 0 else None
-            
-            # Aktualisiere mechaniker_liste mit bereits berechneten anwesenheitsgrad Werten
-            for m in mechaniker_liste:
-                # anwesenheitsgrad wurde bereits in berechne_mechaniker_kpis_aus_rohdaten() korrekt berechnet
-                # Verwende diesen Wert, überschreibe nicht!
-                if 'anwesenheitsgrad' not in m:
-                    # Fallback: Berechne aus anwesenheit_std und arbeitstagen
-                    anwesenheit_std = m.get('anwesenheit_std', m.get('anwesenheit', 0) / 60)
-                    bezahlt_h = arbeitstage_gesamt * 8.0
-                    m['anwesenheitsgrad'] = berechne_anwesenheitsgrad(anwesenheit_std, bezahlt_h)
-
-            logger.info(f"WerkstattData.get_mechaniker_leistung: {len(mechaniker_liste)} Mechaniker, Zeitraum {von} - {bis}")
+        # Anzahl Arbeitstage (Tage mit type=2 Stempelungen, aus denselben Rohdaten)
+        anzahl_tage = leistung_roh['anzahl_tage']
+
+        # Anwesenheitsgrad berechnen (TAG 181 - SSOT)
+        # FIX TAG 196: Verwende bereits berechnete anwesenheitsgrad Werte aus kpis,
+        # da diese die korrekten Arbeitstage im Zeitraum verwenden!
+        # Die Funktion berechne_anwesenheitsgrad_fuer_mechaniker_liste() würde sonst
+        # die falschen 'tage' (Tage mit Stempelungen) verwenden.
+        gesamt_anwesend_h = sum(m.get('anwesenheit_std', m.get('anwesenheit', 0) / 60) for m in mechaniker_liste)
+        # Berechne Gesamt-Bezahlt aus Arbeitstagen im Zeitraum
+        arbeitstage_gesamt = 0
+        current = von
+        while current <= bis:
+            if current.weekday() < 5:  # Mo-Fr
+                arbeitstage_gesamt += 1
+            current += timedelta(days=1)
+        gesamt_bezahlt_h = arbeitstage_gesamt * 8.0 * len(mechaniker_liste)  # Arbeitstage × 8h × Anzahl Mechaniker
+        gesamt_anwesenheitsgrad = berechne_anwesenheitsgrad(gesamt_anwesend_h, gesamt_bezahlt_h) if gesamt_bezahlt_h > 0 else None
+        
+        # Aktualisiere mechaniker_liste mit bereits berechneten anwesenheitsgrad Werten
+        for m in mechaniker_liste:
+            # anwesenheitsgrad wurde bereits in berechne_mechaniker_kpis_aus_rohdaten() korrekt berechnet
+            # Verwende diesen Wert, überschreibe nicht!
+            if 'anwesenheitsgrad' not in m:
+                # Fallback: Berechne aus anwesenheit_std und arbeitstagen
+                anwesenheit_std = m.get('anwesenheit_std', m.get('anwesenheit', 0) / 60)
+                bezahlt_h = arbeitstage_gesamt * 8.0
+                m['anwesenheitsgrad'] = berechne_anwesenheitsgrad(anwesenheit_std, bezahlt_h)
+
+        logger.info(f"WerkstattData.get_mechaniker_leistung: {len(mechaniker_liste)} Mechaniker, Zeitraum {von} - {bis}")
 
-            return {
-                'zeitraum': {
-                    'von': str(von),
-                    'bis': str(bis)
-                },
-                'betrieb': betrieb,
-                'mechaniker': mechaniker_liste,
-                'anzahl_mechaniker': len(mechaniker_liste),
-                'anzahl_tage': anzahl_tage,
-                'gesamt': {
-                    'auftraege': gesamt_auftraege,
-                    'stempelzeit': round(gesamt_stempelzeit_std * 60, 0),  # St-Anteil in Minuten (für Kompatibilität)
-                    'stempelzeit_std': round(gesamt_stempelzeit_std, 1),  # St-Anteil in Stunden (SSOT!)
-                    'stempelzeit_leistungsgrad': round(gesamt_stempelzeit_leistungsgrad, 0),  # TAG 192: Für Vergleich mit Locosoft
-                    'anwesenheit': round(gesamt_anwesenheit_std * 60, 0),  # Anwesenheit in Minuten (für Kompatibilität)
-                    'anwesenheit_std': round(gesamt_anwesenheit_std, 1),  # Anwesenheit in Stunden (SSOT!)
-                    'vorgabezeit': round(gesamt_vorgabezeit_std * 60, 0),  # AW-Anteil in Minuten (für Kompatibilität)
-                    'vorgabezeit_std': round(gesamt_vorgabezeit_std, 1),  # AW-Anteil in Stunden (SSOT!)
-                    'aw': round(gesamt_aw, 1),  # AW-Einheiten (SSOT!)
-                    'umsatz': round(gesamt_umsatz, 2),
-                    'leistungsgrad': gesamt_leistungsgrad,
-                    'produktivitaet': gesamt_produktivitaet,
-                    'anwesenheitsgrad': gesamt_anwesenheitsgrad,
-                    'bezahlt_h': round(sum(m.get('bezahlt_h', 0) for m in mechaniker_liste), 1),
-                    'anwesend_h': round(sum(m.get('anwesend_h', 0) for m in mechaniker_liste), 1)
-                }
+        return {
+            'zeitraum': {
+                'von': str(von),
+                'bis': str(bis)
+            },
+            'betrieb': betrieb,
+            'mechaniker': mechaniker_liste,
+            'anzahl_mechaniker': len(mechaniker_liste),
+            'anzahl_tage': anzahl_tage,
+            'gesamt': {
+                'auftraege': gesamt_auftraege,
+                'stempelzeit': round(gesamt_stempelzeit_std * 60, 0),  # St-Anteil in Minuten (für Kompatibilität)
+                'stempelzeit_std': round(gesamt_stempelzeit_std, 1),  # St-Anteil in Stunden (SSOT!)
+                'stempelzeit_leistungsgrad': round(gesamt_stempelzeit_leistungsgrad, 0),  # TAG 192: Für Vergleich mit Locosoft
+                'anwesenheit': round(gesamt_anwesenheit_std * 60, 0),  # Anwesenheit in Minuten (für Kompatibilität)
+                'anwesenheit_std': round(gesamt_anwesenheit_std, 1),  # Anwesenheit in Stunden (SSOT!)
+                'vorgabezeit': round(gesamt_vorgabezeit_std * 60, 0),  # AW-Anteil in Minuten (für Kompatibilität)
+                'vorgabezeit_std': round(gesamt_vorgabezeit_std, 1),  # AW-Anteil in Stunden (SSOT!)
+                'aw': round(gesamt_aw, 1),  # AW-Einheiten (SSOT!)
+                'umsatz': round(gesamt_umsatz, 2),
+                'leistungsgrad': gesamt_leistungsgrad,
+                'produktivitaet': gesamt_produktivitaet,
+                'anwesenheitsgrad': gesamt_anwesenheitsgrad,
+                'bezahlt_h': round(sum(m.get('bezahlt_h', 0) for m in mechaniker_liste), 1),
+                'anwesend_h': round(sum(m.get('anwesend_h', 0) for m in mechaniker_liste), 1)
             }
+        }
 
     @staticmethod
     def get_leistung_trend(
@@ -1898,6 +1891,243 @@ class WerkstattData:
                 'auftraege_ohne_termin': auftraege_ohne_termin[:20]
             }
 
+    # =========================================================================
+    # KAPAZITÄTS-FORECAST (TAG 220)
+    # =========================================================================
+
+    @staticmethod
+    def get_kapazitaets_forecast(tage: int = 10, betrieb: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Tagesweiser Kapazitäts-Forecast für die nächsten Arbeitstage (ab heute).
+
+        Feiertage, Mechaniker mit Arbeitszeiten je Wochentag, Abwesenheiten und geplante Aufträge
+        werden für den ganzen Zeitraum mit je einer Abfrage geladen (4 Locosoft-Roundtrips,
+        unabhängig von tage) und im Speicher auf die Tage verteilt. Vorher: 2 Abfragen pro Tag.
+
+        Gecacht je Betrieb/Zeitraum (FORECAST_CACHE_TTL); invalidiert über die Stempeluhr-Tags
+        (Celery stempeluhr_aenderungen) und 'werkstatt' (Locosoft-Mirror).
+
+        Args:
+            tage: Anzahl Arbeitstage
+            betrieb: Betrieb-ID (1=DEG, 3=LAN, None=alle)
+
+        Returns:
+            {'stichtag', 'arbeitstage': [...], 'forecast': [{datum, kapazitaet_aw, geplant_aw, ...}]}
+        """
+        return WerkstattData._kapazitaets_forecast(int(tage), int(betrieb) if betrieb else None,
+                                                   date.today().isoformat())
+
+    @staticmethod
+    @cached_result(ttl=FORECAST_CACHE_TTL, tags=['werkstatt', 'stempeluhr', 'stempeluhr:{betrieb}'])
+    def _kapazitaets_forecast(tage: int, betrieb: Optional[int], stichtag: str) -> Dict[str, Any]:
+        heute = date.fromisoformat(stichtag)
+
+        with locosoft_session() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+            # 1. Feiertage (Puffer für Wochenenden: 5 Arbeitstage ≈ 7 Kalendertage)
+            cursor.execute("""
+                SELECT date FROM year_calendar
+                WHERE is_public_holid = true
+                  AND date >= %s
+                  AND date <= %s
+            """, [heute, heute + timedelta(days=tage * 7 // 5 + 14)])
+            feiertage = {row['date'] for row in cursor.fetchall()}
+
+            arbeitstage = []
+            tag = heute
+            while len(arbeitstage) < tage:
+                if tag.weekday() < 5 and tag not in feiertage:
+                    arbeitstage.append(tag)
+                tag += timedelta(days=1)
+            if not arbeitstage:
+                return {'stichtag': stichtag, 'arbeitstage': [], 'forecast': []}
+            von, bis = arbeitstage[0], arbeitstage[-1]
+
+            # 2. Mechaniker mit aktueller Arbeitszeit je Wochentag (eine Zeile pro Wochentag)
+            mechaniker_query = """
+                WITH aktuelle_arbeitszeiten AS (
+                    SELECT DISTINCT ON (employee_number, dayofweek)
+                        employee_number, dayofweek, work_duration
+                    FROM employees_worktimes
+                    ORDER BY employee_number, dayofweek, validity_date DESC
+                )
+                SELECT
+                    eh.employee_number, eh.name, eh.subsidiary, eh.leave_date,
+                    aw.dayofweek, aw.work_duration
+                FROM employees_history eh
+                LEFT JOIN aktuelle_arbeitszeiten aw ON eh.employee_number = aw.employee_number
+                WHERE eh.is_latest_record = true
+                  AND eh.employee_number BETWEEN %s AND %s
+                  AND eh.mechanic_number IS NOT NULL
+                  AND eh.subsidiary > 0
+                  AND (eh.leave_date IS NULL OR eh.leave_date > %s)
+            """
+            params = [MECHANIKER_RANGE_START, MECHANIKER_RANGE_END, von]
+            if betrieb:
+                mechaniker_query += " AND eh.subsidiary = %s"
+                params.append(betrieb)
+            mechaniker_query += " ORDER BY eh.employee_number"
+            cursor.execute(mechaniker_query, params)
+
+            mechaniker = {}
+            for row in cursor.fetchall():
+                m = mechaniker.setdefault(row['employee_number'], {
+                    'name': row['name'],
+                    'leave_date': row['leave_date'],
+                    'stunden': {},
+                })
+                if row['dayofweek'] is not None:
+                    m['stunden'][row['dayofweek']] = row['work_duration']
+
+            # 3. Abwesenheiten im Zeitraum (mehrere Einträge pro Tag möglich, z. B. halbe Tage)
+            cursor.execute("""
+                SELECT employee_number, date, reason
+                FROM absence_calendar
+                WHERE date BETWEEN %s AND %s
+                  AND employee_number BETWEEN %s AND %s
+            """, [von, bis, MECHANIKER_RANGE_START, MECHANIKER_RANGE_END])
+            abwesenheiten = {}
+            for row in cursor.fetchall():
+                abwesenheiten.setdefault((row['employee_number'], row['date']), []).append(row['reason'])
+
+            # 4. Geplante Aufträge (Bringen-Termin im Zeitraum), je Tag summiert
+            auftraege_query = """
+                SELECT
+                    DATE(o.estimated_inbound_time) AS tag,
+                    COUNT(DISTINCT o.number) AS anzahl,
+                    COALESCE(SUM(l.time_units), 0) AS vorgabe_aw
+                FROM orders o
+                LEFT JOIN labours l ON o.number = l.order_number AND l.time_units > 0
+                WHERE o.has_open_positions = true
+                  AND o.estimated_inbound_time >= %s
+                  AND o.estimated_inbound_time < %s
+            """
+            params = [datetime.combine(von, time.min), datetime.combine(bis + timedelta(days=1), time.min)]
+            if betrieb:
+                auftraege_query += " AND o.subsidiary = %s"
+                params.append(betrieb)
+            auftraege_query += " GROUP BY DATE(o.estimated_inbound_time)"
+            cursor.execute(auftraege_query, params)
+            auftraege = {row['tag']: (int(row['anzahl']), float(row['vorgabe_aw'])) for row in cursor.fetchall()}
+
+        forecast = WerkstattData.berechne_tages_forecast(arbeitstage, heute, mechaniker, abwesenheiten, auftraege)
+        logger.info(f"WerkstattData.get_kapazitaets_forecast: {len(arbeitstage)} Tage, {len(mechaniker)} Mechaniker, "
+                    f"Betrieb {betrieb or 'alle'}")
+        return {
+            'stichtag': stichtag,
+            'arbeitstage': [str(t) for t in arbeitstage],
+            'forecast': forecast,
+        }
+
+    @staticmethod
+    def berechne_tages_forecast(
+        arbeitstage: List[date],
+        heute: date,
+        mechaniker: Dict[int, Dict[str, Any]],
+        abwesenheiten: Dict[Tuple[int, date], List[Optional[str]]],
+        auftraege: Dict[date, Tuple[int, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Verteilt die Rohdaten auf die Arbeitstage (ohne DB).
+
+        Args:
+            mechaniker: employee_number → {'name', 'leave_date', 'stunden': {wochentag: work_duration}}
+            abwesenheiten: (employee_number, datum) → [grund, ...]
+            auftraege: datum → (anzahl, vorgabe_aw)
+        """
+        forecast = []
+        for tag in arbeitstage:
+            dow = tag.weekday()  # 0=Mo, 4=Fr
+            kapazitaet_h = 0.0
+            anwesend = 0
+            abwesende = []
+
+            for employee_number, m in mechaniker.items():
+                if m['leave_date'] is not None and m['leave_date'] <= tag:
+                    continue
+                gruende = abwesenheiten.get((employee_number, tag))
+                if gruende:
+                    abwesende.extend({'name': m['name'], 'grund': grund} for grund in gruende)
+                    continue
+                stunden = m['stunden'].get(dow)
+                kapazitaet_h += float(stunden) if stunden is not None else 8.0
+                anwesend += 1
+
+            kapazitaet_aw = kapazitaet_h * 6
+            geplant_anzahl, geplant_aw = auftraege.get(tag, (0, 0.0))
+            auslastung = (geplant_aw / kapazitaet_aw) * 100 if kapazitaet_aw > 0 else 0
+
+            if auslastung > 120:
+                status, status_icon = 'kritisch', '🔴'
+            elif auslastung > 90:
+                status, status_icon = 'hoch', '🟠'
+            elif auslastung > 50:
+                status, status_icon = 'normal', '🟢'
+            else:
+                status, status_icon = 'niedrig', '🔵'
+
+            forecast.append({
+                'datum': str(tag),
+                'datum_formatiert': tag.strftime('%a %d.%m.'),
+                'wochentag': ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So'][dow],
+                'ist_heute': tag == heute,
+                'mechaniker_anwesend': anwesend,
+                'mechaniker_abwesend': len(abwesende),
+                'abwesende': abwesende,
+                'kapazitaet_h': kapazitaet_h,
+                'kapazitaet_aw': kapazitaet_aw,
+                'geplant_aw': geplant_aw,
+                'geplant_anzahl': geplant_anzahl,
+                'auslastung_prozent': round(auslastung, 1),
+                'freie_kapazitaet_aw': max(0, kapazitaet_aw - geplant_aw),
+                'status': status,
+                'status_icon': status_icon
+            })
+        return forecast
+
+    @staticmethod
+    def get_stempeluhr_fingerprint() -> Dict[str, str]:
+        """
+        Änderungs-Fingerabdruck je Betrieb: Stempelungen von heute und Abwesenheiten ab heute.
+        Ändert er sich, sind Stempeluhr und Kapazitäts-Forecast des Betriebs veraltet.
+
+        Returns:
+            {'1': '...', '3': '...'} (Betrieb als String, für den Status-Hash)
+        """
+        with locosoft_session() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                SELECT eh.subsidiary, COUNT(*) AS anzahl, COUNT(t.end_time) AS beendet,
+                       MAX(t.start_time) AS letzter_start, MAX(t.end_time) AS letztes_ende
+                FROM times t
+                JOIN employees_history eh ON eh.employee_number = t.employee_number AND eh.is_latest_record = true
+                WHERE t.start_time >= CURRENT_DATE
+                  AND eh.subsidiary > 0
+                GROUP BY eh.subsidiary
+            """)
+            stempel = {row['subsidiary']: row for row in cursor.fetchall()}
+
+            cursor.execute("""
+                SELECT eh.subsidiary, COUNT(*) AS anzahl, MAX(ac.date) AS bis
+                FROM absence_calendar ac
+                JOIN employees_history eh ON eh.employee_number = ac.employee_number AND eh.is_latest_record = true
+                WHERE ac.date >= CURRENT_DATE
+                  AND eh.subsidiary > 0
+                GROUP BY eh.subsidiary
+            """)
+            abwesend = {row['subsidiary']: row for row in cursor.fetchall()}
+
+        fingerprint = {}
+        for betrieb in set(stempel) | set(abwesend):
+            s = stempel.get(betrieb) or {}
+            a = abwesend.get(betrieb) or {}
+            fingerprint[str(betrieb)] = '|'.join(str(v) for v in (
+                s.get('anzahl'), s.get('beendet'), s.get('letzter_start'), s.get('letztes_ende'),
+                a.get('anzahl'), a.get('bis')
+            ))
+        return fingerprint
+
     # =========================================================================
     # ANWESENHEIT (Attendance / Stempeluhr)
     # =========================================================================
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Werkstatt-Leistung Engine - TAG 220
+====================================
+Rohdaten für WerkstattData.get_mechaniker_leistung() in einem Durchlauf.
+
+Vorher: sechs Locosoft-Queries pro Aufruf über dieselben times-Daten
+(get_vorgabezeit_aus_labours, get_stempelzeit_aus_times, get_anwesenheit_aus_times,
+get_stempelzeit_locosoft, get_stempelzeit_leistungsgrad, get_stempelungen_roh)
+plus eine weitere für die Anzahl Arbeitstage.
+
+Jetzt:
+- times (type 1+2) wird einmal pro Zeitraum geladen und pro Tag zu einem
+  Tages-Slice aggregiert (alle Kennzahlen aus demselben Result-Set)
+- Tage aus abgeschlossenen Monaten werden dauerhaft im Prozess gecacht,
+  vergangene Tage des laufenden Monats für CURRENT_MONTH_TTL Sekunden
+  (Locosoft-Korrekturen an times/labours), der laufende Tag max. TODAY_TTL
+- labours + Gesamt-Stempelzeit der betroffenen Aufträge: eine Query
+- Vergangene Zeiträume (bis < heute) werden komplett gecacht, nach denselben Regeln
+- Der Locosoft-Mirror ruft clear_leistung_cache() auf: erhöht die Cache-Generation
+  in Redis, alle Worker verwerfen ihre Caches (Prüfung alle GENERATION_CHECK_INTERVAL s)
+
+Die Berechnungen entsprechen 1:1 den SQL-Varianten in WerkstattData
+(gleiche Deduplizierung, Leerlauf-Filter, Lücken- und Pausenlogik).
+"""
+
+import logging
+import os
+import threading
+import time as time_mod
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.db_utils import locosoft_session
+
+logger = logging.getLogger(__name__)
+
+# Laufender Tag: Neuberechnung höchstens alle N Sekunden
+TODAY_TTL = int(os.environ.get('WERKSTATT_LEISTUNG_TODAY_TTL', '60'))
+
+# Vergangene Tage/Zeiträume im laufenden Monat: Neuberechnung nach N Sekunden
+CURRENT_MONTH_TTL = int(os.environ.get('WERKSTATT_LEISTUNG_MONAT_TTL', '900'))
+
+# Cache-Größen (LRU)
+MAX_CACHED_DAYS = 3000
+MAX_CACHED_PERIODS = 256
+
+# Cache-Generation in Redis (clear_leistung_cache), von jedem Worker höchstens alle N Sekunden gelesen
+GENERATION_KEY = 'werkstatt_leistung:generation'
+GENERATION_CHECK_INTERVAL = 30
+
+_lock = threading.Lock()
+# Einträge: (Ablauf monotonic oder None = dauerhaft, Wert)
+_day_cache: 'OrderedDict[Tuple, Tuple[Optional[float], Dict[str, Any]]]' = OrderedDict()
+_period_cache: 'OrderedDict[Tuple, Tuple[Optional[float], Dict[str, Any]]]' = OrderedDict()
+_today_cache: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+_generation: Optional[str] = None
+_generation_checked = 0.0
+
+
+def _round_half_up(value: float) -> float:
+    """ROUND(x, 0) wie PostgreSQL numeric (kaufmännisch, nicht Banker's Rounding)."""
+    return float(int(value + 0.5)) if value >= 0 else -float(int(-value + 0.5))
+
+
+def _minutes(start, end) -> float:
+    return (end - start).total_seconds() / 60.0
+
+
+def _leerlauf_key(leerlauf_auftraege: Optional[Iterable[int]]) -> Tuple[int, ...]:
+    return tuple(sorted(set(leerlauf_auftraege or ())))
+
+
+def _passes_leerlauf(order_number: int, leerlauf: Tuple[int, ...]) -> bool:
+    """Entspricht build_leerlauf_filter(): != ALL(ARRAY[...]) bzw. Fallback > 31."""
+    if leerlauf:
+        return order_number not in leerlauf
+    return order_number > 31
+
+
+# =============================================================================
+# TAGES-SLICE
+# =============================================================================
+
+def _build_day_slice(tag: date, rows: List[Tuple], breaktimes: Dict[int, List[Tuple]],
+                     leerlauf: Tuple[int, ...]) -> Dict[str, Any]:
+    """
+    Aggregiert alle times-Zeilen eines Tages.
+
+    rows: (employee_number, order_number, type, start_time, end_time)
+    """
+    stempel_h = defaultdict(float)         # get_stempelzeit_aus_times
+    anwesenheit_h = defaultdict(float)     # get_anwesenheit_aus_times
+    leistungsgrad_min = defaultdict(float)  # get_stempelzeit_leistungsgrad
+    ams_min = defaultdict(float)           # get_vorgabezeit_aus_labours (Stempelzeit im Zeitraum)
+    dedup_alle = set()
+    dedup_loco = defaultdict(set)          # emp → {(order, start, end)} für Locosoft-Logik
+    hat_type2 = False
+
+    for emp, order, typ, start, end in rows:
+        if typ == 1:
+            if end is not None:
+                anwesenheit_h[emp] += _minutes(start, end) / 60.0
+            continue
+
+        hat_type2 = True
+        if end is None:
+            continue
+        minuten = _minutes(start, end)
+        ams_min[(emp, order)] += minuten
+
+        key = (emp, order, start, end)
+        if key in dedup_alle:
+            continue
+        dedup_alle.add(key)
+        stempel_h[emp] += minuten / 60.0
+        if order is None or not _passes_leerlauf(order, leerlauf):
+            continue
+        if order > 31:
+            leistungsgrad_min[emp] += minuten
+        if order > 0:
+            dedup_loco[emp].add((order, start, end))
+
+    # Locosoft-Stempelzeit: Spanne - Lücken - Pausen (get_stempelzeit_locosoft)
+    locosoft = {}
+    dow = (tag.weekday() + 1) % 7  # EXTRACT(DOW): 0 = Sonntag
+    for emp, stempelungen in dedup_loco.items():
+        erste = min(s[1] for s in stempelungen)
+        letzte = max(s[2] for s in stempelungen)
+        spanne = _minutes(erste, letzte)
+
+        starts = sorted(s[1] for s in stempelungen)
+        luecken = 0.0
+        for _, _, end in stempelungen:
+            idx = bisect_right(starts, end)
+            if idx < len(starts):
+                naechster = starts[idx]
+                # JOIN liefert eine Zeile je Stempelung mit diesem Start
+                anzahl = bisect_right(starts, naechster) - idx
+                luecken += _minutes(end, naechster) * anzahl
+
+        pausen = 0.0
+        erste_h = erste.hour + erste.minute / 60.0
+        letzte_h = letzte.hour + letzte.minute / 60.0
+        for b_dow, validity, b_start, b_end in breaktimes.get(emp, ()):
+            if b_dow != dow or validity is None or validity > tag:
+                continue
+            if (b_start is not None and b_end is not None and b_start < b_end
+                    and b_start < letzte_h and b_end > erste_h):
+                pausen += (b_end - b_start) * 60.0
+
+        stempel_min = _round_half_up(spanne - luecken - pausen)
+        if stempel_min > 0:
+            locosoft[emp] = (len({s[0] for s in stempelungen}), stempel_min)
+
+    return {
+        'stempel_h': dict(stempel_h),
+        'anwesenheit_h': dict(anwesenheit_h),
+        'leistungsgrad_min': dict(leistungsgrad_min),
+        'ams_min': dict(ams_min),
+        'locosoft': locosoft,
+        'hat_type2': hat_type2,
+    }
+
+
+def _load_breaktimes(cursor) -> Dict[int, List[Tuple]]:
+    cursor.execute("""
+        SELECT employee_number, dayofweek, validity_date, break_start, break_end
+        FROM employees_breaktimes
+        WHERE is_latest_record IS NULL OR is_latest_record = true
+    """)
+    result = defaultdict(list)
+    for emp, dow, validity, b_start, b_end in cursor.fetchall():
+        result[emp].append((
+            int(dow) if dow is not None else None,
+            validity,
+            float(b_start) if b_start is not None else None,
+            float(b_end) if b_end is not None else None,
+        ))
+    return result
+
+
+def _fetch_day_slices(cursor, von: date, bis: date, leerlauf: Tuple[int, ...]) -> Dict[date, Dict[str, Any]]:
+    """Eine times-Query für [von, bis], aufgeteilt in Tages-Slices."""
+    cursor.execute("""
+        SELECT employee_number, order_number, type, start_time, end_time
+        FROM times
+        WHERE type IN (1, 2)
+          AND start_time >= %s AND start_time < %s + INTERVAL '1 day'
+    """, [von, bis])
+    rows_pro_tag = defaultdict(list)
+    for row in cursor.fetchall():
+        rows_pro_tag[row[3].date()].append(row)
+
+    breaktimes = _load_breaktimes(cursor)
+    slices = {}
+    tag = von
+    while tag <= bis:
+        slices[tag] = _build_day_slice(tag, rows_pro_tag.get(tag, []), breaktimes, leerlauf)
+        tag += timedelta(days=1)
+    return slices
+
+
+def _fetch_auftrag_gesamt(cursor, order_numbers: List[int]) -> Dict[Tuple[int, int], Tuple[float, float, float]]:
+    """
+    Gesamt-Stempelzeit (alle Tage) und Gesamt-AW/Umsatz je (Mechaniker, Auftrag).
+
+    Returns:
+        {(employee_number, order_number): (stempelzeit_min_gesamt, aw_gesamt, umsatz_gesamt)}
+    """
+    if not order_numbers:
+        return {}
+    cursor.execute("""
+        WITH stempelungen_gesamt AS (
+            SELECT
+                t.employee_number,
+                t.order_number,
+                SUM(EXTRACT(EPOCH FROM (t.end_time - t.start_time)) / 60) as stempelzeit_min_gesamt
+            FROM times t
+            WHERE t.type = 2
+              AND t.end_time IS NOT NULL
+              AND t.order_number = ANY(%s)
+            GROUP BY t.employee_number, t.order_number
+        ),
+        labours_gesamt AS (
+            SELECT
+                l.order_number,
+                l.mechanic_no as employee_number,
+                SUM(l.time_units) as aw_gesamt,
+                SUM(l.net_price_in_order) as umsatz_gesamt
+            FROM labours l
+            WHERE l.order_number = ANY(%s)
+              AND l.time_units > 0
+              AND l.mechanic_no IS NOT NULL
+            GROUP BY l.order_number, l.mechanic_no
+        )
+        SELECT sg.employee_number, sg.order_number, sg.stempelzeit_min_gesamt, lg.aw_gesamt, lg.umsatz_gesamt
+        FROM stempelungen_gesamt sg
+        JOIN labours_gesamt lg ON sg.order_number = lg.order_number
+            AND sg.employee_number = lg.employee_number
+    """, [order_numbers, order_numbers])
+    return {
+        (emp, order): (float(sg or 0), float(aw or 0), float(umsatz or 0))
+        for emp, order, sg, aw, umsatz in cursor.fetchall()
+    }
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+def _cache_get(cache: OrderedDict, key):
+    with _lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        ablauf, value = entry
+        if ablauf is not None and time_mod.monotonic() >= ablauf:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key, value, max_size: int, ttl: Optional[int] = None):
+    with _lock:
+        cache[key] = (time_mod.monotonic() + ttl if ttl is not None else None, value)
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+def _cache_ttl(bis: date, heute: date) -> Optional[int]:
+    """Dauerhaft (None) nur für abgeschlossene Monate, im laufenden Monat CURRENT_MONTH_TTL."""
+    return None if bis < heute.replace(day=1) else CURRENT_MONTH_TTL
+
+
+def _clear_local():
+    with _lock:
+        _day_cache.clear()
+        _period_cache.clear()
+        _today_cache.clear()
+
+
+def _check_generation():
+    """Lokale Caches verwerfen, wenn ein anderer Prozess (Mirror-Task) die Generation erhöht hat."""
+    global _generation, _generation_checked
+    jetzt = time_mod.monotonic()
+    if jetzt - _generation_checked < GENERATION_CHECK_INTERVAL:
+        return
+    _generation_checked = jetzt
+    try:
+        from api.cache_utils import get_redis_client
+        client = get_redis_client()
+        if not client:
+            return
+        generation = client.get(GENERATION_KEY)
+    except Exception as e:
+        logger.debug(f"Werkstatt-Leistung: Cache-Generation nicht lesbar: {e}")
+        return
+    if generation != _generation:
+        _clear_local()
+        _generation = generation
+
+
+def clear_leistung_cache():
+    """
+    Alle Caches leeren (nach Locosoft-Mirror bzw. nachträglichen Korrekturen in Locosoft).
+    Erhöht zusätzlich die Generation in Redis, damit alle Gunicorn-Worker ihre Caches verwerfen.
+    """
+    _clear_local()
+    try:
+        from api.cache_utils import get_redis_client
+        client = get_redis_client()
+        if client:
+            client.incr(GENERATION_KEY)
+    except Exception as e:
+        logger.warning(f"Werkstatt-Leistung: Cache-Generation nicht erhöht: {e}")
+
+
+def _get_day_slices(cursor, von: date, bis: date, leerlauf: Tuple[int, ...]) -> List[Dict[str, Any]]:
+    heute = date.today()
+    slices: Dict[date, Dict[str, Any]] = {}
+    fehlend: List[date] = []
+
+    tag = von
+    while tag <= bis:
+        if tag < heute:
+            cached = _cache_get(_day_cache, (tag, leerlauf))
+            if cached is not None:
+                slices[tag] = cached
+            else:
+                fehlend.append(tag)
+        tag += timedelta(days=1)
+
+    # Abgeschlossene Tage: eine Query über den fehlenden Bereich
+    if fehlend:
+        for tag, day_slice in _fetch_day_slices(cursor, fehlend[0], fehlend[-1], leerlauf).items():
+            if tag not in slices:
+                slices[tag] = day_slice
+                _cache_put(_day_cache, (tag, leerlauf), day_slice, MAX_CACHED_DAYS, _cache_ttl(tag, heute))
+
+    # Laufender Tag (und evtl. Zukunft): kurzer TTL statt Dauer-Cache
+    if bis >= heute:
+        start = max(von, heute)
+        key = (start, bis, leerlauf)
+        with _lock:
+            cached = _today_cache.get(key)
+        if cached and time_mod.monotonic() - cached[0] < TODAY_TTL:
+            offen = cached[1]
+        else:
+            offen = _fetch_day_slices(cursor, start, bis, leerlauf)
+            with _lock:
+                # Einträge von Vortagen verwerfen
+                for alt in [k for k in _today_cache if k[0] < heute]:
+                    del _today_cache[alt]
+                _today_cache[key] = (time_mod.monotonic(), offen)
+        slices.update(offen)
+
+    return [slices[t] for t in sorted(slices)]
+
+
+# =============================================================================
+# ÖFFENTLICHE API
+# =============================================================================
+
+def get_leistung_rohdaten(von: date, bis: date, leerlauf_auftraege: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    """
+    Alle Rohdaten für get_mechaniker_leistung() in einem Durchlauf.
+
+    Args:
+        von: Startdatum
+        bis: Enddatum
+        leerlauf_auftraege: Auszuschließende Leerlaufaufträge (leer → Fallback order_number > 31)
+
+    Returns:
+        {
+            'vorgabezeit': {emp: {aw, vorgabezeit_std, umsatz}},          # = get_vorgabezeit_aus_labours
+            'stempelzeit': {emp: stunden},                                 # = get_stempelzeit_aus_times
+            'anwesenheit': {emp: stunden},                                 # = get_anwesenheit_aus_times
+            'stempelzeit_locosoft': {emp: {tage, auftraege, stempel_min}}, # = get_stempelzeit_locosoft
+            'stempelzeit_leistungsgrad': {emp: minuten},                   # = get_stempelzeit_leistungsgrad
+            'anzahl_tage': int                                             # Tage mit type=2 Stempelungen
+        }
+    """
+    _check_generation()
+    leerlauf = _leerlauf_key(leerlauf_auftraege)
+    heute = date.today()
+    abgeschlossen = bis < heute
+    period_key = (von, bis, leerlauf)
+
+    if abgeschlossen:
+        cached = _cache_get(_period_cache, period_key)
+        if cached is not None:
+            return cached
+
+    t0 = time_mod.perf_counter()
+    with locosoft_session() as conn:
+        cursor = conn.cursor()
+        slices = _get_day_slices(cursor, von, bis, leerlauf)
+
+        stempelzeit = defaultdict(float)
+        anwesenheit = defaultdict(float)
+        leistungsgrad_min = defaultdict(float)
+        ams_min = defaultdict(float)
+        locosoft = {}
+        anzahl_tage = 0
+
+        for day_slice in slices:
+            anzahl_tage += 1 if day_slice['hat_type2'] else 0
+            for emp, wert in day_slice['stempel_h'].items():
+                stempelzeit[emp] += wert
+            for emp, wert in day_slice['anwesenheit_h'].items():
+                anwesenheit[emp] += wert
+            for emp, wert in day_slice['leistungsgrad_min'].items():
+                leistungsgrad_min[emp] += wert
+            for key, wert in day_slice['ams_min'].items():
+                ams_min[key] += wert
+            for emp, (auftraege, stempel_min) in day_slice['locosoft'].items():
+                eintrag = locosoft.setdefault(emp, {'tage': 0, 'auftraege': 0, 'stempel_min': 0.0})
+                eintrag['tage'] += 1
+                eintrag['auftraege'] += auftraege
+                eintrag['stempel_min'] += stempel_min
+
+        # Vorgabezeit: AW anteilig nach Stempelzeit-Verhältnis (TAG 215)
+        gesamt = _fetch_auftrag_gesamt(cursor, sorted({order for _, order in ams_min if order is not None}))
+
+    vorgabezeit = {}
+    for (emp, order), minuten_zeitraum in ams_min.items():
+        werte = gesamt.get((emp, order))
+        if werte is None:
+            continue
+        sg_min, aw_gesamt, umsatz_gesamt = werte
+        anteil = minuten_zeitraum / sg_min if sg_min > 0 else 1.0
+        eintrag = vorgabezeit.setdefault(emp, {'aw': 0.0, 'vorgabezeit_std': 0.0, 'umsatz': 0.0})
+        eintrag['aw'] += aw_gesamt * anteil
+        eintrag['umsatz'] += umsatz_gesamt * anteil
+    for eintrag in vorgabezeit.values():
+        eintrag['vorgabezeit_std'] = eintrag['aw'] * 6.0 / 60.0
+
+    result = {
+        'vorgabezeit': vorgabezeit,
+        'stempelzeit': dict(stempelzeit),
+        'anwesenheit': dict(anwesenheit),
+        'stempelzeit_locosoft': locosoft,
+        'stempelzeit_leistungsgrad': dict(leistungsgrad_min),
+        'anzahl_tage': anzahl_tage,
+    }
+
+    if abgeschlossen:
+        _cache_put(_period_cache, period_key, result, MAX_CACHED_PERIODS, _cache_ttl(bis, heute))
+
+    logger.debug(f"Werkstatt-Leistung Rohdaten {von} - {bis}: {len(slices)} Tage, "
+                 f"{(time_mod.perf_counter() - t0) * 1000:.0f} ms")
+    return result
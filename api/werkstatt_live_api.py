@@ -31,7 +31,7 @@ from api.standort_utils import BETRIEB_NAMEN
 from psycopg2.extras import RealDictCursor
 
 # Gudat Disposition: SSOT in gudat_data (DA REST oder KIC GraphQL Fallback)
-from api.gudat_data import get_gudat_disposition
+from api.gudat_data import get_gudat_disposition, GudatData
 
 # Gudat Client für sonstige KIC-Nutzung (z. B. Termine zu Aufträgen)
 sys.path.insert(0, '/opt/greiner-portal/tools')
@@ -48,7 +48,7 @@ logger = logging.getLogger(__name__)
 werkstatt_live_bp = Blueprint('werkstatt_live', __name__, url_prefix='/api/werkstatt/live')
 
 # TAG 213: Cache-Utilities für Performance-Optimierung
-from api.cache_utils import cache_stempeluhr
+from api.cache_utils import cache_stempeluhr, cached_response
 
 # get_locosoft_connection() wird jetzt aus db_utils importiert (TAG 117)
 
@@ -895,6 +895,7 @@ def get_problemfaelle_live():
 
 
 @werkstatt_live_bp.route('/kapazitaet', methods=['GET'])
+@cached_response(ttl=60, stale_ttl=120, tags=['werkstatt'])  # TAG 220
 def get_kapazitaetsplanung():
     """
     Kapazitätsplanung Werkstatt: Offene Arbeit vs. verfügbare Kapazität.
@@ -957,46 +958,31 @@ def _betrieb_to_gudat_center(subsidiary):
 @werkstatt_live_bp.route('/gudat/kapazitaet', methods=['GET'])
 def get_gudat_kapazitaet():
     """
-    Proxy für Gudat Kapazitäts-Daten (pro Filiale).
+    Gudat Kapazitäts-Daten (pro Filiale).
 
     Query-Parameter:
         center: deggendorf | landau (optional)
         subsidiary: 1 | 3 (optional, wird in center übersetzt: 1=deggendorf, 3=landau)
 
-    Ruft /api/gudat/workload auf und transformiert die Daten
-    ins Format das das Frontend erwartet.
-
     TAG122: Echte Werkstatt-Kapazität = nur interne Mechanik-Teams:
     - Allgemeine Reparatur (ID 2)
     - Diagnosetechnik (ID 3)
     - NW/GW (ID 5)
-    """
-    import requests
 
+    TAG 220: GudatData.get_kapazitaet() ruft die Workload-Service-Funktionen direkt auf
+    (vorher HTTP auf localhost:5000/api/gudat/workload + /workload/week).
+    """
     center = request.args.get('center', type=str)
     if not center and request.args.get('subsidiary') is not None:
         center = _betrieb_to_gudat_center(request.args.get('subsidiary'))
     if center:
         center = center.strip().lower()
 
-    # Interne Mechanik-Teams (echte Werkstatt-Kapazität)
-    INTERNE_TEAMS = {2, 3, 5}  # Allgemeine Reparatur, Diagnosetechnik, NW/GW
-
     try:
-        workload_url = 'http://localhost:5000/api/gudat/workload'
-        week_url = 'http://localhost:5000/api/gudat/workload/week'
-        if center:
-            workload_url += f'?center={center}'
-            week_url += f'?center={center}'
-
-        response = requests.get(workload_url, timeout=10)
+        result = GudatData.get_kapazitaet(center=center)
 
-        if response.status_code != 200:
-            try:
-                err_body = response.json()
-                err_msg = err_body.get('error', response.text[:200]) if isinstance(err_body, dict) else response.text[:200]
-            except Exception:
-                err_msg = f'Gudat API Fehler: {response.status_code}'
+        if not result.get('success'):
+            err_msg = result.get('error') or 'Gudat API Fehler'
             if center and 'nicht' not in err_msg.lower() and 'konfiguriert' not in err_msg.lower():
                 err_msg = f"Gudat für {center.capitalize()} nicht verfügbar: {err_msg}"
             return jsonify({
@@ -1005,69 +991,8 @@ def get_gudat_kapazitaet():
                 'center': center or 'deggendorf'
             }), 200  # 200 damit Frontend Erfolg/Fehler einheitlich verarbeiten kann
 
-        data = response.json()
-
-        if 'error' in data:
-            err_msg = data['error']
-            if center and 'nicht' not in err_msg.lower():
-                err_msg = f"Gudat für {center.capitalize()}: {err_msg}"
-            return jsonify({
-                'success': False,
-                'error': err_msg,
-                'center': center or 'deggendorf'
-            }), 200
-
-        week_response = requests.get(week_url, timeout=10)
-        week_data = week_response.json() if week_response.status_code == 200 else {}
-
-        # TAG122: Nur interne Teams für Kapazität zählen (Allgemeine Reparatur, Diagnosetechnik, NW/GW)
-        teams = data.get('teams', [])
-        interne_teams = [t for t in teams if t.get('id') in INTERNE_TEAMS]
-        externe_teams = [t for t in teams if t.get('id') not in INTERNE_TEAMS]
-
-        # Kapazität nur aus internen Teams berechnen
-        intern_kapazitaet = sum(t.get('capacity', 0) for t in interne_teams)
-        intern_geplant = sum(t.get('planned', 0) for t in interne_teams)
-        intern_frei = sum(t.get('free', 0) for t in interne_teams)
-        intern_auslastung = round((intern_geplant / intern_kapazitaet * 100), 1) if intern_kapazitaet > 0 else 0
-
-        # Status basierend auf Auslastung
-        if intern_auslastung >= 90:
-            status = 'critical'
-        elif intern_auslastung >= 70:
-            status = 'warning'
-        else:
-            status = 'ok'
-
-        # Transformiere ins Frontend-Format
-        result = {
-            'success': True,
-            'kapazitaet': intern_kapazitaet,  # TAG122: Nur interne Teams
-            'geplant': intern_geplant,
-            'frei': intern_frei,
-            'auslastung': intern_auslastung,
-            'status': status,
-            'teams': teams,  # Alle Teams (Legacy)
-            'interne_teams': interne_teams,  # Echte Kapazität (Monteure/Stunden)
-            'externe_teams': externe_teams,  # Externe Dienstleister (Gudat-Kapazität, nicht unsere)
-            'woche': week_data.get('days', []),
-            'timestamp': data.get('timestamp', datetime.now().isoformat()),
-            'center': center or 'deggendorf',  # Filiale für Anzeige
-            'hinweis': 'Kapazität = nur Allgemeine Reparatur + Diagnosetechnik + NW/GW'
-        }
-
         return jsonify(result)
 
-    except requests.exceptions.Timeout:
-        return jsonify({
-            'success': False,
-            'error': 'Gudat API Timeout'
-        }), 504
-    except requests.exceptions.ConnectionError:
-        return jsonify({
-            'success': False,
-            'error': 'Gudat API nicht erreichbar'
-        }), 503
     except Exception as e:
         logger.exception("Fehler bei Gudat Kapazität")
         return jsonify({
@@ -1077,6 +1002,7 @@ def get_gudat_kapazitaet():
 
 
 @werkstatt_live_bp.route('/forecast', methods=['GET'])
+@cached_response(ttl=120, stale_ttl=300, tags=['werkstatt', 'stempeluhr', 'stempeluhr:{subsidiary}'])  # TAG 220
 def get_kapazitaets_forecast():
     """
     MEGA Kapazitäts-Forecast: Vorausschau auf die nächsten Arbeitstage
@@ -1093,11 +1019,19 @@ def get_kapazitaets_forecast():
     - subsidiary: Filter nach Betrieb (1, 3)
     """
     try:
-        from datetime import timedelta
+        from api.werkstatt_data import WerkstattData
 
         tage_vorschau = request.args.get('tage', 10, type=int)
         subsidiary = request.args.get('subsidiary', type=int)
 
+        # =====================================================================
+        # 1./2. ARBEITSTAGE + KAPAZITÄT PRO TAG (mit geplanten Abwesenheiten)
+        # TAG 220: Range-Abfragen für den ganzen Zeitraum statt 2 Queries pro Tag,
+        # gecacht je Betrieb (WerkstattData.get_kapazitaets_forecast)
+        # =====================================================================
+
+        tages_forecast = WerkstattData.get_kapazitaets_forecast(tage=tage_vorschau, betrieb=subsidiary)['forecast']
+
         conn_loco = get_locosoft_connection()
         cur_loco = conn_loco.cursor(cursor_factory=RealDictCursor)
 
@@ -1108,157 +1042,7 @@ def get_kapazitaets_forecast():
         cur_portal = conn_portal.cursor()
         
         heute = datetime.now().date()
-        
-        # =====================================================================
-        # 1. ARBEITSTAGE ERMITTELN (ohne Wochenende, mit Feiertagen)
-        # =====================================================================
-        
-        # Feiertage aus Locosoft holen
-        cur_loco.execute("""
-            SELECT date FROM year_calendar 
-            WHERE is_public_holid = true 
-              AND date >= CURRENT_DATE 
-              AND date <= CURRENT_DATE + INTERVAL '%s days'
-        """, [tage_vorschau + 14])  # Extra Puffer für Wochenenden
-        
-        feiertage = set(row['date'] for row in cur_loco.fetchall())
-        
-        # Arbeitstage berechnen
-        arbeitstage = []
-        check_date = heute
-        while len(arbeitstage) < tage_vorschau:
-            # Wochenende überspringen (5=Sa, 6=So)
-            if check_date.weekday() < 5 and check_date not in feiertage:
-                arbeitstage.append(check_date)
-            check_date += timedelta(days=1)
-        
-        # =====================================================================
-        # 2. KAPAZITÄT PRO TAG (mit geplanten Abwesenheiten)
-        # =====================================================================
-        
-        tages_forecast = []
-        
-        for tag in arbeitstage:
-            dow = tag.weekday()  # 0=Mo, 4=Fr
-            
-            # Mechaniker mit Arbeitszeiten für diesen Wochentag
-            kapa_query = """
-                WITH aktuelle_arbeitszeiten AS (
-                    SELECT DISTINCT ON (employee_number, dayofweek)
-                        employee_number,
-                        dayofweek,
-                        work_duration
-                    FROM employees_worktimes
-                    ORDER BY employee_number, dayofweek, validity_date DESC
-                ),
-                abwesende_tag AS (
-                    SELECT employee_number, reason, type
-                    FROM absence_calendar
-                    WHERE date = %s
-                )
-                SELECT 
-                    eh.employee_number,
-                    eh.name,
-                    eh.subsidiary,
-                    COALESCE(aw.work_duration, 8) as stunden,
-                    ab.reason as abwesenheit_grund,
-                    CASE WHEN ab.employee_number IS NOT NULL THEN true ELSE false END as ist_abwesend
-                FROM employees_history eh
-                LEFT JOIN aktuelle_arbeitszeiten aw 
-                    ON eh.employee_number = aw.employee_number
-                    AND aw.dayofweek = %s
-                LEFT JOIN abwesende_tag ab ON eh.employee_number = ab.employee_number
-                WHERE eh.is_latest_record = true
-                  AND eh.employee_number BETWEEN 5000 AND 5999
-                  AND eh.mechanic_number IS NOT NULL
-                  AND eh.subsidiary > 0
-                  AND (eh.leave_date IS NULL OR eh.leave_date > %s)
-            """
-            
-            kapa_params = [tag, dow, tag]
-            if subsidiary:
-                kapa_query += " AND eh.subsidiary = %s"
-                kapa_params.append(subsidiary)
-            
-            cur_loco.execute(kapa_query, kapa_params)
-            mechaniker_tag = cur_loco.fetchall()
-            
-            anwesend = [m for m in mechaniker_tag if not m['ist_abwesend']]
-            abwesend = [m for m in mechaniker_tag if m['ist_abwesend']]
-            
-            kapazitaet_h = sum(float(m['stunden']) for m in anwesend)
-            kapazitaet_aw = kapazitaet_h * 6
-            
-            # Geplante Aufträge für diesen Tag
-            auftraege_query = """
-                SELECT 
-                    o.number as auftrag_nr,
-                    o.subsidiary as betrieb,
-                    o.estimated_inbound_time as bringen,
-                    o.estimated_outbound_time as abholen,
-                    o.urgency,
-                    v.license_plate as kennzeichen,
-                    COALESCE(SUM(l.time_units), 0) as vorgabe_aw
-                FROM orders o
-                LEFT JOIN vehicles v ON o.vehicle_number = v.internal_number
-                LEFT JOIN labours l ON o.number = l.order_number AND l.time_units > 0
-                WHERE o.has_open_positions = true
-                  AND DATE(o.estimated_inbound_time) = %s
-            """
-            
-            auftraege_params = [tag]
-            if subsidiary:
-                auftraege_query += " AND o.subsidiary = %s"
-                auftraege_params.append(subsidiary)
-            
-            auftraege_query += """
-                GROUP BY o.number, o.subsidiary, o.estimated_inbound_time, 
-                         o.estimated_outbound_time, o.urgency, v.license_plate
-            """
-            
-            cur_loco.execute(auftraege_query, auftraege_params)
-            auftraege_tag = cur_loco.fetchall()
-            
-            geplant_aw = sum(float(a['vorgabe_aw']) for a in auftraege_tag)
-            
-            # Auslastung berechnen
-            if kapazitaet_aw > 0:
-                auslastung = (geplant_aw / kapazitaet_aw) * 100
-            else:
-                auslastung = 0
-            
-            # Status bestimmen
-            if auslastung > 120:
-                status = 'kritisch'
-                status_icon = '🔴'
-            elif auslastung > 90:
-                status = 'hoch'
-                status_icon = '🟠'
-            elif auslastung > 50:
-                status = 'normal'
-                status_icon = '🟢'
-            else:
-                status = 'niedrig'
-                status_icon = '🔵'
-            
-            tages_forecast.append({
-                'datum': str(tag),
-                'datum_formatiert': tag.strftime('%a %d.%m.'),
-                'wochentag': ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So'][dow],
-                'ist_heute': tag == heute,
-                'mechaniker_anwesend': len(anwesend),
-                'mechaniker_abwesend': len(abwesend),
-                'abwesende': [{'name': m['name'], 'grund': m['abwesenheit_grund']} for m in abwesend],
-                'kapazitaet_h': kapazitaet_h,
-                'kapazitaet_aw': kapazitaet_aw,
-                'geplant_aw': geplant_aw,
-                'geplant_anzahl': len(auftraege_tag),
-                'auslastung_prozent': round(auslastung, 1),
-                'freie_kapazitaet_aw': max(0, kapazitaet_aw - geplant_aw),
-                'status': status,
-                'status_icon': status_icon
-            })
-        
+
         # =====================================================================
         # 3. UNVERPLANTE AUFTRÄGE (ohne Bringen-Termin)
         # =====================================================================
@@ -2447,208 +2231,130 @@ def get_auftraege_enriched():
         # =====================================================================
         ml_predictions = {}
         mechaniker_effizienz = {}
-        labour_corrections = {}
 
         if mit_ml:
             try:
-                import pickle
                 import pandas as pd
-                import numpy as np
-                import json as json_lib
-
-                MODEL_DIR = "/opt/greiner-portal/data/ml/models"
-                ML_DATA_DIR = "/opt/greiner-portal/data/ml"
-
-                # DRIVE V5.1: Labour Correction Factors laden
-                corrections_path = f"{ML_DATA_DIR}/labour_corrections.json"
-                if os.path.exists(corrections_path):
-                    with open(corrections_path, 'r') as f:
-                        labour_corrections = json_lib.load(f)
-                    logger.debug(f"DRIVE: Labour Corrections geladen ({len(labour_corrections.get('by_operation', {}))} Ops)")
-
-                # DRIVE V5 Modell laden (TAG 119 - qualitätsgeprüfte Stempeluhr-Daten)
-                # Symlink zeigt auf aktuellstes Modell
-                model_path = f"{MODEL_DIR}/auftragsdauer_model.pkl"
-                encoder_path = f"{MODEL_DIR}/label_encoders_v2_tag119.pkl"
-
-                # Fallback auf ältere Version
-                if not os.path.exists(encoder_path):
-                    encoder_path = f"{MODEL_DIR}/label_encoders.pkl"
-
-                if os.path.exists(model_path) and os.path.exists(encoder_path):
-                    with open(model_path, 'rb') as f:
-                        model = pickle.load(f)
-                    with open(encoder_path, 'rb') as f:
-                        encoders = pickle.load(f)
-
-                    # Prüfe welche Features das Modell erwartet
-                    model_features = list(model.feature_names_in_) if hasattr(model, 'feature_names_in_') else []
-                    logger.debug(f"DRIVE: Modell erwartet {len(model_features)} Features: {model_features}")
-                    
-                    # Vorhersage für jeden Auftrag
+                from api.ml_model_registry import get_model_bundle, predict_minutes, labour_correction
+
+                # TAG 220: Modell, Encoder, Corrections und Effizienz aus der Prozess-Registry
+                # (einmal geladen, Hot-Reload bei neuem Symlink-Ziel)
+                bundle = get_model_bundle()
+                if bundle:
+                    model_features = bundle.model_features
+                    v2_layout = bool(model_features) and len(model_features) == 9
+
+                    # Rohwerte aller Aufträge sammeln (ein Feature-Frame, ein predict)
+                    kandidaten = []
                     for auftrag in auftraege_raw:
-                        if auftrag['vorgabe_aw'] and auftrag['vorgabe_aw'] > 0:
-                            try:
-                                vorgabe_aw = float(auftrag['vorgabe_aw'])
-                                betrieb = auftrag['betrieb'] or 1
-                                marke = auftrag['marke'] or 'Opel'
-                                km_stand = float(auftrag['km_stand'] or 50000)
-                                fahrzeug_alter = float(auftrag['fahrzeug_alter'] or 3)
-                                mech_nr = auftrag.get('mechaniker_nr') or auftrag.get('aktiv_mechaniker_nr')
-
-                                # Datum-Features
-                                auftrag_datum = auftrag['auftrag_datum']
-                                if auftrag_datum:
-                                    wochentag = auftrag_datum.weekday()
-                                    monat = auftrag_datum.month
-                                    start_stunde = auftrag_datum.hour if auftrag_datum.hour > 0 else 8
-                                else:
-                                    wochentag, monat, start_stunde = 1, 6, 8
-
-                                # Kategorische Features encodieren
-                                try:
-                                    marke_encoded = encoders['marke'].transform([marke])[0]
-                                except:
-                                    marke_encoded = 0
-
-                                # Mechaniker encodieren (falls Encoder vorhanden)
-                                try:
-                                    if 'mechaniker' in encoders and mech_nr:
-                                        mechaniker_encoded = encoders['mechaniker'].transform([mech_nr])[0]
-                                    else:
-                                        mechaniker_encoded = 0
-                                except:
-                                    mechaniker_encoded = 0
-
-                                # Feature-Vektor basierend auf Modell-Anforderungen
-                                # Modell erwartet: vorgabe_aw, mechaniker_encoded, betrieb, wochentag, monat, start_stunde, marke_encoded, fahrzeug_alter_jahre, km_stand
-                                if model_features and len(model_features) == 9:
-                                    # V2 Modell (9 Features)
-                                    features = pd.DataFrame([[
-                                        vorgabe_aw,            # 1. vorgabe_aw
-                                        mechaniker_encoded,    # 2. mechaniker_encoded
-                                        betrieb,               # 3. betrieb
-                                        wochentag,             # 4. wochentag
-                                        monat,                 # 5. monat
-                                        start_stunde,          # 6. start_stunde
-                                        marke_encoded,         # 7. marke_encoded
-                                        fahrzeug_alter,        # 8. fahrzeug_alter_jahre
-                                        km_stand               # 9. km_stand
-                                    ]], columns=model_features)
-                                else:
-                                    # Fallback: V5 Modell (21 Features) - falls Modell doch mehr Features erwartet
-                                    soll_dauer_min = vorgabe_aw * 6
-                                    try:
-                                        auftragstyp = auftrag.get('auftragstyp', 'X') or 'X'
-                                        auftragstyp_encoded = encoders['auftragstyp'].transform([auftragstyp])[0]
-                                    except:
-                                        auftragstyp_encoded = 0
-                                    try:
-                                        labour_type = auftrag.get('labour_type', 'W') or 'W'
-                                        labour_type_encoded = encoders['labour_type'].transform([labour_type])[0]
-                                    except:
-                                        labour_type_encoded = 0
-                                    
-                                    kalenderwoche = auftrag_datum.isocalendar()[1] if auftrag_datum else 25
-                                    anzahl_positionen = int(auftrag.get('anzahl_positionen', 1) or 1)
-                                    anzahl_teile = int(auftrag.get('anzahl_teile', 0) or 0)
-                                    charge_type = int(auftrag.get('charge_type', 10) or 10)
-                                    urgency = int(auftrag.get('urgency', 0) or 0)
-                                    power_kw = float(auftrag.get('power_kw', 74) or 74)
-                                    cubic_capacity = float(auftrag.get('cubic_capacity', 1200) or 1200)
-                                    
-                                    features = pd.DataFrame([[
-                                        soll_dauer_min,        # 1. soll_dauer_min
-                                        vorgabe_aw,            # 2. soll_aw
-                                        betrieb,               # 3. betrieb
-                                        anzahl_positionen,     # 4. anzahl_positionen
-                                        anzahl_teile,          # 5. anzahl_teile
-                                        charge_type,           # 6. charge_type
-                                        urgency,               # 7. urgency
-                                        wochentag,             # 8. wochentag
-                                        monat,                 # 9. monat
-                                        start_stunde,          # 10. start_stunde
-                                        kalenderwoche,         # 11. kalenderwoche
-                                        power_kw,              # 12. power_kw
-                                        cubic_capacity,        # 13. cubic_capacity
-                                        km_stand,              # 14. km_stand
-                                        fahrzeug_alter,        # 15. fahrzeug_alter_jahre
-                                        1.0,                   # 16. productivity_factor
-                                        10.0,                  # 17. years_experience
-                                        0,                     # 18. meister
-                                        marke_encoded,         # 19. marke_encoded
-                                        auftragstyp_encoded,   # 20. auftragstyp_encoded
-                                        labour_type_encoded    # 21. labour_type_encoded
-                                    ]], columns=[
-                                        'soll_dauer_min', 'soll_aw', 'betrieb', 'anzahl_positionen', 'anzahl_teile',
-                                        'charge_type', 'urgency', 'wochentag', 'monat', 'start_stunde', 'kalenderwoche',
-                                        'power_kw', 'cubic_capacity', 'km_stand', 'fahrzeug_alter_jahre',
-                                        'productivity_factor', 'years_experience', 'meister',
-                                        'marke_encoded', 'auftragstyp_encoded', 'labour_type_encoded'
-                                    ])
-
-                                # DRIVE V5 Vorhersage
-                                vorhersage_min = model.predict(features)[0]
-
-                                # === DRIVE V5.1: Labour Correction Factor anwenden ===
-                                # Hierarchie: 1) Op+Type, 2) Op, 3) Type, 4) 1.0
-                                labour_op = str(auftrag.get('labour_operation_id') or '').strip()
-                                labour_t = str(auftrag.get('labour_type') or 'W').strip()
-
-                                correction_factor = 1.0
-                                correction_source = 'default'
-
-                                if labour_corrections:
-                                    # 1. Exakter Match: Op + Type
-                                    if labour_op and labour_op in labour_corrections.get('by_operation_and_type', {}):
-                                        if labour_t in labour_corrections['by_operation_and_type'][labour_op]:
-                                            correction_factor = labour_corrections['by_operation_and_type'][labour_op][labour_t]['factor']
-                                            correction_source = f'{labour_op}+{labour_t}'
-
-                                    # 2. Fallback: Operation aggregiert
-                                    if correction_source == 'default' and labour_op in labour_corrections.get('by_operation', {}):
-                                        correction_factor = labour_corrections['by_operation'][labour_op]
-                                        correction_source = labour_op
-
-                                    # 3. Fallback: Type global (G=1.24, W=0.94, I=1.08)
-                                    if correction_source == 'default' and labour_t in labour_corrections.get('by_type', {}):
-                                        correction_factor = labour_corrections['by_type'][labour_t]
-                                        correction_source = f'type:{labour_t}'
-
-                                # Korrigierte Vorhersage
-                                vorhersage_min_korrigiert = vorhersage_min * correction_factor
-                                vorhersage_aw = vorhersage_min_korrigiert / 6.0  # 1 AW = 6 Minuten
-
-                                # Potenzial = Differenz ML vs Herstellervorgabe
-                                potenzial_aw = vorhersage_aw - vorgabe_aw
-                                potenzial_prozent = (potenzial_aw / vorgabe_aw * 100) if vorgabe_aw > 0 else 0
-
-                                ml_predictions[auftrag['auftrag_nr']] = {
-                                    'vorhersage_aw': round(vorhersage_aw, 1),
-                                    'vorhersage_min': round(vorhersage_min_korrigiert, 0),
-                                    'potenzial_aw': round(potenzial_aw, 1),
-                                    'potenzial_prozent': round(potenzial_prozent, 1),
-                                    'correction_factor': round(correction_factor, 2),
-                                    'correction_source': correction_source,
-                                    'konfidenz': 'V5.1'  # Modell-Version für Debugging
-                                }
+                        if not (auftrag['vorgabe_aw'] and auftrag['vorgabe_aw'] > 0):
+                            continue
+                        try:
+                            auftrag_datum = auftrag['auftrag_datum']
+                            if auftrag_datum:
+                                wochentag = auftrag_datum.weekday()
+                                monat = auftrag_datum.month
+                                start_stunde = auftrag_datum.hour if auftrag_datum.hour > 0 else 8
+                            else:
+                                wochentag, monat, start_stunde = 1, 6, 8
+                            kandidaten.append((auftrag, {
+                                'vorgabe_aw': float(auftrag['vorgabe_aw']),
+                                'betrieb': auftrag['betrieb'] or 1,
+                                'marke': auftrag['marke'] or 'Opel',
+                                'km_stand': float(auftrag['km_stand'] or 50000),
+                                'fahrzeug_alter': float(auftrag['fahrzeug_alter'] or 3),
+                                'mech_nr': auftrag.get('mechaniker_nr') or auftrag.get('aktiv_mechaniker_nr'),
+                                'wochentag': wochentag,
+                                'monat': monat,
+                                'start_stunde': start_stunde,
+                                'kalenderwoche': auftrag_datum.isocalendar()[1] if auftrag_datum else 25,
+                                'auftragstyp': auftrag.get('auftragstyp', 'X') or 'X',
+                                'labour_type': auftrag.get('labour_type', 'W') or 'W',
+                                'anzahl_positionen': int(auftrag.get('anzahl_positionen', 1) or 1),
+                                'anzahl_teile': int(auftrag.get('anzahl_teile', 0) or 0),
+                                'charge_type': int(auftrag.get('charge_type', 10) or 10),
+                                'urgency': int(auftrag.get('urgency', 0) or 0),
+                                'power_kw': float(auftrag.get('power_kw', 74) or 74),
+                                'cubic_capacity': float(auftrag.get('cubic_capacity', 1200) or 1200),
+                            }))
+                        except Exception as ml_err:
+                            logger.debug(f"DRIVE ML-Fehler für Auftrag {auftrag['auftrag_nr']}: {ml_err}")
+
+                    if kandidaten:
+                        raw = pd.DataFrame([werte for _, werte in kandidaten])
+                        marke_encoded = bundle.encode('marke', raw['marke'])
+
+                        if v2_layout:
+                            # V2 Modell (9 Features): vorgabe_aw, mechaniker_encoded, betrieb, wochentag,
+                            # monat, start_stunde, marke_encoded, fahrzeug_alter_jahre, km_stand
+                            features = pd.DataFrame({
+                                'vorgabe_aw': raw['vorgabe_aw'],
+                                'mechaniker_encoded': bundle.encode('mechaniker', raw['mech_nr']),
+                                'betrieb': raw['betrieb'],
+                                'wochentag': raw['wochentag'],
+                                'monat': raw['monat'],
+                                'start_stunde': raw['start_stunde'],
+                                'marke_encoded': marke_encoded,
+                                'fahrzeug_alter_jahre': raw['fahrzeug_alter'],
+                                'km_stand': raw['km_stand'],
+                            })
+                            features.columns = model_features
+                        else:
+                            # Fallback: V5 Modell (21 Features) - falls Modell doch mehr Features erwartet
+                            features = pd.DataFrame({
+                                'soll_dauer_min': raw['vorgabe_aw'] * 6,
+                                'soll_aw': raw['vorgabe_aw'],
+                                'betrieb': raw['betrieb'],
+                                'anzahl_positionen': raw['anzahl_positionen'],
+                                'anzahl_teile': raw['anzahl_teile'],
+                                'charge_type': raw['charge_type'],
+                                'urgency': raw['urgency'],
+                                'wochentag': raw['wochentag'],
+                                'monat': raw['monat'],
+                                'start_stunde': raw['start_stunde'],
+                                'kalenderwoche': raw['kalenderwoche'],
+                                'power_kw': raw['power_kw'],
+                                'cubic_capacity': raw['cubic_capacity'],
+                                'km_stand': raw['km_stand'],
+                                'fahrzeug_alter_jahre': raw['fahrzeug_alter'],
+                                'productivity_factor': 1.0,
+                                'years_experience': 10.0,
+                                'meister': 0,
+                                'marke_encoded': marke_encoded,
+                                'auftragstyp_encoded': bundle.encode('auftragstyp', raw['auftragstyp']),
+                                'labour_type_encoded': bundle.encode('labour_type', raw['labour_type']),
+                            })
+
+                        # DRIVE V5 Vorhersage - ein Aufruf für alle Aufträge
+                        vorhersagen = predict_minutes(bundle, features)
+
+                        for (auftrag, werte), vorhersage_min in zip(kandidaten, vorhersagen):
+                            # === DRIVE V5.1: Labour Correction Factor anwenden ===
+                            labour_op = str(auftrag.get('labour_operation_id') or '').strip()
+                            labour_t = str(auftrag.get('labour_type') or 'W').strip()
+                            correction_factor, correction_source = labour_correction(bundle, labour_op, labour_t)
+
+                            # Korrigierte Vorhersage
+                            vorgabe_aw = werte['vorgabe_aw']
+                            vorhersage_min_korrigiert = float(vorhersage_min) * correction_factor
+                            vorhersage_aw = vorhersage_min_korrigiert / 6.0  # 1 AW = 6 Minuten
+
+                            # Potenzial = Differenz ML vs Herstellervorgabe
+                            potenzial_aw = vorhersage_aw - vorgabe_aw
+                            potenzial_prozent = (potenzial_aw / vorgabe_aw * 100) if vorgabe_aw > 0 else 0
+
+                            ml_predictions[auftrag['auftrag_nr']] = {
+                                'vorhersage_aw': round(vorhersage_aw, 1),
+                                'vorhersage_min': round(vorhersage_min_korrigiert, 0),
+                                'potenzial_aw': round(potenzial_aw, 1),
+                                'potenzial_prozent': round(potenzial_prozent, 1),
+                                'correction_factor': round(correction_factor, 2),
+                                'correction_source': correction_source,
+                                'konfidenz': 'V5.1'  # Modell-Version für Debugging
+                            }
 
-                            except Exception as ml_err:
-                                logger.debug(f"DRIVE ML-Fehler für Auftrag {auftrag['auftrag_nr']}: {ml_err}")
-
-                    # Mechaniker-Effizienz aus V5 Trainingsdaten
-                    data_path = "/opt/greiner-portal/data/ml/auftraege_features_v5.csv"
-                    if os.path.exists(data_path):
-                        df = pd.read_csv(data_path)
-                        eff = df.groupby('mechaniker_nr').agg({
-                            'ist_dauer_min': 'mean',
-                            'soll_dauer_min': 'mean',
-                            'effizienz_ratio': 'mean'
-                        }).reset_index()
-                        # Effizienz = SOLL/IST * 100 (höher = schneller als Vorgabe)
-                        eff['effizienz'] = (eff['soll_dauer_min'] / eff['ist_dauer_min']) * 100
-                        for _, row in eff.iterrows():
-                            mechaniker_effizienz[int(row['mechaniker_nr'])] = round(row['effizienz'], 1)
+                    # Mechaniker-Effizienz: beim Retrain vorberechnet (ml_retrain → mechaniker_effizienz.json)
+                    mechaniker_effizienz = bundle.mechaniker_effizienz
 
             except Exception as e:
                 logger.warning(f"DRIVE ML-Integration fehlgeschlagen: {e}")
@@ -902,6 +902,14 @@ try:
 except Exception as e:
     print(f"⚠️  ML API nicht geladen: {e}")
 
+# Job-Offload (langsame LLM/DAT/Mail-Requests im Hintergrund) - TAG 220
+try:
+    from api.job_offload import jobs_api
+    app.register_blueprint(jobs_api)
+    print("✅ Jobs API registriert: /api/jobs/")
+except Exception as e:
+    print(f"⚠️  Jobs API nicht geladen: {e}")
+
 # Teile-Status API (TAG 100 - Fehlende Teile auf Aufträgen)
 try:
     from api.teile_status_api import teile_status_bp
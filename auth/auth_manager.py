@@ -4,10 +4,15 @@ Verwaltet User-Login, Sessions und OU-basierte Rollen
 
 Author: Claude
 Date: 2025-11-08
+
+TAG 220: Principal-Cache für load_user (siehe get_user_by_id) – kein DB-/LDAP-Zugriff
+mehr pro Request; company wird beim Login in users.company gespeichert.
 """
 
 import os
 import logging
+import threading
+import time
 from datetime import datetime
 from typing import Optional, Dict, List, Any, Tuple
 from flask_login import UserMixin
@@ -22,6 +27,11 @@ from config.roles_config import get_role_from_title, get_allowed_features, FEATU
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# TAG 220: Principal-Cache (user_id → User) für Flask-Login load_user
+USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '300'))  # Sekunden, 0 = aus
+# Redis-Hash mit Generationszählern ('*' = alle User, sonst user_id) – Invalidierung über alle Worker
+USER_CACHE_GEN_KEY = 'auth:principal_gen'
+
 # OU → Rollen Mapping (Sinnvolle Defaults)
 OU_ROLE_MAPPING = {
     'Geschäftsleitung': {
@@ -241,8 +251,11 @@ class AuthManager:
                 ou=ou,
                 ad_groups=user_details['groups'],
                 roles=roles,
-                title=ldap_title
+                title=ldap_title,
+                company=user_details.get('company')
             )
+            # Login schreibt Rollen/Stammdaten neu → gecachten Principal verwerfen
+            invalidate_user_cache(user_id)
 
             # Option B: Zugriff nur aus Portal – keine LDAP-Rolle für Berechtigung
             # Wirksame Rolle = admin (user_roles) ODER in Rechteverwaltung zugewiesene Rolle ODER Default mitarbeiter
@@ -375,10 +388,12 @@ class AuthManager:
             return False
 
     def _cache_user(self, username: str, display_name: str, email: str,
-                    ou: str, ad_groups: List[str], roles: List[str], title: str = None) -> int:
+                    ou: str, ad_groups: List[str], roles: List[str], title: str = None,
+                    company: str = None) -> int:
         """
         Speichert/aktualisiert User in DB (Cache)
         TAG142: Umgestellt auf PostgreSQL via get_db()
+        TAG 220: company (LDAP) wird mitgespeichert – get_user_by_id braucht kein LDAP mehr
 
         Returns:
             user_id
@@ -398,10 +413,10 @@ class AuthManager:
                 user_id = existing[0]
                 cursor.execute(convert_placeholders('''
                     UPDATE users
-                    SET display_name = ?, email = ?, ou = ?, title = ?,
+                    SET display_name = ?, email = ?, ou = ?, title = ?, company = ?,
                         ad_groups = ?, last_login = ?
                     WHERE id = ?
-                '''), (display_name, email, ou, title, json.dumps(ad_groups),
+                '''), (display_name, email, ou, title, company, json.dumps(ad_groups),
                       datetime.now().isoformat(), user_id))
 
                 # Rollen aktualisieren - ABER Admin-Rollen behalten!
@@ -425,10 +440,10 @@ class AuthManager:
             else:
                 # Neuen User anlegen - PostgreSQL RETURNING für ID
                 cursor.execute(convert_placeholders('''
-                    INSERT INTO users (username, display_name, email, ou, title, ad_groups, last_login, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO users (username, display_name, email, ou, title, company, ad_groups, last_login, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                     RETURNING id
-                '''), (username, display_name, email, ou, title, json.dumps(ad_groups),
+                '''), (username, display_name, email, ou, title, company, json.dumps(ad_groups),
                       datetime.now().isoformat(), datetime.now().isoformat()))
                 result = cursor.fetchone()
                 user_id = result[0] if result else None
@@ -456,8 +471,10 @@ class AuthManager:
     
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """
-        Lädt User aus DB (für Session-Management)
-        TAG142: Umgestellt auf PostgreSQL via get_db()
+        Lädt User für Session-Management (Flask-Login load_user, jeder Request)
+
+        TAG 220: Aus dem Principal-Cache (USER_CACHE_TTL), sonst _load_user_from_db().
+        Änderungen über die Admin-API rufen invalidate_user_cache() auf.
 
         Args:
             user_id: User-ID
@@ -465,6 +482,20 @@ class AuthManager:
         Returns:
             User-Objekt oder None
         """
+        user = _user_cache_get(user_id)
+        if user is not None:
+            return user
+        generation = _cache_generation(user_id)
+        user = self._load_user_from_db(user_id)
+        if user is not None:
+            _user_cache_put(user_id, user, generation)
+        return user
+
+    def _load_user_from_db(self, user_id: int) -> Optional[User]:
+        """
+        Lädt User aus DB (User-Zeile + Rollen → Permissions/Features)
+        TAG142: Umgestellt auf PostgreSQL via get_db()
+        """
         try:
             conn = get_db()
             cursor = conn.cursor()
@@ -502,20 +533,18 @@ class AuthManager:
                 portal_role = 'admin'
                 permissions = OU_ROLE_MAPPING['Geschäftsleitung']['permissions']
                 allowed_features = ['admin'] + list(FEATURE_ACCESS.keys())
-                logger.info(f"👑 Admin-Override für User {user_id} - alle Features freigeschaltet")
+                logger.debug(f"👑 Admin-Override für User {user_id} - alle Features freigeschaltet")
             else:
                 override = user_row.get('portal_role_override')
                 portal_role = (override or 'mitarbeiter').strip() or 'mitarbeiter'
                 allowed_features = get_allowed_features(portal_role)
 
-            # TAG 109: Company aus LDAP holen für Standort-Default
-            company = None
-            try:
-                user_details = self.ldap.get_user_details(user_row['username'])
-                if user_details:
-                    company = user_details.get('company')
-            except:
-                pass  # Falls LDAP nicht erreichbar, company bleibt None
+            # TAG 109: Company für Standort-Default
+            # TAG 220: aus users.company (beim Login gespeichert) statt LDAP pro Request
+            company = user_row.get('company')
+            if company is None:
+                # Noch kein Login seit Einführung der Spalte: einmalig aus LDAP nachtragen
+                company = self._backfill_company(user_id, user_row['username'])
             
             # User-Objekt erstellen
             user = User(
@@ -538,6 +567,29 @@ class AuthManager:
             logger.error(f"❌ Fehler beim Laden des Users: {str(e)}")
             return None
     
+    def _backfill_company(self, user_id: int, username: str) -> Optional[str]:
+        """
+        company aus LDAP holen und in users.company speichern (TAG 220).
+        Für Sessions von vor der Migration, deren User sich seitdem nicht neu angemeldet hat.
+        """
+        try:
+            user_details = self.ldap.get_user_details(username)
+            company = user_details.get('company') if user_details else None
+        except Exception:
+            return None  # Falls LDAP nicht erreichbar, company bleibt None (nächster Versuch nach Cache-TTL)
+        if company:
+            try:
+                conn = get_db()
+                cursor = conn.cursor()
+                cursor.execute(convert_placeholders(
+                    'UPDATE users SET company = ? WHERE id = ? AND company IS NULL'
+                ), (company, user_id))
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                logger.warning(f"⚠️ users.company für User {user_id} nicht gespeichert: {e}")
+        return company
+
     def _log_auth_event(self, username: str, action: str, details: str,
                         ip_address: str = None):
         """
@@ -586,6 +638,77 @@ class AuthManager:
             logger.error(f"❌ Fehler beim Logout: {str(e)}")
 
 
+# =============================================================================
+# PRINCIPAL-CACHE (TAG 220)
+# =============================================================================
+# Pro Worker-Prozess: user_id → (gültig_bis, Generation, User). Die Generation kommt aus
+# Redis (USER_CACHE_GEN_KEY); invalidate_user_cache() erhöht sie, damit alle Gunicorn-Worker
+# ihren Eintrag beim nächsten Zugriff verwerfen. Ohne Redis greift nur die TTL (plus
+# lokale Invalidierung im aufrufenden Worker).
+
+_user_cache: Dict[int, Tuple[float, Optional[str], User]] = {}
+_user_cache_lock = threading.Lock()
+
+
+def _cache_generation(user_id: int) -> Optional[str]:
+    """Aktuelle Generation für user_id ('<alle>:<user>'), None wenn Redis fehlt."""
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        gen_all, gen_user = client.hmget(USER_CACHE_GEN_KEY, '*', str(user_id))
+    except Exception as e:
+        _mark_redis_down(e)
+        return None
+    return f"{gen_all or 0}:{gen_user or 0}"
+
+
+def _user_cache_get(user_id: int) -> Optional[User]:
+    if USER_CACHE_TTL <= 0:
+        return None
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+    if entry is None:
+        return None
+    expires_at, generation, user = entry
+    if expires_at < time.monotonic() or _cache_generation(user_id) != generation:
+        with _user_cache_lock:
+            _user_cache.pop(user_id, None)
+        return None
+    return user
+
+
+def _user_cache_put(user_id: int, user: User, generation: Optional[str]):
+    if USER_CACHE_TTL <= 0:
+        return
+    with _user_cache_lock:
+        _user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL, generation, user)
+
+
+def invalidate_user_cache(user_id: Optional[int] = None):
+    """
+    Gecachten Principal verwerfen – nach Änderungen an user_roles, portal_role_override
+    (user_id angeben) oder feature_access (None = alle User).
+    """
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
+    from api.cache_utils import get_redis_client, _mark_redis_down
+
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.hincrby(USER_CACHE_GEN_KEY, '*' if user_id is None else str(user_id), 1)
+    except Exception as e:
+        _mark_redis_down(e)
+
+
 # Singleton-Instanz
 _auth_manager_instance = None
 
@@ -333,6 +333,13 @@ app.conf.update(
             'options': {'queue': 'verkauf'}
         },
         
+        # Locosoft Mirror inkrementell (TAG 220): Delta-Tabellen alle 15 Min in der Arbeitszeit
+        'locosoft-mirror-incremental': {
+            'task': 'celery_app.tasks.locosoft_mirror_incremental',
+            'schedule': crontab(minute='7,22,37,52', hour='6-18', day_of_week='mon-sat'),
+            'options': {'queue': 'verkauf'}
+        },
+        
         # Finanzreporting Cube Refresh (nach Locosoft Mirror)
         # TAG 179: Automatischer Refresh nach Locosoft-Sync (18-19 Uhr)
         'refresh-finanzreporting-cube': {
@@ -363,7 +370,7 @@ app.conf.update(
         'update-penner-marktpreise': {
             'task': 'celery_app.tasks.update_penner_marktpreise',
             'schedule': crontab(minute=0, hour=3),
-            'kwargs': {'min_lagerwert': 50, 'limit': 100},
+            'kwargs': {'min_lagerwert': 50},  # TAG 220: ganze Penner-Liste, Crawl mit Zeitbudget
             'options': {'queue': 'aftersales'}
         },
 
@@ -397,6 +404,13 @@ app.conf.update(
             'options': {'queue': 'aftersales'}
         },
 
+        # Stempeluhr-/Abwesenheits-Änderungen → Stempeluhr- und Forecast-Cache invalidieren (TAG 220)
+        'stempeluhr-aenderungen': {
+            'task': 'celery_app.tasks.stempeluhr_aenderungen',
+            'schedule': crontab(minute='*', hour='6-18', day_of_week='mon-sat'),
+            'options': {'queue': 'aftersales'}
+        },
+
         # =====================================================================
         # WHATSAPP POLLING (Alternative zum Webhook — nur bei WHATSAPP_USE_POLLING_INSTEAD_OF_WEBHOOK=true)
         # =====================================================================
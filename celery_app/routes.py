@@ -221,6 +221,7 @@ TASK_CATEGORIES = {
             ('servicebox_master', 'ServiceBox Master', 'Komplett neu laden (langsam!)'),
             ('check_servicebox_password_expiry', 'ServiceBox Passwort-Prüfung', 'Erinnerung bei ablaufendem Passwort'),
             ('sync_teile', 'Teile Sync', 'Teile synchronisieren'),
+            ('refresh_lager_snapshot', 'Lager-Snapshot', 'Renner & Penner neu klassifizieren'),
             ('import_teile', 'Teile Import', 'Teile-Lieferscheine importieren'),
             ('werkstatt_leistung', 'Werkstatt Leistung', 'Leistungsgrade berechnen'),
             ('email_werkstatt_tagesbericht', 'Werkstatt E-Mail', 'Tagesbericht senden'),
@@ -236,6 +237,7 @@ TASK_CATEGORIES = {
             ('import_stellantis', 'Stellantis Import', 'Stellantis Fahrzeuge importieren'),
             ('sync_stammdaten', 'Stammdaten Sync', 'Fahrzeug-Stammdaten sync'),
             ('locosoft_mirror', 'Locosoft Mirror', 'Locosoft komplett spiegeln'),
+            ('locosoft_mirror_incremental', 'Locosoft Mirror (Delta)', 'Geänderte Locosoft-Daten nachziehen'),
         ]
     },
     'integrations': {
@@ -284,9 +286,9 @@ def start_task(task_name):
         scrape_hyundai, leasys_cache_refresh, umsatz_bereinigung, bwa_berechnung,
         sync_employees, sync_locosoft_employees, email_auftragseingang,
         email_tek_daily, email_afa_bestand_report, email_afa_verkaufsempfehlungen_report, db_backup, cleanup_backups,         servicebox_scraper, servicebox_matcher,
-        servicebox_import, servicebox_master, check_servicebox_password_expiry, sync_teile, import_teile,
+        servicebox_import, servicebox_master, check_servicebox_password_expiry, sync_teile, refresh_lager_snapshot, import_teile,
         werkstatt_leistung, email_werkstatt_tagesbericht, sync_charge_types,
-        ml_retrain, sync_sales, import_stellantis, sync_stammdaten, locosoft_mirror, sync_ad_departments,
+        ml_retrain, sync_sales, import_stellantis, sync_stammdaten, locosoft_mirror, locosoft_mirror_incremental, sync_ad_departments,
         update_penner_marktpreise, email_penner_weekly, sync_eautoseller_data,
         benachrichtige_serviceberater_ueberschreitungen, fetch_whatsapp_inbound_polling
     )
@@ -314,6 +316,7 @@ def start_task(task_name):
         'servicebox_master': servicebox_master,
         'check_servicebox_password_expiry': check_servicebox_password_expiry,
         'sync_teile': sync_teile,
+        'refresh_lager_snapshot': refresh_lager_snapshot,
         'import_teile': import_teile,
         'werkstatt_leistung': werkstatt_leistung,
         'email_werkstatt_tagesbericht': email_werkstatt_tagesbericht,
@@ -323,6 +326,7 @@ def start_task(task_name):
         'import_stellantis': import_stellantis,
         'sync_stammdaten': sync_stammdaten,
         'locosoft_mirror': locosoft_mirror,
+        'locosoft_mirror_incremental': locosoft_mirror_incremental,
         'sync_ad_departments': sync_ad_departments,
         'update_penner_marktpreise': update_penner_marktpreise,
         'email_penner_weekly': email_penner_weekly,
@@ -484,6 +488,7 @@ def task_history(task_name):
             'servicebox_master': 'celery_app.tasks.servicebox_master',
             'check_servicebox_password_expiry': 'celery_app.tasks.check_servicebox_password_expiry',
             'sync_teile': 'celery_app.tasks.sync_teile',
+            'refresh_lager_snapshot': 'celery_app.tasks.refresh_lager_snapshot',
             'import_teile': 'celery_app.tasks.import_teile',
             'werkstatt_leistung': 'celery_app.tasks.werkstatt_leistung',
             'email_werkstatt_tagesbericht': 'celery_app.tasks.email_werkstatt_tagesbericht',
@@ -14,6 +14,38 @@ from celery import shared_task
 # Logging
 logger = logging.getLogger('celery_tasks')
 
+
+def _invalidate_response_cache(*tags):
+    """Response-Cache nach Datenimport invalidieren (TAG 220, siehe api.cache_utils)."""
+    try:
+        from api.cache_utils import invalidate_cache_tags
+        invalidate_cache_tags(*tags)
+    except Exception as e:
+        logger.warning(f"Response-Cache-Invalidierung fehlgeschlagen ({', '.join(tags)}): {e}")
+
+
+def _clear_werkstatt_leistung_cache():
+    """Werkstatt-Leistung-Caches aller Worker verwerfen (Redis-Generation, siehe api.werkstatt_leistung)."""
+    try:
+        from api.werkstatt_leistung import clear_leistung_cache
+        clear_leistung_cache()
+    except Exception as e:
+        logger.warning(f"Werkstatt-Leistung-Cache nicht geleert: {e}")
+
+
+def _record_locosoft_mirror_success(mode):
+    """
+    Erfolgreichen Mirror-Lauf im Status-Key status:locosoft_mirror vermerken (TAG 220).
+    send_daily_tek.py prüft diesen Key statt celery-task-meta-* per KEYS zu durchsuchen.
+    """
+    try:
+        from api.cache_utils import set_job_status
+        jetzt = datetime.now().isoformat(timespec='seconds')
+        set_job_status('locosoft_mirror', last_success=jetzt, last_mode=mode, **{f'last_{mode}_success': jetzt})
+    except Exception as e:
+        logger.warning(f"Locosoft-Mirror-Status nicht geschrieben: {e}")
+
+
 # Neue Task für Serviceberater-Benachrichtigungen (TAG 171)
 @shared_task(soft_time_limit=300)
 def benachrichtige_serviceberater_ueberschreitungen():
@@ -585,31 +617,31 @@ def benachrichtige_serviceberater_ueberschreitungen():
 # SERVICEBOX SCRAPER TASKS (TAG 171)
 # =============================================================================
 
+# TAG 220: eine Crawl-Engine für Scraper (inkrementell) und Master (voll)
+SERVICEBOX_CRAWLER_SCRIPT = '/opt/greiner-portal/tools/scrapers/servicebox_api_scraper.py'
+
+
 @shared_task(soft_time_limit=1800, name='celery_app.tasks.servicebox_scraper')
 def servicebox_scraper():
     """
     ServiceBox API-Scraper - Holt Bestellungen aus ServiceBox via API
     TAG 173: Umgestellt auf API-Endpoint für bessere Performance
+    TAG 220: inkrementell (nur geänderte Bestellungen), Details parallel, Checkpoint
     Läuft 3x täglich (09:30, 12:30, 16:30)
     """
     import subprocess
     import os
     
     try:
-        # TAG 173: Neuer API-Scraper
-        script_path = '/opt/greiner-portal/tools/scrapers/servicebox_api_scraper.py'
-        if not os.path.exists(script_path):
-            # Fallback auf alten Scraper
-            script_path = '/opt/greiner-portal/tools/scrapers/servicebox_detail_scraper_final.py'
-            logger.warning(f"API-Scraper nicht gefunden, verwende alten Scraper: {script_path}")
-        
+        script_path = SERVICEBOX_CRAWLER_SCRIPT
         if not os.path.exists(script_path):
             logger.error(f"ServiceBox Scraper-Script nicht gefunden: {script_path}")
             return {'success': False, 'error': 'Script nicht gefunden'}
         
         logger.info("Starte ServiceBox API-Scraper...")
         result = subprocess.run(
-            ['/opt/greiner-portal/venv/bin/python3', script_path],
+            # Budget unter dem Timeout: Rest wird per Checkpoint im nächsten Lauf fortgesetzt
+            ['/opt/greiner-portal/venv/bin/python3', script_path, '--budget', '1700'],
             cwd='/opt/greiner-portal',
             capture_output=True,
             text=True,
@@ -713,20 +745,22 @@ def servicebox_import():
 def servicebox_master():
     """
     ServiceBox Master - Komplett neu laden (alle Bestellungen)
+    TAG 220: Crawl-Engine im Voll-Modus (vorher Selenium-Scraper, dessen JSON kein
+    Folgeschritt gelesen hat); bei Timeout setzt der nächste Lauf am Checkpoint fort
     Läuft täglich um 20:00
     """
     import subprocess
     import os
     
     try:
-        script_path = '/opt/greiner-portal/tools/scrapers/servicebox_scraper_complete.py'
+        script_path = SERVICEBOX_CRAWLER_SCRIPT
         if not os.path.exists(script_path):
             logger.error(f"ServiceBox Master-Script nicht gefunden: {script_path}")
             return {'success': False, 'error': 'Script nicht gefunden'}
         
         logger.info("Starte ServiceBox Master (komplett neu laden)...")
         result = subprocess.run(
-            ['/opt/greiner-portal/venv/bin/python3', script_path],
+            ['/opt/greiner-portal/venv/bin/python3', script_path, '--voll', '--budget', '3500'],
             cwd='/opt/greiner-portal',
             capture_output=True,
             text=True,
@@ -906,6 +940,7 @@ def import_mt940():
         
         if result.returncode == 0:
             logger.info("MT940 Import erfolgreich abgeschlossen")
+            _invalidate_response_cache('bankenspiegel')
             return {'success': True, 'stdout': result.stdout[-500:]}
         else:
             error_msg = result.stderr[-500:] if result.stderr else result.stdout[-500:]
@@ -996,6 +1031,8 @@ def import_santander():
         
         if result.returncode == 0:
             logger.info("Santander Import erfolgreich abgeschlossen")
+            # fahrzeugfinanzierungen geändert → Zinsen der AfA-Verkaufsempfehlungen neu lesen
+            _invalidate_response_cache('afa_vin')
             return {'success': True, 'stdout': result.stdout[-500:]}
         else:
             logger.error(f"Santander Import fehlgeschlagen: {result.stderr}")
@@ -1035,6 +1072,8 @@ def import_hyundai():
         
         if result.returncode == 0:
             logger.info("Hyundai Import erfolgreich abgeschlossen")
+            # fahrzeugfinanzierungen geändert → Zinsen der AfA-Verkaufsempfehlungen neu lesen
+            _invalidate_response_cache('afa_vin')
             return {'success': True, 'stdout': result.stdout[-500:]}
         else:
             logger.error(f"Hyundai Import fehlgeschlagen: {result.stderr}")
@@ -1412,6 +1451,10 @@ def locosoft_mirror():
         
         if result.returncode == 0:
             logger.info("Locosoft Mirror erfolgreich abgeschlossen")
+            _invalidate_response_cache('tek', 'werkstatt', 'renner_penner', 'afa_vin')
+            _clear_werkstatt_leistung_cache()
+            _record_locosoft_mirror_success('full')
+            _trigger_lager_snapshot()
             return {'success': True, 'stdout': result.stdout[-500:]}
         else:
             logger.error(f"Locosoft Mirror fehlgeschlagen: {result.stderr}")
@@ -1425,6 +1468,47 @@ def locosoft_mirror():
         return {'success': False, 'error': str(e)}
 
 
+@shared_task(soft_time_limit=600, name='celery_app.tasks.locosoft_mirror_incremental')
+def locosoft_mirror_incremental():
+    """
+    Locosoft Mirror inkrementell (TAG 220)
+    Läuft alle 15 Min während der Arbeitszeit: nur Delta-Tabellen
+    (journal_accountings, times, labours, invoices, orders), nur geänderte Fenster.
+    """
+    import subprocess
+    import os
+    
+    try:
+        script_path = '/opt/greiner-portal/scripts/sync/locosoft_mirror.py'
+        if not os.path.exists(script_path):
+            logger.error(f"Locosoft Mirror-Script nicht gefunden: {script_path}")
+            return {'success': False, 'error': 'Script nicht gefunden'}
+        
+        result = subprocess.run(
+            ['/opt/greiner-portal/venv/bin/python3', script_path, '--mode', 'incremental'],
+            cwd='/opt/greiner-portal',
+            capture_output=True,
+            text=True,
+            timeout=600
+        )
+        
+        if result.returncode == 0:
+            logger.info("Locosoft Mirror (inkrementell) erfolgreich abgeschlossen")
+            _invalidate_response_cache('tek', 'afa_vin')
+            _record_locosoft_mirror_success('incremental')
+            return {'success': True, 'stdout': result.stdout[-500:]}
+        else:
+            logger.error(f"Locosoft Mirror (inkrementell) fehlgeschlagen: {result.stderr}")
+            return {'success': False, 'error': result.stderr[-500:]}
+    
+    except subprocess.TimeoutExpired:
+        logger.error("Locosoft Mirror (inkrementell): Timeout nach 10 Minuten")
+        return {'success': False, 'error': 'Timeout'}
+    except Exception as e:
+        logger.exception("Fehler bei Locosoft Mirror (inkrementell)")
+        return {'success': False, 'error': str(e)}
+
+
 @shared_task(soft_time_limit=300, name='celery_app.tasks.sync_teile')
 def sync_teile():
     """
@@ -1461,6 +1545,7 @@ def sync_teile():
         
         if result.returncode == 0:
             logger.info("Teile Sync erfolgreich abgeschlossen")
+            _trigger_lager_snapshot()
             return {'success': True, 'stdout': result.stdout[-500:]}
         else:
             logger.error(f"Teile Sync fehlgeschlagen: {result.stderr}")
@@ -1544,6 +1629,8 @@ def import_stellantis():
         
         if result.returncode == 0:
             logger.info("Stellantis Import erfolgreich abgeschlossen")
+            # fahrzeugfinanzierungen geändert → Zinsen der AfA-Verkaufsempfehlungen neu lesen
+            _invalidate_response_cache('afa_vin')
             return {'success': True, 'stdout': result.stdout[-500:]}
         else:
             logger.error(f"Stellantis Import fehlgeschlagen: {result.stderr}")
@@ -2192,7 +2279,17 @@ def ml_retrain():
         
         if result.returncode == 0:
             logger.info("ML Training erfolgreich abgeschlossen")
-            return {'success': True, 'stdout': result.stdout[-500:]}
+            # TAG 220: Mechaniker-Effizienz vorberechnen (statt CSV-Auswertung pro Request)
+            effizienz_info = {}
+            try:
+                from api.ml_model_registry import export_mechaniker_effizienz, EFFIZIENZ_PATH
+                anzahl = export_mechaniker_effizienz()
+                effizienz_info = {'mechaniker_effizienz': anzahl}
+                logger.info(f"Mechaniker-Effizienz exportiert: {anzahl} Mechaniker → {EFFIZIENZ_PATH}")
+            except Exception as e:
+                logger.warning(f"Mechaniker-Effizienz-Export fehlgeschlagen: {e}")
+                effizienz_info = {'effizienz_warning': str(e)}
+            return {'success': True, 'stdout': result.stdout[-500:], **effizienz_info}
         else:
             logger.error(f"ML Training fehlgeschlagen: {result.stderr}")
             return {'success': False, 'error': result.stderr[-500:]}
@@ -2205,51 +2302,32 @@ def ml_retrain():
         return {'success': False, 'error': str(e)}
 
 
+# Zeitbudget des Crawls: Rest bis soft_time_limit bleibt für offene Requests + letzten Batch
+PENNER_MARKTPREISE_BUDGET = 270
+
+
 @shared_task(soft_time_limit=300, name='celery_app.tasks.update_penner_marktpreise')
-def update_penner_marktpreise():
+def update_penner_marktpreise(min_lagerwert=50, limit=None):
     """
     Penner Marktpreise - Marktpreise aktualisieren
     Läuft täglich um 03:00
+
+    TAG 220: direkt über PreisvergleichService.update_all_penner (Crawl-Engine) statt
+    Subprocess. Ganze Penner-Liste nach Lagerwert; was im Zeitbudget nicht mehr
+    abgefragt wird, steht beim nächsten Lauf vorne.
     """
-    import subprocess
-    import os
-    
     try:
-        # Prüfe verschiedene mögliche Pfade
-        script_paths = [
-            '/opt/greiner-portal/scripts/penner/update_marktpreise.py',
-            '/opt/greiner-portal/scripts/update_penner_marktpreise.py'
-        ]
-        
-        script_path = None
-        for path in script_paths:
-            if os.path.exists(path):
-                script_path = path
-                break
-        
-        if not script_path:
-            logger.warning("Penner Marktpreise-Script nicht gefunden")
-            return {'success': False, 'error': 'Script nicht gefunden'}
-        
+        from api.preisvergleich_service import get_preisvergleich_service
+
         logger.info("Starte Penner Marktpreise Update...")
-        result = subprocess.run(
-            ['/opt/greiner-portal/venv/bin/python3', script_path],
-            cwd='/opt/greiner-portal',
-            capture_output=True,
-            text=True,
-            timeout=300
+        result = get_preisvergleich_service().update_all_penner(
+            min_lagerwert=min_lagerwert,
+            limit=limit,
+            budget_sekunden=PENNER_MARKTPREISE_BUDGET
         )
-        
-        if result.returncode == 0:
-            logger.info("Penner Marktpreise Update erfolgreich abgeschlossen")
-            return {'success': True, 'stdout': result.stdout[-500:]}
-        else:
-            logger.error(f"Penner Marktpreise Update fehlgeschlagen: {result.stderr}")
-            return {'success': False, 'error': result.stderr[-500:]}
-    
-    except subprocess.TimeoutExpired:
-        logger.error("Penner Marktpreise Update: Timeout nach 5 Minuten")
-        return {'success': False, 'error': 'Timeout'}
+        logger.info(f"Penner Marktpreise Update abgeschlossen: {result}")
+        return {'success': True, **result}
+
     except Exception as e:
         logger.exception("Fehler bei Penner Marktpreise Update")
         return {'success': False, 'error': str(e)}
@@ -2386,6 +2464,9 @@ def sync_eautoseller_data():
         except Exception as bwa_e:
             logger.warning("eAutoSeller BWA-Platzierungen (optional): %s", bwa_e)
             out['bwa_error'] = str(bwa_e)[:200]
+        if out['script_ok'] or out['bwa_updated']:
+            # AfA-Verkaufsempfehlungen (api/afa_vin_anreicherung): eAutoSeller-Platzierungen neu lesen
+            _invalidate_response_cache('afa_vin')
         return out
     except subprocess.TimeoutExpired:
         logger.error("eAutoseller Sync: Timeout nach 5 Minuten")
@@ -2696,3 +2777,108 @@ def garantie_precheck_refresh(max_orders: int = 120, max_ai: int = 20):
     except Exception as e:
         logger.exception("Fehler bei garantie_precheck_refresh")
         return {'success': False, 'error': str(e)}
+
+
+@shared_task(soft_time_limit=600, name='celery_app.tasks.kategorisiere_transaktionen_ki')
+def kategorisiere_transaktionen_ki(limit: int = 50):
+    """
+    KI-Fallback der Transaktions-Kategorisierung (TAG 220).
+    Wird von POST /api/bankenspiegel/transaktionen/kategorisieren (mit_ki=true) angestoßen,
+    statt LM Studio im Gunicorn-Worker seriell aufzurufen.
+    Batch-Prompts, begrenzt parallel, Vorschläge per Fingerprint gecacht (api.ai_api).
+    """
+    try:
+        from api.db_utils import db_session, rows_to_list
+        from api.ai_api import kategorisiere_transaktionen_mit_ki
+        from api.transaktion_kategorisierung import bulk_update_kategorien
+
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, verwendungszweck, buchungstext, gegenkonto_name, betrag
+                FROM transaktionen
+                WHERE (kategorie IS NULL OR kategorie = '')
+                ORDER BY buchungsdatum DESC
+                LIMIT %s
+            """, (int(limit),))
+            transaktionen = rows_to_list(cursor.fetchall())
+
+        if not transaktionen:
+            return {'success': True, 'ki_aktualisiert': 0, 'message': 'Keine unkategorisierten Transaktionen'}
+
+        ergebnis = kategorisiere_transaktionen_mit_ki(transaktionen)
+        updates = [(tid, v['kategorie'], v.get('unterkategorie')) for tid, v in ergebnis['vorschlaege'].items()]
+        with db_session() as conn:
+            cursor = conn.cursor()
+            # Nur noch leere Kategorien: manuelle Zuordnung während des KI-Laufs nicht überschreiben
+            aktualisiert = bulk_update_kategorien(cursor, updates, nur_unkategorisiert=True)
+            conn.commit()
+
+        if aktualisiert:
+            _invalidate_response_cache('bankenspiegel')
+        logger.info("KI-Kategorisierung: %s von %s Transaktionen aktualisiert (%s aus Cache, %s Prompts)",
+                    aktualisiert, len(transaktionen), ergebnis['cache_treffer'], ergebnis['ki_anfragen'])
+        return {
+            'success': True,
+            'ki_aktualisiert': aktualisiert,
+            'anzahl': len(transaktionen),
+            'cache_treffer': ergebnis['cache_treffer'],
+            'ki_anfragen': ergebnis['ki_anfragen'],
+        }
+    except Exception as e:
+        logger.exception("Fehler bei kategorisiere_transaktionen_ki")
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task(soft_time_limit=600, name='celery_app.tasks.refresh_lager_snapshot')
+def refresh_lager_snapshot():
+    """
+    Lager-Snapshot für Renner & Penner neu aufbauen (TAG 220).
+    Wird nach erfolgreichem sync_teile und locosoft_mirror angestoßen; die Endpoints
+    unter /api/lager lesen danach nur noch den vorklassifizierten Snapshot.
+    """
+    try:
+        from api.lager_snapshot import refresh_lager_snapshot as refresh
+
+        ergebnis = refresh()
+        return {'success': True, **ergebnis}
+    except Exception as e:
+        logger.exception("Fehler bei refresh_lager_snapshot")
+        return {'success': False, 'error': str(e)}
+
+
+def _trigger_lager_snapshot():
+    """Snapshot-Neuaufbau asynchron anstoßen (Fehler blockieren den Sync nicht)."""
+    try:
+        refresh_lager_snapshot.apply_async(queue='aftersales')
+    except Exception as e:
+        logger.warning(f"Lager-Snapshot konnte nicht angestoßen werden: {e}")
+
+
+@shared_task(soft_time_limit=60, name='celery_app.tasks.stempeluhr_aenderungen')
+def stempeluhr_aenderungen():
+    """
+    Stempeluhr-/Abwesenheits-Änderungen erkennen (TAG 220).
+    Vergleicht den Fingerabdruck je Betrieb (WerkstattData.get_stempeluhr_fingerprint) mit dem
+    letzten Lauf (status:stempeluhr_fingerprint) und invalidiert bei Änderung die Stempeluhr-Tags:
+    Stempeluhr-Ansicht und Kapazitäts-Forecast werden dann beim nächsten Aufruf neu berechnet.
+    """
+    try:
+        from api.werkstatt_data import WerkstattData
+        from api.cache_utils import get_job_status, set_job_status, invalidate_stempeluhr_cache
+
+        vorher = get_job_status('stempeluhr_fingerprint')
+        if vorher is None:
+            return {'success': False, 'error': 'Redis nicht erreichbar'}
+
+        aktuell = WerkstattData.get_stempeluhr_fingerprint()
+        betriebe = set(aktuell) | set(vorher)
+        geaendert = sorted(b for b in betriebe if aktuell.get(b, '') != vorher.get(b, ''))
+        for betrieb in geaendert:
+            invalidate_stempeluhr_cache(betrieb)
+        if geaendert:
+            set_job_status('stempeluhr_fingerprint', **{b: aktuell.get(b, '') for b in betriebe})
+        return {'success': True, 'geaendert': geaendert}
+    except Exception as e:
+        logger.exception("Fehler bei stempeluhr_aenderungen")
+        return {'success': False, 'error': str(e)}
@@ -1,5 +1,7 @@
 """Gunicorn configuration for Greiner Portal"""
+import gc
 import multiprocessing
+import os
 
 # Server socket
 bind = "127.0.0.1:5000"
@@ -13,6 +15,29 @@ worker_connections = 1000
 timeout = 120  # Mind. 90s für Hilfe-KI (LM Studio); war 30s → 502 bei „Mit KI erweitern“
 keepalive = 2
 
+# TAG 220: App einmal im Master importieren (Blueprints, Flask, psycopg2, Graph/SOAP-Clients),
+# die Worker teilen diesen Import-Kern per Copy-on-Write statt ihn je Worker neu zu laden.
+# Schwere optionale Bibliotheken (pandas, reportlab, bs4) importieren die Blueprints erst bei Bedarf.
+# DB-Pool, Redis-Client und Job-Pool sind fork-sicher (werden im Worker neu aufgebaut).
+# Achtung: mit Preload lädt "kill -HUP" keinen neuen Code - nach Deploy den Dienst neu starten.
+# Abschalten: DRIVE_PRELOAD_APP=0
+preload_app = os.environ.get('DRIVE_PRELOAD_APP', '1').lower() not in ('0', 'false', 'no')
+
+if preload_app:
+    # Während des Imports keine GC-Läufe: sonst werden Objekt-Header im Master umsortiert/beschrieben
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    """Import-Kern einfrieren: der Zyklus-GC im Worker fasst diese Objekte nicht mehr an (keine CoW-Kopien)."""
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
 # Logging
 accesslog = "/opt/greiner-portal/logs/gunicorn-access.log"
 errorlog = "/opt/greiner-portal/logs/gunicorn-error.log"
@@ -0,0 +1,56 @@
+-- MT940-Import: Datei-Manifest + natürliche Schlüssel für Bulk-Deduplizierung (TAG 220)
+-- bank_import_dateien: eine Zeile pro Datei auf dem Share (Größe, mtime, SHA-256, Ergebnis des letzten Imports).
+-- Unveränderte Dateien überspringt scripts/imports/import_mt940.py ohne sie zu öffnen; das Script legt die
+-- Tabelle bei Bedarf auch selbst an.
+-- Die Unique-Indizes auf transaktionen/salden ersetzen die SELECT-Prüfungen pro Zeile
+-- (INSERT ... ON CONFLICT DO NOTHING). Vorhandene Duplikate im Schlüssel werden vorher bereinigt
+-- (behalten wird die manuell kategorisierte bzw. älteste Zeile).
+-- Ausführung: PGPASSWORD=DrivePortal2024 psql -h 127.0.0.1 -U drive_user -d drive_portal -f migrations/add_bank_import_manifest.sql
+
+CREATE TABLE IF NOT EXISTS bank_import_dateien (
+    pfad                TEXT PRIMARY KEY,           -- absoluter Pfad auf dem Share
+    dateiname           TEXT NOT NULL,
+    groesse             BIGINT NOT NULL,
+    mtime_ns            BIGINT NOT NULL,
+    sha256              VARCHAR(64),
+    konto_id            INTEGER,
+    status              VARCHAR(20) NOT NULL,       -- ok | fehler | kein_konto
+    transaktionen_neu   INTEGER DEFAULT 0,
+    transaktionen_dup   INTEGER DEFAULT 0,
+    salden_neu          INTEGER DEFAULT 0,
+    salden_aktualisiert INTEGER DEFAULT 0,
+    fehler              TEXT,
+    importiert_am       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE bank_import_dateien IS 'MT940-Import: Manifest der eingelesenen Dateien; unveränderte Dateien (Größe+mtime bzw. SHA-256) werden übersprungen.';
+
+-- Duplikate im natürlichen Schlüssel entfernen (die bisherige Einzelprüfung hat sie verhindert;
+-- vorhanden sein können sie nur aus parallelen Läufen oder Alt-Importen)
+DELETE FROM transaktionen t
+USING (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY konto_id, buchungsdatum, betrag, verwendungszweck
+        ORDER BY kategorie_manuell DESC, id
+    ) AS rn
+    FROM transaktionen
+    WHERE verwendungszweck IS NOT NULL
+) d
+WHERE t.id = d.id AND d.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_trans_unique
+    ON transaktionen (konto_id, buchungsdatum, betrag, verwendungszweck);
+
+-- salden: UNIQUE(konto_id, datum) stammt aus dem Schema, nur anlegen falls es fehlt
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_indexes
+        WHERE tablename = 'salden' AND indexdef ILIKE 'CREATE UNIQUE INDEX%(konto_id, datum)%'
+    ) THEN
+        DELETE FROM salden s
+        USING salden s2
+        WHERE s.konto_id = s2.konto_id AND s.datum = s2.datum AND s.id < s2.id;
+        CREATE UNIQUE INDEX idx_salden_konto_datum ON salden (konto_id, datum);
+    END IF;
+END $$;
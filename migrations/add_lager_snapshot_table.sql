@@ -0,0 +1,38 @@
+-- Renner & Penner: vorklassifizierter Lager-Snapshot (TAG 220)
+-- Zeilen je Lager (betrieb = stock_no) und je Teilenummer über alle Lager (betrieb IS NULL,
+-- nur Zeilen der Analyse: ohne AT-Teile, Kaution, Rücklaufteil, Altteil-Wert).
+-- Gepflegt von api/lager_snapshot.py (refresh_lager_snapshot), angestoßen von den Celery-Tasks
+-- sync_teile und locosoft_mirror. Abgeleitete Spalten (verkauf_12m, tage_seit_abgang, kategorie, ...)
+-- gelten für das Datum von "stand"; an Folgetagen rechnen die Worker sie beim Laden neu.
+-- Ausführung: PGPASSWORD=DrivePortal2024 psql -h 127.0.0.1 -U drive_user -d drive_portal -f migrations/add_lager_snapshot_table.sql
+
+CREATE TABLE IF NOT EXISTS lager_snapshot (
+    part_number        TEXT NOT NULL,
+    betrieb            INTEGER,                              -- stock_no; NULL = alle Lager je Teilenummer
+    description        TEXT,
+    parts_type         INTEGER,
+    hat_stamm          BOOLEAN NOT NULL DEFAULT FALSE,       -- Teil in parts_master vorhanden
+    analyse            BOOLEAN NOT NULL DEFAULT FALSE,       -- in Renner/Penner-Ansichten enthalten
+    bestand            DOUBLE PRECISION,
+    ek_preis           DOUBLE PRECISION,
+    vk_preis           DOUBLE PRECISION,
+    wert               DOUBLE PRECISION,                     -- stock_level * usage_value (ungerundet)
+    lagerwert          DOUBLE PRECISION,                     -- gerundet auf Cent
+    verkauf_aktuell    DOUBLE PRECISION,
+    verkauf_vorjahr    DOUBLE PRECISION,
+    letzter_abgang     DATE,
+    letzter_zugang     DATE,
+    mindestbestand     DOUBLE PRECISION,
+    verkauf_12m        DOUBLE PRECISION,
+    tage_seit_abgang   INTEGER,
+    kategorie          VARCHAR(10),                          -- renner | penner | leiche | normal
+    status_icon        VARCHAR(8),
+    prioritaet         SMALLINT,
+    empfehlung         TEXT,
+    reichweite_monate  DOUBLE PRECISION,
+    umschlag_jahr      DOUBLE PRECISION,
+    verkauf_monat_avg  DOUBLE PRECISION,
+    stand              TIMESTAMP NOT NULL
+);
+
+COMMENT ON TABLE lager_snapshot IS 'Renner & Penner: Lagerbestand aus Locosoft, vorklassifiziert; Pflege durch api/lager_snapshot.py nach sync_teile / locosoft_mirror.';
@@ -0,0 +1,21 @@
+-- Locosoft-Mirror: Sync-State pro Tabelle (TAG 220)
+-- High-Water-Marks für den inkrementellen Mirror (scripts/sync/locosoft_mirror.py --mode incremental)
+-- und Status des letzten Laufs. Das Mirror-Script legt die Tabelle bei Bedarf auch selbst an.
+-- Ausführung: PGPASSWORD=DrivePortal2024 psql -h 127.0.0.1 -U drive_user -d drive_portal -f migrations/add_loco_sync_state_table.sql
+
+CREATE TABLE IF NOT EXISTS loco_sync_state (
+    table_name      VARCHAR(100) PRIMARY KEY,   -- Locosoft-Tabellenname (ohne loco_-Prefix)
+    strategy        VARCHAR(20) NOT NULL,       -- full | date_window | key_window
+    hwm_column      VARCHAR(100),               -- Spalte des High-Water-Marks
+    hwm_value       TEXT,                       -- MAX(hwm_column) nach dem letzten erfolgreichen Lauf
+    columns_hash    VARCHAR(32),                -- Schema-Fingerprint; Änderung erzwingt Voll-Sync
+    last_run_at     TIMESTAMP,
+    last_full_at    TIMESTAMP,
+    last_mode       VARCHAR(20),
+    rows_last_run   BIGINT,
+    duration_s      NUMERIC(10,1),
+    status          VARCHAR(20),                -- ok | error
+    error           TEXT
+);
+
+COMMENT ON TABLE loco_sync_state IS 'Locosoft-Mirror: High-Water-Marks und Status pro gespiegelter Tabelle; wird von locosoft_mirror.py gepflegt.';
@@ -0,0 +1,9 @@
+-- ServiceBox Crawl-Engine: Stand je Bestellung für den Inkrementell-Modus (TAG 220)
+-- listen_hash: Hash der Listenzeile (Status, Datum, Beträge) beim letzten Detail-Abruf
+-- detail_hash: Hash der geparsten Details – unveränderte Details werden nicht neu geschrieben
+-- Gepflegt von tools/scrapers/servicebox_api_scraper.py (DetailWriter).
+-- Ausführung: PGPASSWORD=DrivePortal2024 psql -h 127.0.0.1 -U drive_user -d drive_portal -f migrations/add_servicebox_crawl_state.sql
+
+ALTER TABLE stellantis_bestellungen ADD COLUMN IF NOT EXISTS listen_hash TEXT;
+ALTER TABLE stellantis_bestellungen ADD COLUMN IF NOT EXISTS detail_hash TEXT;
+ALTER TABLE stellantis_bestellungen ADD COLUMN IF NOT EXISTS detail_abgerufen_am TIMESTAMP;
@@ -0,0 +1,25 @@
+-- TEK: Tages-Fakt-Tabelle aus loco_journal_accountings (TAG 220)
+-- Vorverdichtet je Tag × Konto × Firma × Filiale × Soll/Haben × G&V-/Kostenumlage-Flag.
+-- Spaltennamen wie im Journal → die bestehenden TEK-Filter (firma_filter_*, umlage_erloese_filter,
+-- Bereichs-CASE auf nominal_account_number) laufen unverändert auf der Fakt-Tabelle.
+-- Gepflegt von api/tek_fact.py (refresh_tek_fact), aufgerufen vom Locosoft-Mirror in derselben
+-- Transaktion wie der Journal-Sync (voll: vor dem Swap, inkrementell: Datumsfenster).
+-- Status/Vollständigkeit: loco_sync_state, table_name = 'tek_fact_daily'.
+-- Ausführung: PGPASSWORD=DrivePortal2024 psql -h 127.0.0.1 -U drive_user -d drive_portal -f migrations/add_tek_fact_daily_table.sql
+
+CREATE TABLE IF NOT EXISTS tek_fact_daily (
+    accounting_date            DATE NOT NULL,
+    nominal_account_number     BIGINT,
+    subsidiary_to_company_ref  BIGINT,
+    branch_number              BIGINT,
+    debit_or_credit            VARCHAR(1),
+    ist_guv_abschluss          BOOLEAN NOT NULL DEFAULT FALSE,   -- posting_text LIKE '%G&V-Abschluss%'
+    ist_kostenumlage           BOOLEAN NOT NULL DEFAULT FALSE,   -- posting_text LIKE '%Kostenumlage%' / '%kostenumlage%'
+    posted_value               BIGINT NOT NULL DEFAULT 0,        -- Summe in Cent (wie Journal)
+    buchungen                  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_tek_fact_daily_datum_konto
+    ON tek_fact_daily (accounting_date, nominal_account_number);
+
+COMMENT ON TABLE tek_fact_daily IS 'TEK: Journal-Buchungen verdichtet pro Tag/Konto/Firma/Filiale/Soll-Haben/Flags; Pflege durch api/tek_fact.py nach jedem Locosoft-Mirror-Lauf.';
@@ -0,0 +1,9 @@
+-- Auth: LDAP-Attribut company in users speichern (TAG 220)
+-- Wird beim Login von AuthManager._cache_user geschrieben; get_user_by_id (Flask-Login load_user)
+-- liest es von dort statt pro Request eine LDAP-Abfrage zu machen (Standort-Default, TAG 109).
+-- Vor dem Deploy ausführen – der Login schreibt die Spalte. Bestehende Sessions (company NULL):
+-- AuthManager._load_user_from_db holt company einmalig aus LDAP und trägt es hier nach.
+-- Ausführung: PGPASSWORD=DrivePortal2024 psql -h 127.0.0.1 -U drive_user -d drive_portal -f migrations/add_users_company.sql
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS company VARCHAR(255) DEFAULT NULL;
+COMMENT ON COLUMN users.company IS 'LDAP company (beim Login aktualisiert) – Standort-Default im Portal.';
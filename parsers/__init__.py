@@ -16,6 +16,7 @@ Date: 2025-11-13
 """
 
 from .base_parser import BaseParser, Transaction
+from .pdf_document import PdfDocument
 from .sparkasse_parser import SparkasseParser
 from .vrbank_parser import VRBankParser
 from .vrbank_landau_parser import VRBankLandauParser
@@ -25,6 +26,7 @@ from .parser_factory import ParserFactory
 __all__ = [
     'BaseParser',
     'Transaction',
+    'PdfDocument',
     'SparkasseParser',
     'VRBankParser',
     'VRBankLandauParser',
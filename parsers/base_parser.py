@@ -23,6 +23,8 @@ from typing import List, Optional, Dict
 import re
 import logging
 
+from .pdf_document import PdfDocument
+
 logger = logging.getLogger(__name__)
 
 
@@ -67,12 +69,14 @@ class BaseParser(ABC):
     - parse(): Methode zum Parsen der PDF
     """
     
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
         """
         Initialisiert Parser
         
         Args:
             pdf_path: Pfad zur PDF-Datei
+            document: Optional - bereits geöffnetes PdfDocument (TAG 220: ParserFactory
+                      reicht das Dokument aus der Erkennung weiter, kein zweites Dekodieren)
         """
         self.pdf_path = Path(pdf_path)
         self.iban: Optional[str] = None
@@ -81,6 +85,7 @@ class BaseParser(ABC):
         
         if not self.pdf_path.exists():
             raise FileNotFoundError(f"PDF nicht gefunden: {pdf_path}")
+        self.document = document if document is not None else PdfDocument(self.pdf_path)
     
     @property
     @abstractmethod
@@ -19,7 +19,6 @@ from typing import Optional, List
 from datetime import datetime
 import re
 import logging
-import pdfplumber
 
 logger = logging.getLogger(__name__)
 
@@ -40,17 +39,14 @@ class GenobankBaseParser(BaseParser):
     
     def extract_text_from_pdf(self) -> str:
         """
-        Extrahiert Text aus PDF mit pdfplumber
+        Extrahiert Text aus PDF (TAG 220: über das geteilte PdfDocument inkl. Text-Cache)
         
         Returns:
             Vollständiger Text der PDF
         """
         try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    text += page.extract_text() or ""
-                return text
+            with self.document as doc:
+                return doc.full_text(separator='')
         except Exception as e:
             logger.error(f"❌ Fehler beim PDF-Lesen: {e}")
             self.errors.append(f"PDF-Fehler: {e}")
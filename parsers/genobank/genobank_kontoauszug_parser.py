@@ -29,6 +29,7 @@ Date: 2025-11-18
 """
 
 from parsers.genobank.genobank_base import GenobankBaseParser, Transaction
+from parsers.pdf_document import PdfDocument
 from typing import List, Optional
 from datetime import datetime
 import re
@@ -49,8 +50,8 @@ class GenobankKontoauszugParser(GenobankBaseParser):
     Funktioniert für ALLE Monate und Jahre!
     """
     
-    def __init__(self, pdf_path: str):
-        super().__init__(pdf_path)
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
+        super().__init__(pdf_path, document)
         self.endsaldo: Optional[float] = None
         self.endsaldo_datum: Optional[datetime] = None
     
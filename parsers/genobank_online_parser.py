@@ -25,9 +25,9 @@ import logging
 from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
-import pdfplumber
 
 from .base_parser import BaseParser, Transaction
+from .pdf_document import PdfDocument
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +40,8 @@ class GenobankOnlineParser(BaseParser):
     Endsaldo: "(Endsaldo)\n+BETRAG EUR"
     """
     
-    def __init__(self, pdf_path: str):
-        super().__init__(pdf_path)
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
+        super().__init__(pdf_path, document)
         self.endsaldo: Optional[float] = None
     
     @property
@@ -52,22 +52,22 @@ class GenobankOnlineParser(BaseParser):
     def extract_iban(self) -> Optional[str]:
         """Extrahiert IBAN aus PDF-Header"""
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
-                if not pdf.pages:
-                    return None
-                
-                text = pdf.pages[0].extract_text()[:1000]
-                
-                # Pattern: IBAN DE + 20 Ziffern
-                pattern = r'IBAN\s*(DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2})'
-                match = re.search(pattern, text)
-                
-                if match:
-                    iban = match.group(1).replace(' ', '')
-                    logger.debug(f"IBAN extrahiert: {iban}")
-                    return iban
-                
+            if not self.document.page_count:
                 return None
+            
+            # TAG 220: erste Seite aus dem geteilten PdfDocument
+            text = self.document.first_page_text[:1000]
+            
+            # Pattern: IBAN DE + 20 Ziffern
+            pattern = r'IBAN\s*(DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2})'
+            match = re.search(pattern, text)
+            
+            if match:
+                iban = match.group(1).replace(' ', '')
+                logger.debug(f"IBAN extrahiert: {iban}")
+                return iban
+            
+            return None
                 
         except Exception as e:
             logger.error(f"Fehler bei IBAN-Extraktion: {e}")
@@ -111,13 +111,9 @@ class GenobankOnlineParser(BaseParser):
         transactions = []
         
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
+            with self.document as doc:
                 # Sammle Text
-                full_text = ""
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
+                full_text = doc.full_text()
                 
                 if not full_text:
                     logger.warning(f"Kein Text in {self.pdf_path.name}")
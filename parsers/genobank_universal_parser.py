@@ -10,13 +10,14 @@ Version: 3.0 (FIXED)
 Date: 2025-11-13
 """
 
-import pdfplumber
 import re
 import logging
 from typing import List, Optional, Dict
 from datetime import datetime
 from pathlib import Path
 
+from .pdf_document import PdfDocument
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,8 +27,10 @@ class GenobankUniversalParser:
     FIXED: Korrekte Endsaldo/Startsaldo Behandlung
     """
     
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
         self.pdf_path = Path(pdf_path)
+        # TAG 220: geteiltes PdfDocument (ParserFactory) bzw. eigenes mit Text-Cache
+        self.document = document if document is not None else PdfDocument(self.pdf_path)
         self.transactions = []
         self.format_type = None
         self.iban = None
@@ -42,8 +45,8 @@ class GenobankUniversalParser:
         logger.info(f"📄 Parse Genobank PDF: {self.pdf_path.name}")
         
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
-                full_text = self._extract_full_text(pdf)
+            with self.document as doc:
+                full_text = doc.full_text()
                 
                 # IBAN extrahieren
                 self.iban = self._extract_iban(full_text)
@@ -72,15 +75,6 @@ class GenobankUniversalParser:
             traceback.print_exc()
             return []
     
-    def _extract_full_text(self, pdf) -> str:
-        """Extrahiert Text von allen Seiten"""
-        full_text = ""
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                full_text += text + "\n"
-        return full_text
-    
     def _extract_iban(self, text: str) -> Optional[str]:
         """Extrahiert IBAN - funktioniert für BEIDE Formate: Tagesauszug UND Kontoauszug"""
         header = text[:1500]  # Mehr Text für Kontoauszüge
@@ -16,7 +16,7 @@ Date: 2025-11-14
 """
 
 from .base_parser import BaseParser, Transaction
-import pdfplumber
+from .pdf_document import PdfDocument
 import re
 from datetime import datetime
 from typing import List, Optional
@@ -32,9 +32,9 @@ class HypoVereinsbankParser(BaseParser):
     Erkennt HypoVereinsbank/UniCredit Formate
     """
 
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
         """Initialisiert Parser"""
-        super().__init__(pdf_path)
+        super().__init__(pdf_path, document)
         self.endsaldo = None
 
     @property
@@ -52,14 +52,10 @@ class HypoVereinsbankParser(BaseParser):
         self.transactions = []
 
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
+            with self.document as doc:
 
                 # Vollständigen Text für IBAN und Endsaldo
-                full_text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n"
+                full_text = doc.full_text()
 
                 # IBAN extrahieren
                 if full_text:
@@ -86,8 +82,7 @@ class HypoVereinsbankParser(BaseParser):
                     logger.warning(f"⚠️ Keine IBAN gefunden in {self.pdf_path.name}")
 
                 # Alle Seiten durchgehen für Transaktionen
-                for page in pdf.pages:
-                    text = page.extract_text()
+                for text in doc.page_texts():
 
                     if not text:
                         continue
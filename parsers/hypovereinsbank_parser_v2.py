@@ -6,16 +6,19 @@ Version: 2.0 (für V2-DB-Struktur)
 """
 
 import re
-import pdfplumber
 from datetime import datetime
 from decimal import Decimal
 
+from parsers.pdf_document import PdfDocument
+
 
 class HypoVereinsbankParser:
     """Parser für HypoVereinsbank PDF-Kontoauszüge"""
     
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, document=None):
         self.pdf_path = pdf_path
+        # TAG 220: Text/Tabellen über PdfDocument (einmal dekodieren, Cache nach Inhalts-Hash)
+        self.document = document if document is not None else PdfDocument(pdf_path)
         self.iban = None
         self.kontonummer = None
         self.saldo_datum = None
@@ -24,10 +27,9 @@ class HypoVereinsbankParser:
         
     def parse(self):
         """Hauptmethode zum Parsen des PDFs"""
-        with pdfplumber.open(self.pdf_path) as pdf:
+        with self.document as doc:
             # Erste Seite für Metadaten
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
+            text = doc.page_text(0)
             
             # IBAN extrahieren
             self._extract_iban(text)
@@ -39,8 +41,8 @@ class HypoVereinsbankParser:
             self._extract_saldo(text)
             
             # Transaktionen von allen Seiten extrahieren
-            for page in pdf.pages:
-                self._extract_transactions_from_page(page)
+            for index in range(doc.page_count):
+                self._extract_transactions_from_page(doc, index)
         
         return {
             'iban': self.iban,
@@ -75,11 +77,11 @@ class HypoVereinsbankParser:
             betrag_str = match.group(2).replace('.', '').replace(',', '.')
             self.endsaldo = float(betrag_str)
     
-    def _extract_transactions_from_page(self, page):
+    def _extract_transactions_from_page(self, doc, index):
         """Transaktionen von einer Seite extrahieren.
         HVB-PDFs können mehrere Tabellen pro Seite haben (z.B. Buchungszeilen aufgeteilt);
         nur die erste zu nutzen ließ Zeilen weg (z.B. PL Gutschein). Daher alle Tabellen."""
-        tables = page.extract_tables()
+        tables = doc.page_tables(index)
         
         if not tables:
             return
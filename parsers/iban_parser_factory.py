@@ -26,6 +26,7 @@ from typing import Optional, Type
 
 # Import aller Parser
 from .base_parser import BaseParser
+from .pdf_document import PdfDocument
 from .genobank.genobank_tagesauszug_parser import GenobankTagesauszugParser
 from .genobank.genobank_kontoauszug_parser import GenobankKontoauszugParser
 from .genobank_online_parser import GenobankOnlineParser
@@ -73,7 +74,7 @@ class IBANParserFactory:
     """
     
     @staticmethod
-    def extract_iban_from_pdf(pdf_path: Path) -> Optional[str]:
+    def extract_iban_from_pdf(pdf_path: Path, document: Optional[PdfDocument] = None) -> Optional[str]:
         """
         Extrahiert IBAN aus PDF-Header.
         
@@ -86,35 +87,35 @@ class IBANParserFactory:
             IBAN ohne Leerzeichen oder None
         """
         try:
-            import pdfplumber
+            # TAG 220: PdfDocument (wird an den Parser weitergereicht, Text-Cache)
+            if document is None:
+                document = PdfDocument(pdf_path)
+            if not document.page_count:
+                return None
             
-            with pdfplumber.open(str(pdf_path)) as pdf:
-                if not pdf.pages:
-                    return None
-                
-                # Erste 1000 Zeichen der ersten Seite
-                text = pdf.pages[0].extract_text()
-                if not text:
-                    return None
-                
-                text = text[:1000]
-                
-                # Pattern: DE + 20 Ziffern (mit optionalen Leerzeichen)
-                # Beispiele:
-                # - "IBAN DE27741900000000057908"
-                # - "IBAN: DE96 7419 0000 1700 0579 08"
-                # - "DE63 7415 0000 0760 0364 67"
-                
-                pattern = r'DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2}'
-                match = re.search(pattern, text)
-                
-                if match:
-                    iban = match.group().replace(' ', '')
-                    logger.debug(f"IBAN aus PDF extrahiert: {iban}")
-                    return iban
-                
-                logger.debug(f"Keine IBAN in {pdf_path.name} gefunden")
+            # Erste 1000 Zeichen der ersten Seite
+            text = document.first_page_text
+            if not text:
                 return None
+            
+            text = text[:1000]
+            
+            # Pattern: DE + 20 Ziffern (mit optionalen Leerzeichen)
+            # Beispiele:
+            # - "IBAN DE27741900000000057908"
+            # - "IBAN: DE96 7419 0000 1700 0579 08"
+            # - "DE63 7415 0000 0760 0364 67"
+            
+            pattern = r'DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2}'
+            match = re.search(pattern, text)
+            
+            if match:
+                iban = match.group().replace(' ', '')
+                logger.debug(f"IBAN aus PDF extrahiert: {iban}")
+                return iban
+            
+            logger.debug(f"Keine IBAN in {pdf_path.name} gefunden")
+            return None
                 
         except Exception as e:
             logger.error(f"Fehler bei IBAN-Extraktion aus {pdf_path}: {e}")
@@ -214,21 +215,25 @@ class IBANParserFactory:
             logger.error(f"PDF nicht gefunden: {pdf_path}")
             return None
         
+        # Ein Dokument für Erkennung und Parser (TAG 220)
+        document = PdfDocument(pdf_path_obj)
+
         # Strategie 1: IBAN-basiert
-        iban = cls.extract_iban_from_pdf(pdf_path_obj)
+        iban = cls.extract_iban_from_pdf(pdf_path_obj, document)
         if iban:
             parser_class = cls.get_parser_by_iban(iban)
             if parser_class:
                 logger.info(f"✅ {pdf_path_obj.name} → {parser_class.__name__} (IBAN)")
-                return parser_class(str(pdf_path))
+                return parser_class(str(pdf_path), document=document)
         
         # Strategie 2: Dateiname-basiert
         parser_class = cls.get_parser_by_filename(pdf_path_obj)
         if parser_class:
             logger.info(f"✅ {pdf_path_obj.name} → {parser_class.__name__} (Dateiname)")
-            return parser_class(str(pdf_path))
+            return parser_class(str(pdf_path), document=document)
         
         # Keine Zuordnung möglich
+        document.close()
         logger.error(f"❌ Kein Parser für {pdf_path_obj.name} gefunden!")
         return None
     
@@ -10,6 +10,9 @@ Priorität:
 2. Bank-Keywords im PDF-Inhalt
 3. Keywords im Dateinamen (Fallback)
 
+TAG 220: Die PDF wird nur einmal geöffnet (PdfDocument). IBAN- und Inhalts-Erkennung
+lesen denselben Erste-Seite-Text, der gewählte Parser bekommt das Dokument weitergereicht.
+
 Author: Claude AI
 Version: 4.0 (IBAN-basiert)
 Date: 2025-11-13
@@ -19,9 +22,9 @@ import logging
 import re
 from pathlib import Path
 from typing import Optional
-import pdfplumber
 
 from .base_parser import BaseParser
+from .pdf_document import PdfDocument
 from .sparkasse_parser import SparkasseParser
 from .vrbank_parser import VRBankParser
 from .vrbank_landau_parser import VRBankLandauParser
@@ -89,7 +92,8 @@ class ParserFactory:
     }
 
     @classmethod
-    def create_parser(cls, pdf_path: str, force_parser: Optional[str] = None) -> BaseParser:
+    def create_parser(cls, pdf_path: str, force_parser: Optional[str] = None,
+                      document: Optional[PdfDocument] = None) -> BaseParser:
         """
         Erstellt den passenden Parser für eine PDF-Datei
         
@@ -102,6 +106,7 @@ class ParserFactory:
         Args:
             pdf_path: Pfad zur PDF-Datei
             force_parser: Optional - erzwinge Parser ('sparkasse', 'vrbank', 'hypovereinsbank')
+            document: Optional - bereits geöffnetes PdfDocument (sonst neu, mit Text-Cache)
 
         Returns:
             Parser-Instanz
@@ -114,34 +119,45 @@ class ParserFactory:
         if not pdf_path_obj.exists():
             raise FileNotFoundError(f"PDF nicht gefunden: {pdf_path}")
 
+        # Ein Dokument für Erkennung UND Parser (einmal öffnen, Seiten einmal dekodieren)
+        if document is None:
+            document = PdfDocument(pdf_path)
+
         # Force-Parser wenn angegeben
         if force_parser:
-            return cls._get_forced_parser(pdf_path, force_parser)
+            return cls._get_forced_parser(pdf_path, force_parser, document)
 
         # 1. PRIORITÄT: IBAN-basierte Erkennung (eindeutig!)
-        parser_class = cls._detect_by_iban(pdf_path)
+        parser_class = cls._detect_by_iban(document)
         if parser_class:
             logger.info(f"✅ Parser erkannt (IBAN): {parser_class.__name__}")
-            return parser_class(pdf_path)
+            return parser_class(pdf_path, document=document)
 
         # 2. PRIORITÄT: Inhalt-basierte Erkennung (Bank-Namen im PDF)
-        parser_class = cls._detect_by_content(pdf_path)
+        parser_class = cls._detect_by_content(document)
         if parser_class:
             logger.info(f"✅ Parser erkannt (Inhalt): {parser_class.__name__}")
-            return parser_class(pdf_path)
+            return parser_class(pdf_path, document=document)
 
         # 3. PRIORITÄT: Dateinamen-basierte Erkennung (Fallback)
         parser_class = cls._detect_by_filename(pdf_path_obj)
         if parser_class:
             logger.info(f"✅ Parser erkannt (Dateiname): {parser_class.__name__}")
-            return parser_class(pdf_path)
+            return parser_class(pdf_path, document=document)
 
         # Letzter Fallback: SparkasseParser (universell)
         logger.warning(f"⚠️ Bank nicht erkannt - nutze SparkasseParser als Fallback")
-        return SparkasseParser(pdf_path)
+        return SparkasseParser(pdf_path, document=document)
+
+    @staticmethod
+    def _first_page_text(document: PdfDocument) -> Optional[str]:
+        """Erste Seite aus dem Dokument (einmal dekodiert, danach aus dem Speicher/Cache)"""
+        if not document.page_count:
+            return None
+        return document.first_page_text or None
 
     @classmethod
-    def _detect_by_iban(cls, pdf_path: str) -> Optional[type]:
+    def _detect_by_iban(cls, document: PdfDocument) -> Optional[type]:
         """
         Erkennt Parser anhand der IBAN im PDF
         
@@ -152,42 +168,38 @@ class ParserFactory:
             Parser-Klasse oder None
         """
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                if not pdf.pages:
-                    return None
-
-                # Erste Seite extrahieren
-                first_page_text = pdf.pages[0].extract_text()
-                if not first_page_text:
-                    return None
-
-                # IBAN-Pattern: DE + 20 Ziffern
-                # IBAN mit oder ohne Leerzeichen
-                iban_pattern = r'DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2}'
-                found_ibans_raw = re.findall(iban_pattern, first_page_text)
-                # Leerzeichen entfernen für Mapping-Lookup
-                found_ibans = [iban.replace(' ', '') for iban in found_ibans_raw]
-
-                if not found_ibans:
-                    logger.debug("Keine IBAN im PDF gefunden")
-                    return None
-
-                # Prüfe jede gefundene IBAN gegen Mapping
-                for iban in found_ibans:
-                    if iban in cls.IBAN_TO_PARSER:
-                        parser_class = cls.IBAN_TO_PARSER[iban]
-                        logger.debug(f"IBAN-Match: {iban} → {parser_class.__name__}")
-                        return parser_class
-
-                logger.debug(f"Gefundene IBANs nicht im Mapping: {found_ibans}")
+            # Erste Seite extrahieren
+            first_page_text = cls._first_page_text(document)
+            if not first_page_text:
+                return None
+
+            # IBAN-Pattern: DE + 20 Ziffern
+            # IBAN mit oder ohne Leerzeichen
+            iban_pattern = r'DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2}'
+            found_ibans_raw = re.findall(iban_pattern, first_page_text)
+            # Leerzeichen entfernen für Mapping-Lookup
+            found_ibans = [iban.replace(' ', '') for iban in found_ibans_raw]
+
+            if not found_ibans:
+                logger.debug("Keine IBAN im PDF gefunden")
                 return None
 
+            # Prüfe jede gefundene IBAN gegen Mapping
+            for iban in found_ibans:
+                if iban in cls.IBAN_TO_PARSER:
+                    parser_class = cls.IBAN_TO_PARSER[iban]
+                    logger.debug(f"IBAN-Match: {iban} → {parser_class.__name__}")
+                    return parser_class
+
+            logger.debug(f"Gefundene IBANs nicht im Mapping: {found_ibans}")
+            return None
+
         except Exception as e:
             logger.error(f"Fehler bei IBAN-Detection: {e}")
             return None
 
     @classmethod
-    def _detect_by_content(cls, pdf_path: str) -> Optional[type]:
+    def _detect_by_content(cls, document: PdfDocument) -> Optional[type]:
         """
         Erkennt Parser anhand des PDF-Inhalts
         
@@ -197,21 +209,17 @@ class ParserFactory:
             Parser-Klasse oder None
         """
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                if not pdf.pages:
-                    return None
-
-                first_page_text = pdf.pages[0].extract_text()
-                if not first_page_text:
-                    return None
+            first_page_text = cls._first_page_text(document)
+            if not first_page_text:
+                return None
 
-                # Nach Keywords suchen
-                for keyword, parser_class in cls.CONTENT_PATTERNS.items():
-                    if keyword in first_page_text:
-                        logger.debug(f"Content-Match: '{keyword}' → {parser_class.__name__}")
-                        return parser_class
+            # Nach Keywords suchen
+            for keyword, parser_class in cls.CONTENT_PATTERNS.items():
+                if keyword in first_page_text:
+                    logger.debug(f"Content-Match: '{keyword}' → {parser_class.__name__}")
+                    return parser_class
 
-                return None
+            return None
 
         except Exception as e:
             logger.error(f"Fehler bei Content-Detection: {e}")
@@ -237,7 +245,8 @@ class ParserFactory:
         return None
 
     @classmethod
-    def _get_forced_parser(cls, pdf_path: str, parser_type: str) -> BaseParser:
+    def _get_forced_parser(cls, pdf_path: str, parser_type: str,
+                           document: Optional[PdfDocument] = None) -> BaseParser:
         """
         Gibt erzwungenen Parser zurück
         
@@ -255,7 +264,7 @@ class ParserFactory:
             raise ValueError(f"Unbekannter Parser-Typ: {parser_type}")
 
         logger.info(f"✅ Erzwungener Parser: {parser_class.__name__}")
-        return parser_class(pdf_path)
+        return parser_class(pdf_path, document=document)
 
     @classmethod
     def get_supported_banks(cls) -> list:
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF-Dokument für Bankenspiegel-Parser (TAG 220)
+================================================
+Ein PDF wird pro Import genau einmal geöffnet und jede Seite höchstens einmal
+dekodiert – Erkennung (ParserFactory) und Parser teilen sich dasselbe Objekt.
+
+Vorher: _detect_by_iban, _detect_by_content und der Parser öffneten die PDF je
+einmal mit pdfplumber (3× Dekodieren pro Datei).
+
+Zusätzlich: Text-Cache nach Inhalts-Hash (SHA-256 der Datei). Ein erneuter Import
+über ein unverändertes Verzeichnis dekodiert keine PDF mehr.
+
+Verwendung:
+    from parsers.pdf_document import PdfDocument
+
+    with PdfDocument(pdf_path) as doc:
+        erste_seite = doc.first_page_text
+        full_text = doc.full_text()          # Seiten mit Text, je + '\\n'
+        tabellen = doc.page_tables(0)        # pdfplumber extract_tables()
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Text-Cache (JSON je Inhalts-Hash); leer/'0' = Cache aus
+TEXT_CACHE_DIR = os.environ.get('BANK_PDF_TEXT_CACHE_DIR', '/opt/greiner-portal/data/cache/pdf_text')
+
+# Cache-Format-Version: bei Änderung der Extraktion erhöhen → alte Einträge ungültig
+CACHE_VERSION = 1
+
+
+class PdfDocument:
+    """
+    Lazy geöffnete PDF mit Seiten-Text/Tabellen-Cache.
+
+    - pdfplumber wird erst geöffnet, wenn eine Seite nicht im Cache ist
+    - page_text()/page_tables() extrahieren jede Seite höchstens einmal
+    - close() schreibt neu extrahierte Seiten in den Text-Cache
+    """
+
+    def __init__(self, pdf_path: Union[str, Path], cache_dir: Optional[str] = TEXT_CACHE_DIR):
+        self.pdf_path = Path(pdf_path)
+        if not self.pdf_path.exists():
+            raise FileNotFoundError(f"PDF nicht gefunden: {pdf_path}")
+        self.cache_dir = Path(cache_dir) if cache_dir and cache_dir != '0' else None
+
+        self._pdf = None
+        self._content_hash: Optional[str] = None
+        self._page_count: Optional[int] = None
+        self._texts: Dict[int, str] = {}
+        self._tables: Dict[int, list] = {}
+        self._dirty = False
+        self._cache_loaded = False
+
+    # ========================
+    # CONTEXT MANAGER
+    # ========================
+
+    def __enter__(self) -> 'PdfDocument':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """pdfplumber schließen und neu extrahierte Seiten cachen."""
+        if self._dirty:
+            self._write_cache()
+        if self._pdf is not None:
+            try:
+                self._pdf.close()
+            except Exception:
+                pass
+            self._pdf = None
+
+    # ========================
+    # CACHE
+    # ========================
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 des Datei-Inhalts (Cache-Schlüssel, unabhängig von Name/Pfad)."""
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            with open(self.pdf_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def _cache_file(self) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / self.content_hash[:2] / f"{self.content_hash}.json"
+
+    def _load_cache(self):
+        if self._cache_loaded:
+            return
+        self._cache_loaded = True
+        cache_file = self._cache_file()
+        if cache_file is None or not cache_file.exists():
+            return
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CACHE_VERSION:
+                return
+            self._page_count = data.get('page_count')
+            self._texts.update({int(k): v for k, v in data.get('texts', {}).items()})
+            self._tables.update({int(k): v for k, v in data.get('tables', {}).items()})
+            logger.debug(f"PDF-Text-Cache Treffer: {self.pdf_path.name} ({len(self._texts)} Seiten)")
+        except (OSError, ValueError) as e:
+            logger.debug(f"PDF-Text-Cache unlesbar ({cache_file}): {e}")
+
+    def _write_cache(self):
+        cache_file = self._cache_file()
+        if cache_file is None:
+            return
+        payload = {
+            'version': CACHE_VERSION,
+            'file': self.pdf_path.name,
+            'page_count': self._page_count,
+            'texts': {str(k): v for k, v in self._texts.items()},
+            'tables': {str(k): v for k, v in self._tables.items()},
+        }
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_file, cache_file)
+            self._dirty = False
+        except OSError as e:
+            # Cache ist optional – Import läuft ohne weiter
+            logger.debug(f"PDF-Text-Cache nicht schreibbar ({cache_file}): {e}")
+
+    # ========================
+    # PDF-ZUGRIFF
+    # ========================
+
+    @property
+    def pdf(self):
+        """pdfplumber-Objekt (wird beim ersten Zugriff geöffnet)."""
+        if self._pdf is None:
+            import pdfplumber
+            self._pdf = pdfplumber.open(str(self.pdf_path))
+            self._page_count = len(self._pdf.pages)
+        return self._pdf
+
+    @property
+    def page_count(self) -> int:
+        self._load_cache()
+        if self._page_count is None:
+            self._page_count = len(self.pdf.pages)
+            self._dirty = True
+        return self._page_count
+
+    def page_text(self, index: int) -> str:
+        """Text einer Seite ('' wenn pdfplumber None liefert)."""
+        self._load_cache()
+        if index not in self._texts:
+            self._texts[index] = self.pdf.pages[index].extract_text() or ''
+            self._dirty = True
+        return self._texts[index]
+
+    def page_tables(self, index: int) -> list:
+        """Tabellen einer Seite (pdfplumber extract_tables)."""
+        self._load_cache()
+        if index not in self._tables:
+            self._tables[index] = self.pdf.pages[index].extract_tables() or []
+            self._dirty = True
+        return self._tables[index]
+
+    @property
+    def first_page_text(self) -> str:
+        """Text der ersten Seite ('' bei leerer PDF)."""
+        return self.page_text(0) if self.page_count else ''
+
+    def page_texts(self) -> List[str]:
+        return [self.page_text(i) for i in range(self.page_count)]
+
+    def full_text(self, separator: str = '\n') -> str:
+        """Text aller Seiten mit Inhalt, jeweils gefolgt von separator (wie bisher in den Parsern)."""
+        return ''.join(text + separator for text in self.page_texts() if text)
+
+    def __repr__(self):
+        return f"PdfDocument('{self.pdf_path.name}', pages={self._page_count})"
@@ -32,9 +32,9 @@ import logging
 from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
-import pdfplumber
 
 from .base_parser import BaseParser, Transaction
+from .pdf_document import PdfDocument
 
 logger = logging.getLogger(__name__)
 
@@ -50,8 +50,8 @@ class SparkasseOnlineParser(BaseParser):
     - IBAN-Extraktion aus Header
     """
     
-    def __init__(self, pdf_path: str):
-        super().__init__(pdf_path)
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
+        super().__init__(pdf_path, document)
         self.endsaldo: Optional[float] = None
         self.kontostand_datum: Optional[str] = None
         self.anfangssaldo: Optional[float] = None
@@ -68,24 +68,23 @@ class SparkasseOnlineParser(BaseParser):
         Format im PDF: DE63 7415 0000 0760 0364 67 24,35 EUR *
         """
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
-                if not pdf.pages:
-                    return None
-                
-                # Erste Seite, erste 1000 Zeichen
-                text = pdf.pages[0].extract_text()[:1000]
-                
-                # Pattern: DE + 20 Ziffern (mit optionalen Leerzeichen)
-                pattern = r'DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2}'
-                match = re.search(pattern, text)
-                
-                if match:
-                    iban = match.group().replace(' ', '')
-                    logger.debug(f"IBAN extrahiert: {iban}")
-                    return iban
-                
-                logger.warning(f"Keine IBAN in {self.pdf_path.name} gefunden")
+            if not self.document.page_count:
                 return None
+            
+            # Erste Seite, erste 1000 Zeichen (TAG 220: aus dem geteilten PdfDocument)
+            text = self.document.first_page_text[:1000]
+            
+            # Pattern: DE + 20 Ziffern (mit optionalen Leerzeichen)
+            pattern = r'DE\d{2}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\s*\d{2}'
+            match = re.search(pattern, text)
+            
+            if match:
+                iban = match.group().replace(' ', '')
+                logger.debug(f"IBAN extrahiert: {iban}")
+                return iban
+            
+            logger.warning(f"Keine IBAN in {self.pdf_path.name} gefunden")
+            return None
                 
         except Exception as e:
             logger.error(f"Fehler bei IBAN-Extraktion: {e}")
@@ -141,13 +140,9 @@ class SparkasseOnlineParser(BaseParser):
         transactions = []
         
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
+            with self.document as doc:
                 # Sammle Text aller Seiten
-                full_text = ""
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
+                full_text = doc.full_text()
                 
                 if not full_text:
                     logger.warning(f"Kein Text in {self.pdf_path.name} extrahiert (möglicherweise gescanntes PDF)")
@@ -18,7 +18,7 @@ Date: 2025-11-14
 """
 
 from .base_parser import BaseParser, Transaction
-import pdfplumber
+from .pdf_document import PdfDocument
 import re
 from datetime import datetime
 from typing import List, Optional
@@ -30,9 +30,9 @@ logger = logging.getLogger(__name__)
 class SparkasseParser(BaseParser):
     """Parser für Sparkasse PDF-Kontoauszüge"""
 
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
         """Initialisiert Parser"""
-        super().__init__(pdf_path)
+        super().__init__(pdf_path, document)
         self.endsaldo: Optional[float] = None
 
     @property
@@ -50,14 +50,10 @@ class SparkasseParser(BaseParser):
         self.transactions = []
 
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
+            with self.document as doc:
 
                 # Sammle Text von allen Seiten
-                full_text = ""
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
+                full_text = doc.full_text()
 
                 # IBAN extrahieren
                 self.iban = self.extract_iban(full_text)
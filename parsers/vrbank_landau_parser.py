@@ -19,12 +19,12 @@ Version: 1.3
 Date: 2025-11-18
 """
 
-import pdfplumber
 import re
 import logging
 from typing import List, Optional
 from datetime import datetime
 from parsers.base_parser import BaseParser, Transaction
+from parsers.pdf_document import PdfDocument
 
 logger = logging.getLogger(__name__)
 
@@ -32,9 +32,9 @@ logger = logging.getLogger(__name__)
 class VRBankLandauParser(BaseParser):
     """Parser für VR-Bank Landau-Mengkofen Kontoauszüge"""
 
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
         """Initialisiert Parser"""
-        super().__init__(pdf_path)
+        super().__init__(pdf_path, document)
         self.endsaldo: Optional[float] = None
 
     @property
@@ -46,8 +46,8 @@ class VRBankLandauParser(BaseParser):
         logger.info(f"📄 Parse {self.bank_name}: {self.pdf_path.name}")
 
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
-                full_text = self._extract_full_text(pdf)
+            with self.document as doc:
+                full_text = doc.full_text()
 
                 # IBAN extrahieren
                 self.iban = self._extract_iban_vrbank_landau(full_text)
@@ -86,15 +86,6 @@ class VRBankLandauParser(BaseParser):
             self.errors.append(str(e))
             return {'iban': None, 'transactions': [], 'endsaldo': None, 'saldo_datum': None}
 
-    def _extract_full_text(self, pdf) -> str:
-        """Extrahiert Text von allen Seiten"""
-        full_text = ""
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                full_text += text + "\n"
-        return full_text
-
     def _extract_iban_vrbank_landau(self, text: str) -> Optional[str]:
         """Extrahiert Konto-IBAN aus VR Bank Landau PDF Header"""
         pattern = r'^IBAN\s+(DE\d{20})'
@@ -21,11 +21,11 @@ Version: 3.1
 Date: 2025-11-14
 """
 
-import pdfplumber
 import re
 import logging
 from typing import List, Optional
 from .base_parser import BaseParser, Transaction
+from .pdf_document import PdfDocument
 
 logger = logging.getLogger(__name__)
 
@@ -49,8 +49,8 @@ class VRBankParser(BaseParser):
         transactions = parser.parse()
     """
 
-    def __init__(self, pdf_path: str):
-        super().__init__(pdf_path)
+    def __init__(self, pdf_path: str, document: Optional[PdfDocument] = None):
+        super().__init__(pdf_path, document)
         self.year: Optional[int] = None
         self.endsaldo: Optional[float] = None
 
@@ -68,9 +68,9 @@ class VRBankParser(BaseParser):
         logger.info(f"📄 Parse {self.bank_name}: {self.pdf_path.name}")
 
         try:
-            with pdfplumber.open(str(self.pdf_path)) as pdf:
+            with self.document as doc:
                 # Text von allen Seiten sammeln
-                full_text = self._extract_full_text(pdf)
+                full_text = doc.full_text()
 
                 # IBAN extrahieren
                 self.iban = self._extract_iban_vrbank(full_text)
@@ -115,15 +115,6 @@ class VRBankParser(BaseParser):
             self.errors.append(str(e))
             return []
 
-    def _extract_full_text(self, pdf) -> str:
-        """Extrahiert Text von allen Seiten"""
-        full_text = ""
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                full_text += text + "\n"
-        return full_text
-
     def _extract_iban_vrbank(self, text: str) -> Optional[str]:
         """
         Extrahiert IBAN aus VR-Bank PDF
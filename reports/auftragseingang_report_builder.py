@@ -8,7 +8,6 @@ gemeinsam genutzt, damit Betreff/Body/PDF konsistent bleiben.
 from datetime import date, datetime
 from typing import Dict, Any, List
 
-from api.pdf_generator import generate_auftragseingang_komplett_pdf
 from api.verkauf_data import VerkaufData
 from utils.werktage import get_werktage_monat
 
@@ -134,6 +133,8 @@ def build_auftragseingang_report_package(anchor_date: date) -> Dict[str, Any]:
     ae_pro_tag = (monat_gesamt / wt["vergangen"]) if wt["vergangen"] > 0 else 0.0
     prognose_ae = round(ae_pro_tag * wt["gesamt"]) if wt["vergangen"] > 0 else None
 
+    from api.pdf_generator import generate_auftragseingang_komplett_pdf  # reportlab erst bei Bedarf (TAG 220)
+
     pdf_bytes = generate_auftragseingang_komplett_pdf(
         tag_data=tag_data,
         monat_data=monat_data,
@@ -13,6 +13,8 @@ from api.db_connection import convert_placeholders, sql_placeholder, get_db_type
 # TAG 146: Wiederverwendbares TEK-Datenmodul (100% Konsistenz mit Reports!)
 # SSOT: Breakeven/Prognose in api.controlling_data (eine Logik für Portal + PDF)
 from api.controlling_data import get_tek_data, berechne_breakeven_prognose, berechne_breakeven_prognose_standort
+from api.tek_fact import get_tek_quelle
+from api.cache_utils import cached_response, cached_result
 from utils.werktage import get_werktage, get_werktage_monat
 
 # get_db() wird jetzt direkt aus api.db_connection importiert (SSOT)
@@ -995,7 +997,9 @@ def get_bereich_daten(von: str, bis: str, firma_filter_umsatz: str, umlage_erloe
     # TAG157: Wenn kein separater Einsatz-Filter, nutze Umsatz-Filter (Abwärtskompatibilität)
     if firma_filter_einsatz is None:
         firma_filter_einsatz = firma_filter_umsatz
-    guv_filter = get_guv_filter()
+    # TAG 220: Fakt-Tabelle tek_fact_daily statt Journal-Scan (Fallback: Journal)
+    quelle = get_tek_quelle()
+    guv_filter = quelle.guv_filter
     with db_session() as conn:
         cursor = conn.cursor()
 
@@ -1011,7 +1015,7 @@ def get_bereich_daten(von: str, bis: str, firma_filter_umsatz: str, umlage_erloe
                     ELSE '9-Andere'
                 END as bereich,
                 SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0 as umsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND ((nominal_account_number BETWEEN 800000 AND 889999)
                    OR (nominal_account_number BETWEEN 893200 AND 893299))
@@ -1034,7 +1038,7 @@ def get_bereich_daten(von: str, bis: str, firma_filter_umsatz: str, umlage_erloe
                     ELSE '9-Andere'
                 END as bereich,
                 SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0 as einsatz
-            FROM loco_journal_accountings
+            FROM {quelle.tabelle}
             WHERE accounting_date >= ? AND accounting_date < ?
               AND nominal_account_number BETWEEN 700000 AND 799999
               {firma_filter_einsatz}
@@ -1150,6 +1154,7 @@ def get_werkstatt_produktivitaet(von: str, bis: str, betrieb: str = '0') -> dict
 
 @controlling_bp.route('/api/tek')
 @login_required
+@cached_response(ttl=300, stale_ttl=600, tags=['tek'])  # TAG 220
 def api_tek():
     """
     API: TEK-Daten mit umschaltbarem Modus
@@ -1265,13 +1270,14 @@ def api_tek():
             )"""
 
             # Berechne Umlage-Betrag für Info-Anzeige (Erlös-Seite)
+            quelle = get_tek_quelle()
             with db_session() as conn:
                 cursor = conn.cursor()
                 cursor.execute(convert_placeholders(f"""
                     SELECT COALESCE(SUM(
                         CASE WHEN debit_or_credit='H' THEN posted_value ELSE -posted_value END
                     )/100.0, 0) as betrag
-                    FROM loco_journal_accountings
+                    FROM {quelle.tabelle}
                     WHERE accounting_date >= ? AND accounting_date < ?
                       AND nominal_account_number IN ({umlage_konten_str})
                       {firma_filter_umsatz}
@@ -1286,11 +1292,11 @@ def api_tek():
                     SELECT COALESCE(SUM(
                         CASE WHEN debit_or_credit='H' THEN posted_value ELSE -posted_value END
                     )/100.0, 0) as betrag
-                    FROM loco_journal_accountings
+                    FROM {quelle.tabelle}
                     WHERE accounting_date >= ? AND accounting_date < ?
                       AND debit_or_credit = 'H'
                       AND substr(CAST(nominal_account_number AS TEXT), 5, 1) = '0'
-                      AND (posting_text LIKE '%%Kostenumlage%%' OR posting_text LIKE '%%kostenumlage%%')
+                      AND {quelle.kostenumlage}
                       AND nominal_account_number BETWEEN 400000 AND 499999
                       {firma_filter_kosten}
                 """), (von, bis))
@@ -1483,15 +1489,17 @@ def api_tek():
         # =====================================================================
         # FIRMEN-VERGLEICH - TAG 136: PostgreSQL-kompatibel
         # =====================================================================
+        # TAG 220: Firmen-Vergleich, VM und VJ aus tek_fact_daily (Fallback: Journal)
+        quelle = get_tek_quelle()
         firmen = None
         if firma == '0':
             firmen = {}
             with db_session() as conn:
                 cursor = conn.cursor()
                 for f_id, f_name in [('1', 'Stellantis'), ('2', 'Hyundai')]:
-                    cursor.execute(convert_placeholders("""
+                    cursor.execute(convert_placeholders(f"""
                         SELECT SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0 as umsatz
-                        FROM loco_journal_accountings
+                        FROM {quelle.tabelle}
                         WHERE accounting_date >= ? AND accounting_date < ?
                           AND ((nominal_account_number BETWEEN 800000 AND 889999)
                                OR (nominal_account_number BETWEEN 893200 AND 893299))
@@ -1500,9 +1508,9 @@ def api_tek():
                     row = cursor.fetchone()
                     f_umsatz = float(row_to_dict(row)['umsatz'] or 0) if row else 0
 
-                    cursor.execute(convert_placeholders("""
+                    cursor.execute(convert_placeholders(f"""
                         SELECT SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0 as einsatz
-                        FROM loco_journal_accountings
+                        FROM {quelle.tabelle}
                         WHERE accounting_date >= ? AND accounting_date < ?
                           AND nominal_account_number BETWEEN 700000 AND 799999
                           AND subsidiary_to_company_ref = ?
@@ -1536,7 +1544,7 @@ def api_tek():
             cursor = conn.cursor()
             cursor.execute(convert_placeholders(f"""
                 SELECT SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0 as umsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= ? AND accounting_date < ?
                   AND ((nominal_account_number BETWEEN 800000 AND 889999) OR (nominal_account_number BETWEEN 893200 AND 893299))
                   {firma_filter_umsatz}
@@ -1547,7 +1555,7 @@ def api_tek():
             # TAG157: firma_filter_einsatz für korrekte Standort-Zuordnung!
             cursor.execute(convert_placeholders(f"""
                 SELECT SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0 as einsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= ? AND accounting_date < ?
                   AND nominal_account_number BETWEEN 700000 AND 799999
                   {firma_filter_einsatz}
@@ -1573,7 +1581,7 @@ def api_tek():
             cursor = conn.cursor()
             cursor.execute(convert_placeholders(f"""
                 SELECT SUM(CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END) / 100.0 as umsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= ? AND accounting_date < ?
                   AND ((nominal_account_number BETWEEN 800000 AND 889999) OR (nominal_account_number BETWEEN 893200 AND 893299))
                   {firma_filter_umsatz}
@@ -1584,7 +1592,7 @@ def api_tek():
             # TAG157: firma_filter_einsatz für korrekte Standort-Zuordnung!
             cursor.execute(convert_placeholders(f"""
                 SELECT SUM(CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END) / 100.0 as einsatz
-                FROM loco_journal_accountings
+                FROM {quelle.tabelle}
                 WHERE accounting_date >= ? AND accounting_date < ?
                   AND nominal_account_number BETWEEN 700000 AND 799999
                   {firma_filter_einsatz}
@@ -2118,544 +2126,566 @@ def api_tek_detail():
     - gruppe: (optional) 2-stelliges Präfix für Konten-Detail (z.B. '81')
     - konto: (optional) Für Buchungs-Details eines bestimmten Kontos
     - typ: 'umsatz' oder 'einsatz' (für Konten/Buchungen)
+
+    Logik: tek_detail_daten() (TAG 220, auch direkt vom PDF-Generator genutzt)
     """
     try:
-        bereich = request.args.get('bereich', '2-GW')
-        firma = request.args.get('firma', '0')
-        standort = request.args.get('standort', '0')
-        monat = request.args.get('monat', type=int)
-        jahr = request.args.get('jahr', type=int)
-        ebene = request.args.get('ebene', 'gruppen')  # 'gruppen', 'konten', 'buchungen'
-        gruppe = request.args.get('gruppe', '')  # z.B. '81', '71'
-        konto = request.args.get('konto', type=int)
-        typ = request.args.get('typ', 'umsatz')  # 'umsatz' oder 'einsatz'
-        
-        heute = date.today()
-        if not monat:
-            monat = heute.month
-        if not jahr:
-            jahr = heute.year
-        
-        von = f"{jahr}-{monat:02d}-01"
-        bis = f"{jahr}-{monat+1:02d}-01" if monat < 12 else f"{jahr+1}-01-01"
-        
-        db = get_db()
-        
-        # Firma/Standort-Filter bauen (Umsatz: branch_number, Einsatz: Konto-Endziffer wie Haupt-TEK)
-        firma_filter = ""
-        firma_filter_umsatz = ""
-        firma_filter_einsatz = ""
-        subsidiary = 1  # Default: Stellantis
-        if firma == '1':
-            firma_filter = "AND subsidiary_to_company_ref = 1"
-            firma_filter_umsatz = "AND subsidiary_to_company_ref = 1"
-            firma_filter_einsatz = "AND subsidiary_to_company_ref = 1"
-            subsidiary = 1
-            if standort == '1':
-                firma_filter += " AND branch_number = 1"
-                firma_filter_umsatz += " AND branch_number = 1"
-                firma_filter_einsatz += " AND substr(CAST(nominal_account_number AS TEXT), 6, 1) = '1'"
-            elif standort == '2':
-                firma_filter += " AND branch_number = 3"
-                firma_filter_umsatz += " AND branch_number = 3"
-                firma_filter_einsatz += " AND substr(CAST(nominal_account_number AS TEXT), 6, 1) = '2'"
-        elif firma == '2':
-            firma_filter = "AND subsidiary_to_company_ref = 2"
-            firma_filter_umsatz = "AND subsidiary_to_company_ref = 2"
-            firma_filter_einsatz = "AND subsidiary_to_company_ref = 2"
-            subsidiary = 2
-        
-        # Bereichs-Mapping: TEK-Bereich -> Konten-Ranges
-        bereich_konten = {
-            '1-NW': {'umsatz': (810000, 819999), 'einsatz': (710000, 719999)},
-            '2-GW': {'umsatz': (820000, 829999), 'einsatz': (720000, 729999)},
-            '3-Teile': {'umsatz': (830000, 839999), 'einsatz': (730000, 739999)},
-            '4-Lohn': {'umsatz': (840000, 849999), 'einsatz': (740000, 749999)},
-            '5-Sonst': {'umsatz': (860000, 869999), 'einsatz': (760000, 769999)}
-        }
-        
-        # Gruppen-Bezeichnungen (SKR51)
-        gruppen_namen = {
-            # Umsatz
-            '81': 'Erlöse Neuwagen', '82': 'Erlöse Gebrauchtwagen', 
-            '83': 'Erlöse Teile', '84': 'Erlöse Lohn',
-            '85': 'Erlöse Lack', '86': 'Sonstige Erlöse', '88': 'Erlöse Vermietung',
-            '89': 'Sonstige betriebliche Erträge',
-            # Einsatz
-            '71': 'Einsatz Neuwagen', '72': 'Einsatz Gebrauchtwagen',
-            '73': 'Einsatz Teile', '74': 'Einsatz Lohn',
-            '75': 'Einsatz Lack', '76': 'Sonstiger Einsatz', '78': 'Einsatz Vermietung',
+        daten = tek_detail_daten(
+            bereich=request.args.get('bereich', '2-GW'),
+            firma=request.args.get('firma', '0'),
+            standort=request.args.get('standort', '0'),
+            monat=request.args.get('monat', type=int),
+            jahr=request.args.get('jahr', type=int),
+            ebene=request.args.get('ebene', 'gruppen'),  # 'gruppen', 'konten', 'buchungen'
+            gruppe=request.args.get('gruppe', ''),  # z.B. '81', '71'
+            konto=request.args.get('konto', type=int),
+            typ=request.args.get('typ', 'umsatz')  # 'umsatz' oder 'einsatz'
+        )
+        return jsonify(daten), 200
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        import traceback
+        return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
+
+
+@cached_result(ttl=300, tags=['tek'])
+def tek_detail_daten(bereich: str = '2-GW', firma: str = '0', standort: str = '0',
+                     monat: int = None, jahr: int = None, ebene: str = 'gruppen',
+                     gruppe: str = '', konto: int = None, typ: str = 'umsatz') -> dict:
+    """
+    TEK-Drill-Down (Gruppen -> Konten -> Buchungen) als Dict - Logik von /api/tek/detail.
+
+    TAG 220: Service-Funktion statt HTTP-Selbstaufruf (PDF-Generator holte die Absatzwege
+    über http://127.0.0.1:5000/api/tek/detail). Ergebnis-Cache gemeinsam mit dem Endpoint,
+    Invalidierung über Tag 'tek' nach dem Locosoft-Sync.
+
+    Raises:
+        ValueError: unbekannter Bereich
+    """
+    heute = date.today()
+    if not monat:
+        monat = heute.month
+    if not jahr:
+        jahr = heute.year
+    
+    von = f"{jahr}-{monat:02d}-01"
+    bis = f"{jahr}-{monat+1:02d}-01" if monat < 12 else f"{jahr+1}-01-01"
+    
+    db = get_db()
+    
+    # Firma/Standort-Filter bauen (Umsatz: branch_number, Einsatz: Konto-Endziffer wie Haupt-TEK)
+    firma_filter = ""
+    firma_filter_umsatz = ""
+    firma_filter_einsatz = ""
+    subsidiary = 1  # Default: Stellantis
+    if firma == '1':
+        firma_filter = "AND subsidiary_to_company_ref = 1"
+        firma_filter_umsatz = "AND subsidiary_to_company_ref = 1"
+        firma_filter_einsatz = "AND subsidiary_to_company_ref = 1"
+        subsidiary = 1
+        if standort == '1':
+            firma_filter += " AND branch_number = 1"
+            firma_filter_umsatz += " AND branch_number = 1"
+            firma_filter_einsatz += " AND substr(CAST(nominal_account_number AS TEXT), 6, 1) = '1'"
+        elif standort == '2':
+            firma_filter += " AND branch_number = 3"
+            firma_filter_umsatz += " AND branch_number = 3"
+            firma_filter_einsatz += " AND substr(CAST(nominal_account_number AS TEXT), 6, 1) = '2'"
+    elif firma == '2':
+        firma_filter = "AND subsidiary_to_company_ref = 2"
+        firma_filter_umsatz = "AND subsidiary_to_company_ref = 2"
+        firma_filter_einsatz = "AND subsidiary_to_company_ref = 2"
+        subsidiary = 2
+    
+    # Bereichs-Mapping: TEK-Bereich -> Konten-Ranges
+    bereich_konten = {
+        '1-NW': {'umsatz': (810000, 819999), 'einsatz': (710000, 719999)},
+        '2-GW': {'umsatz': (820000, 829999), 'einsatz': (720000, 729999)},
+        '3-Teile': {'umsatz': (830000, 839999), 'einsatz': (730000, 739999)},
+        '4-Lohn': {'umsatz': (840000, 849999), 'einsatz': (740000, 749999)},
+        '5-Sonst': {'umsatz': (860000, 869999), 'einsatz': (760000, 769999)}
+    }
+    
+    # Gruppen-Bezeichnungen (SKR51)
+    gruppen_namen = {
+        # Umsatz
+        '81': 'Erlöse Neuwagen', '82': 'Erlöse Gebrauchtwagen', 
+        '83': 'Erlöse Teile', '84': 'Erlöse Lohn',
+        '85': 'Erlöse Lack', '86': 'Sonstige Erlöse', '88': 'Erlöse Vermietung',
+        '89': 'Sonstige betriebliche Erträge',
+        # Einsatz
+        '71': 'Einsatz Neuwagen', '72': 'Einsatz Gebrauchtwagen',
+        '73': 'Einsatz Teile', '74': 'Einsatz Lohn',
+        '75': 'Einsatz Lack', '76': 'Sonstiger Einsatz', '78': 'Einsatz Vermietung',
+    }
+    
+    if bereich not in bereich_konten:
+        db.close()
+        raise ValueError(f'Unbekannter Bereich: {bereich}')
+    
+    ranges = bereich_konten[bereich]
+    
+    # =====================================================================
+    # EBENE: BUCHUNGEN (Detail für ein Konto)
+    # =====================================================================
+    if ebene == 'buchungen' and konto:
+        # Vorzeichen basierend auf Kontotyp
+        if str(konto).startswith('7'):
+            vorzeichen = "CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END"
+        else:
+            vorzeichen = "CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END"
+
+        cursor = db.cursor()
+        cursor.execute(convert_placeholders(f"""
+            SELECT
+                accounting_date as datum,
+                document_number as beleg_nr,
+                COALESCE(NULLIF(posting_text, ''), NULLIF(free_form_accounting_text, ''), NULLIF(contra_account_text, ''), '-') as buchungstext,
+                {vorzeichen} / 100.0 as betrag,
+                debit_or_credit as soll_haben,
+                vehicle_reference as fahrzeug,
+                customer_number as kunden_nr,
+                invoice_number as rechnung_nr
+            FROM loco_journal_accountings
+            WHERE accounting_date >= ? AND accounting_date < ?
+              AND nominal_account_number = ?
+              {firma_filter}
+            ORDER BY accounting_date, document_number
+        """), (von, bis, konto))
+        buchungen = [row_to_dict(r) for r in cursor.fetchall()]
+
+        db.close()
+
+        return {
+            'success': True,
+            'ebene': 'buchungen',
+            'konto': konto,
+            'buchungen': [{
+                'datum': str(row['datum']),
+                'beleg_nr': row['beleg_nr'],
+                'buchungstext': row['buchungstext'],
+                'betrag': round(float(row['betrag'] or 0), 2),
+                'soll_haben': row['soll_haben'],
+                'fahrzeug': row['fahrzeug'] or '',
+                'kunden_nr': row['kunden_nr'] or '',
+                'rechnung_nr': row['rechnung_nr'] or ''
+            } for row in buchungen],
+            'anzahl': len(buchungen)
         }
-        
-        if bereich not in bereich_konten:
-            return jsonify({'success': False, 'error': f'Unbekannter Bereich: {bereich}'}), 400
-        
-        ranges = bereich_konten[bereich]
-        
-        # =====================================================================
-        # EBENE: BUCHUNGEN (Detail für ein Konto)
-        # =====================================================================
-        if ebene == 'buchungen' and konto:
-            # Vorzeichen basierend auf Kontotyp
-            if str(konto).startswith('7'):
-                vorzeichen = "CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END"
-            else:
-                vorzeichen = "CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END"
+    
+    # =====================================================================
+    # EBENE: KONTEN (Detail für eine Gruppe, z.B. '81')
+    # =====================================================================
+    if ebene == 'konten' and gruppe:
+        # Bestimme Range und Vorzeichen basierend auf Typ
+        if typ == 'einsatz':
+            konto_range = ranges['einsatz']
+            vorzeichen = "CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END"
+        else:
+            konto_range = ranges['umsatz']
+            vorzeichen = "CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END"
 
-            cursor = db.cursor()
-            cursor.execute(convert_placeholders(f"""
+        cursor = db.cursor()
+        # TAG 136: PostgreSQL erlaubt kein HAVING mit Alias, nutze Subquery
+        cursor.execute(convert_placeholders(f"""
+            SELECT * FROM (
                 SELECT
-                    accounting_date as datum,
-                    document_number as beleg_nr,
-                    COALESCE(NULLIF(posting_text, ''), NULLIF(free_form_accounting_text, ''), NULLIF(contra_account_text, ''), '-') as buchungstext,
-                    {vorzeichen} / 100.0 as betrag,
-                    debit_or_credit as soll_haben,
-                    vehicle_reference as fahrzeug,
-                    customer_number as kunden_nr,
-                    invoice_number as rechnung_nr
+                    nominal_account_number as konto,
+                    MIN(posting_text) as bezeichnung,
+                    SUM({vorzeichen}) / 100.0 as betrag,
+                    COUNT(*) as buchungen_anzahl
                 FROM loco_journal_accountings
                 WHERE accounting_date >= ? AND accounting_date < ?
-                  AND nominal_account_number = ?
+                  AND nominal_account_number BETWEEN ? AND ?
+                  AND substr(CAST(nominal_account_number AS TEXT), 1, 2) = ?
                   {firma_filter}
-                ORDER BY accounting_date, document_number
-            """), (von, bis, konto))
-            buchungen = [row_to_dict(r) for r in cursor.fetchall()]
+                GROUP BY nominal_account_number
+            ) sub WHERE betrag != 0
+            ORDER BY ABS(betrag) DESC
+        """), (von, bis, konto_range[0], konto_range[1], gruppe))
+        konten = [row_to_dict(r) for r in cursor.fetchall()]
 
-            db.close()
+        summe = sum(float(row['betrag'] or 0) for row in konten)
+        gruppe_name = gruppen_namen.get(gruppe, f'Gruppe {gruppe}')
 
-            return jsonify({
-                'success': True,
-                'ebene': 'buchungen',
-                'konto': konto,
-                'buchungen': [{
-                    'datum': str(row['datum']),
-                    'beleg_nr': row['beleg_nr'],
-                    'buchungstext': row['buchungstext'],
-                    'betrag': round(float(row['betrag'] or 0), 2),
-                    'soll_haben': row['soll_haben'],
-                    'fahrzeug': row['fahrzeug'] or '',
-                    'kunden_nr': row['kunden_nr'] or '',
-                    'rechnung_nr': row['rechnung_nr'] or ''
-                } for row in buchungen],
-                'anzahl': len(buchungen)
-            }), 200
-        
-        # =====================================================================
-        # EBENE: KONTEN (Detail für eine Gruppe, z.B. '81')
-        # =====================================================================
-        if ebene == 'konten' and gruppe:
-            # Bestimme Range und Vorzeichen basierend auf Typ
-            if typ == 'einsatz':
-                konto_range = ranges['einsatz']
-                vorzeichen = "CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END"
-            else:
-                konto_range = ranges['umsatz']
-                vorzeichen = "CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END"
+        # Konten mit Bezeichnungen aus loco_nominal_accounts
+        konten_liste = [{
+            'konto': row['konto'],
+            'bezeichnung': get_konto_bezeichnung(db, row['konto'], subsidiary),
+            'betrag': round(float(row['betrag'] or 0), 2),
+            'buchungen_anzahl': int(row['buchungen_anzahl'])
+        } for row in konten]
 
-            cursor = db.cursor()
-            # TAG 136: PostgreSQL erlaubt kein HAVING mit Alias, nutze Subquery
-            cursor.execute(convert_placeholders(f"""
-                SELECT * FROM (
-                    SELECT
-                        nominal_account_number as konto,
-                        MIN(posting_text) as bezeichnung,
-                        SUM({vorzeichen}) / 100.0 as betrag,
-                        COUNT(*) as buchungen_anzahl
-                    FROM loco_journal_accountings
-                    WHERE accounting_date >= ? AND accounting_date < ?
-                      AND nominal_account_number BETWEEN ? AND ?
-                      AND substr(CAST(nominal_account_number AS TEXT), 1, 2) = ?
-                      {firma_filter}
-                    GROUP BY nominal_account_number
-                ) sub WHERE betrag != 0
-                ORDER BY ABS(betrag) DESC
-            """), (von, bis, konto_range[0], konto_range[1], gruppe))
-            konten = [row_to_dict(r) for r in cursor.fetchall()]
-
-            summe = sum(float(row['betrag'] or 0) for row in konten)
-            gruppe_name = gruppen_namen.get(gruppe, f'Gruppe {gruppe}')
-
-            # Konten mit Bezeichnungen aus loco_nominal_accounts
-            konten_liste = [{
-                'konto': row['konto'],
-                'bezeichnung': get_konto_bezeichnung(db, row['konto'], subsidiary),
+        db.close()
+
+        return {
+            'success': True,
+            'ebene': 'konten',
+            'bereich': bereich,
+            'typ': typ,
+            'gruppe': gruppe,
+            'gruppe_name': gruppe_name,
+            'konten': konten_liste,
+            'summe': round(summe, 2),
+            'anzahl_konten': len(konten_liste)
+        }
+    
+    # =====================================================================
+    # EBENE: GRUPPEN (Standard - 2-stellige Kontengruppen) TAG 136
+    # hole_gruppen(von, bis, ...) für beliebigen Zeitraum (Monat oder Vortag)
+    # =====================================================================
+    def hole_gruppen(von_d, bis_d, konto_range, vorzeichen_typ, mit_konten=False):
+        if vorzeichen_typ == 'einsatz':
+            vorzeichen = "CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END"
+        else:
+            vorzeichen = "CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END"
+
+        cursor = db.cursor()
+        # TAG 136: PostgreSQL erlaubt kein HAVING mit Alias, nutze Subquery
+        cursor.execute(convert_placeholders(f"""
+            SELECT * FROM (
+                SELECT
+                    substr(CAST(nominal_account_number AS TEXT), 1, 2) as gruppe,
+                    SUM({vorzeichen}) / 100.0 as betrag,
+                    COUNT(DISTINCT nominal_account_number) as anzahl_konten,
+                    COUNT(*) as buchungen_anzahl
+                FROM loco_journal_accountings
+                WHERE accounting_date >= ? AND accounting_date < ?
+                  AND nominal_account_number BETWEEN ? AND ?
+                  {firma_filter}
+                GROUP BY substr(CAST(nominal_account_number AS TEXT), 1, 2)
+            ) sub WHERE betrag != 0
+            ORDER BY ABS(betrag) DESC
+        """), (von_d, bis_d, konto_range[0], konto_range[1]))
+        rows = [row_to_dict(r) for r in cursor.fetchall()]
+
+        ergebnis = []
+        for row in rows:
+            g = {
+                'gruppe': row['gruppe'],
+                'name': gruppen_namen.get(row['gruppe'], f"Gruppe {row['gruppe']}"),
                 'betrag': round(float(row['betrag'] or 0), 2),
+                'anzahl_konten': int(row['anzahl_konten']),
                 'buchungen_anzahl': int(row['buchungen_anzahl'])
-            } for row in konten]
-
-            db.close()
-
-            return jsonify({
-                'success': True,
-                'ebene': 'konten',
-                'bereich': bereich,
-                'typ': typ,
-                'gruppe': gruppe,
-                'gruppe_name': gruppe_name,
-                'konten': konten_liste,
-                'summe': round(summe, 2),
-                'anzahl_konten': len(konten_liste)
-            }), 200
-        
-        # =====================================================================
-        # EBENE: GRUPPEN (Standard - 2-stellige Kontengruppen) TAG 136
-        # hole_gruppen(von, bis, ...) für beliebigen Zeitraum (Monat oder Vortag)
-        # =====================================================================
-        def hole_gruppen(von_d, bis_d, konto_range, vorzeichen_typ, mit_konten=False):
-            if vorzeichen_typ == 'einsatz':
-                vorzeichen = "CASE WHEN debit_or_credit = 'S' THEN posted_value ELSE -posted_value END"
-            else:
-                vorzeichen = "CASE WHEN debit_or_credit = 'H' THEN posted_value ELSE -posted_value END"
+            }
 
+            # Optional: Einzelkonten für Drill-Down laden
+            if mit_konten:
+                cursor.execute(convert_placeholders(f"""
+                    SELECT * FROM (
+                        SELECT
+                            j.nominal_account_number as konto,
+                            COALESCE(n.account_description, MIN(j.posting_text)) as bezeichnung,
+                            SUM({vorzeichen}) / 100.0 as betrag,
+                            COUNT(*) as buchungen_anzahl
+                        FROM loco_journal_accountings j
+                        LEFT JOIN loco_nominal_accounts n
+                            ON j.nominal_account_number = n.nominal_account_number
+                            AND j.subsidiary_to_company_ref = n.subsidiary_to_company_ref
+                        WHERE j.accounting_date >= ? AND j.accounting_date < ?
+                          AND j.nominal_account_number BETWEEN ? AND ?
+                          AND substr(CAST(j.nominal_account_number AS TEXT), 1, 2) = ?
+                          {firma_filter.replace('subsidiary_to_company_ref', 'j.subsidiary_to_company_ref').replace('branch_number', 'j.branch_number')}
+                        GROUP BY j.nominal_account_number, n.account_description
+                    ) sub WHERE betrag != 0
+                    ORDER BY ABS(betrag) DESC
+                """), (von_d, bis_d, konto_range[0], konto_range[1], row['gruppe']))
+                konten_rows = [row_to_dict(kr) for kr in cursor.fetchall()]
+                g['konten'] = [{
+                    'konto': kr['konto'],
+                    'bezeichnung': kr['bezeichnung'] or '',
+                    'betrag': round(float(kr['betrag'] or 0), 2),
+                    'buchungen_anzahl': int(kr['buchungen_anzahl'])
+                } for kr in konten_rows]
+
+            ergebnis.append(g)
+
+        return ergebnis
+    
+    # Umsatz-Gruppen (mit Einzelkonten für Drill-Down) – Kumuliert = Monat
+    umsatz_gruppen = hole_gruppen(von, bis, ranges['umsatz'], 'umsatz', mit_konten=True)
+    umsatz_summe = sum(g['betrag'] for g in umsatz_gruppen)
+
+    # Einsatz-Gruppen (mit Einzelkonten für Drill-Down) – Kumuliert = Monat
+    einsatz_gruppen = hole_gruppen(von, bis, ranges['einsatz'], 'einsatz', mit_konten=True)
+    einsatz_summe = sum(g['betrag'] for g in einsatz_gruppen)
+
+    # Vortag (ein Tag) – kontenbezogen wie GlobalCube (Vortag pro Konto in Modal)
+    vortag_d = heute - timedelta(days=1)
+    vortag_von = vortag_d.strftime('%Y-%m-%d')
+    vortag_bis = (vortag_d + timedelta(days=1)).strftime('%Y-%m-%d')
+    umsatz_gruppen_vortag = hole_gruppen(vortag_von, vortag_bis, ranges['umsatz'], 'umsatz', mit_konten=True)
+    einsatz_gruppen_vortag = hole_gruppen(vortag_von, vortag_bis, ranges['einsatz'], 'einsatz', mit_konten=True)
+
+    # 4-Lohn: Im laufenden Monat Einsatz Gruppe 74 kalkuliert (Method B, 6-Monats-Quote)
+    # damit "Einsatz Lohn" in der Detail-Tabelle nicht 0 € anzeigt
+    if bereich == '4-Lohn':
+        werkstatt_umsatz = next((g['betrag'] for g in umsatz_gruppen if g['gruppe'] == '84'), 0)
+        heute_d = date.today()
+        bis_d = datetime.strptime(bis, '%Y-%m-%d').date()
+        ist_laufender_monat = bis_d >= heute_d
+        if ist_laufender_monat and werkstatt_umsatz > 0:
+            aktueller_monat_start = heute_d.replace(day=1)
+            bis_6m = aktueller_monat_start
+            von_6m = bis_6m
+            for _ in range(6):
+                von_6m = (von_6m - timedelta(days=1)).replace(day=1)
             cursor = db.cursor()
-            # TAG 136: PostgreSQL erlaubt kein HAVING mit Alias, nutze Subquery
-            cursor.execute(convert_placeholders(f"""
-                SELECT * FROM (
-                    SELECT
-                        substr(CAST(nominal_account_number AS TEXT), 1, 2) as gruppe,
-                        SUM({vorzeichen}) / 100.0 as betrag,
-                        COUNT(DISTINCT nominal_account_number) as anzahl_konten,
-                        COUNT(*) as buchungen_anzahl
-                    FROM loco_journal_accountings
-                    WHERE accounting_date >= ? AND accounting_date < ?
-                      AND nominal_account_number BETWEEN ? AND ?
-                      {firma_filter}
-                    GROUP BY substr(CAST(nominal_account_number AS TEXT), 1, 2)
-                ) sub WHERE betrag != 0
-                ORDER BY ABS(betrag) DESC
-            """), (von_d, bis_d, konto_range[0], konto_range[1]))
-            rows = [row_to_dict(r) for r in cursor.fetchall()]
-
-            ergebnis = []
-            for row in rows:
-                g = {
-                    'gruppe': row['gruppe'],
-                    'name': gruppen_namen.get(row['gruppe'], f"Gruppe {row['gruppe']}"),
-                    'betrag': round(float(row['betrag'] or 0), 2),
-                    'anzahl_konten': int(row['anzahl_konten']),
-                    'buchungen_anzahl': int(row['buchungen_anzahl'])
-                }
+            cursor.execute(convert_placeholders("""
+                SELECT SUM(CASE WHEN nominal_account_number BETWEEN 840000 AND 849999 AND debit_or_credit = 'H' THEN posted_value
+                                   WHEN nominal_account_number BETWEEN 840000 AND 849999 AND debit_or_credit = 'S' THEN -posted_value ELSE 0 END) / 100.0 as umsatz
+                FROM loco_journal_accountings
+                WHERE accounting_date >= ? AND accounting_date < ?
+                """ + firma_filter_umsatz), (von_6m.strftime('%Y-%m-%d'), bis_6m.strftime('%Y-%m-%d')))
+            row = cursor.fetchone()
+            umsatz_6m = float((row_to_dict(row, cursor) or {}).get('umsatz') or 0)
+            cursor.execute(convert_placeholders("""
+                SELECT SUM(CASE WHEN nominal_account_number BETWEEN 740000 AND 749999 AND debit_or_credit = 'S' THEN posted_value
+                                   WHEN nominal_account_number BETWEEN 740000 AND 749999 AND debit_or_credit = 'H' THEN -posted_value ELSE 0 END) / 100.0 as einsatz
+                FROM loco_journal_accountings
+                WHERE accounting_date >= ? AND accounting_date < ?
+                """ + firma_filter_einsatz), (von_6m.strftime('%Y-%m-%d'), bis_6m.strftime('%Y-%m-%d')))
+            row = cursor.fetchone()
+            einsatz_6m = float((row_to_dict(row, cursor) or {}).get('einsatz') or 0)
+            einsatz_quote_6m = (einsatz_6m / umsatz_6m) if umsatz_6m > 0 else 0.36
+            einsatz_kalk_74 = round(werkstatt_umsatz * einsatz_quote_6m, 2)
+            # Gruppe 74 in einsatz_gruppen setzen oder anlegen
+            gr74 = next((g for g in einsatz_gruppen if g['gruppe'] == '74'), None)
+            if gr74:
+                gr74['betrag'] = einsatz_kalk_74
+                gr74['kalkuliert'] = True
+            else:
+                einsatz_gruppen.append({
+                    'gruppe': '74',
+                    'name': gruppen_namen.get('74', 'Einsatz Lohn'),
+                    'betrag': einsatz_kalk_74,
+                    'anzahl_konten': 0,
+                    'buchungen_anzahl': 0,
+                    'konten': [],
+                    'kalkuliert': True
+                })
+            einsatz_summe = sum(g['betrag'] for g in einsatz_gruppen)
+        elif werkstatt_umsatz > 0:
+            # Abgeschlossener Monat: 74 aus FIBU; Markierung entfernen
+            for g in einsatz_gruppen:
+                g.pop('kalkuliert', None)
+
+    db1 = umsatz_summe - einsatz_summe
+
+    # =====================================================================
+    # FAHRZEUG-GRUPPIERUNG nach Modell + Absatzweg (nur für NW, GW)
+    # TAG 136: Nutzt bestehende parse_modell_aus_kontobezeichnung Logik
+    # Format Kontobezeichnung: "NW VE Corsa an Kd Leas" -> Modell, Kundentyp, Verkaufsart
+    # =====================================================================
+    fahrzeuge = []
+    absatzwege = []
+    if bereich in ['1-NW', '2-GW']:
+        cursor = db.cursor()
 
-                # Optional: Einzelkonten für Drill-Down laden
-                if mit_konten:
-                    cursor.execute(convert_placeholders(f"""
-                        SELECT * FROM (
-                            SELECT
-                                j.nominal_account_number as konto,
-                                COALESCE(n.account_description, MIN(j.posting_text)) as bezeichnung,
-                                SUM({vorzeichen}) / 100.0 as betrag,
-                                COUNT(*) as buchungen_anzahl
-                            FROM loco_journal_accountings j
-                            LEFT JOIN loco_nominal_accounts n
-                                ON j.nominal_account_number = n.nominal_account_number
-                                AND j.subsidiary_to_company_ref = n.subsidiary_to_company_ref
-                            WHERE j.accounting_date >= ? AND j.accounting_date < ?
-                              AND j.nominal_account_number BETWEEN ? AND ?
-                              AND substr(CAST(j.nominal_account_number AS TEXT), 1, 2) = ?
-                              {firma_filter.replace('subsidiary_to_company_ref', 'j.subsidiary_to_company_ref').replace('branch_number', 'j.branch_number')}
-                            GROUP BY j.nominal_account_number, n.account_description
-                        ) sub WHERE betrag != 0
-                        ORDER BY ABS(betrag) DESC
-                    """), (von_d, bis_d, konto_range[0], konto_range[1], row['gruppe']))
-                    konten_rows = [row_to_dict(kr) for kr in cursor.fetchall()]
-                    g['konten'] = [{
-                        'konto': kr['konto'],
-                        'bezeichnung': kr['bezeichnung'] or '',
-                        'betrag': round(float(kr['betrag'] or 0), 2),
-                        'buchungen_anzahl': int(kr['buchungen_anzahl'])
-                    } for kr in konten_rows]
-
-                ergebnis.append(g)
-
-            return ergebnis
-        
-        # Umsatz-Gruppen (mit Einzelkonten für Drill-Down) – Kumuliert = Monat
-        umsatz_gruppen = hole_gruppen(von, bis, ranges['umsatz'], 'umsatz', mit_konten=True)
-        umsatz_summe = sum(g['betrag'] for g in umsatz_gruppen)
-
-        # Einsatz-Gruppen (mit Einzelkonten für Drill-Down) – Kumuliert = Monat
-        einsatz_gruppen = hole_gruppen(von, bis, ranges['einsatz'], 'einsatz', mit_konten=True)
-        einsatz_summe = sum(g['betrag'] for g in einsatz_gruppen)
-
-        # Vortag (ein Tag) – kontenbezogen wie GlobalCube (Vortag pro Konto in Modal)
-        vortag_d = heute - timedelta(days=1)
-        vortag_von = vortag_d.strftime('%Y-%m-%d')
-        vortag_bis = (vortag_d + timedelta(days=1)).strftime('%Y-%m-%d')
-        umsatz_gruppen_vortag = hole_gruppen(vortag_von, vortag_bis, ranges['umsatz'], 'umsatz', mit_konten=True)
-        einsatz_gruppen_vortag = hole_gruppen(vortag_von, vortag_bis, ranges['einsatz'], 'einsatz', mit_konten=True)
-
-        # 4-Lohn: Im laufenden Monat Einsatz Gruppe 74 kalkuliert (Method B, 6-Monats-Quote)
-        # damit "Einsatz Lohn" in der Detail-Tabelle nicht 0 € anzeigt
-        if bereich == '4-Lohn':
-            werkstatt_umsatz = next((g['betrag'] for g in umsatz_gruppen if g['gruppe'] == '84'), 0)
-            heute_d = date.today()
-            bis_d = datetime.strptime(bis, '%Y-%m-%d').date()
-            ist_laufender_monat = bis_d >= heute_d
-            if ist_laufender_monat and werkstatt_umsatz > 0:
-                aktueller_monat_start = heute_d.replace(day=1)
-                bis_6m = aktueller_monat_start
-                von_6m = bis_6m
-                for _ in range(6):
-                    von_6m = (von_6m - timedelta(days=1)).replace(day=1)
-                cursor = db.cursor()
-                cursor.execute(convert_placeholders("""
-                    SELECT SUM(CASE WHEN nominal_account_number BETWEEN 840000 AND 849999 AND debit_or_credit = 'H' THEN posted_value
-                                       WHEN nominal_account_number BETWEEN 840000 AND 849999 AND debit_or_credit = 'S' THEN -posted_value ELSE 0 END) / 100.0 as umsatz
-                    FROM loco_journal_accountings
-                    WHERE accounting_date >= ? AND accounting_date < ?
-                    """ + firma_filter_umsatz), (von_6m.strftime('%Y-%m-%d'), bis_6m.strftime('%Y-%m-%d')))
-                row = cursor.fetchone()
-                umsatz_6m = float((row_to_dict(row, cursor) or {}).get('umsatz') or 0)
-                cursor.execute(convert_placeholders("""
-                    SELECT SUM(CASE WHEN nominal_account_number BETWEEN 740000 AND 749999 AND debit_or_credit = 'S' THEN posted_value
-                                       WHEN nominal_account_number BETWEEN 740000 AND 749999 AND debit_or_credit = 'H' THEN -posted_value ELSE 0 END) / 100.0 as einsatz
-                    FROM loco_journal_accountings
-                    WHERE accounting_date >= ? AND accounting_date < ?
-                    """ + firma_filter_einsatz), (von_6m.strftime('%Y-%m-%d'), bis_6m.strftime('%Y-%m-%d')))
-                row = cursor.fetchone()
-                einsatz_6m = float((row_to_dict(row, cursor) or {}).get('einsatz') or 0)
-                einsatz_quote_6m = (einsatz_6m / umsatz_6m) if umsatz_6m > 0 else 0.36
-                einsatz_kalk_74 = round(werkstatt_umsatz * einsatz_quote_6m, 2)
-                # Gruppe 74 in einsatz_gruppen setzen oder anlegen
-                gr74 = next((g for g in einsatz_gruppen if g['gruppe'] == '74'), None)
-                if gr74:
-                    gr74['betrag'] = einsatz_kalk_74
-                    gr74['kalkuliert'] = True
-                else:
-                    einsatz_gruppen.append({
-                        'gruppe': '74',
-                        'name': gruppen_namen.get('74', 'Einsatz Lohn'),
-                        'betrag': einsatz_kalk_74,
-                        'anzahl_konten': 0,
-                        'buchungen_anzahl': 0,
-                        'konten': [],
-                        'kalkuliert': True
-                    })
-                einsatz_summe = sum(g['betrag'] for g in einsatz_gruppen)
-            elif werkstatt_umsatz > 0:
-                # Abgeschlossener Monat: 74 aus FIBU; Markierung entfernen
-                for g in einsatz_gruppen:
-                    g.pop('kalkuliert', None)
+        # Nach Modell und Absatzweg gruppieren
+        modell_stats = {}
+        absatzweg_stats = {}
 
-        db1 = umsatz_summe - einsatz_summe
+        # 1. Umsatz-Konten holen (mit Kontobezeichnung aus loco_nominal_accounts)
+        cursor.execute(convert_placeholders(f"""
+            SELECT
+                j.nominal_account_number as konto,
+                COALESCE(n.account_description, MIN(j.posting_text)) as bezeichnung,
+                SUM(CASE WHEN j.debit_or_credit = 'H' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag,
+                COUNT(DISTINCT SUBSTRING(j.vehicle_reference FROM 'FG:([A-Z0-9]+)')) as stueck
+            FROM loco_journal_accountings j
+            LEFT JOIN loco_nominal_accounts n
+                ON j.nominal_account_number = n.nominal_account_number
+                AND j.subsidiary_to_company_ref = n.subsidiary_to_company_ref
+            WHERE j.accounting_date >= ? AND j.accounting_date < ?
+              AND j.nominal_account_number BETWEEN ? AND ?
+              {firma_filter.replace('subsidiary_to_company_ref', 'j.subsidiary_to_company_ref').replace('branch_number', 'j.branch_number')}
+            GROUP BY j.nominal_account_number, n.account_description
+        """), (von, bis, ranges['umsatz'][0], ranges['umsatz'][1]))
 
-        # =====================================================================
-        # FAHRZEUG-GRUPPIERUNG nach Modell + Absatzweg (nur für NW, GW)
-        # TAG 136: Nutzt bestehende parse_modell_aus_kontobezeichnung Logik
-        # Format Kontobezeichnung: "NW VE Corsa an Kd Leas" -> Modell, Kundentyp, Verkaufsart
-        # =====================================================================
-        fahrzeuge = []
-        absatzwege = []
-        if bereich in ['1-NW', '2-GW']:
-            cursor = db.cursor()
+        for row in cursor.fetchall():
+            r = row_to_dict(row)
+            konto = r.get('konto', 0)
+            bezeichnung = r.get('bezeichnung', '') or ''
+            betrag = float(r.get('betrag', 0) or 0)
+            stueck = int(r.get('stueck', 0) or 0)
 
-            # Nach Modell und Absatzweg gruppieren
-            modell_stats = {}
-            absatzweg_stats = {}
+            parsed = parse_modell_aus_kontobezeichnung(bezeichnung)
+            modell = normalisiere_fibu_modell(parsed['modell'])
+            kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
+            verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
 
-            # 1. Umsatz-Konten holen (mit Kontobezeichnung aus loco_nominal_accounts)
-            cursor.execute(convert_placeholders(f"""
-                SELECT
-                    j.nominal_account_number as konto,
-                    COALESCE(n.account_description, MIN(j.posting_text)) as bezeichnung,
-                    SUM(CASE WHEN j.debit_or_credit = 'H' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag,
-                    COUNT(DISTINCT SUBSTRING(j.vehicle_reference FROM 'FG:([A-Z0-9]+)')) as stueck
-                FROM loco_journal_accountings j
-                LEFT JOIN loco_nominal_accounts n
-                    ON j.nominal_account_number = n.nominal_account_number
-                    AND j.subsidiary_to_company_ref = n.subsidiary_to_company_ref
-                WHERE j.accounting_date >= ? AND j.accounting_date < ?
-                  AND j.nominal_account_number BETWEEN ? AND ?
-                  {firma_filter.replace('subsidiary_to_company_ref', 'j.subsidiary_to_company_ref').replace('branch_number', 'j.branch_number')}
-                GROUP BY j.nominal_account_number, n.account_description
-            """), (von, bis, ranges['umsatz'][0], ranges['umsatz'][1]))
-
-            for row in cursor.fetchall():
-                r = row_to_dict(row)
-                konto = r.get('konto', 0)
-                bezeichnung = r.get('bezeichnung', '') or ''
-                betrag = float(r.get('betrag', 0) or 0)
-                stueck = int(r.get('stueck', 0) or 0)
-
-                parsed = parse_modell_aus_kontobezeichnung(bezeichnung)
-                modell = normalisiere_fibu_modell(parsed['modell'])
-                kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
-                verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
-
-                # Modell-Statistik (Umsatz) mit Konten-Details für Drill-Down
-                if modell not in modell_stats:
-                    modell_stats[modell] = {'modell': modell, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
-                modell_stats[modell]['stueck'] += stueck
-                modell_stats[modell]['umsatz'] += betrag
-                modell_stats[modell]['konten'].append({
-                    'konto': konto,
-                    'bezeichnung': bezeichnung,
-                    'umsatz': betrag,
-                    'einsatz': 0,
-                    'stueck': stueck
-                })
+            # Modell-Statistik (Umsatz) mit Konten-Details für Drill-Down
+            if modell not in modell_stats:
+                modell_stats[modell] = {'modell': modell, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
+            modell_stats[modell]['stueck'] += stueck
+            modell_stats[modell]['umsatz'] += betrag
+            modell_stats[modell]['konten'].append({
+                'konto': konto,
+                'bezeichnung': bezeichnung,
+                'umsatz': betrag,
+                'einsatz': 0,
+                'stueck': stueck
+            })
 
-                # Absatzweg-Statistik (Umsatz) mit Konten für Drill-Down
-                absatzweg = f"{kundentyp} {verkaufsart}".strip() or 'Sonstige'
-                if absatzweg not in absatzweg_stats:
-                    absatzweg_stats[absatzweg] = {'absatzweg': absatzweg, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
-                absatzweg_stats[absatzweg]['stueck'] += stueck
-                absatzweg_stats[absatzweg]['umsatz'] += betrag
-                absatzweg_stats[absatzweg]['konten'].append({
-                    'konto': konto,
-                    'bezeichnung': bezeichnung,
-                    'umsatz': betrag,
-                    'einsatz': 0,
-                    'stueck': stueck
-                })
+            # Absatzweg-Statistik (Umsatz) mit Konten für Drill-Down
+            absatzweg = f"{kundentyp} {verkaufsart}".strip() or 'Sonstige'
+            if absatzweg not in absatzweg_stats:
+                absatzweg_stats[absatzweg] = {'absatzweg': absatzweg, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
+            absatzweg_stats[absatzweg]['stueck'] += stueck
+            absatzweg_stats[absatzweg]['umsatz'] += betrag
+            absatzweg_stats[absatzweg]['konten'].append({
+                'konto': konto,
+                'bezeichnung': bezeichnung,
+                'umsatz': betrag,
+                'einsatz': 0,
+                'stueck': stueck
+            })
 
-            # 2. Einsatz-Konten holen (mit Kontobezeichnung aus loco_nominal_accounts)
-            cursor.execute(convert_placeholders(f"""
-                SELECT
-                    j.nominal_account_number as konto,
-                    COALESCE(n.account_description, MIN(j.posting_text)) as bezeichnung,
-                    SUM(CASE WHEN j.debit_or_credit = 'S' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag
-                FROM loco_journal_accountings j
-                LEFT JOIN loco_nominal_accounts n
-                    ON j.nominal_account_number = n.nominal_account_number
-                    AND j.subsidiary_to_company_ref = n.subsidiary_to_company_ref
-                WHERE j.accounting_date >= ? AND j.accounting_date < ?
-                  AND j.nominal_account_number BETWEEN ? AND ?
-                  {firma_filter.replace('subsidiary_to_company_ref', 'j.subsidiary_to_company_ref').replace('branch_number', 'j.branch_number')}
-                GROUP BY j.nominal_account_number, n.account_description
-            """), (von, bis, ranges['einsatz'][0], ranges['einsatz'][1]))
-
-            for row in cursor.fetchall():
-                r = row_to_dict(row)
-                bezeichnung = r.get('bezeichnung', '') or ''
-                betrag = float(r.get('betrag', 0) or 0)
-
-                parsed = parse_modell_aus_kontobezeichnung(bezeichnung)
-                modell = normalisiere_fibu_modell(parsed['modell'])
-                kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
-                verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
-
-                konto = r.get('konto', '')
-
-                # Modell-Statistik (Einsatz) - auch anlegen wenn nur Einsatz ohne Umsatz!
-                if modell not in modell_stats:
-                    modell_stats[modell] = {'modell': modell, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
-                modell_stats[modell]['einsatz'] += betrag
-                # Auch Einsatz-Konten zum Drill-Down hinzufügen
-                modell_stats[modell]['konten'].append({
-                    'konto': konto,
-                    'bezeichnung': bezeichnung,
-                    'umsatz': 0,
-                    'einsatz': betrag,
-                    'stueck': 0
-                })
+        # 2. Einsatz-Konten holen (mit Kontobezeichnung aus loco_nominal_accounts)
+        cursor.execute(convert_placeholders(f"""
+            SELECT
+                j.nominal_account_number as konto,
+                COALESCE(n.account_description, MIN(j.posting_text)) as bezeichnung,
+                SUM(CASE WHEN j.debit_or_credit = 'S' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag
+            FROM loco_journal_accountings j
+            LEFT JOIN loco_nominal_accounts n
+                ON j.nominal_account_number = n.nominal_account_number
+                AND j.subsidiary_to_company_ref = n.subsidiary_to_company_ref
+            WHERE j.accounting_date >= ? AND j.accounting_date < ?
+              AND j.nominal_account_number BETWEEN ? AND ?
+              {firma_filter.replace('subsidiary_to_company_ref', 'j.subsidiary_to_company_ref').replace('branch_number', 'j.branch_number')}
+            GROUP BY j.nominal_account_number, n.account_description
+        """), (von, bis, ranges['einsatz'][0], ranges['einsatz'][1]))
 
-                # Absatzweg-Statistik (Einsatz) - auch anlegen wenn nur Einsatz ohne Umsatz!
-                absatzweg = f"{kundentyp} {verkaufsart}".strip() or 'Sonstige'
-                if absatzweg not in absatzweg_stats:
-                    absatzweg_stats[absatzweg] = {'absatzweg': absatzweg, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
-                absatzweg_stats[absatzweg]['einsatz'] += betrag
-                # Auch Einsatz-Konten zum Drill-Down hinzufügen
-                absatzweg_stats[absatzweg]['konten'].append({
-                    'konto': konto,
-                    'bezeichnung': bezeichnung,
-                    'umsatz': 0,
-                    'einsatz': betrag,
-                    'stueck': 0
-                })
+        for row in cursor.fetchall():
+            r = row_to_dict(row)
+            bezeichnung = r.get('bezeichnung', '') or ''
+            betrag = float(r.get('betrag', 0) or 0)
 
-            # Modelle in Liste umwandeln (mit DB1 und Einzelkonten für Drill-Down)
-            fahrzeuge = [
-                {
-                    'modell': m['modell'],
-                    'stueck': m['stueck'],
-                    'umsatz': round(m['umsatz'], 2),
-                    'einsatz': round(m['einsatz'], 2),
-                    'db1': round(m['umsatz'] - m['einsatz'], 2),
-                    'db1_pro_stueck': round((m['umsatz'] - m['einsatz']) / m['stueck'], 2) if m['stueck'] > 0 else 0,
-                    'konten': m.get('konten', [])  # Einzelkonten für Drill-Down
-                }
-                for m in modell_stats.values() if m['umsatz'] > 0 or m['einsatz'] > 0
-            ]
-            # Intelligente Sortierung: Echte Modelle oben (alphabetisch), Sammelposten unten
-            def sortkey_modell(item):
-                m = item['modell'].lower()
-                # Diese Begriffe ans Ende sortieren
-                nachrangig = ['sonstig', 'umlage', 'erlös', 'erloes', 'kosten', 'zubehör', 'zubehoer',
-                              'garantie', 'bonus', 'prämie', 'praemie', 'provision', 'rabatt']
-                for begriff in nachrangig:
-                    if begriff in m:
-                        return (1, item['modell'])  # Nach hinten
-                return (0, item['modell'])  # Normale alphabetische Sortierung
-            fahrzeuge.sort(key=sortkey_modell)
-
-            # Absatzwege in Liste umwandeln (mit DB1 und Konten für Drill-Down)
-            absatzwege = [
-                {
-                    'absatzweg': a['absatzweg'],
-                    'stueck': a['stueck'],
-                    'umsatz': round(a['umsatz'], 2),
-                    'einsatz': round(a['einsatz'], 2),
-                    'db1': round(a['umsatz'] - a['einsatz'], 2),
-                    'db1_pro_stueck': round((a['umsatz'] - a['einsatz']) / a['stueck'], 2) if a['stueck'] > 0 else 0,
-                    'konten': a.get('konten', [])  # Einzelkonten für Drill-Down
-                }
-                for a in absatzweg_stats.values() if a['umsatz'] > 0 or a['einsatz'] > 0
-            ]
-            absatzwege.sort(key=lambda x: x['absatzweg'])  # Alphabetisch nach Absatzweg
+            parsed = parse_modell_aus_kontobezeichnung(bezeichnung)
+            modell = normalisiere_fibu_modell(parsed['modell'])
+            kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
+            verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
 
-        db.close()
+            konto = r.get('konto', '')
 
-        # Vortag-Summen für Modal (Vortag + Kumuliert)
-        vortag_umsatz_summe = sum(g['betrag'] for g in umsatz_gruppen_vortag)
-        vortag_einsatz_summe = sum(g['betrag'] for g in einsatz_gruppen_vortag)
-        vortag_datum_formatiert = vortag_d.strftime('%d.%m.%Y')
+            # Modell-Statistik (Einsatz) - auch anlegen wenn nur Einsatz ohne Umsatz!
+            if modell not in modell_stats:
+                modell_stats[modell] = {'modell': modell, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
+            modell_stats[modell]['einsatz'] += betrag
+            # Auch Einsatz-Konten zum Drill-Down hinzufügen
+            modell_stats[modell]['konten'].append({
+                'konto': konto,
+                'bezeichnung': bezeichnung,
+                'umsatz': 0,
+                'einsatz': betrag,
+                'stueck': 0
+            })
 
-        return jsonify({
-            'success': True,
-            'ebene': 'gruppen',
-            'bereich': bereich,
-            'filter': {
-                'firma': firma,
-                'standort': standort,
-                'monat': monat,
-                'jahr': jahr,
-                'von': von,
-                'bis': bis
-            },
+            # Absatzweg-Statistik (Einsatz) - auch anlegen wenn nur Einsatz ohne Umsatz!
+            absatzweg = f"{kundentyp} {verkaufsart}".strip() or 'Sonstige'
+            if absatzweg not in absatzweg_stats:
+                absatzweg_stats[absatzweg] = {'absatzweg': absatzweg, 'stueck': 0, 'umsatz': 0, 'einsatz': 0, 'konten': []}
+            absatzweg_stats[absatzweg]['einsatz'] += betrag
+            # Auch Einsatz-Konten zum Drill-Down hinzufügen
+            absatzweg_stats[absatzweg]['konten'].append({
+                'konto': konto,
+                'bezeichnung': bezeichnung,
+                'umsatz': 0,
+                'einsatz': betrag,
+                'stueck': 0
+            })
+
+        # Modelle in Liste umwandeln (mit DB1 und Einzelkonten für Drill-Down)
+        fahrzeuge = [
+            {
+                'modell': m['modell'],
+                'stueck': m['stueck'],
+                'umsatz': round(m['umsatz'], 2),
+                'einsatz': round(m['einsatz'], 2),
+                'db1': round(m['umsatz'] - m['einsatz'], 2),
+                'db1_pro_stueck': round((m['umsatz'] - m['einsatz']) / m['stueck'], 2) if m['stueck'] > 0 else 0,
+                'konten': m.get('konten', [])  # Einzelkonten für Drill-Down
+            }
+            for m in modell_stats.values() if m['umsatz'] > 0 or m['einsatz'] > 0
+        ]
+        # Intelligente Sortierung: Echte Modelle oben (alphabetisch), Sammelposten unten
+        def sortkey_modell(item):
+            m = item['modell'].lower()
+            # Diese Begriffe ans Ende sortieren
+            nachrangig = ['sonstig', 'umlage', 'erlös', 'erloes', 'kosten', 'zubehör', 'zubehoer',
+                          'garantie', 'bonus', 'prämie', 'praemie', 'provision', 'rabatt']
+            for begriff in nachrangig:
+                if begriff in m:
+                    return (1, item['modell'])  # Nach hinten
+            return (0, item['modell'])  # Normale alphabetische Sortierung
+        fahrzeuge.sort(key=sortkey_modell)
+
+        # Absatzwege in Liste umwandeln (mit DB1 und Konten für Drill-Down)
+        absatzwege = [
+            {
+                'absatzweg': a['absatzweg'],
+                'stueck': a['stueck'],
+                'umsatz': round(a['umsatz'], 2),
+                'einsatz': round(a['einsatz'], 2),
+                'db1': round(a['umsatz'] - a['einsatz'], 2),
+                'db1_pro_stueck': round((a['umsatz'] - a['einsatz']) / a['stueck'], 2) if a['stueck'] > 0 else 0,
+                'konten': a.get('konten', [])  # Einzelkonten für Drill-Down
+            }
+            for a in absatzweg_stats.values() if a['umsatz'] > 0 or a['einsatz'] > 0
+        ]
+        absatzwege.sort(key=lambda x: x['absatzweg'])  # Alphabetisch nach Absatzweg
+
+    db.close()
+
+    # Vortag-Summen für Modal (Vortag + Kumuliert)
+    vortag_umsatz_summe = sum(g['betrag'] for g in umsatz_gruppen_vortag)
+    vortag_einsatz_summe = sum(g['betrag'] for g in einsatz_gruppen_vortag)
+    vortag_datum_formatiert = vortag_d.strftime('%d.%m.%Y')
+
+    return {
+        'success': True,
+        'ebene': 'gruppen',
+        'bereich': bereich,
+        'filter': {
+            'firma': firma,
+            'standort': standort,
+            'monat': monat,
+            'jahr': jahr,
+            'von': von,
+            'bis': bis
+        },
+        'umsatz': {
+            'gruppen': umsatz_gruppen,
+            'summe': round(umsatz_summe, 2),
+            'anzahl_gruppen': len(umsatz_gruppen),
+            'gesamt': round(umsatz_summe, 2)
+        },
+        'einsatz': {
+            'gruppen': einsatz_gruppen,
+            'summe': round(einsatz_summe, 2),
+            'anzahl_gruppen': len(einsatz_gruppen),
+            'gesamt': round(einsatz_summe, 2)
+        },
+        'vortag': {
+            'datum': vortag_von,
+            'datum_formatiert': vortag_datum_formatiert,
             'umsatz': {
-                'gruppen': umsatz_gruppen,
-                'summe': round(umsatz_summe, 2),
-                'anzahl_gruppen': len(umsatz_gruppen),
-                'gesamt': round(umsatz_summe, 2)
+                'gruppen': umsatz_gruppen_vortag,
+                'gesamt': round(vortag_umsatz_summe, 2)
             },
             'einsatz': {
-                'gruppen': einsatz_gruppen,
-                'summe': round(einsatz_summe, 2),
-                'anzahl_gruppen': len(einsatz_gruppen),
-                'gesamt': round(einsatz_summe, 2)
-            },
-            'vortag': {
-                'datum': vortag_von,
-                'datum_formatiert': vortag_datum_formatiert,
-                'umsatz': {
-                    'gruppen': umsatz_gruppen_vortag,
-                    'gesamt': round(vortag_umsatz_summe, 2)
-                },
-                'einsatz': {
-                    'gruppen': einsatz_gruppen_vortag,
-                    'gesamt': round(vortag_einsatz_summe, 2)
-                }
-            },
-            'kumuliert_label': f"{['', 'Jan.', 'Feb.', 'März', 'Apr.', 'Mai', 'Juni', 'Juli', 'Aug.', 'Sep.', 'Okt.', 'Nov.', 'Dez.'][monat]}/{jahr}",
-            'db1': round(db1, 2),
-            'fahrzeuge': fahrzeuge,   # TAG 136: Modell-Gruppierung
-            'absatzwege': absatzwege  # TAG 136: Absatzweg-Gruppierung (Kundentyp + Verkaufsart)
-        }), 200
-        
-    except Exception as e:
-        import traceback
-        return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
+                'gruppen': einsatz_gruppen_vortag,
+                'gesamt': round(vortag_einsatz_summe, 2)
+            }
+        },
+        'kumuliert_label': f"{['', 'Jan.', 'Feb.', 'März', 'Apr.', 'Mai', 'Juni', 'Juli', 'Aug.', 'Sep.', 'Okt.', 'Nov.', 'Dez.'][monat]}/{jahr}",
+        'db1': round(db1, 2),
+        'fahrzeuge': fahrzeuge,   # TAG 136: Modell-Gruppierung
+        'absatzwege': absatzwege  # TAG 136: Absatzweg-Gruppierung (Kundentyp + Verkaufsart)
+    }
 
 
 # =============================================================================
@@ -2992,340 +3022,359 @@ def api_tek_modelle():
     - standort: 0=Alle, 1=Deggendorf, 2=Landau
     - monat, jahr: Zeitraum
     - gruppierung: 'modell' (Standard), 'modell_kundentyp', 'modell_verkaufsart', 'detail'
+
+    Logik: tek_modelle_daten() (TAG 220, auch direkt vom PDF-Generator genutzt)
     """
     try:
-        bereich = request.args.get('bereich', '1-NW')
-        firma = request.args.get('firma', '0')
-        standort = request.args.get('standort', '0')
-        monat = request.args.get('monat', type=int)
-        jahr = request.args.get('jahr', type=int)
-        gruppierung = request.args.get('gruppierung', 'modell')  # modell, modell_kundentyp, modell_verkaufsart, detail
-
-        heute = date.today()
-        if not monat:
-            monat = heute.month
-        if not jahr:
-            jahr = heute.year
+        daten = tek_modelle_daten(
+            bereich=request.args.get('bereich', '1-NW'),
+            firma=request.args.get('firma', '0'),
+            standort=request.args.get('standort', '0'),
+            monat=request.args.get('monat', type=int),
+            jahr=request.args.get('jahr', type=int),
+            gruppierung=request.args.get('gruppierung', 'modell')  # modell, modell_kundentyp, modell_verkaufsart, detail
+        )
+        return jsonify(daten), 200
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        import traceback
+        return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
 
-        # Aktueller Monat
-        von = f"{jahr}-{monat:02d}-01"
-        bis = f"{jahr}-{monat+1:02d}-01" if monat < 12 else f"{jahr+1}-01-01"
 
-        # Vormonat berechnen
-        vm_monat = monat - 1 if monat > 1 else 12
-        vm_jahr = jahr if monat > 1 else jahr - 1
-        vm_von = f"{vm_jahr}-{vm_monat:02d}-01"
-        vm_bis = f"{vm_jahr}-{vm_monat+1:02d}-01" if vm_monat < 12 else f"{vm_jahr+1}-01-01"
+@cached_result(ttl=300, tags=['tek'])
+def tek_modelle_daten(bereich: str = '1-NW', firma: str = '0', standort: str = '0',
+                      monat: int = None, jahr: int = None, gruppierung: str = 'modell') -> dict:
+    """
+    TEK-Daten nach Fahrzeugmodell als Dict - Logik von /api/tek/modelle.
 
-        # Vorjahr (gleicher Monat)
-        vj_von = f"{jahr-1}-{monat:02d}-01"
-        vj_bis = f"{jahr-1}-{monat+1:02d}-01" if monat < 12 else f"{jahr}-01-01"
+    TAG 220: Service-Funktion statt HTTP-Selbstaufruf aus dem PDF-Generator;
+    Ergebnis-Cache gemeinsam mit dem Endpoint (Tag 'tek').
 
-        db = get_db()
-        cursor = db.cursor()
+    Raises:
+        ValueError: Bereich nicht NW/GW
+    """
+    heute = date.today()
+    if not monat:
+        monat = heute.month
+    if not jahr:
+        jahr = heute.year
+
+    # Aktueller Monat
+    von = f"{jahr}-{monat:02d}-01"
+    bis = f"{jahr}-{monat+1:02d}-01" if monat < 12 else f"{jahr+1}-01-01"
+
+    # Vormonat berechnen
+    vm_monat = monat - 1 if monat > 1 else 12
+    vm_jahr = jahr if monat > 1 else jahr - 1
+    vm_von = f"{vm_jahr}-{vm_monat:02d}-01"
+    vm_bis = f"{vm_jahr}-{vm_monat+1:02d}-01" if vm_monat < 12 else f"{vm_jahr+1}-01-01"
+
+    # Vorjahr (gleicher Monat)
+    vj_von = f"{jahr-1}-{monat:02d}-01"
+    vj_bis = f"{jahr-1}-{monat+1:02d}-01" if monat < 12 else f"{jahr}-01-01"
+
+    db = get_db()
+    cursor = db.cursor()
 
-        # Firma/Standort-Filter
-        firma_filter = ""
+    # Firma/Standort-Filter
+    firma_filter = ""
+    subsidiary = 1
+    if firma == '1':
+        firma_filter = "AND j.subsidiary_to_company_ref = 1"
         subsidiary = 1
-        if firma == '1':
-            firma_filter = "AND j.subsidiary_to_company_ref = 1"
-            subsidiary = 1
-            if standort == '1':
-                firma_filter += " AND j.branch_number = 1"
-            elif standort == '2':
-                firma_filter += " AND j.branch_number = 3"
-        elif firma == '2':
-            firma_filter = "AND j.subsidiary_to_company_ref = 2"
-            subsidiary = 2
-
-        # Bereichs-Konten
-        bereich_konten = {
-            '1-NW': {'umsatz': (810000, 819999), 'einsatz': (710000, 719999)},
-            '2-GW': {'umsatz': (820000, 829999), 'einsatz': (720000, 729999)},
-        }
-
-        if bereich not in bereich_konten:
-            db.close()
-            return jsonify({'success': False, 'error': f'Bereich {bereich} nicht unterstützt für Modell-Ansicht'}), 400
-
-        ranges = bereich_konten[bereich]
-
-        # =====================================================================
-        # UMSATZ pro Konto (mit Bezeichnung aus loco_nominal_accounts) TAG 136
-        # =====================================================================
-        cursor.execute(convert_placeholders(f"""
-            SELECT * FROM (
-                SELECT
-                    j.nominal_account_number as konto,
-                    COALESCE(n.account_description, 'Konto ' || CAST(j.nominal_account_number AS TEXT)) as bezeichnung,
-                    SUM(CASE WHEN j.debit_or_credit = 'H' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag,
-                    COUNT(*) as buchungen
-                FROM loco_journal_accountings j
-                LEFT JOIN loco_nominal_accounts n
-                    ON j.nominal_account_number = n.nominal_account_number
-                    AND n.subsidiary_to_company_ref = ?
-                WHERE j.accounting_date >= ? AND j.accounting_date < ?
-                  AND j.nominal_account_number BETWEEN ? AND ?
-                  {firma_filter}
-                GROUP BY j.nominal_account_number, n.account_description
-            ) sub WHERE betrag != 0
-        """), (subsidiary, von, bis, ranges['umsatz'][0], ranges['umsatz'][1]))
-        umsatz_konten = [row_to_dict(r) for r in cursor.fetchall()]
+        if standort == '1':
+            firma_filter += " AND j.branch_number = 1"
+        elif standort == '2':
+            firma_filter += " AND j.branch_number = 3"
+    elif firma == '2':
+        firma_filter = "AND j.subsidiary_to_company_ref = 2"
+        subsidiary = 2
 
-        # =====================================================================
-        # EINSATZ pro Konto
-        # =====================================================================
-        cursor.execute(convert_placeholders(f"""
-            SELECT * FROM (
-                SELECT
-                    j.nominal_account_number as konto,
-                    COALESCE(n.account_description, 'Konto ' || CAST(j.nominal_account_number AS TEXT)) as bezeichnung,
-                    SUM(CASE WHEN j.debit_or_credit = 'S' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag,
-                    COUNT(*) as buchungen
-                FROM loco_journal_accountings j
-                LEFT JOIN loco_nominal_accounts n
-                    ON j.nominal_account_number = n.nominal_account_number
-                    AND n.subsidiary_to_company_ref = ?
-                WHERE j.accounting_date >= ? AND j.accounting_date < ?
-                  AND j.nominal_account_number BETWEEN ? AND ?
-                  {firma_filter}
-                GROUP BY j.nominal_account_number, n.account_description
-            ) sub WHERE betrag != 0
-        """), (subsidiary, von, bis, ranges['einsatz'][0], ranges['einsatz'][1]))
-        einsatz_konten = [row_to_dict(r) for r in cursor.fetchall()]
+    # Bereichs-Konten
+    bereich_konten = {
+        '1-NW': {'umsatz': (810000, 819999), 'einsatz': (710000, 719999)},
+        '2-GW': {'umsatz': (820000, 829999), 'einsatz': (720000, 729999)},
+    }
 
+    if bereich not in bereich_konten:
         db.close()
+        raise ValueError(f'Bereich {bereich} nicht unterstützt für Modell-Ansicht')
 
-        # =====================================================================
-        # Modell extrahieren und gruppieren
-        # =====================================================================
-        modell_daten = {}  # Key: modell (oder modell+kundentyp etc.)
+    ranges = bereich_konten[bereich]
 
-        # Umsatz verarbeiten
-        for row in umsatz_konten:
-            parsed = parse_modell_aus_kontobezeichnung(row['bezeichnung'])
-            modell = normalisiere_fibu_modell(parsed['modell'])  # Normalisieren für Locosoft-Match
-            kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
-            verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
+    # =====================================================================
+    # UMSATZ pro Konto (mit Bezeichnung aus loco_nominal_accounts) TAG 136
+    # =====================================================================
+    cursor.execute(convert_placeholders(f"""
+        SELECT * FROM (
+            SELECT
+                j.nominal_account_number as konto,
+                COALESCE(n.account_description, 'Konto ' || CAST(j.nominal_account_number AS TEXT)) as bezeichnung,
+                SUM(CASE WHEN j.debit_or_credit = 'H' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag,
+                COUNT(*) as buchungen
+            FROM loco_journal_accountings j
+            LEFT JOIN loco_nominal_accounts n
+                ON j.nominal_account_number = n.nominal_account_number
+                AND n.subsidiary_to_company_ref = ?
+            WHERE j.accounting_date >= ? AND j.accounting_date < ?
+              AND j.nominal_account_number BETWEEN ? AND ?
+              {firma_filter}
+            GROUP BY j.nominal_account_number, n.account_description
+        ) sub WHERE betrag != 0
+    """), (subsidiary, von, bis, ranges['umsatz'][0], ranges['umsatz'][1]))
+    umsatz_konten = [row_to_dict(r) for r in cursor.fetchall()]
 
-            # Key basierend auf Gruppierung
-            if gruppierung == 'modell':
-                key = modell
-            elif gruppierung == 'modell_kundentyp':
-                key = f"{modell}|{kundentyp}"
-            elif gruppierung == 'modell_verkaufsart':
-                key = f"{modell}|{verkaufsart}"
-            else:  # detail
-                key = f"{modell}|{kundentyp}|{verkaufsart}"
-
-            if key not in modell_daten:
-                modell_daten[key] = {
-                    'modell': modell,
-                    'kundentyp': kundentyp if gruppierung != 'modell' else None,
-                    'verkaufsart': verkaufsart if gruppierung in ['modell_verkaufsart', 'detail'] else None,
-                    'umsatz': 0,
-                    'einsatz': 0,
-                    'buchungen_umsatz': 0,
-                    'buchungen_einsatz': 0,
-                    'konten_umsatz': [],
-                    'konten_einsatz': []
-                }
+    # =====================================================================
+    # EINSATZ pro Konto
+    # =====================================================================
+    cursor.execute(convert_placeholders(f"""
+        SELECT * FROM (
+            SELECT
+                j.nominal_account_number as konto,
+                COALESCE(n.account_description, 'Konto ' || CAST(j.nominal_account_number AS TEXT)) as bezeichnung,
+                SUM(CASE WHEN j.debit_or_credit = 'S' THEN j.posted_value ELSE -j.posted_value END) / 100.0 as betrag,
+                COUNT(*) as buchungen
+            FROM loco_journal_accountings j
+            LEFT JOIN loco_nominal_accounts n
+                ON j.nominal_account_number = n.nominal_account_number
+                AND n.subsidiary_to_company_ref = ?
+            WHERE j.accounting_date >= ? AND j.accounting_date < ?
+              AND j.nominal_account_number BETWEEN ? AND ?
+              {firma_filter}
+            GROUP BY j.nominal_account_number, n.account_description
+        ) sub WHERE betrag != 0
+    """), (subsidiary, von, bis, ranges['einsatz'][0], ranges['einsatz'][1]))
+    einsatz_konten = [row_to_dict(r) for r in cursor.fetchall()]
 
-            modell_daten[key]['umsatz'] += row['betrag']
-            modell_daten[key]['buchungen_umsatz'] += row['buchungen']
-            modell_daten[key]['konten_umsatz'].append(row['konto'])
+    db.close()
 
-        # Einsatz verarbeiten
-        for row in einsatz_konten:
-            parsed = parse_modell_aus_kontobezeichnung(row['bezeichnung'])
-            modell = normalisiere_fibu_modell(parsed['modell'])  # Normalisieren für Locosoft-Match
-            kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
-            verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
+    # =====================================================================
+    # Modell extrahieren und gruppieren
+    # =====================================================================
+    modell_daten = {}  # Key: modell (oder modell+kundentyp etc.)
 
-            # Key basierend auf Gruppierung
-            if gruppierung == 'modell':
-                key = modell
-            elif gruppierung == 'modell_kundentyp':
-                key = f"{modell}|{kundentyp}"
-            elif gruppierung == 'modell_verkaufsart':
-                key = f"{modell}|{verkaufsart}"
-            else:  # detail
-                key = f"{modell}|{kundentyp}|{verkaufsart}"
-
-            if key not in modell_daten:
-                modell_daten[key] = {
-                    'modell': modell,
-                    'kundentyp': kundentyp if gruppierung != 'modell' else None,
-                    'verkaufsart': verkaufsart if gruppierung in ['modell_verkaufsart', 'detail'] else None,
-                    'umsatz': 0,
-                    'einsatz': 0,
-                    'buchungen_umsatz': 0,
-                    'buchungen_einsatz': 0,
-                    'konten_umsatz': [],
-                    'konten_einsatz': []
-                }
+    # Umsatz verarbeiten
+    for row in umsatz_konten:
+        parsed = parse_modell_aus_kontobezeichnung(row['bezeichnung'])
+        modell = normalisiere_fibu_modell(parsed['modell'])  # Normalisieren für Locosoft-Match
+        kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
+        verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
+
+        # Key basierend auf Gruppierung
+        if gruppierung == 'modell':
+            key = modell
+        elif gruppierung == 'modell_kundentyp':
+            key = f"{modell}|{kundentyp}"
+        elif gruppierung == 'modell_verkaufsart':
+            key = f"{modell}|{verkaufsart}"
+        else:  # detail
+            key = f"{modell}|{kundentyp}|{verkaufsart}"
+
+        if key not in modell_daten:
+            modell_daten[key] = {
+                'modell': modell,
+                'kundentyp': kundentyp if gruppierung != 'modell' else None,
+                'verkaufsart': verkaufsart if gruppierung in ['modell_verkaufsart', 'detail'] else None,
+                'umsatz': 0,
+                'einsatz': 0,
+                'buchungen_umsatz': 0,
+                'buchungen_einsatz': 0,
+                'konten_umsatz': [],
+                'konten_einsatz': []
+            }
 
-            modell_daten[key]['einsatz'] += row['betrag']
-            modell_daten[key]['buchungen_einsatz'] += row['buchungen']
-            modell_daten[key]['konten_einsatz'].append(row['konto'])
+        modell_daten[key]['umsatz'] += float(row['betrag'] or 0)  # TAG 220: Decimal → float (JSON/Cache)
+        modell_daten[key]['buchungen_umsatz'] += int(row['buchungen'] or 0)
+        modell_daten[key]['konten_umsatz'].append(row['konto'])
 
-        # =====================================================================
-        # DB1 und Marge berechnen, als Liste formatieren
-        # =====================================================================
-        modelle_liste = []
-        for key, daten in modell_daten.items():
-            db1 = daten['umsatz'] - daten['einsatz']
-            marge = (db1 / daten['umsatz'] * 100) if daten['umsatz'] > 0 else 0
-
-            # Kategorie ermitteln
-            kategorie, sort_order = kategorisiere_modell(daten['modell'])
-
-            eintrag = {
-                'modell': daten['modell'],
-                'kategorie': kategorie,
-                'kategorie_sort': sort_order,
-                'umsatz': round(daten['umsatz'], 2),
-                'einsatz': round(daten['einsatz'], 2),
-                'db1': round(db1, 2),
-                'marge': round(marge, 1),
-                'buchungen': daten['buchungen_umsatz'] + daten['buchungen_einsatz'],
-                'konten_anzahl': len(set(daten['konten_umsatz'] + daten['konten_einsatz']))
+    # Einsatz verarbeiten
+    for row in einsatz_konten:
+        parsed = parse_modell_aus_kontobezeichnung(row['bezeichnung'])
+        modell = normalisiere_fibu_modell(parsed['modell'])  # Normalisieren für Locosoft-Match
+        kundentyp = normalisiere_kundentyp(parsed['kundentyp'])
+        verkaufsart = normalisiere_verkaufsart(parsed['verkaufsart'])
+
+        # Key basierend auf Gruppierung
+        if gruppierung == 'modell':
+            key = modell
+        elif gruppierung == 'modell_kundentyp':
+            key = f"{modell}|{kundentyp}"
+        elif gruppierung == 'modell_verkaufsart':
+            key = f"{modell}|{verkaufsart}"
+        else:  # detail
+            key = f"{modell}|{kundentyp}|{verkaufsart}"
+
+        if key not in modell_daten:
+            modell_daten[key] = {
+                'modell': modell,
+                'kundentyp': kundentyp if gruppierung != 'modell' else None,
+                'verkaufsart': verkaufsart if gruppierung in ['modell_verkaufsart', 'detail'] else None,
+                'umsatz': 0,
+                'einsatz': 0,
+                'buchungen_umsatz': 0,
+                'buchungen_einsatz': 0,
+                'konten_umsatz': [],
+                'konten_einsatz': []
             }
 
-            if daten['kundentyp']:
-                eintrag['kundentyp'] = daten['kundentyp']
-            if daten['verkaufsart']:
-                eintrag['verkaufsart'] = daten['verkaufsart']
-
-            modelle_liste.append(eintrag)
+        modell_daten[key]['einsatz'] += float(row['betrag'] or 0)  # TAG 220: Decimal → float (JSON/Cache)
+        modell_daten[key]['buchungen_einsatz'] += int(row['buchungen'] or 0)
+        modell_daten[key]['konten_einsatz'].append(row['konto'])
+
+    # =====================================================================
+    # DB1 und Marge berechnen, als Liste formatieren
+    # =====================================================================
+    modelle_liste = []
+    for key, daten in modell_daten.items():
+        db1 = daten['umsatz'] - daten['einsatz']
+        marge = (db1 / daten['umsatz'] * 100) if daten['umsatz'] > 0 else 0
+
+        # Kategorie ermitteln
+        kategorie, sort_order = kategorisiere_modell(daten['modell'])
+
+        eintrag = {
+            'modell': daten['modell'],
+            'kategorie': kategorie,
+            'kategorie_sort': sort_order,
+            'umsatz': round(daten['umsatz'], 2),
+            'einsatz': round(daten['einsatz'], 2),
+            'db1': round(db1, 2),
+            'marge': round(marge, 1),
+            'buchungen': daten['buchungen_umsatz'] + daten['buchungen_einsatz'],
+            'konten_anzahl': len(set(daten['konten_umsatz'] + daten['konten_einsatz']))
+        }
 
-        # =====================================================================
-        # LOCOSOFT STÜCKZAHLEN holen und mit FiBu-Daten mergen
-        # =====================================================================
-        stueckzahlen = get_stueckzahlen_locosoft(von, bis, bereich, firma, standort)
-        gesamt_stueck = stueckzahlen.get('gesamt_stueck', 0)
-
-        # Stückzahlen zu den Modellen hinzufügen (Fuzzy-Match nach Modellname)
-        for eintrag in modelle_liste:
-            modell_name = eintrag['modell']
-            stueck_info = stueckzahlen['modelle'].get(modell_name)
-
-            if stueck_info:
-                eintrag['stueck'] = stueck_info['stueck']
-                eintrag['avg_vk'] = stueck_info['avg_vk']
-                # Durchschnitts-DB pro Fahrzeug berechnen
-                if stueck_info['stueck'] > 0:
-                    eintrag['avg_db1'] = round(eintrag['db1'] / stueck_info['stueck'], 2)
-                else:
-                    eintrag['avg_db1'] = 0
+        if daten['kundentyp']:
+            eintrag['kundentyp'] = daten['kundentyp']
+        if daten['verkaufsart']:
+            eintrag['verkaufsart'] = daten['verkaufsart']
+
+        modelle_liste.append(eintrag)
+
+    # =====================================================================
+    # LOCOSOFT STÜCKZAHLEN holen und mit FiBu-Daten mergen
+    # =====================================================================
+    stueckzahlen = get_stueckzahlen_locosoft(von, bis, bereich, firma, standort)
+    gesamt_stueck = stueckzahlen.get('gesamt_stueck', 0)
+
+    # Stückzahlen zu den Modellen hinzufügen (Fuzzy-Match nach Modellname)
+    for eintrag in modelle_liste:
+        modell_name = eintrag['modell']
+        stueck_info = stueckzahlen['modelle'].get(modell_name)
+
+        if stueck_info:
+            eintrag['stueck'] = stueck_info['stueck']
+            eintrag['avg_vk'] = stueck_info['avg_vk']
+            # Durchschnitts-DB pro Fahrzeug berechnen
+            if stueck_info['stueck'] > 0:
+                eintrag['avg_db1'] = round(eintrag['db1'] / stueck_info['stueck'], 2)
             else:
-                # Kein Match in Locosoft gefunden
-                eintrag['stueck'] = None
-                eintrag['avg_vk'] = None
-                eintrag['avg_db1'] = None
-
-        # =====================================================================
-        # VERGLEICHSDATEN: Vormonat und Vorjahr
-        # =====================================================================
-        # Vormonat-Daten holen
-        vm_daten = get_fibu_modell_daten(vm_von, vm_bis, bereich, firma, standort, subsidiary)
-        vm_stueck = get_stueckzahlen_locosoft(vm_von, vm_bis, bereich, firma, standort)
-
-        # Vorjahr-Daten holen
-        vj_daten = get_fibu_modell_daten(vj_von, vj_bis, bereich, firma, standort, subsidiary)
-        vj_stueck = get_stueckzahlen_locosoft(vj_von, vj_bis, bereich, firma, standort)
-
-        # Vergleichswerte zu jedem Modell hinzufügen
-        for eintrag in modelle_liste:
-            modell_name = eintrag['modell']
-
-            # Vormonat
-            vm = vm_daten.get(modell_name, {})
-            eintrag['vm_umsatz'] = round(vm.get('umsatz', 0), 2)
-            eintrag['vm_db1'] = round(vm.get('db1', 0), 2)
-            vm_s = vm_stueck.get('modelle', {}).get(modell_name, {})
-            eintrag['vm_stueck'] = vm_s.get('stueck') if vm_s else None
-
-            # Vorjahr
-            vj = vj_daten.get(modell_name, {})
-            eintrag['vj_umsatz'] = round(vj.get('umsatz', 0), 2)
-            eintrag['vj_db1'] = round(vj.get('db1', 0), 2)
-            vj_s = vj_stueck.get('modelle', {}).get(modell_name, {})
-            eintrag['vj_stueck'] = vj_s.get('stueck') if vj_s else None
-
-        # Nach Kategorie sortieren, dann nach Umsatz innerhalb der Kategorie
-        modelle_liste.sort(key=lambda x: (x['kategorie_sort'], -x['umsatz']))
-
-        # Gesamt aktueller Monat
-        gesamt_umsatz = sum(m['umsatz'] for m in modelle_liste)
-        gesamt_einsatz = sum(m['einsatz'] for m in modelle_liste)
-        gesamt_db1 = gesamt_umsatz - gesamt_einsatz
-        gesamt_marge = (gesamt_db1 / gesamt_umsatz * 100) if gesamt_umsatz > 0 else 0
-
-        # Gesamt Vormonat
-        gesamt_vm_umsatz = sum(m['vm_umsatz'] for m in modelle_liste)
-        gesamt_vm_db1 = sum(m['vm_db1'] for m in modelle_liste)
-        gesamt_vm_stueck = vm_stueck.get('gesamt_stueck', 0)
-
-        # Gesamt Vorjahr
-        gesamt_vj_umsatz = sum(m['vj_umsatz'] for m in modelle_liste)
-        gesamt_vj_db1 = sum(m['vj_db1'] for m in modelle_liste)
-        gesamt_vj_stueck = vj_stueck.get('gesamt_stueck', 0)
-
-        monat_namen = ['', 'Januar', 'Februar', 'März', 'April', 'Mai', 'Juni',
-                       'Juli', 'August', 'September', 'Oktober', 'November', 'Dezember']
+                eintrag['avg_db1'] = 0
+        else:
+            # Kein Match in Locosoft gefunden
+            eintrag['stueck'] = None
+            eintrag['avg_vk'] = None
+            eintrag['avg_db1'] = None
+
+    # =====================================================================
+    # VERGLEICHSDATEN: Vormonat und Vorjahr
+    # =====================================================================
+    # Vormonat-Daten holen
+    vm_daten = get_fibu_modell_daten(vm_von, vm_bis, bereich, firma, standort, subsidiary)
+    vm_stueck = get_stueckzahlen_locosoft(vm_von, vm_bis, bereich, firma, standort)
+
+    # Vorjahr-Daten holen
+    vj_daten = get_fibu_modell_daten(vj_von, vj_bis, bereich, firma, standort, subsidiary)
+    vj_stueck = get_stueckzahlen_locosoft(vj_von, vj_bis, bereich, firma, standort)
+
+    # Vergleichswerte zu jedem Modell hinzufügen
+    for eintrag in modelle_liste:
+        modell_name = eintrag['modell']
+
+        # Vormonat
+        vm = vm_daten.get(modell_name, {})
+        eintrag['vm_umsatz'] = round(vm.get('umsatz', 0), 2)
+        eintrag['vm_db1'] = round(vm.get('db1', 0), 2)
+        vm_s = vm_stueck.get('modelle', {}).get(modell_name, {})
+        eintrag['vm_stueck'] = vm_s.get('stueck') if vm_s else None
+
+        # Vorjahr
+        vj = vj_daten.get(modell_name, {})
+        eintrag['vj_umsatz'] = round(vj.get('umsatz', 0), 2)
+        eintrag['vj_db1'] = round(vj.get('db1', 0), 2)
+        vj_s = vj_stueck.get('modelle', {}).get(modell_name, {})
+        eintrag['vj_stueck'] = vj_s.get('stueck') if vj_s else None
+
+    # Nach Kategorie sortieren, dann nach Umsatz innerhalb der Kategorie
+    modelle_liste.sort(key=lambda x: (x['kategorie_sort'], -x['umsatz']))
+
+    # Gesamt aktueller Monat
+    gesamt_umsatz = sum(m['umsatz'] for m in modelle_liste)
+    gesamt_einsatz = sum(m['einsatz'] for m in modelle_liste)
+    gesamt_db1 = gesamt_umsatz - gesamt_einsatz
+    gesamt_marge = (gesamt_db1 / gesamt_umsatz * 100) if gesamt_umsatz > 0 else 0
+
+    # Gesamt Vormonat
+    gesamt_vm_umsatz = sum(m['vm_umsatz'] for m in modelle_liste)
+    gesamt_vm_db1 = sum(m['vm_db1'] for m in modelle_liste)
+    gesamt_vm_stueck = vm_stueck.get('gesamt_stueck', 0)
+
+    # Gesamt Vorjahr
+    gesamt_vj_umsatz = sum(m['vj_umsatz'] for m in modelle_liste)
+    gesamt_vj_db1 = sum(m['vj_db1'] for m in modelle_liste)
+    gesamt_vj_stueck = vj_stueck.get('gesamt_stueck', 0)
+
+    monat_namen = ['', 'Januar', 'Februar', 'März', 'April', 'Mai', 'Juni',
+                   'Juli', 'August', 'September', 'Oktober', 'November', 'Dezember']
 
-        return jsonify({
-            'success': True,
-            'bereich': bereich,
-            'bereich_name': 'Neuwagen' if bereich == '1-NW' else 'Gebrauchtwagen',
-            'gruppierung': gruppierung,
-            'filter': {
-                'firma': firma,
-                'standort': standort,
+    return {
+        'success': True,
+        'bereich': bereich,
+        'bereich_name': 'Neuwagen' if bereich == '1-NW' else 'Gebrauchtwagen',
+        'gruppierung': gruppierung,
+        'filter': {
+            'firma': firma,
+            'standort': standort,
+            'monat': monat,
+            'monat_name': monat_namen[monat],
+            'jahr': jahr,
+            'von': von,
+            'bis': bis
+        },
+        'vergleich': {
+            'vormonat': {
+                'monat': vm_monat,
+                'monat_name': monat_namen[vm_monat],
+                'jahr': vm_jahr,
+                'von': vm_von,
+                'bis': vm_bis
+            },
+            'vorjahr': {
                 'monat': monat,
                 'monat_name': monat_namen[monat],
-                'jahr': jahr,
-                'von': von,
-                'bis': bis
-            },
-            'vergleich': {
-                'vormonat': {
-                    'monat': vm_monat,
-                    'monat_name': monat_namen[vm_monat],
-                    'jahr': vm_jahr,
-                    'von': vm_von,
-                    'bis': vm_bis
-                },
-                'vorjahr': {
-                    'monat': monat,
-                    'monat_name': monat_namen[monat],
-                    'jahr': jahr - 1,
-                    'von': vj_von,
-                    'bis': vj_bis
-                }
-            },
-            'modelle': modelle_liste,
-            'anzahl_modelle': len(modelle_liste),
-            'gesamt': {
-                'umsatz': round(gesamt_umsatz, 2),
-                'einsatz': round(gesamt_einsatz, 2),
-                'db1': round(gesamt_db1, 2),
-                'marge': round(gesamt_marge, 1),
-                'stueck': gesamt_stueck,
-                'vm_umsatz': round(gesamt_vm_umsatz, 2),
-                'vm_db1': round(gesamt_vm_db1, 2),
-                'vm_stueck': gesamt_vm_stueck,
-                'vj_umsatz': round(gesamt_vj_umsatz, 2),
-                'vj_db1': round(gesamt_vj_db1, 2),
-                'vj_stueck': gesamt_vj_stueck
-            },
-            'timestamp': datetime.now().isoformat()
-        }), 200
-
-    except Exception as e:
-        import traceback
-        return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
+                'jahr': jahr - 1,
+                'von': vj_von,
+                'bis': vj_bis
+            }
+        },
+        'modelle': modelle_liste,
+        'anzahl_modelle': len(modelle_liste),
+        'gesamt': {
+            'umsatz': round(gesamt_umsatz, 2),
+            'einsatz': round(gesamt_einsatz, 2),
+            'db1': round(gesamt_db1, 2),
+            'marge': round(gesamt_marge, 1),
+            'stueck': gesamt_stueck,
+            'vm_umsatz': round(gesamt_vm_umsatz, 2),
+            'vm_db1': round(gesamt_vm_db1, 2),
+            'vm_stueck': gesamt_vm_stueck,
+            'vj_umsatz': round(gesamt_vj_umsatz, 2),
+            'vj_db1': round(gesamt_vj_db1, 2),
+            'vj_stueck': gesamt_vj_stueck
+        },
+        'timestamp': datetime.now().isoformat()
+    }
 
 
 # =============================================================================
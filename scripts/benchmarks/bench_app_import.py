@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Import-Zeit und Speicher der Flask-App (app.py)
+==========================================================
+TAG 220 - Misst, was ein Gunicorn-Worker beim Start lädt:
+
+  1. pakete   – python -X importtime "import app": Importzeit (Eigenzeit) je Top-Level-Paket
+                (flask, psycopg2, pandas, reportlab, api, routes, ...)
+  2. module   – die Blueprint-Module aus app.py in App-Reihenfolge in einem Prozess importiert:
+                Zeit und RSS-Zuwachs je Modul, nachgeladene schwere Bibliotheken
+  3. gunicorn – (optional, --gunicorn) Worker-Speicher mit und ohne preload_app:
+                RSS, PSS und privater Speicher (USS) je Worker aus /proc/<pid>/smaps_rollup
+
+Module, die sich hier nicht importieren lassen (fehlende Config/Abhängigkeit), werden mit
+Fehler aufgeführt; ihre Kosten fehlen dann in der Summe.
+
+Verwendung:
+    python3 scripts/benchmarks/bench_app_import.py [--top 25]
+    python3 scripts/benchmarks/bench_app_import.py --gunicorn 4
+"""
+
+import argparse
+import ast
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Bibliotheken, die nur einzelne Blueprints brauchen und nicht im Worker-Start landen sollen
+SCHWERE_PAKETE = (
+    'pandas', 'numpy', 'sklearn', 'xgboost', 'joblib', 'scipy',       # ML
+    'reportlab', 'fitz', 'pdfplumber', 'pypdf', 'PyPDF2',             # PDF
+    'pytesseract', 'PIL', 'cv2',                                      # OCR/Bild
+    'bs4', 'selenium', 'playwright',                                  # Scraping
+    'openpyxl', 'matplotlib',
+)
+
+
+def app_module():
+    """Repo-Module, die app.py auf Modulebene (auch in try/if) importiert, in Reihenfolge."""
+    tree = ast.parse(open(os.path.join(ROOT, 'app.py'), encoding='utf-8').read())
+    module = []
+
+    def walk(body):
+        for node in body:
+            if isinstance(node, ast.Import):
+                module.extend(a.name for a in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                module.append(node.module)
+            elif isinstance(node, ast.Try):
+                walk(node.body)
+            elif isinstance(node, ast.If):
+                walk(node.body)
+                walk(node.orelse)
+
+    walk(tree.body)
+    lokal = []
+    for name in dict.fromkeys(module):
+        pfad = os.path.join(ROOT, *name.split('.'))
+        if os.path.exists(pfad + '.py') or os.path.exists(os.path.join(pfad, '__init__.py')):
+            lokal.append(name)
+    return lokal
+
+
+def python_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+# =============================================================================
+# 1. PAKETE (-X importtime)
+# =============================================================================
+
+def pakete_importtime(top: int):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, env=python_env(), capture_output=True, text=True
+    )
+    kosten = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package" - Eigenzeit je Modul,
+        # summiert je Top-Level-Paket (app.py selbst importiert alles, kumuliert wäre immer 100 %)
+        self_us, _, name = line[len('import time:'):].split('|')
+        paket = name.strip().split('.')[0]
+        kosten[paket] = kosten.get(paket, 0) + int(self_us)
+
+    gesamt = sum(kosten.values())
+    print(f"\n1. Importzeit je Paket (python -X importtime, Eigenzeit, gesamt {gesamt / 1e6:.2f}s)")
+    print(f"   {'Paket':28s} {'Zeit':>9s} {'Anteil':>7s}")
+    for paket, us in sorted(kosten.items(), key=lambda kv: -kv[1])[:top]:
+        markierung = '  ← schwer' if paket in SCHWERE_PAKETE else ''
+        print(f"   {paket:28s} {us / 1e3:7.0f}ms {us / gesamt * 100 if gesamt else 0:6.1f}%{markierung}")
+    if proc.returncode != 0:
+        fehler = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unbekannt'
+        print(f"   ⚠️  'import app' abgebrochen: {fehler}")
+
+
+# =============================================================================
+# 2. MODULE (Blueprint-Reihenfolge, ein Prozess)
+# =============================================================================
+
+_MODUL_PROBE = r'''
+import importlib, json, sys, time
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+schwer = set(json.loads(sys.argv[2]))
+basis = ('flask', 'flask_login', 'werkzeug', 'jinja2')
+for name in basis:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+
+for name in json.loads(sys.argv[1]):
+    vorher_mods = set(sys.modules)
+    rss = rss_kb()
+    start = time.perf_counter()
+    fehler = None
+    try:
+        importlib.import_module(name)
+    except BaseException as e:
+        fehler = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"[:70]
+    neu = set(sys.modules) - vorher_mods
+    print(json.dumps({
+        'modul': name,
+        'sekunden': time.perf_counter() - start,
+        'rss_kb': rss_kb() - rss,
+        'module_neu': len(neu),
+        'schwer': sorted({m.split('.')[0] for m in neu} & schwer),
+        'fehler': fehler,
+    }), flush=True)
+print(json.dumps({'gesamt_rss_kb': rss_kb()}))
+'''
+
+
+def module_kosten(top: int):
+    module = app_module()
+    proc = subprocess.run(
+        [sys.executable, '-c', _MODUL_PROBE, json.dumps(module), json.dumps(SCHWERE_PAKETE)],
+        cwd=ROOT, env=python_env(), capture_output=True, text=True
+    )
+    zeilen = [json.loads(zeile) for zeile in proc.stdout.splitlines() if zeile.startswith('{')]
+    ergebnisse = [z for z in zeilen if 'modul' in z]
+    gesamt_rss = next((z['gesamt_rss_kb'] for z in zeilen if 'gesamt_rss_kb' in z), 0)
+
+    print(f"\n2. Blueprint-Module aus app.py ({len(module)} Module, Import in App-Reihenfolge, "
+          f"RSS danach {gesamt_rss / 1024:.0f} MB)")
+    print(f"   {'Modul':42s} {'Zeit':>8s} {'RSS+':>8s} {'Module':>6s}  schwere Pakete / Fehler")
+    for r in sorted(ergebnisse, key=lambda r: -r['sekunden'])[:top]:
+        info = ', '.join(r['schwer']) or ''
+        if r['fehler']:
+            info = (info + '  ' if info else '') + f"⚠️  {r['fehler']}"
+        print(f"   {r['modul']:42s} {r['sekunden'] * 1e3:6.0f}ms {r['rss_kb'] / 1024:6.1f}MB "
+              f"{r['module_neu']:6d}  {info}")
+
+    schwer = sorted({p for r in ergebnisse for p in r['schwer']})
+    print(f"   Summe: {sum(r['sekunden'] for r in ergebnisse):.2f}s, "
+          f"{sum(r['rss_kb'] for r in ergebnisse) / 1024:.0f} MB; "
+          f"{sum(1 for r in ergebnisse if r['fehler'])} Module mit Fehler")
+    print(f"   Schwere Pakete beim App-Import: {', '.join(schwer) if schwer else 'keine ✅'}")
+
+
+# =============================================================================
+# 3. GUNICORN (preload an/aus)
+# =============================================================================
+
+def _freier_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _kinder(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _smaps(pid: int):
+    werte = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            teile = line.split()
+            if len(teile) >= 3 and teile[2] == 'kB':
+                werte[teile[0].rstrip(':')] = int(teile[1])
+    return {
+        'rss': werte.get('Rss', 0),
+        'pss': werte.get('Pss', 0),
+        'uss': werte.get('Private_Clean', 0) + werte.get('Private_Dirty', 0),
+    }
+
+
+def gunicorn_lauf(workers: int, preload: bool, timeout: float = 120):
+    port = _freier_port()
+    env = python_env()
+    env['DRIVE_PRELOAD_APP'] = '1' if preload else '0'
+    cmd = [sys.executable, '-m', 'gunicorn', '--config', 'config/gunicorn.conf.py',
+           '--bind', f"127.0.0.1:{port}", '--workers', str(workers),
+           '--pid', os.devnull, '--access-logfile', os.devnull, '--error-logfile', '-', 'app:app']
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        bereit = None
+        while time.perf_counter() - start < timeout and proc.poll() is None:
+            if len(_kinder(proc.pid)) == workers:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2)
+                    bereit = time.perf_counter() - start
+                    break
+                except OSError:
+                    pass
+            time.sleep(0.2)
+        if bereit is None:
+            fehler = proc.stderr.read() if proc.poll() is not None else 'Timeout'
+            return {'fehler': fehler.strip().splitlines()[-1] if fehler.strip() else 'unbekannt'}
+
+        # Jeden Worker einmal anfragen lassen, damit auch Lazy-Initialisierungen gezählt werden
+        for _ in range(workers * 2):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5).read()
+        speicher = [_smaps(pid) for pid in _kinder(proc.pid)]
+        return {
+            'bereit_s': bereit,
+            'master': _smaps(proc.pid),
+            'rss': sum(s['rss'] for s in speicher),
+            'pss': sum(s['pss'] for s in speicher),
+            'uss': sum(s['uss'] for s in speicher),
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def gunicorn_vergleich(workers: int):
+    print(f"\n3. Gunicorn mit {workers} Workern (Summe über alle Worker)")
+    print(f"   {'Modus':12s} {'bereit':>8s} {'RSS':>9s} {'PSS':>9s} {'privat':>9s}")
+    for preload in (False, True):
+        modus = 'preload' if preload else 'ohne'
+        r = gunicorn_lauf(workers, preload)
+        if 'fehler' in r:
+            print(f"   {modus:12s} ⚠️  {r['fehler']}")
+            continue
+        print(f"   {modus:12s} {r['bereit_s']:7.1f}s {r['rss'] / 1024:7.0f}MB {r['pss'] / 1024:7.0f}MB "
+              f"{r['uss'] / 1024:7.0f}MB")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=25, help='Anzahl Zeilen je Tabelle')
+    parser.add_argument('--gunicorn', type=int, metavar='WORKER', default=0,
+                        help='zusätzlich Gunicorn mit/ohne preload_app starten und Worker-Speicher messen')
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, Repo {ROOT}")
+    pakete_importtime(args.top)
+    module_kosten(args.top)
+    if args.gunicorn:
+        gunicorn_vergleich(args.gunicorn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Micro-Benchmark: HybridRow / HybridCursor
+==========================================
+TAG 220 - Vergleicht Row-Erzeugung und Spalten-Lookup (row['name']) für:
+
+  1. legacy      – alte HybridRow (keys.index() pro Lookup, keys-Tuple pro Row)
+  2. hybrid      – aktuelle HybridRow (gemeinsames RowSchema, Dict-Lookup)
+  3. realdict    – psycopg2 RealDictRow (wie RealDictCursor), Fallback: dict
+
+Läuft ohne Datenbank (simuliertes Result-Set in Form von cursor.description + Tuples).
+
+Verwendung:
+    python3 scripts/benchmarks/bench_hybrid_row.py [--rows 5000] [--cols 30] [--lookups 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.db_connection import HybridRow, schema_from_description
+
+try:
+    from psycopg2.extras import RealDictRow
+except ImportError:
+    RealDictRow = None
+
+
+class LegacyHybridRow:
+    """Stand vor TAG 220 (lineare Suche in keys)"""
+    __slots__ = ('_values', '_keys')
+
+    def __init__(self, values, keys):
+        object.__setattr__(self, '_values', tuple(values))
+        object.__setattr__(self, '_keys', tuple(keys))
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        elif isinstance(key, str):
+            try:
+                idx = self._keys.index(key)
+                return self._values[idx]
+            except ValueError:
+                raise KeyError(key)
+        raise TypeError(f"Invalid key type: {type(key)}")
+
+
+def build_legacy(description, rows):
+    keys = [desc[0] for desc in description]
+    return [LegacyHybridRow(row, keys) for row in rows]
+
+
+def build_hybrid(description, rows):
+    schema = schema_from_description(description)
+    return [HybridRow(row, schema) for row in rows]
+
+
+def build_realdict(description, rows):
+    keys = [desc[0] for desc in description]
+    if RealDictRow is None:
+        return [dict(zip(keys, row)) for row in rows]
+    # RealDictCursor: pro Row eine RealDictRow, Werte per Spaltenname gesetzt
+    result = []
+    for row in rows:
+        r = dict.__new__(RealDictRow)
+        dict.__init__(r)
+        for key, value in zip(keys, row):
+            r[key] = value
+        result.append(r)
+    return result
+
+
+def run(name, builder, description, rows, lookup_keys, repeat):
+    best_build = best_lookup = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        built = builder(description, rows)
+        t1 = time.perf_counter()
+        total = 0
+        for row in built:
+            for key in lookup_keys:
+                if row[key] is not None:
+                    total += 1
+        t2 = time.perf_counter()
+        best_build = min(best_build, t1 - t0)
+        best_lookup = min(best_lookup, t2 - t1)
+    print(f"  {name:<10} build {best_build * 1000:8.2f} ms   lookups {best_lookup * 1000:8.2f} ms   "
+          f"gesamt {(best_build + best_lookup) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--cols', type=int, default=30)
+    parser.add_argument('--lookups', type=int, default=10, help='String-Lookups pro Row')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    description = [(f'spalte_{i:02d}', None, None, None, None, None, None) for i in range(args.cols)]
+    rows = [tuple(f'{r}-{c}' for c in range(args.cols)) for r in range(args.rows)]
+    # Lookups gleichmäßig über alle Spalten verteilt (hintere Spalten = teuer für keys.index)
+    step = max(1, args.cols // max(1, args.lookups))
+    lookup_keys = [description[i][0] for i in range(0, args.cols, step)][:args.lookups]
+
+    print(f"HybridRow-Benchmark: {args.rows} Rows × {args.cols} Spalten, {len(lookup_keys)} Lookups/Row "
+          f"(best of {args.repeat})")
+    if RealDictRow is None:
+        print("  (psycopg2 nicht installiert – realdict nutzt dict als Näherung)")
+    run('legacy', build_legacy, description, rows, lookup_keys, args.repeat)
+    run('hybrid', build_hybrid, description, rows, lookup_keys, args.repeat)
+    run('realdict', build_realdict, description, rows, lookup_keys, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
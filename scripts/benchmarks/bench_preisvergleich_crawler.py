@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Marktpreis-Update für Penner-Teile (update_all_penner)
+=================================================================
+TAG 220 - Vergleicht den Batch-Abruf der Marktpreise (eBay + Daparto):
+
+  1. legacy   – Stand vor TAG 220: Teil für Teil, get_marktpreis() mit _rate_limit-Sleeps,
+                danach _save_to_cache + _update_locosoft_data einzeln
+  2. crawler  – api.preisvergleich_crawler: Quellen parallel, Token-Bucket je Quelle,
+                Batch-Upsert
+  3. crawler (2. Lauf) – bedingte Requests, Quellen antworten 304 Not Modified
+  4. budget   – Crawler über die 4-fache Teileliste mit der Laufzeit von legacy als Zeitbudget
+
+Läuft ohne Netz und Datenbank: eine simulierte Session beantwortet die Requests nach
+einer festen Latenz, die DB-Zugriffe warten die Roundtrip-Zeit ab. Rate-Limits und
+Latenzen werden mit --zeitfaktor skaliert (Standard 0.05 → eBay 2.0s → 0.1s).
+legacy und crawler müssen identische Empfehlungen liefern (wird geprüft).
+
+Verwendung:
+    python3 scripts/benchmarks/bench_preisvergleich_crawler.py [--teile 40] [--latenz-ms 1500] [--zeitfaktor 0.05]
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import api.preisvergleich_service as pvs
+from api.preisvergleich_crawler import MarktpreisCrawler, QUELLEN
+
+
+# =============================================================================
+# SIMULIERTE QUELLEN
+# =============================================================================
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise pvs.requests.HTTPError(f"{self.status_code}")
+
+
+class FakeSession:
+    """Antwortet nach fester Latenz mit deterministischem HTML je URL (inkl. ETag)."""
+
+    headers = {}
+
+    def __init__(self, latenz: float, counter: dict, lock: threading.Lock):
+        self.latenz = latenz
+        self.counter = counter
+        self.lock = lock
+
+    def get(self, url, headers=None, timeout=None):
+        time.sleep(self.latenz)
+        digest = hashlib.md5(url.encode()).hexdigest()
+        etag = f'"{digest[:12]}"'
+        with self.lock:
+            self.counter['requests'] += 1
+        if headers and headers.get('If-None-Match') == etag:
+            return FakeResponse(304)
+        seed = int(digest[:8], 16)
+        anzahl = seed % 7
+        preise = [5 + (seed >> i) % 200 + ((seed >> (i + 3)) % 100) / 100 for i in range(anzahl)]
+        if 'ebay' in url:
+            html = ''.join(
+                f'<div class="s-item"><span class="s-item__price">EUR {p:.2f}'.replace('.', ',') +
+                f'</span><span class="s-item__title">Teil {i}</span>'
+                f'<a class="s-item__link" href="https://ebay/{i}"></a></div>'
+                for i, p in enumerate(preise))
+        else:
+            html = ''.join(f'<div data-price="{p:.2f}"></div>' for p in preise)
+        return FakeResponse(200, html, {'ETag': etag})
+
+
+class FakeService(pvs.PreisvergleichService):
+    """Service mit In-Memory-Cache; jeder DB-Zugriff kostet einen Roundtrip."""
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, rtt: float, session):
+        self._initialized = False
+        super().__init__()
+        self._session = session
+        self.rtt = rtt
+        self.db = {}
+        self.db_roundtrips = 0
+
+    def _db(self):
+        self.db_roundtrips += 1
+        time.sleep(self.rtt)
+
+    def _save_to_cache(self, teilenummer, data):
+        self._db()
+        self.db[teilenummer] = data
+
+    def _update_locosoft_data(self, teilenummer, data):
+        self._db()
+
+    def _load_cache_batch(self, teilenummern):
+        self._db()
+        return {
+            tnr: {'abgefragt_am': None, 'quellen': {q['source']: q for q in data['quellen']}}
+            for tnr, data in self.db.items() if tnr in set(teilenummern)
+        }
+
+    def _save_batch_to_cache(self, eintraege):
+        if eintraege:
+            self._db()
+        for _, data in eintraege:
+            self.db[data['teilenummer']] = data
+
+
+# =============================================================================
+# LEGACY (Stand vor TAG 220)
+# =============================================================================
+
+def legacy_update_all(service, teile):
+    for teil in teile:
+        service.get_marktpreis(
+            teil['part_number'],
+            use_cache=False,
+            ek_preis=float(teil.get('ek_preis') or 0),
+            tage_seit_abgang=int(teil.get('tage_seit_abgang') or 0)
+        )
+        service._update_locosoft_data(teil['part_number'], teil)
+
+
+def teile_liste(n, offset=0):
+    return [{
+        'part_number': f"1K0 615 {301 + offset + i:03d}",
+        'description': f"Teil {offset + i}",
+        'ek_preis': 20 + (i * 7) % 80,
+        'vk_preis': 40 + (i * 7) % 120,
+        'bestand': 1 + i % 4,
+        'lagerwert': 1000 - i,
+        'tage_seit_abgang': 400 + i * 3,
+    } for i in range(n)]
+
+
+def empfehlungen(service):
+    return {tnr: (d['zusammenfassung'], d['empfehlung']) for tnr, d in service.db.items()}
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teile', type=int, default=40)
+    parser.add_argument('--latenz-ms', type=float, default=1500,
+                        help='HTTP-Latenz + Parsen je Request (vor Skalierung)')
+    parser.add_argument('--rtt-ms', type=float, default=20, help='DB-Roundtrip (vor Skalierung)')
+    parser.add_argument('--zeitfaktor', type=float, default=0.05)
+    args = parser.parse_args()
+
+    f = args.zeitfaktor
+    latenz = args.latenz_ms / 1000.0 * f
+    rtt = args.rtt_ms / 1000.0 * f
+    pvs.RATE_LIMIT_EBAY *= f
+    pvs.RATE_LIMIT_DAPARTO *= f
+    quellen = [q._replace(intervall=q.intervall * f) for q in QUELLEN]
+    teile = teile_liste(args.teile)
+
+    def neue_session(counter):
+        return FakeSession(latenz, counter, lock)
+
+    lock = threading.Lock()
+
+    # 1. legacy
+    counter = {'requests': 0}
+    legacy = FakeService(rtt, neue_session(counter))
+    t0 = time.perf_counter()
+    legacy_update_all(legacy, teile)
+    t_legacy = time.perf_counter() - t0
+    print(f"legacy      {t_legacy / f:7.1f}s real   {counter['requests']:4d} Requests  "
+          f"{legacy.db_roundtrips:4d} DB-Roundtrips")
+
+    # 2./3. crawler, zweimal (zweiter Lauf mit ETag)
+    counter = {'requests': 0}
+    service = FakeService(rtt, None)
+    for lauf in ('crawler', 'crawler 304'):
+        service.db_roundtrips = 0
+        crawler = MarktpreisCrawler(service, quellen=quellen, session_factory=lambda: neue_session(counter))
+        stats = crawler.run(teile)
+        print(f"{lauf:11s} {stats['dauer_sekunden'] / f:7.1f}s real   "
+              f"{stats['nicht_geaendert']:4d}× 304      {service.db_roundtrips:4d} DB-Roundtrips")
+
+    if empfehlungen(legacy) != empfehlungen(service):
+        print("❌ Empfehlungen unterschiedlich!")
+        sys.exit(1)
+
+    # 4. gleiche Laufzeit wie legacy, vierfache Liste
+    budget_service = FakeService(rtt, None)
+    crawler = MarktpreisCrawler(budget_service, budget_sekunden=t_legacy, quellen=quellen,
+                                session_factory=lambda: neue_session({'requests': 0}))
+    stats = crawler.run(teile_liste(args.teile * 4))
+    print(f"budget      {stats['dauer_sekunden'] / f:7.1f}s real   "
+          f"{stats['gesamt'] - stats['offen']:4d} von {stats['gesamt']} Teilen im legacy-Zeitbudget "
+          f"(legacy: {args.teile})")
+    print(f"✅ Empfehlungen identisch ({len(teile)} Teile)")
+
+
+if __name__ == '__main__':
+    main()
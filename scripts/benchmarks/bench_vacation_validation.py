@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Urlaubs-Validierung für Mehrwochen-Buchungen (book-batch)
+=====================================================================
+TAG 220 - Vergleicht die Validierung einer Batch-Buchung (Arbeitstage zählen,
+max. Abwesenheit Abteilung/Standort, contingent_days je Tag):
+
+  1. legacy  – Stand vor TAG 220: eine Query pro Datum (Arbeitszeitmodell, Abwesende)
+  2. set     – api.vacation_validation: eine Query pro Datumsbereich
+
+Läuft ohne Datenbank: ein simulierter Cursor beantwortet die Queries aus
+In-Memory-Daten und wartet pro execute() die angegebene Roundtrip-Zeit ab.
+Beide Varianten müssen identische Ergebnisse liefern (wird geprüft).
+
+Verwendung:
+    python3 scripts/benchmarks/bench_vacation_validation.py [--weeks 3] [--rtt-ms 0.5] [--runs 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api import vacation_validation
+from api.vacation_validation import (
+    check_max_absence,
+    contingent_days,
+    count_working_days,
+    load_work_weekday_intervals,
+)
+
+# =============================================================================
+# SIMULIERTE DATENBANK
+# =============================================================================
+
+class FakeCursor:
+    """Beantwortet die Validierungs-Queries aus In-Memory-Daten, zählt Roundtrips."""
+
+    def __init__(self, models, absences, rtt: float):
+        self.models = models            # [(start, end, '0,1,2,3')]
+        self.absences = absences        # date → Anzahl Abwesende in der Abteilung
+        self.rtt = rtt
+        self.queries = 0
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.queries += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+        q = ' '.join(query.split())
+        if 'FROM employee_working_time_models' in q:
+            _, bis, von = params
+            bis, von = _d(bis), _d(von)
+            rows = [m for m in self.models if m[0] <= bis and (m[1] is None or m[1] >= von)]
+            rows.sort(key=lambda m: m[0], reverse=True)
+            self._result = [(m[2],) for m in rows[:1]] if 'LIMIT 1' in q else rows
+        elif 'FROM employees WHERE id' in q:
+            self._result = [('Service', 'Deggendorf')]
+        elif 'department_absence_limits' in q:
+            self._result = [(50,)]
+        elif q.startswith('SELECT COUNT(*) FROM employees'):
+            self._result = [(12,)]
+        elif 'GROUP BY vb.booking_date' in q:
+            tage = {_d(t) for t in params[2]}
+            self._result = [(d, n) for d, n in self.absences.items() if d in tage and n]
+        elif 'COUNT(DISTINCT vb.employee_id)' in q:
+            self._result = [(self.absences.get(_d(params[2]), 0),)]
+        else:
+            raise ValueError(f"Unerwartete Query: {q[:80]}")
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+
+def _d(value):
+    return value if isinstance(value, date) else datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+# =============================================================================
+# LEGACY (Stand vor TAG 220, nur die Query-Muster)
+# =============================================================================
+
+def legacy_work_weekdays(cursor, employee_id, d):
+    cursor.execute("""
+        SELECT work_weekdays FROM employee_working_time_models
+        WHERE employee_id = %s AND start_date <= %s AND (end_date IS NULL OR end_date >= %s)
+        ORDER BY start_date DESC LIMIT 1
+    """, (employee_id, d, d))
+    row = cursor.fetchone()
+    if not row or not row[0]:
+        return {0, 1, 2, 3, 4}
+    return {int(x) for x in str(row[0]).split(',') if x.strip().isdigit()}
+
+
+def legacy_validate(cursor, employee_id, dates, day_part):
+    requested = 0.0
+    for d in dates:
+        wd = _d(d).weekday()
+        if wd < 5 and wd in legacy_work_weekdays(cursor, employee_id, _d(d)):
+            requested += 1.0 if day_part == 'full' else 0.5
+
+    cursor.execute("SELECT department_name, location FROM employees WHERE id = %s", (employee_id,))
+    cursor.fetchone()
+    cursor.execute("SELECT max_absence_percent FROM department_absence_limits", ())
+    max_percent = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM employees e", ())
+    total = cursor.fetchone()[0]
+    blocked = []
+    for d in dates:
+        cursor.execute("SELECT COUNT(DISTINCT vb.employee_id) FROM vacation_bookings vb", (None, None, d))
+        absent = cursor.fetchone()[0]
+        if (absent + 1) / total > max_percent / 100.0:
+            blocked.append(d)
+
+    cont = []
+    for d in dates:
+        wd = _d(d).weekday()
+        if wd >= 5 or wd not in legacy_work_weekdays(cursor, employee_id, _d(d)):
+            cont.append(0)
+        else:
+            cont.append(1.0 if day_part == 'full' else 0.5)
+    return requested, sorted(blocked), cont
+
+
+def set_validate(cursor, employee_id, dates, day_part):
+    intervals = load_work_weekday_intervals(cursor, employee_id, dates)
+    requested = count_working_days(intervals, dates, day_part)
+    cap = check_max_absence(cursor, employee_id, dates, 1)
+    blocked = cap[0] if cap else []
+    cont = [contingent_days(intervals, d, day_part) for d in dates]
+    return requested, blocked, cont
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weeks', type=int, default=3, help='Länge der Batch-Buchung in Wochen')
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='Simulierte DB-Roundtrip-Zeit in ms')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    # Legacy prüft die Abwesenheitsgrenze immer → für den Vergleich auch im Set-Pfad aktivieren
+    vacation_validation.ABSENCE_CAP_ENABLED = True
+
+    random.seed(220)
+    start = date(2026, 7, 6)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(args.weeks * 7)]
+    # Modellwechsel mitten im Zeitraum (Teilzeit ab Woche 2)
+    models = [
+        (date(2020, 1, 1), start + timedelta(days=6), '0,1,2,3,4'),
+        (start + timedelta(days=7), None, '0,1,2,3'),
+    ]
+    absences = {_d(d): random.randint(0, 6) for d in dates}
+
+    results = {}
+    for name, fn in (('legacy', legacy_validate), ('set', set_validate)):
+        cursor = FakeCursor(models, absences, args.rtt_ms / 1000.0)
+        t0 = time.perf_counter()
+        for _ in range(args.runs):
+            out = fn(cursor, 42, dates, 'full')
+        elapsed = (time.perf_counter() - t0) / args.runs
+        results[name] = out
+        print(f"{name:8s} {elapsed * 1000:8.2f} ms/Validierung   {cursor.queries / args.runs:6.0f} Queries")
+
+    if results['legacy'] != results['set']:
+        print("❌ Ergebnisse unterschiedlich!")
+        print(f"  legacy: {results['legacy']}")
+        print(f"  set:    {results['set']}")
+        sys.exit(1)
+    print(f"✅ Ergebnisse identisch ({len(dates)} Tage, {results['set'][0]} Arbeitstage, "
+          f"{len(results['set'][1])} gesperrt)")
+
+
+if __name__ == '__main__':
+    main()
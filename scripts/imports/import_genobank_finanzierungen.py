@@ -15,6 +15,7 @@ from datetime import datetime, date, timedelta
 
 # Projekt-Pfad für Imports
 sys.path.insert(0, '/opt/greiner-portal')
+from api.cache_utils import invalidate_cache_tags
 from api.db_connection import get_db
 from api.db_utils import locosoft_session, db_session, row_to_dict, rows_to_list
 
@@ -258,6 +259,9 @@ for fz in genobank_fahrzeuge:
 
 drive_conn.commit()
 
+# TAG 220: Zinsen der AfA-Verkaufsempfehlungen (api/afa_vin_anreicherung) neu lesen
+invalidate_cache_tags('afa_vin')
+
 print(f"\n✅ Import abgeschlossen:")
 print(f"   ✓ {stats['importiert']} Fahrzeuge importiert")
 if stats['fehler'] > 0:
@@ -3,10 +3,23 @@
 """
 MT940 Import für Bankenspiegel V2 - FINAL CORRECT
 TAG 136: PostgreSQL-kompatibel via db_utils
+
+TAG 220: Inkrementeller Import
+- Manifest bank_import_dateien (Pfad, Größe, mtime, SHA-256, Ergebnis): unveränderte Dateien
+  werden ohne Öffnen übersprungen; nur mtime geändert → Hash-Vergleich, kein Parsen
+- Deduplizierung über die Unique-Indizes (transaktionen: konto_id/buchungsdatum/betrag/
+  verwendungszweck, salden: konto_id/datum) mit Bulk-INSERT ... ON CONFLICT statt
+  SELECT pro Zeile
+- Commit pro Datei: ein Fehler verwirft nur diese Datei, sie wird beim nächsten Lauf wiederholt
+- Zusammenfassung: neue/geänderte/übersprungene Dateien und tatsächlich neue Zeilen
+- --voll ignoriert das Manifest (alle Dateien parsen; Duplikate fängt ON CONFLICT ab)
+
+Migration: migrations/add_bank_import_manifest.sql
 """
 
 import sys
 import argparse
+import hashlib
 from pathlib import Path
 import mt940
 import re
@@ -17,17 +30,49 @@ from api.db_utils import db_session, row_to_dict
 from api.db_connection import sql_placeholder, get_db_type, get_db
 from api.bankenspiegel_utils import create_snapshot_from_saldo
 
+# Dateiendungen auf dem Share
+MT940_PATTERNS = ('*.mta', '*.mt940', '*.MT940', '*.TXT', '*.txt')
+
+# Zeilen pro Bulk-INSERT (transaktionen)
+INSERT_BATCH_SIZE = 500
+
+MANIFEST_DDL = """
+    CREATE TABLE IF NOT EXISTS bank_import_dateien (
+        pfad                TEXT PRIMARY KEY,
+        dateiname           TEXT NOT NULL,
+        groesse             BIGINT NOT NULL,
+        mtime_ns            BIGINT NOT NULL,
+        sha256              VARCHAR(64),
+        konto_id            INTEGER,
+        status              VARCHAR(20) NOT NULL,
+        transaktionen_neu   INTEGER DEFAULT 0,
+        transaktionen_dup   INTEGER DEFAULT 0,
+        salden_neu          INTEGER DEFAULT 0,
+        salden_aktualisiert INTEGER DEFAULT 0,
+        fehler              TEXT,
+        importiert_am       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SALDO_PATTERN = r':{tag}:([CD])(\d{{6}})EUR([\d,\.]+)'
+
+
 class MT940Importer:
-    def __init__(self):
+    def __init__(self, voll=False):
         self.conn = None
         self.cursor = None
         self.ph = None  # Placeholder für SQL
+        self.voll = voll
+        self.manifest = {}
+        self._konten = {}
         self.stats = {
             'files_read': 0,
             'files_imported': 0,
+            'files_skipped': 0,
             'transactions_imported': 0,
             'transactions_duplicates': 0,
             'salden_imported': 0,
+            'salden_updated': 0,
             'salden_duplicates': 0,
             'errors': 0
         }
@@ -37,30 +82,95 @@ class MT940Importer:
         self.conn = get_db()
         self.cursor = self.conn.cursor()
         self.ph = sql_placeholder()
+        self.prepare_schema()
 
     def close(self):
         if self.conn:
             self.conn.close()
-    
-    def get_konto_id_by_number(self, kontonummer):
-        ph = self.ph
-        self.cursor.execute(f"SELECT id FROM konten WHERE kontonummer = {ph}", (kontonummer,))
-        result = self.cursor.fetchone()
-        if result:
+
+    def prepare_schema(self):
+        """Manifest-Tabelle anlegen (falls Migration fehlt); Unique-Index für ON CONFLICT prüfen."""
+        self.cursor.execute(MANIFEST_DDL)
+        self.cursor.execute(
+            "SELECT 1 FROM pg_indexes WHERE tablename = 'transaktionen' AND indexname = 'idx_trans_unique'"
+        )
+        if not self.cursor.fetchone():
+            # Ohne Index würde ON CONFLICT DO NOTHING nichts abfangen → Duplikate
+            self.conn.rollback()
+            raise RuntimeError(
+                "Unique-Index idx_trans_unique fehlt - migrations/add_bank_import_manifest.sql ausführen"
+            )
+        self.conn.commit()
+
+    # =========================================================================
+    # MANIFEST
+    # =========================================================================
+
+    def load_manifest(self):
+        """Alle Manifest-Einträge in einer Query: pfad → {groesse, mtime_ns, sha256, status}"""
+        self.cursor.execute("SELECT pfad, groesse, mtime_ns, sha256, status FROM bank_import_dateien")
+        self.manifest = {}
+        for result in self.cursor.fetchall():
             row = row_to_dict(result)
-            return row['id']
+            self.manifest[row['pfad']] = row
+
+    def save_manifest(self, file_path, stat, sha256, konto_id, status, counts=None, fehler=None):
+        counts = counts or {}
+        ph = self.ph
+        self.cursor.execute(
+            f"""INSERT INTO bank_import_dateien (
+                    pfad, dateiname, groesse, mtime_ns, sha256, konto_id, status,
+                    transaktionen_neu, transaktionen_dup, salden_neu, salden_aktualisiert,
+                    fehler, importiert_am
+                ) VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+                ON CONFLICT (pfad) DO UPDATE SET
+                    dateiname = EXCLUDED.dateiname,
+                    groesse = EXCLUDED.groesse,
+                    mtime_ns = EXCLUDED.mtime_ns,
+                    sha256 = EXCLUDED.sha256,
+                    konto_id = EXCLUDED.konto_id,
+                    status = EXCLUDED.status,
+                    transaktionen_neu = EXCLUDED.transaktionen_neu,
+                    transaktionen_dup = EXCLUDED.transaktionen_dup,
+                    salden_neu = EXCLUDED.salden_neu,
+                    salden_aktualisiert = EXCLUDED.salden_aktualisiert,
+                    fehler = EXCLUDED.fehler,
+                    importiert_am = EXCLUDED.importiert_am""",
+            (str(file_path), file_path.name, stat.st_size, stat.st_mtime_ns, sha256, konto_id, status,
+             counts.get('tx_neu', 0), counts.get('tx_dup', 0),
+             counts.get('salden_neu', 0), counts.get('salden_aktualisiert', 0), fehler)
+        )
 
-        # LTRIM funktioniert in beiden DBs
+    def touch_manifest(self, file_path, stat):
+        """Inhalt unverändert (gleicher Hash), nur mtime/Größe nachziehen."""
+        ph = self.ph
         self.cursor.execute(
-            f"SELECT id FROM konten WHERE LTRIM(kontonummer, '0') = LTRIM({ph}, '0')",
-            (kontonummer,)
+            f"UPDATE bank_import_dateien SET groesse = {ph}, mtime_ns = {ph} WHERE pfad = {ph}",
+            (stat.st_size, stat.st_mtime_ns, str(file_path))
         )
+
+    # =========================================================================
+    # KONTEN
+    # =========================================================================
+
+    def get_konto_id_by_number(self, kontonummer):
+        if kontonummer in self._konten:
+            return self._konten[kontonummer]
+
+        ph = self.ph
+        self.cursor.execute(f"SELECT id FROM konten WHERE kontonummer = {ph}", (kontonummer,))
         result = self.cursor.fetchone()
-        if result:
-            row = row_to_dict(result)
-            return row['id']
-        return None
-    
+        if not result:
+            # LTRIM funktioniert in beiden DBs
+            self.cursor.execute(
+                f"SELECT id FROM konten WHERE LTRIM(kontonummer, '0') = LTRIM({ph}, '0')",
+                (kontonummer,)
+            )
+            result = self.cursor.fetchone()
+        konto_id = row_to_dict(result)['id'] if result else None
+        self._konten[kontonummer] = konto_id
+        return konto_id
+
     def extract_kontonummer(self, filename):
         match = re.search(r'Umsaetze[_\s]+(\d+)[_\s]+', filename, re.IGNORECASE)
         if match:
@@ -75,27 +185,7 @@ class MT940Importer:
             return match.group(1)
         
         return None
-    
-    def transaction_exists(self, konto_id, buchungsdatum, betrag, verwendungszweck):
-        ph = self.ph
-        self.cursor.execute(
-            f"""SELECT COUNT(*) as cnt FROM transaktionen
-               WHERE konto_id = {ph} AND buchungsdatum = {ph} AND betrag = {ph} AND verwendungszweck = {ph}""",
-            (konto_id, buchungsdatum, betrag, verwendungszweck)
-        )
-        row = row_to_dict(self.cursor.fetchone())
-        return row['cnt'] > 0
 
-    def saldo_exists(self, konto_id, datum):
-        """Prüft ob Saldo für dieses Datum existiert"""
-        ph = self.ph
-        self.cursor.execute(
-            f"""SELECT COUNT(*) as cnt FROM salden WHERE konto_id = {ph} AND datum = {ph}""",
-            (konto_id, datum)
-        )
-        row = row_to_dict(self.cursor.fetchone())
-        return row['cnt'] > 0
-    
     def date_to_string(self, date_obj):
         if date_obj is None:
             return None
@@ -106,140 +196,129 @@ class MT940Importer:
         if hasattr(date_obj, 'strftime'):
             return date_obj.strftime('%Y-%m-%d')
         return str(date_obj)
-    
-    def parse_salden_from_file(self, file_path, konto_id):
-        """Parst Salden aus MT940 - Schlusssaldo (62F) hat Prioritaet ueber Anfangssaldo (60F)"""
-        salden_imported = 0
-        salden_updated = 0
 
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+    # =========================================================================
+    # SALDEN
+    # =========================================================================
 
-            # Dictionary: Datum -> (saldo, typ) wobei typ = '60F' oder '62F'
-            salden_dict = {}
-
-            # :60F: (Anfangssaldo) - wird zuerst gesammelt
-            for match in re.finditer(r':60F:([CD])(\d{6})EUR([\d,\.]+)', content):
+    def parse_salden(self, content):
+        """Salden aus MT940-Text: Datum → (saldo, typ). Schlusssaldo (62F) hat Prioritaet ueber Anfangssaldo (60F)"""
+        salden_dict = {}
+        for tag in ('60F', '62F'):
+            for match in re.finditer(SALDO_PATTERN.format(tag=tag), content):
                 vorzeichen = match.group(1)
                 datum_str = match.group(2)
-                betrag_str = match.group(3).replace(',', '.')
-
-                jahr = '20' + datum_str[0:2]
-                monat = datum_str[2:4]
-                tag = datum_str[4:6]
-                datum = f"{jahr}-{monat}-{tag}"
+                datum = f"20{datum_str[0:2]}-{datum_str[2:4]}-{datum_str[4:6]}"
 
-                saldo = float(betrag_str)
+                saldo = float(match.group(3).replace(',', '.'))
                 if vorzeichen == 'D':
                     saldo = -saldo
 
-                # Nur setzen wenn noch nicht vorhanden
-                if datum not in salden_dict:
-                    salden_dict[datum] = (saldo, '60F')
-
-            # :62F: (Schlusssaldo) - UEBERSCHREIBT immer den Anfangssaldo!
-            for match in re.finditer(r':62F:([CD])(\d{6})EUR([\d,\.]+)', content):
-                vorzeichen = match.group(1)
-                datum_str = match.group(2)
-                betrag_str = match.group(3).replace(',', '.')
+                # 60F nur setzen wenn noch nicht vorhanden, 62F ueberschreibt IMMER
+                if tag == '62F' or datum not in salden_dict:
+                    salden_dict[datum] = (saldo, tag)
+        return salden_dict
 
-                jahr = '20' + datum_str[0:2]
-                monat = datum_str[2:4]
-                tag = datum_str[4:6]
-                datum = f"{jahr}-{monat}-{tag}"
+    def import_salden(self, konto_id, salden_dict, import_datei):
+        """
+        Salden per Upsert: neue Tage einfügen; 62F (Schlusssaldo) aktualisiert einen vorhandenen
+        Tag, wenn sich der Betrag geändert hat. Snapshot nur für eingefügte/geänderte Salden.
 
-                saldo = float(betrag_str)
-                if vorzeichen == 'D':
-                    saldo = -saldo
-
-                # Schlusssaldo ueberschreibt IMMER den Anfangssaldo
-                salden_dict[datum] = (saldo, '62F')
-
-            # Importieren - INSERT oder UPDATE
-            ph = self.ph
-            for datum, (saldo, typ) in salden_dict.items():
-                if not self.saldo_exists(konto_id, datum):
-                    # Neuer Eintrag
-                    self.cursor.execute(
-                        f"""INSERT INTO salden (konto_id, datum, saldo, quelle, import_datei)
-                           VALUES ({ph}, {ph}, {ph}, 'MT940', {ph})""",
-                        (konto_id, datum, saldo, file_path.name)
-                    )
-                    salden_imported += 1
-                    # TAG 180: Automatisch Snapshot erstellen
-                    create_snapshot_from_saldo(konto_id, datum, saldo, cursor=self.cursor)
+        Returns: (neu, aktualisiert)
+        """
+        ph = self.ph
+        neu = 0
+        aktualisiert = 0
+        for typ, on_conflict in (
+            ('60F', "DO NOTHING"),
+            ('62F', """DO UPDATE SET saldo = EXCLUDED.saldo, import_datei = EXCLUDED.import_datei
+                       WHERE salden.saldo IS DISTINCT FROM EXCLUDED.saldo"""),
+        ):
+            rows = [(konto_id, datum, saldo, import_datei)
+                    for datum, (saldo, t) in sorted(salden_dict.items()) if t == typ]
+            if not rows:
+                continue
+            values = ', '.join([f"({ph}, {ph}, {ph}, 'MT940', {ph})"] * len(rows))
+            self.cursor.execute(
+                f"""INSERT INTO salden (konto_id, datum, saldo, quelle, import_datei)
+                   VALUES {values}
+                   ON CONFLICT (konto_id, datum) {on_conflict}
+                   RETURNING datum, saldo, (xmax = 0) AS eingefuegt""",
+                [v for row in rows for v in row]
+            )
+            geschrieben = [row_to_dict(r) for r in self.cursor.fetchall()]
+            for row in geschrieben:
+                if row['eingefuegt']:
+                    neu += 1
                 else:
-                    # Update wenn 62F (Schlusssaldo)
-                    if typ == '62F':
-                        self.cursor.execute(
-                            f"""UPDATE salden SET saldo = {ph}, import_datei = {ph}
-                               WHERE konto_id = {ph} AND datum = {ph}""",
-                            (saldo, file_path.name, konto_id, datum)
-                        )
-                        salden_updated += 1
-                        # TAG 180: Snapshot aktualisieren
-                        create_snapshot_from_saldo(konto_id, datum, saldo, cursor=self.cursor)
-                    else:
-                        self.stats['salden_duplicates'] += 1
-
-            self.stats['salden_imported'] += salden_imported
-            if salden_updated > 0:
-                print(f"   Salden aktualisiert: {salden_updated} (Schlusssaldo)")
-            return salden_imported + salden_updated
-
-        except Exception as e:
-            print(f"   Salden-Fehler: {e}")
-            import traceback
-            traceback.print_exc()
-            return 0
-
-    def import_transaction_from_statement(self, konto_id, statement_data, import_datei):
-        try:
-            buchungsdatum = self.date_to_string(statement_data.get('date'))
-            valutadatum = self.date_to_string(statement_data.get('entry_date') or statement_data.get('date'))
-            
-            amount_obj = statement_data.get('amount')
-            if hasattr(amount_obj, 'amount'):
-                betrag = float(amount_obj.amount)
-            else:
-                betrag = float(amount_obj) if amount_obj else 0.0
-            
-            zweck_parts = []
-            if statement_data.get('purpose'):
-                zweck_parts.append(statement_data['purpose'])
-            if statement_data.get('applicant_name'):
-                zweck_parts.append(statement_data['applicant_name'])
-            if statement_data.get('recipient_name'):
-                zweck_parts.append(statement_data['recipient_name'])
-            verwendungszweck = ' '.join(zweck_parts) or 'N/A'
-            
-            buchungstext = statement_data.get('posting_text') or statement_data.get('transaction_code') or 'N/A'
-            gegenkonto_iban = statement_data.get('applicant_iban') or statement_data.get('gvc_applicant_iban')
-            gegenkonto_name = statement_data.get('applicant_name') or statement_data.get('recipient_name')
-            
-            if self.transaction_exists(konto_id, buchungsdatum, betrag, verwendungszweck):
-                self.stats['transactions_duplicates'] += 1
-                return False
-
-            ph = self.ph
+                    aktualisiert += 1
+                # TAG 180: Automatisch Snapshot erstellen/aktualisieren
+                create_snapshot_from_saldo(konto_id, row['datum'], float(row['saldo']), cursor=self.cursor)
+            self.stats['salden_duplicates'] += len(rows) - len(geschrieben)
+
+        self.stats['salden_imported'] += neu
+        self.stats['salden_updated'] += aktualisiert
+        return neu, aktualisiert
+
+    # =========================================================================
+    # TRANSAKTIONEN
+    # =========================================================================
+
+    def transaction_row(self, konto_id, statement_data, import_datei):
+        """MT940-Statement → Spaltenwerte für transaktionen (ohne import_quelle)."""
+        buchungsdatum = self.date_to_string(statement_data.get('date'))
+        valutadatum = self.date_to_string(statement_data.get('entry_date') or statement_data.get('date'))
+
+        amount_obj = statement_data.get('amount')
+        if hasattr(amount_obj, 'amount'):
+            betrag = float(amount_obj.amount)
+        else:
+            betrag = float(amount_obj) if amount_obj else 0.0
+
+        zweck_parts = []
+        if statement_data.get('purpose'):
+            zweck_parts.append(statement_data['purpose'])
+        if statement_data.get('applicant_name'):
+            zweck_parts.append(statement_data['applicant_name'])
+        if statement_data.get('recipient_name'):
+            zweck_parts.append(statement_data['recipient_name'])
+        verwendungszweck = ' '.join(zweck_parts) or 'N/A'
+
+        buchungstext = statement_data.get('posting_text') or statement_data.get('transaction_code') or 'N/A'
+        gegenkonto_iban = statement_data.get('applicant_iban') or statement_data.get('gvc_applicant_iban')
+        gegenkonto_name = statement_data.get('applicant_name') or statement_data.get('recipient_name')
+
+        return (konto_id, buchungsdatum, valutadatum, betrag, buchungstext,
+                verwendungszweck, gegenkonto_iban, gegenkonto_name, import_datei)
+
+    def import_transactions(self, rows):
+        """
+        Bulk-INSERT ... ON CONFLICT DO NOTHING über idx_trans_unique.
+
+        Returns: (neu, duplikate)
+        """
+        ph = self.ph
+        neu = 0
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            batch = rows[i:i + INSERT_BATCH_SIZE]
+            values = ', '.join([f"({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, 'MT940', {ph})"] * len(batch))
             self.cursor.execute(
                 f"""INSERT INTO transaktionen (
                     konto_id, buchungsdatum, valutadatum, betrag, buchungstext,
                     verwendungszweck, gegenkonto_iban, gegenkonto_name,
                     import_quelle, import_datei
-                ) VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, 'MT940', {ph})""",
-                (konto_id, buchungsdatum, valutadatum, betrag, buchungstext,
-                 verwendungszweck, gegenkonto_iban, gegenkonto_name, import_datei)
+                ) VALUES {values}
+                ON CONFLICT DO NOTHING
+                RETURNING id""",
+                [v for row in batch for v in row]
             )
-            self.stats['transactions_imported'] += 1
-            return True
-            
-        except Exception as e:
-            print(f"   ⚠️  TX-Fehler: {e}")
-            self.stats['errors'] += 1
-            return False
-    
+            neu += len(self.cursor.fetchall())
+
+        duplikate = len(rows) - neu
+        self.stats['transactions_imported'] += neu
+        self.stats['transactions_duplicates'] += duplikate
+        return neu, duplikate
+
     def get_konto_name(self, konto_id):
         ph = self.ph
         self.cursor.execute(f"SELECT kontoname FROM konten WHERE id = {ph}", (konto_id,))
@@ -248,79 +327,110 @@ class MT940Importer:
             row = row_to_dict(result)
             return row['kontoname']
         return "Unbekannt"
-    
+
+    # =========================================================================
+    # DATEIEN
+    # =========================================================================
+
     def import_file(self, file_path):
+        stat = file_path.stat()
+        bekannt = self.manifest.get(str(file_path))
+
+        # Unverändert laut Manifest → nicht öffnen
+        if (not self.voll and bekannt and bekannt['status'] == 'ok'
+                and bekannt['groesse'] == stat.st_size and bekannt['mtime_ns'] == stat.st_mtime_ns):
+            self.stats['files_skipped'] += 1
+            return
+
         print(f"\n{'='*80}")
         print(f"📄 {file_path.name}")
-        
+
         self.stats['files_read'] += 1
-        
+
         kontonummer = self.extract_kontonummer(file_path.name)
-        if not kontonummer:
-            print(f"   ❌ Kontonummer nicht erkennbar")
-            self.stats['errors'] += 1
-            return
-        
-        konto_id = self.get_konto_id_by_number(kontonummer)
+        konto_id = self.get_konto_id_by_number(kontonummer) if kontonummer else None
         if not konto_id:
-            print(f"   ❌ Konto nicht gefunden")
+            print(f"   ❌ {'Konto nicht gefunden' if kontonummer else 'Kontonummer nicht erkennbar'}")
             self.stats['errors'] += 1
+            # Ohne Hash: wird beim nächsten Lauf erneut geprüft (z.B. Konto inzwischen angelegt)
+            self.save_manifest(file_path, stat, None, None, 'kein_konto')
+            self.conn.commit()
             return
-        
+
+        raw = file_path.read_bytes()
+        sha256 = hashlib.sha256(raw).hexdigest()
+
+        # Nur mtime/Größe geändert (z.B. erneut kopiert), Inhalt identisch
+        if not self.voll and bekannt and bekannt['status'] == 'ok' and bekannt['sha256'] == sha256:
+            print(f"   ⏭️  Inhalt unverändert")
+            self.touch_manifest(file_path, stat)
+            self.conn.commit()
+            self.stats['files_skipped'] += 1
+            return
+
         konto_name = self.get_konto_name(konto_id)
         print(f"   ✓ {konto_name} (ID {konto_id})")
-        
-        # SALDEN
-        salden_count = self.parse_salden_from_file(file_path, konto_id)
-        if salden_count > 0:
-            print(f"   💰 Salden: {salden_count}")
-        
-        # TRANSAKTIONEN
+
+        content = raw.decode('utf-8', errors='ignore')
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                statements = mt940.parse(f)
-            
-            tx_count = 0
-            for statement in statements:
-                if self.import_transaction_from_statement(konto_id, statement.data, file_path.name):
-                    tx_count += 1
-            
-            if tx_count > 0:
-                print(f"   ✅ TX: {tx_count}")
-            
+            # SALDEN
+            salden_neu, salden_aktualisiert = self.import_salden(
+                konto_id, self.parse_salden(content), file_path.name
+            )
+            if salden_neu or salden_aktualisiert:
+                print(f"   💰 Salden: {salden_neu} neu, {salden_aktualisiert} aktualisiert (Schlusssaldo)")
+
+            # TRANSAKTIONEN
+            rows = []
+            for statement in mt940.parse(content):
+                try:
+                    rows.append(self.transaction_row(konto_id, statement.data, file_path.name))
+                except Exception as e:
+                    print(f"   ⚠️  TX-Fehler: {e}")
+                    self.stats['errors'] += 1
+            tx_neu, tx_dup = self.import_transactions(rows)
+            if tx_neu > 0:
+                print(f"   ✅ TX: {tx_neu} neu ({tx_dup} bereits vorhanden)")
+
+            self.save_manifest(file_path, stat, sha256, konto_id, 'ok', {
+                'tx_neu': tx_neu, 'tx_dup': tx_dup,
+                'salden_neu': salden_neu, 'salden_aktualisiert': salden_aktualisiert,
+            })
+            self.conn.commit()
             self.stats['files_imported'] += 1
-            
+
         except Exception as e:
+            self.conn.rollback()
             print(f"   ❌ {e}")
             self.stats['errors'] += 1
-    
+            self.save_manifest(file_path, stat, sha256, konto_id, 'fehler', fehler=str(e)[:1000])
+            self.conn.commit()
+
     def import_directory(self, directory):
-        files = (list(directory.glob('*.mta')) + 
-                list(directory.glob('*.mt940')) + 
-                list(directory.glob('*.MT940')) +
-                list(directory.glob('*.TXT')) +
-                list(directory.glob('*.txt')))
-        
+        files = sorted({f for pattern in MT940_PATTERNS for f in directory.glob(pattern)})
+
         if not files:
             print(f"⚠️ Keine MT940-Dateien")
             return
-        
+
         print(f"\n📂 {directory}")
         print(f"📁 {len(files)} Dateien")
-        
-        for file_path in sorted(files):
+
+        self.load_manifest()
+        for file_path in files:
             self.import_file(file_path)
-        
-        self.conn.commit()
+
         print(f"\n✅ Gespeichert")
-    
+
     def print_statistics(self):
         print(f"\n{'='*80}")
         print("📊 ZUSAMMENFASSUNG")
         print(f"{'='*80}")
-        print(f"Dateien:            {self.stats['files_imported']}/{self.stats['files_read']}")
-        print(f"Transaktionen:      {self.stats['transactions_imported']} (Duplikate: {self.stats['transactions_duplicates']})")
-        print(f"Salden:             {self.stats['salden_imported']} (Duplikate: {self.stats['salden_duplicates']})")
+        print(f"Dateien:            {self.stats['files_imported']}/{self.stats['files_read']} neu/geändert "
+              f"({self.stats['files_skipped']} unverändert übersprungen)")
+        print(f"Transaktionen:      {self.stats['transactions_imported']} neu (Duplikate: {self.stats['transactions_duplicates']})")
+        print(f"Salden:             {self.stats['salden_imported']} neu, {self.stats['salden_updated']} aktualisiert "
+              f"(Duplikate: {self.stats['salden_duplicates']})")
         print(f"Fehler:             {self.stats['errors']}")
         print(f"{'='*80}\n")
 
@@ -369,6 +479,8 @@ def main():
     parser.add_argument('directory', type=str)
     parser.add_argument('--retry', type=int, default=3, help='Anzahl Retry-Versuche bei Mount-Problemen')
     parser.add_argument('--retry-delay', type=int, default=2, help='Wartezeit zwischen Retries in Sekunden')
+    parser.add_argument('--voll', action='store_true',
+                        help='Manifest ignorieren und alle Dateien neu einlesen (Duplikate werden übersprungen)')
     # --db Argument wird ignoriert, db_session nutzt Umgebungsvariable
 
     args = parser.parse_args()
@@ -380,7 +492,7 @@ def main():
         print(f"❌ Mount-Verzeichnis nicht verfügbar: {directory}")
         sys.exit(1)
 
-    importer = MT940Importer()
+    importer = MT940Importer(voll=args.voll)
 
     try:
         importer.connect()
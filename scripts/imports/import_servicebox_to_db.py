@@ -163,7 +163,7 @@ def main():
                     empfaenger.get('code'),
                     parsed.get('lokale_nr') or best.get('kommentare', {}).get('lokale_nr'),
                     best.get('url'),
-                    best.get('kommentare', {}).get('kommentar') or parsed.get('kommentar_werkstatt'),
+                    best.get('kommentare', {}).get('werkstatt') or best.get('kommentare', {}).get('kommentar') or parsed.get('kommentar_werkstatt'),  # TAG 220: Scraper liefert 'werkstatt'
                     parsed.get('kundennummer'),
                     parsed.get('vin'),
                     parsed.get('werkstattauftrag'),
@@ -193,7 +193,7 @@ def main():
                     empfaenger.get('code'),
                     parsed.get('lokale_nr') or best.get('kommentare', {}).get('lokale_nr'),
                     best.get('url'),
-                    best.get('kommentare', {}).get('kommentar') or parsed.get('kommentar_werkstatt'),
+                    best.get('kommentare', {}).get('werkstatt') or best.get('kommentare', {}).get('kommentar') or parsed.get('kommentar_werkstatt'),  # TAG 220: Scraper liefert 'werkstatt'
                     parsed.get('kundennummer'),
                     parsed.get('vin'),
                     parsed.get('werkstattauftrag'),
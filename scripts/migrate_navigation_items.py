@@ -261,6 +261,10 @@ def migrate_navigation_items():
     conn.commit()
     conn.close()
     
+    # TAG 220: Navigation-Cache der laufenden Worker verwerfen
+    from api.navigation_utils import invalidate_navigation_cache
+    invalidate_navigation_cache()
+
     print("✅ Navigation-Items erfolgreich migriert!")
 
 
@@ -17,6 +17,7 @@ Schedule (Celery Beat):
 Task: celery_app.tasks.email_tek_daily
 
 Version: 3.1 (TAG146) - 19:30 Uhr wegen Locosoft-Mirror um 19:00
+TAG 220: TEK-Snapshots je Standort einmal pro Lauf (TekReportRun), parallel berechnet
 """
 
 import sys
@@ -32,6 +33,8 @@ try:
 except ImportError:
     pass
 
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, date
 from scripts.tek_api_helper import get_tek_data_from_api
 from api.db_utils import db_session, row_to_dict, get_locosoft_connection
@@ -53,6 +56,10 @@ TEK_REPORT_TYPES = {
 
 ABSENDER = "drive@auto-greiner.de"
 
+# TAG 220: Standorte, deren TEK-Snapshot ein Versandlauf vorab parallel berechnet
+# (None = Gesamt); Parallelität je Standort ein Thread
+TEK_SNAPSHOT_STANDORTE = (None, 'DEG', 'LAN')
+
 # Monatsnamen
 MONATE = ['', 'Januar', 'Februar', 'März', 'April', 'Mai', 'Juni',
           'Juli', 'August', 'September', 'Oktober', 'November', 'Dezember']
@@ -105,6 +112,78 @@ def get_tek_data(monat=None, jahr=None, standort=None):
     return get_tek_data_from_api(monat, jahr, standort)
 
 
+class TekReportRun:
+    """
+    TEK-Snapshots eines Versandlaufs (TAG 220).
+
+    Jeder Standort (Gesamt/DEG/LAN) wird pro Lauf genau einmal berechnet und von
+    allen Report-Typen (Gesamt, Filiale, Bereiche, Verkauf, Service) und PDF-Renderern
+    geteilt. Vorher: get_tek_data() pro Report-Typ und Standort (bis zu 24× pro Lauf).
+
+    Verwendung:
+        with TekReportRun() as run:
+            run.prefetch(TEK_SNAPSHOT_STANDORTE)   # parallel
+            data = run.get('DEG')                 # wartet ggf. auf die Berechnung
+
+    Die Snapshots werden von Renderern und E-Mail-Bausteinen nur gelesen.
+    Ohne with-Block (z. B. Einzel-Testversand) wird bei get() direkt berechnet.
+    """
+
+    def __init__(self, monat=None, jahr=None):
+        self.monat = monat
+        self.jahr = jahr
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._lookups = None
+
+    def __enter__(self):
+        from api.pdf_generator import shared_tek_lookups
+        self._executor = ThreadPoolExecutor(max_workers=len(TEK_SNAPSHOT_STANDORTE),
+                                            thread_name_prefix='tek-snapshot')
+        self._lookups = shared_tek_lookups()
+        self._lookups.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._lookups.__exit__(exc_type, exc, tb)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    @staticmethod
+    def _key(standort):
+        return None if standort in (None, '', 'ALL') else standort
+
+    def _future(self, standort):
+        key = self._key(standort)
+        with self._lock:
+            future = self._snapshots.get(key)
+            if future is not None:
+                return future, False
+            if self._executor is not None:
+                future = self._executor.submit(get_tek_data, self.monat, self.jahr, key)
+                self._snapshots[key] = future
+                return future, False
+            future = Future()
+            self._snapshots[key] = future
+            return future, True
+
+    def prefetch(self, standorte):
+        """Snapshots für mehrere Standorte anstoßen (parallel, wenn im with-Block)."""
+        for standort in standorte:
+            self._future(standort)
+
+    def get(self, standort=None):
+        """TEK-Snapshot eines Standorts (None/'ALL' = Gesamt); Fehler werden weitergereicht."""
+        future, compute = self._future(standort)
+        if compute:
+            try:
+                future.set_result(get_tek_data(self.monat, self.jahr, self._key(standort)))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
 def format_euro(value):
     """Formatiert als Euro (deutsches Format - TAG146: OHNE 'k'-Notation!)"""
     try:
@@ -157,12 +236,13 @@ def get_subscribers_by_standort():
     return get_subscribers_for_report('tek_daily')
 
 
-def send_gesamt_reports(connector, heute, test_email=None):
+def send_gesamt_reports(connector, heute, test_email=None, run=None):
     """
     Sendet TEK Gesamt-Reports (tek_daily).
     Für Geschäftsleitung - alle Bereiche.
     """
     from api.pdf_generator import generate_tek_daily_pdf
+    run = run or TekReportRun()
 
     if test_email:
         # Test-Modus: Nur an Test-Adresse
@@ -189,7 +269,7 @@ def send_gesamt_reports(connector, heute, test_email=None):
     for standort, empfaenger in standorte:
         standort_name = standort or 'Gesamt'
         print(f"\n    [{standort_name}] Lade Daten...")
-        data = get_tek_data(standort=standort)
+        data = run.get(standort)
 
         print(f"    [{standort_name}] Generiere PDF...")
         pdf_bytes = generate_tek_daily_pdf(data)
@@ -221,13 +301,14 @@ def send_gesamt_reports(connector, heute, test_email=None):
     return emails_sent
 
 
-def send_filiale_reports(connector, heute, test_email=None, test_standort=None):
+def send_filiale_reports(connector, heute, test_email=None, test_standort=None, run=None):
     """
     Sendet TEK Filiale-Reports (tek_filiale).
     Für Filialleiter wie Rolf - alle Bereiche eines Standorts.
     test_standort: Bei Testversand nur diesen Standort senden (DEG/LAN).
     """
     from api.pdf_generator import generate_tek_filiale_pdf
+    run = run or TekReportRun()
 
     if test_email:
         # Test-Modus: an Test-Adresse (nur ein Standort wenn test_standort gesetzt)
@@ -259,7 +340,7 @@ def send_filiale_reports(connector, heute, test_email=None, test_standort=None):
             continue
 
         print(f"\n    [Filiale {standort}] Lade Daten...")
-        data = get_tek_data(standort=standort)
+        data = run.get(standort)
 
         print(f"    [Filiale {standort}] Generiere PDF...")
         pdf_bytes = generate_tek_filiale_pdf(data)
@@ -285,12 +366,13 @@ def send_filiale_reports(connector, heute, test_email=None, test_standort=None):
     return emails_sent
 
 
-def send_bereich_reports(connector, heute, report_type, bereich_key, test_email=None):
+def send_bereich_reports(connector, heute, report_type, bereich_key, test_email=None, run=None):
     """
     Sendet TEK Bereichs-Reports (tek_nw, tek_gw, tek_teile, tek_werkstatt).
     Für Abteilungsleiter - nur ein spezifischer Bereich.
     """
     from api.pdf_generator import generate_tek_bereich_pdf
+    run = run or TekReportRun()
 
     BEREICH_NAMEN = {
         '1-NW': 'Neuwagen', '2-GW': 'Gebrauchtwagen',
@@ -323,7 +405,7 @@ def send_bereich_reports(connector, heute, report_type, bereich_key, test_email=
     for standort, empfaenger in standorte:
         standort_name = standort or 'Gesamt'
         print(f"\n    [{bereich_name} {standort_name}] Lade Daten...")
-        data = get_tek_data(standort=standort)
+        data = run.get(standort)
 
         # Bereichs-Daten extrahieren
         bereich_data = None
@@ -360,7 +442,7 @@ def send_bereich_reports(connector, heute, report_type, bereich_key, test_email=
     return emails_sent
 
 
-def send_verkauf_reports(connector, heute, test_email=None, test_standort=None):
+def send_verkauf_reports(connector, heute, test_email=None, test_standort=None, run=None):
     """
     Sendet TEK Verkauf-Reports (NW+GW kombiniert) - TAG 215
     Für Verkaufsleitung - alle Standorte.
@@ -368,6 +450,7 @@ def send_verkauf_reports(connector, heute, test_email=None, test_standort=None):
     """
     from api.pdf_generator import generate_tek_verkauf_pdf
     from api.standort_utils import STANDORT_NAMEN
+    run = run or TekReportRun()
 
     if test_email:
         if test_standort == 'DEG':
@@ -400,7 +483,7 @@ def send_verkauf_reports(connector, heute, test_email=None, test_standort=None):
 
     for standort, empfaenger, standort_name in standorte:
         print(f"\n    [Verkauf {standort_name}] Lade Daten...")
-        data = get_tek_data(standort=standort)
+        data = run.get(standort)
 
         print(f"    [Verkauf {standort_name}] Generiere PDF...")
         pdf_bytes = generate_tek_verkauf_pdf(data, standort_name)
@@ -430,13 +513,14 @@ def send_verkauf_reports(connector, heute, test_email=None, test_standort=None):
     return emails_sent
 
 
-def send_service_reports(connector, heute, test_email=None, test_standort=None):
+def send_service_reports(connector, heute, test_email=None, test_standort=None, run=None):
     """
     Sendet TEK Service-Reports (Teile+Werkstatt kombiniert) - TAG 215
     Für Service-Leitung - alle Standorte.
     test_standort: Bei Testversand nur diesen Standort (DEG/LAN) oder Gesamt (None).
     """
     from api.pdf_generator import generate_tek_service_pdf
+    run = run or TekReportRun()
 
     if test_email:
         if test_standort == 'DEG':
@@ -469,7 +553,7 @@ def send_service_reports(connector, heute, test_email=None, test_standort=None):
 
     for standort, empfaenger, standort_name in standorte:
         print(f"\n    [Service {standort_name}] Lade Daten...")
-        data = get_tek_data(standort=standort)
+        data = run.get(standort)
 
         print(f"    [Service {standort_name}] Generiere PDF...")
         pdf_bytes = generate_tek_service_pdf(data, standort_name)
@@ -940,58 +1024,20 @@ def check_locosoft_mirror_completed():
     """
     Prüft ob Locosoft Mirror heute erfolgreich abgeschlossen wurde.
     TAG 181: Sicherheitsprüfung für TEK-Versand
-    
+    TAG 220: Liest den Status-Key status:locosoft_mirror (geschrieben von den Celery-Tasks
+    locosoft_mirror / locosoft_mirror_incremental) statt celery-task-meta-* per KEYS zu durchsuchen.
+
     Returns: True wenn Mirror heute erfolgreich war, False sonst
     """
     try:
-        import redis
-        from datetime import datetime, timezone
-        import json
-        
-        # Redis Client für Result Backend (DB 1)
-        redis_client = redis.Redis(host='localhost', port=6379, db=1, decode_responses=False)
-        
-        # Suche nach Locosoft Mirror Task-Ergebnissen
-        pattern = 'celery-task-meta-*'
-        keys = redis_client.keys(pattern)
-        
-        heute = date.today()
-        heute_str = heute.strftime('%Y-%m-%d')
-        
-        # Durchsuche die letzten Keys
-        for key in keys[:500]:  # Maximal 500 Keys prüfen
-            try:
-                meta_data = redis_client.get(key)
-                if not meta_data:
-                    continue
-                
-                if isinstance(meta_data, bytes):
-                    meta_data = meta_data.decode('utf-8')
-                
-                data = json.loads(meta_data)
-                
-                # Prüfe ob es der Locosoft Mirror Task ist
-                task_name = data.get('task_name', '')
-                if 'locosoft_mirror' not in task_name:
-                    continue
-                
-                # Prüfe Status
-                status = data.get('status', '')
-                if status != 'SUCCESS':
-                    continue
-                
-                # Prüfe Datum
-                date_done = data.get('date_done')
-                if date_done:
-                    # Parse ISO-Format
-                    if 'T' in date_done:
-                        task_date = date_done.split('T')[0]
-                        if task_date == heute_str:
-                            return True
-            except (json.JSONDecodeError, UnicodeDecodeError, KeyError, ValueError):
-                continue
-        
-        return False
+        from api.cache_utils import get_job_status
+
+        status = get_job_status('locosoft_mirror')
+        if status is None:
+            print("⚠️  Warnung: Konnte Locosoft Mirror-Status nicht prüfen: Redis nicht erreichbar")
+            return False
+        last_success = status.get('last_success') or ''
+        return last_success[:10] == date.today().isoformat()
     except Exception as e:
         print(f"⚠️  Warnung: Konnte Locosoft Mirror-Status nicht prüfen: {e}")
         return False  # Im Fehlerfall erlauben (nicht blockieren)
@@ -1057,37 +1103,41 @@ def main():
         total_sent = 0
         test_email = args.test_email  # None wenn nicht im Test-Modus
 
-        # 1. TEK Gesamt-Reports (tek_daily)
-        print("\n[1] TEK GESAMT-REPORTS (tek_daily)")
-        count = send_gesamt_reports(connector, heute, test_email)
-        total_sent += count
-        print(f"    -> {count} E-Mails")
-
-        # 2. TEK Filiale-Reports (tek_filiale) - für Filialleiter wie Rolf
-        print("\n[2] TEK FILIALE-REPORTS (tek_filiale)")
-        count = send_filiale_reports(connector, heute, test_email)
-        total_sent += count
-        print(f"    -> {count} E-Mails")
-
-        # 3. TEK Bereichs-Reports
-        for report_type, config in TEK_REPORT_TYPES.items():
-            if config['type'] == 'bereich':
-                print(f"\n[3] TEK BEREICH: {config['name']} ({report_type})")
-                count = send_bereich_reports(connector, heute, report_type, config['bereich_key'], test_email)
-                total_sent += count
-                print(f"    -> {count} E-Mails")
-
-        # 4. TEK Verkauf-Reports (NW+GW kombiniert) - TAG 215
-        print("\n[4] TEK VERKAUF-REPORTS (NW+GW)")
-        count = send_verkauf_reports(connector, heute, test_email)
-        total_sent += count
-        print(f"    -> {count} E-Mails")
-
-        # 5. TEK Service-Reports (Teile+Werkstatt kombiniert) - TAG 215
-        print("\n[5] TEK SERVICE-REPORTS (Teile+Werkstatt)")
-        count = send_service_reports(connector, heute, test_email)
-        total_sent += count
-        print(f"    -> {count} E-Mails")
+        # TAG 220: TEK-Snapshots einmal pro Lauf, Standorte parallel
+        with TekReportRun() as run:
+            run.prefetch(TEK_SNAPSHOT_STANDORTE)
+
+            # 1. TEK Gesamt-Reports (tek_daily)
+            print("\n[1] TEK GESAMT-REPORTS (tek_daily)")
+            count = send_gesamt_reports(connector, heute, test_email, run=run)
+            total_sent += count
+            print(f"    -> {count} E-Mails")
+
+            # 2. TEK Filiale-Reports (tek_filiale) - für Filialleiter wie Rolf
+            print("\n[2] TEK FILIALE-REPORTS (tek_filiale)")
+            count = send_filiale_reports(connector, heute, test_email, run=run)
+            total_sent += count
+            print(f"    -> {count} E-Mails")
+
+            # 3. TEK Bereichs-Reports
+            for report_type, config in TEK_REPORT_TYPES.items():
+                if config['type'] == 'bereich':
+                    print(f"\n[3] TEK BEREICH: {config['name']} ({report_type})")
+                    count = send_bereich_reports(connector, heute, report_type, config['bereich_key'], test_email, run=run)
+                    total_sent += count
+                    print(f"    -> {count} E-Mails")
+
+            # 4. TEK Verkauf-Reports (NW+GW kombiniert) - TAG 215
+            print("\n[4] TEK VERKAUF-REPORTS (NW+GW)")
+            count = send_verkauf_reports(connector, heute, test_email, run=run)
+            total_sent += count
+            print(f"    -> {count} E-Mails")
+
+            # 5. TEK Service-Reports (Teile+Werkstatt kombiniert) - TAG 215
+            print("\n[5] TEK SERVICE-REPORTS (Teile+Werkstatt)")
+            count = send_service_reports(connector, heute, test_email, run=run)
+            total_sent += count
+            print(f"    -> {count} E-Mails")
 
         print(f"\n{'='*60}")
         print(f"ERFOLG! Insgesamt {total_sent} E-Mails gesendet.")
@@ -2,12 +2,28 @@
 """
 LOCOSOFT KOMPLETT-MIRROR nach PostgreSQL
 =========================================
-Version: 2.0
+Version: 3.0
 Datum: 2025-12-23 (TAG 136 - PostgreSQL Migration)
+TAG 220: COPY-Streaming, parallele Worker, Shadow-Tabellen mit atomarem Swap
 
 Spiegelt ALLE Locosoft-Tabellen nach UNSERE PostgreSQL-Datenbank.
 Prefix: loco_ (vermeidet Konflikte mit eigenen Tabellen)
 
+Ablauf pro Tabelle (v3.0):
+    1. Shadow-Tabelle loco_<name>__new anlegen
+    2. COPY (SELECT ...) TO STDOUT (Locosoft) → COPY ... FROM STDIN (Portal),
+       gestreamt über einen Puffer – keine Python-Konvertierung pro Wert
+    3. Indizes auf der Shadow-Tabelle bauen
+    4. Swap in EINER Transaktion: loco_<name> → __old, __new → loco_<name>, DROP __old
+       → Dashboards sehen immer eine vollständige Tabelle (nie leer/halb befüllt)
+    Mehrere Tabellen laufen parallel (--workers).
+
+Inkrementell (TAG 220, --mode incremental):
+    Tabellen aus SYNC_STRATEGIES werden nur im geänderten Bereich nachgezogen
+    (Datumsfenster bzw. Schlüsselfenster ab High-Water-Mark aus loco_sync_state).
+    DELETE + COPY des Fensters laufen in einer Transaktion → Leser sehen nie Lücken.
+    Celery: alle 15 Min (Arbeitszeit) inkrementell, 19:00 weiterhin voll.
+
 QUELLE: Locosoft PostgreSQL (10.80.80.8)
 ZIEL:   Greiner Portal PostgreSQL (127.0.0.1/drive_portal)
 
@@ -16,6 +32,8 @@ Verwendung:
     python locosoft_mirror.py --tables journal_accountings,vehicles
     python locosoft_mirror.py --min-rows 100     # Nur Tabellen mit >100 Zeilen
     python locosoft_mirror.py --dry-run          # Nur zeigen, nicht syncen
+    python locosoft_mirror.py --workers 6        # Anzahl paralleler Tabellen (Default: 4)
+    python locosoft_mirror.py --mode incremental # Nur Delta-Tabellen, nur geänderte Fenster
 
 Celery Schedule:
     Taeglich 19:00 Uhr (nach Locosoft-Sync)
@@ -24,13 +42,17 @@ Celery Schedule:
 import os
 import sys
 import json
+import queue
+import hashlib
 import argparse
+import threading
+import time
 import psycopg2
+import psycopg2.errors
 from psycopg2 import sql
-from psycopg2.extras import execute_batch
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional
-from decimal import Decimal
+from typing import Callable, List, Dict, Any, Optional
 
 # Projekt-Pfad für Imports
 sys.path.insert(0, '/opt/greiner-portal')
@@ -67,6 +89,46 @@ try:
 except ImportError:
     pass
 
+# Suffixe für Shadow-Swap
+SHADOW_SUFFIX = '__new'
+OLD_SUFFIX = '__old'
+
+# Parallele Tabellen-Syncs (je Worker eine Quell- und eine Ziel-Verbindung)
+DEFAULT_WORKERS = 4
+
+# Swap: max. Wartezeit auf den Tabellen-Lock (laufende Dashboard-Queries), dann Retry
+SWAP_LOCK_TIMEOUT = '15s'
+SWAP_RETRIES = 4
+
+# Puffer zwischen COPY TO und COPY FROM (Anzahl Chunks à ~8 KB)
+COPY_PIPE_CHUNKS = 256
+
+# Sync-State (High-Water-Marks, letzter Lauf) – siehe migrations/add_loco_sync_state_table.sql
+SYNC_STATE_TABLE = 'loco_sync_state'
+
+# Sync-Strategien pro Tabelle (TAG 220). Nicht aufgeführte Tabellen: 'full' (Shadow-Swap).
+#   date_window:  Zeilen mit <column> >= HWM - lookback_days neu laden (DELETE + COPY)
+#   key_window:   Zeilen mit <column> >= HWM - key_lookback neu laden (append-by-key,
+#                 Lookback fängt Änderungen an jüngsten Schlüsseln ab; 0 = reines Append)
+# Ältere Änderungen (außerhalb des Fensters) holt der nächtliche Voll-Lauf.
+SYNC_STRATEGIES = {
+    'journal_accountings': {'strategy': 'date_window', 'column': 'accounting_date', 'lookback_days': 62},
+    'invoices':            {'strategy': 'date_window', 'column': 'invoice_date', 'lookback_days': 62},
+    'times':               {'strategy': 'date_window', 'column': 'start_time', 'lookback_days': 14},
+    'orders':              {'strategy': 'date_window', 'column': 'order_date', 'lookback_days': 120},
+    'labours':             {'strategy': 'key_window', 'column': 'order_number', 'key_lookback': 5000},
+}
+
+# Abgeleitete Tabellen (TAG 220): werden in derselben Transaktion wie der Sync der
+# Quell-Tabelle neu verdichtet (voll: aus der Shadow-Tabelle, inkrementell: ab Fensterbeginn)
+try:
+    from api.tek_fact import refresh_tek_fact
+    DERIVED_REFRESH = {
+        'journal_accountings': refresh_tek_fact,   # tek_fact_daily (TEK, Breakeven, VM/VJ)
+    }
+except ImportError:
+    DERIVED_REFRESH = {}
+
 # Tabellen die NICHT gespiegelt werden sollen (zu gross oder irrelevant)
 SKIP_TABLES = [
     'model_options_code',      # 1.7 Mio - Konfigurator
@@ -89,9 +151,12 @@ INCLUDE_VIEWS = [
 # LOGGING
 # =============================================================================
 
+_log_lock = threading.Lock()
+
 def log(msg: str, level: str = "INFO"):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{level}] {msg}")
+    with _log_lock:
+        print(f"[{timestamp}] [{level}] {msg}", flush=True)
 
 # =============================================================================
 # DATENBANKVERBINDUNGEN
@@ -103,6 +168,9 @@ def get_locosoft_credentials() -> dict:
         creds = json.load(f)
     return creds['databases']['locosoft']
 
+# Gleiche Text-Darstellung für Datum/Intervall auf beiden Seiten (COPY-Textformat)
+SESSION_OPTIONS = '-c DateStyle=ISO,YMD -c IntervalStyle=postgres -c client_encoding=UTF8'
+
 def connect_locosoft() -> psycopg2.extensions.connection:
     """Verbindung zu Locosoft PostgreSQL (QUELLE)"""
     creds = get_locosoft_credentials()
@@ -111,33 +179,43 @@ def connect_locosoft() -> psycopg2.extensions.connection:
         port=creds['port'],
         database=creds['database'],
         user=creds['user'],
-        password=creds['password']
+        password=creds['password'],
+        options=SESSION_OPTIONS
     )
 
 def connect_target() -> psycopg2.extensions.connection:
     """Verbindung zu unserer PostgreSQL (ZIEL)"""
-    return psycopg2.connect(**TARGET_DB_CONFIG)
+    return psycopg2.connect(options=SESSION_OPTIONS, **TARGET_DB_CONFIG)
 
 # =============================================================================
 # HILFSFUNKTIONEN
 # =============================================================================
 
-def convert_value(val: Any) -> Any:
-    """Konvertiert Werte für PostgreSQL-Insert"""
-    if val is None:
-        return None
-    if isinstance(val, Decimal):
-        return float(val)
-    if isinstance(val, timedelta):
-        # timedelta als Intervall-String speichern
-        total_seconds = val.total_seconds()
-        hours = int(total_seconds // 3600)
-        minutes = int((total_seconds % 3600) // 60)
-        seconds = int(total_seconds % 60)
-        return f"{hours}:{minutes:02d}:{seconds:02d}"
-    if isinstance(val, (list, dict)):
-        return json.dumps(val)
-    return val
+def _ident_name(name: str) -> str:
+    """
+    PostgreSQL-Bezeichner auf 63 Zeichen begrenzen (sonst kürzt PG still und
+    Shadow-/Live-Namen könnten kollidieren) – lange Namen bekommen einen Hash-Suffix.
+    """
+    if len(name) <= 63:
+        return name
+    digest = hashlib.md5(name.encode()).hexdigest()[:8]
+    return f"{name[:54]}_{digest}"
+
+def is_array_column(col: Dict) -> bool:
+    """Array-Spalten werden als JSONB gespiegelt (siehe map_pg_type)"""
+    pg_type = col['type'].lower()
+    return pg_type.endswith('[]') or 'array' in pg_type
+
+def build_select_list(columns: List[Dict]) -> str:
+    """
+    SELECT-Liste für COPY TO: Arrays als JSON-Text (Ziel ist JSONB),
+    alle anderen Spalten unverändert im COPY-Textformat.
+    """
+    parts = []
+    for col in columns:
+        ident = f'"{col["name"]}"'
+        parts.append(f'to_json({ident})' if is_array_column(col) else ident)
+    return ', '.join(parts)
 
 def get_all_tables(source_conn) -> List[Dict]:
     """Alle Tabellen mit Zeilenanzahl aus Locosoft holen"""
@@ -234,16 +312,118 @@ def map_pg_type(col: Dict) -> str:
     # Default: TEXT
     return 'TEXT'
 
+# =============================================================================
+# COPY-STREAMING
+# =============================================================================
+
+class CopyPipe:
+    """
+    Puffer zwischen COPY TO STDOUT (Locosoft, Writer-Thread) und
+    COPY FROM STDIN (Portal, Reader). Begrenzte Queue → konstanter Speicher.
+    """
+
+    def __init__(self, max_chunks: int = COPY_PIPE_CHUNKS):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._buffer = b''
+        self._eof = False
+        self.aborted = False
+
+    # --- Writer-Seite (psycopg2 copy_expert TO) ---
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        while True:
+            if self.aborted:
+                raise IOError("COPY-Ziel abgebrochen")
+            try:
+                self._queue.put(data, timeout=1)
+                return len(data)
+            except queue.Full:
+                continue
+
+    def close_writer(self):
+        while not self.aborted:
+            try:
+                self._queue.put(None, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    # --- Reader-Seite (psycopg2 copy_expert FROM) ---
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def abort(self):
+        self.aborted = True
+        # Writer ggf. aus blockierendem put() befreien
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+def copy_rows(source_conn, target_conn, select_sql: str, target_table: str, columns: List[Dict]) -> int:
+    """
+    Streamt das Ergebnis von select_sql per COPY von Locosoft in target_table.
+
+    Quelle läuft in einem eigenen Thread, das Ziel liest parallel aus dem Puffer.
+    Commit ist Sache des Aufrufers (target_conn bleibt in der Transaktion).
+
+    Returns:
+        Anzahl kopierter Zeilen
+    """
+    pipe = CopyPipe()
+    source_error = []
+
+    def produce():
+        try:
+            with source_conn.cursor() as cur:
+                cur.copy_expert(f"COPY ({select_sql}) TO STDOUT", pipe)
+            source_conn.rollback()
+        except Exception as e:
+            source_error.append(e)
+        finally:
+            pipe.close_writer()
+
+    producer = threading.Thread(target=produce, name=f"copy-{target_table}", daemon=True)
+    producer.start()
+
+    col_list = ', '.join(f'"{c["name"]}"' for c in columns)
+    try:
+        with target_conn.cursor() as cur:
+            cur.copy_expert(f'COPY "{target_table}" ({col_list}) FROM STDIN', pipe, size=65536)
+            copied = cur.rowcount
+    except Exception:
+        pipe.abort()
+        producer.join()
+        raise
+    producer.join()
+
+    # Quelle abgebrochen → Ziel hat nur einen Teil bekommen, darf nicht übernommen werden
+    if source_error:
+        raise source_error[0]
+    return copied
+
 # =============================================================================
 # SYNC-FUNKTIONEN
 # =============================================================================
 
-def create_target_table(target_conn, table_name: str, columns: List[Dict]):
-    """PostgreSQL-Tabelle in Ziel-DB erstellen (DROP + CREATE)"""
+def create_target_table(target_conn, target_table: str, columns: List[Dict]):
+    """Tabelle in Ziel-DB anlegen (DROP + CREATE, ohne Commit)"""
     cursor = target_conn.cursor()
-    target_table = f"{TABLE_PREFIX}{table_name}"
 
-    # Drop falls existiert
+    # Drop falls existiert (z. B. Reste eines abgebrochenen Laufs)
     cursor.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(
         sql.Identifier(target_table)
     ))
@@ -257,72 +437,315 @@ def create_target_table(target_conn, table_name: str, columns: List[Dict]):
 
     create_sql = f'CREATE TABLE "{target_table}" ({", ".join(col_defs)})'
     cursor.execute(create_sql)
-    target_conn.commit()
 
-def sync_table(source_conn, target_conn, table_name: str, columns: List[Dict], batch_size: int = 5000) -> int:
-    """Tabelle von Locosoft nach unserer PostgreSQL kopieren"""
-    source_cursor = source_conn.cursor()
-    target_cursor = target_conn.cursor()
-    target_table = f"{TABLE_PREFIX}{table_name}"
-
-    # Alle Daten lesen
-    col_names = [f'"{c["name"]}"' for c in columns]
-    source_cursor.execute(f'SELECT {",".join(col_names)} FROM "{table_name}"')
-
-    # Insert vorbereiten
-    placeholders = ','.join(['%s' for _ in columns])
-    col_names_target = [f'"{c["name"]}"' for c in columns]
-    insert_sql = f'INSERT INTO "{target_table}" ({",".join(col_names_target)}) VALUES ({placeholders})'
-
-    total = 0
-    while True:
-        rows = source_cursor.fetchmany(batch_size)
-        if not rows:
-            break
-
-        # Werte konvertieren
-        converted_rows = []
-        for row in rows:
-            converted_rows.append(tuple(convert_value(val) for val in row))
-
-        # Batch-Insert
-        execute_batch(target_cursor, insert_sql, converted_rows, page_size=1000)
-        total += len(rows)
-
-        if total % 50000 == 0:
-            log(f"  ... {total:,} Zeilen")
-            target_conn.commit()
+# Typische Index-Felder
+INDEX_CANDIDATES = [
+    'id', 'document_number', 'customer_number', 'vehicle_reference',
+    'accounting_date', 'document_date', 'subsidiary_to_company_ref',
+    'branch_number', 'nominal_account_number', 'employee_number',
+    'invoice_date', 'order_date', 'vin', 'license_plate',
+    'work_start', 'work_end', 'created_timestamp'
+]
 
-    target_conn.commit()
-    return total
+def index_name(table_name: str, col: str, suffix: str = '') -> str:
+    """Name des Standard-Index (Live-Name ohne Suffix, Shadow mit SHADOW_SUFFIX)"""
+    return _ident_name(f"idx_{TABLE_PREFIX}{table_name}_{col}{suffix}")
 
-def create_indexes(target_conn, table_name: str, columns: List[Dict]):
-    """Standard-Indizes erstellen"""
-    cursor = target_conn.cursor()
-    target_table = f"{TABLE_PREFIX}{table_name}"
+def create_indexes(target_conn, table_name: str, columns: List[Dict], target_table: Optional[str] = None,
+                   suffix: str = '') -> List[str]:
+    """
+    Standard-Indizes erstellen (ohne Commit).
 
-    # Typische Index-Felder
-    index_candidates = [
-        'id', 'document_number', 'customer_number', 'vehicle_reference',
-        'accounting_date', 'document_date', 'subsidiary_to_company_ref',
-        'branch_number', 'nominal_account_number', 'employee_number',
-        'invoice_date', 'order_date', 'vin', 'license_plate',
-        'work_start', 'work_end', 'created_timestamp'
-    ]
+    Returns:
+        Liste der indizierten Spalten
+    """
+    cursor = target_conn.cursor()
+    target_table = target_table or f"{TABLE_PREFIX}{table_name}"
 
     # Pruefen welche Spalten existieren
     existing_cols = {col['name'] for col in columns}
+    indexed = []
 
-    for col in index_candidates:
+    for col in INDEX_CANDIDATES:
         if col in existing_cols:
-            idx_name = f"idx_{target_table}_{col}"
+            idx_name = index_name(table_name, col, suffix)
+            cursor.execute("SAVEPOINT idx")
             try:
                 cursor.execute(f'CREATE INDEX IF NOT EXISTS "{idx_name}" ON "{target_table}"("{col}")')
+                cursor.execute("RELEASE SAVEPOINT idx")
+                indexed.append(col)
             except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT idx")
                 log(f"  Index {idx_name} Fehler: {e}", "WARN")
 
+    return indexed
+
+def swap_shadow_table(target_conn, table_name: str, indexed_cols: List[str]):
+    """
+    Shadow-Tabelle atomar gegen die Live-Tabelle tauschen und committen.
+
+    Live → __old, __new → Live, DROP __old, Shadow-Indizes auf Live-Namen umbenennen.
+    Lesende Queries halten ACCESS SHARE-Locks; der Swap wartet max. SWAP_LOCK_TIMEOUT
+    und versucht es dann erneut, statt neue Leser hinter sich aufzustauen.
+    """
+    live = f"{TABLE_PREFIX}{table_name}"
+    shadow = _ident_name(f"{live}{SHADOW_SUFFIX}")
+    old = _ident_name(f"{live}{OLD_SUFFIX}")
+    cursor = target_conn.cursor()
+
+    for attempt in range(1, SWAP_RETRIES + 1):
+        cursor.execute("SAVEPOINT swap")
+        try:
+            cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+            cursor.execute("SELECT to_regclass(%s)", (f'"{live}"',))
+            live_exists = cursor.fetchone()[0] is not None
+            if live_exists:
+                cursor.execute(f'DROP TABLE IF EXISTS "{old}" CASCADE')
+                cursor.execute(f'ALTER TABLE "{live}" RENAME TO "{old}"')
+            cursor.execute(f'ALTER TABLE "{shadow}" RENAME TO "{live}"')
+            if live_exists:
+                # CASCADE: abhängige Views wurden auch bisher bei jedem Lauf entfernt
+                cursor.execute(f'DROP TABLE "{old}" CASCADE')
+            for col in indexed_cols:
+                cursor.execute(
+                    f'ALTER INDEX "{index_name(table_name, col, SHADOW_SUFFIX)}" '
+                    f'RENAME TO "{index_name(table_name, col)}"'
+                )
+            cursor.execute("RELEASE SAVEPOINT swap")
+            target_conn.commit()
+            return
+        except psycopg2.errors.LockNotAvailable:
+            cursor.execute("ROLLBACK TO SAVEPOINT swap")
+            log(f"  {table_name}: Swap wartet auf Lock (Versuch {attempt}/{SWAP_RETRIES})", "WARN")
+            time.sleep(2 * attempt)
+
+    raise RuntimeError(f"Swap für {live} nicht möglich: Tabelle dauerhaft gesperrt")
+
+def sync_table(source_conn, target_conn, table_name: str, columns: List[Dict],
+               before_swap: Optional[Callable[[str, int], None]] = None) -> int:
+    """
+    Tabelle von Locosoft nach unserer PostgreSQL kopieren (Shadow + Swap).
+
+    Bis zum Swap-Commit sehen Leser unverändert die bisherige loco_-Tabelle.
+    before_swap(shadow_table, rows) läuft in derselben Transaktion wie der Swap
+    (z. B. Sync-State schreiben).
+    """
+    live = f"{TABLE_PREFIX}{table_name}"
+    shadow = _ident_name(f"{live}{SHADOW_SUFFIX}")
+
+    create_target_table(target_conn, shadow, columns)
+    select_sql = f'SELECT {build_select_list(columns)} FROM "{table_name}"'
+    total = copy_rows(source_conn, target_conn, select_sql, shadow, columns)
+    indexed = create_indexes(target_conn, table_name, columns, target_table=shadow, suffix=SHADOW_SUFFIX)
+    if before_swap is not None:
+        before_swap(shadow, total)
+    swap_shadow_table(target_conn, table_name, indexed)
+    return total
+
+# =============================================================================
+# SYNC-STATE & INKREMENTELLE STRATEGIEN (TAG 220)
+# =============================================================================
+
+def ensure_sync_state_table(target_conn):
+    """loco_sync_state anlegen, falls die Migration noch nicht lief"""
+    cursor = target_conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} (
+            table_name      VARCHAR(100) PRIMARY KEY,
+            strategy        VARCHAR(20) NOT NULL,
+            hwm_column      VARCHAR(100),
+            hwm_value       TEXT,
+            columns_hash    VARCHAR(32),
+            last_run_at     TIMESTAMP,
+            last_full_at    TIMESTAMP,
+            last_mode       VARCHAR(20),
+            rows_last_run   BIGINT,
+            duration_s      NUMERIC(10,1),
+            status          VARCHAR(20),
+            error           TEXT
+        )
+    """)
     target_conn.commit()
 
+def columns_hash(columns: List[Dict]) -> str:
+    """Fingerprint der Quellspalten – ändert sich das Schema, wird voll gesynct"""
+    signature = '|'.join(f"{c['name']}:{c['type']}" for c in columns)
+    return hashlib.md5(signature.encode()).hexdigest()
+
+def get_sync_state(target_conn, table_name: str) -> Optional[Dict]:
+    cursor = target_conn.cursor()
+    cursor.execute(f"""
+        SELECT strategy, hwm_column, hwm_value, columns_hash
+        FROM {SYNC_STATE_TABLE} WHERE table_name = %s
+    """, (table_name,))
+    row = cursor.fetchone()
+    target_conn.rollback()
+    if not row:
+        return None
+    return {'strategy': row[0], 'hwm_column': row[1], 'hwm_value': row[2], 'columns_hash': row[3]}
+
+def save_sync_state(target_conn, table_name: str, strategy: str, mode: str, rows: int, seconds: float,
+                    hwm_column: Optional[str] = None, hwm_value: Optional[str] = None,
+                    cols_hash: Optional[str] = None, status: str = 'ok', error: Optional[str] = None):
+    """
+    Sync-State schreiben (ohne Commit – läuft in der Daten-Transaktion mit,
+    damit HWM und Daten immer zusammenpassen).
+    """
+    cursor = target_conn.cursor()
+    cursor.execute(f"""
+        INSERT INTO {SYNC_STATE_TABLE}
+            (table_name, strategy, hwm_column, hwm_value, columns_hash, last_run_at,
+             last_full_at, last_mode, rows_last_run, duration_s, status, error)
+        VALUES (%s, %s, %s, %s, %s, NOW(), CASE WHEN %s = 'full' THEN NOW() END, %s, %s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            strategy      = EXCLUDED.strategy,
+            hwm_column    = COALESCE(EXCLUDED.hwm_column, {SYNC_STATE_TABLE}.hwm_column),
+            hwm_value     = COALESCE(EXCLUDED.hwm_value, {SYNC_STATE_TABLE}.hwm_value),
+            columns_hash  = COALESCE(EXCLUDED.columns_hash, {SYNC_STATE_TABLE}.columns_hash),
+            last_run_at   = NOW(),
+            last_full_at  = COALESCE(EXCLUDED.last_full_at, {SYNC_STATE_TABLE}.last_full_at),
+            last_mode     = EXCLUDED.last_mode,
+            rows_last_run = EXCLUDED.rows_last_run,
+            duration_s    = EXCLUDED.duration_s,
+            status        = EXCLUDED.status,
+            error         = EXCLUDED.error
+    """, (table_name, strategy, hwm_column, hwm_value, cols_hash, mode, mode, rows, seconds, status, error))
+
+def read_hwm(target_conn, target_table: str, column: str) -> Optional[str]:
+    """Aktueller High-Water-Mark (MAX der Strategie-Spalte) als Text"""
+    cursor = target_conn.cursor()
+    cursor.execute(f'SELECT MAX("{column}")::text FROM "{target_table}"')
+    return cursor.fetchone()[0]
+
+def window_start(config: Dict, hwm_value: str):
+    """Beginn des neu zu ladenden Fensters aus HWM + Lookback"""
+    if config['strategy'] == 'date_window':
+        hwm_date = date.fromisoformat(hwm_value[:10])
+        return min(hwm_date, date.today()) - timedelta(days=config['lookback_days'])
+    return int(hwm_value) - config.get('key_lookback', 0)
+
+def sync_table_window(source_conn, target_conn, table_name: str, columns: List[Dict],
+                      config: Dict, hwm_value: str) -> int:
+    """
+    Fenster-Sync (date_window / key_window) direkt in der Live-Tabelle.
+
+    DELETE des Fensters + COPY aus Locosoft in EINER Transaktion (MVCC): Leser sehen
+    bis zum Commit den alten Stand, danach den neuen – nie ein leeres Fenster.
+    Commit macht der Aufrufer (zusammen mit dem Sync-State).
+    """
+    live = f"{TABLE_PREFIX}{table_name}"
+    column = config['column']
+    start = window_start(config, hwm_value)
+
+    target_cursor = target_conn.cursor()
+    target_cursor.execute(f'DELETE FROM "{live}" WHERE "{column}" >= %s', (start,))
+    deleted = target_cursor.rowcount
+
+    with source_conn.cursor() as source_cursor:
+        select_sql = source_cursor.mogrify(
+            f'SELECT {build_select_list(columns)} FROM "{table_name}" WHERE "{column}" >= %s', (start,)
+        ).decode()
+    copied = copy_rows(source_conn, target_conn, select_sql, live, columns)
+    log(f"  {table_name}: Fenster {column} >= {start}: {deleted:,} ersetzt, {copied:,} geladen")
+    return copied
+
+def refresh_derived(target_conn, table_name: str, source_table: str, von=None):
+    """Abgeleitete Tabellen zur Quell-Tabelle neu verdichten (ohne Commit, siehe DERIVED_REFRESH)"""
+    refresh = DERIVED_REFRESH.get(table_name)
+    if refresh is None:
+        return
+    rows = refresh(target_conn, source_table=source_table, von=von)
+    if rows < 0:
+        log(f"  {table_name}: abgeleitete Tabelle fehlgeschlagen (Leser fallen auf die Quell-Tabelle zurück)", "WARN")
+    else:
+        log(f"  {table_name}: abgeleitete Tabelle neu verdichtet ({rows:,} Zeilen"
+            f"{'' if von is None else f' ab {von}'})")
+
+def sync_one_table(table_name: str, mode: str = 'auto') -> Dict[str, Any]:
+    """
+    Worker: eine Tabelle mit eigenen Verbindungen spiegeln.
+
+    Args:
+        mode: 'full' = immer Shadow-Swap, 'auto'/'incremental' = Strategie aus
+              SYNC_STRATEGIES, sofern HWM vorhanden und Schema unverändert
+
+    Returns:
+        {'table', 'rows', 'seconds', 'error', 'mode'}
+    """
+    started = time.monotonic()
+    result = {'table': table_name, 'rows': 0, 'seconds': 0.0, 'error': None, 'mode': 'full', 'skipped': False}
+    config = SYNC_STRATEGIES.get(table_name, {'strategy': 'full'})
+    source_conn = target_conn = None
+    try:
+        source_conn = connect_locosoft()
+        target_conn = connect_target()
+
+        # Parallele Läufe (15-Min-Delta vs. nächtlicher Voll-Lauf) auf derselben Tabelle verhindern
+        cursor = target_conn.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (f"locosoft_mirror:{table_name}",))
+        if not cursor.fetchone()[0]:
+            target_conn.rollback()
+            result['skipped'] = True
+            result['error'] = 'Läuft bereits in einem anderen Prozess'
+            return result
+        target_conn.rollback()
+
+        # Spalten holen
+        columns = get_table_columns(source_conn, table_name)
+        if not columns:
+            result['error'] = 'Keine Spalten gefunden'
+            return result
+        cols_hash = columns_hash(columns)
+
+        state = get_sync_state(target_conn, table_name)
+        incremental = (
+            mode != 'full'
+            and config['strategy'] != 'full'
+            and state is not None
+            and state['hwm_value'] is not None
+            and state['hwm_column'] == config['column']
+            and state['columns_hash'] == cols_hash
+        )
+        column = config.get('column')
+
+        if incremental:
+            result['mode'] = config['strategy']
+            result['rows'] = sync_table_window(source_conn, target_conn, table_name, columns, config, state['hwm_value'])
+            refresh_derived(target_conn, table_name, f"{TABLE_PREFIX}{table_name}",
+                            window_start(config, state['hwm_value']))
+            hwm = read_hwm(target_conn, f"{TABLE_PREFIX}{table_name}", column)
+            save_sync_state(target_conn, table_name, config['strategy'], config['strategy'], result['rows'],
+                            round(time.monotonic() - started, 1), column, hwm, cols_hash)
+            target_conn.commit()
+        else:
+            # Voll-Sync; HWM der Shadow-Tabelle wird in derselben Transaktion wie der Swap gespeichert
+            def record_state(shadow: str, rows: int):
+                refresh_derived(target_conn, table_name, shadow)
+                hwm = read_hwm(target_conn, shadow, column) if column else None
+                save_sync_state(target_conn, table_name, config['strategy'], 'full', rows,
+                                round(time.monotonic() - started, 1), column, hwm, cols_hash)
+
+            result['rows'] = sync_table(source_conn, target_conn, table_name, columns, before_swap=record_state)
+    except Exception as e:
+        result['error'] = str(e)
+        if target_conn is not None:
+            try:
+                target_conn.rollback()
+                save_sync_state(target_conn, table_name, config['strategy'], result['mode'], 0,
+                                round(time.monotonic() - started, 1), status='error', error=str(e)[:1000])
+                target_conn.commit()
+            except Exception:
+                pass
+    finally:
+        for conn in (source_conn, target_conn):
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        result['seconds'] = round(time.monotonic() - started, 1)
+    return result
+
 # =============================================================================
 # HAUPTFUNKTION
 # =============================================================================
@@ -333,6 +756,10 @@ def main():
     parser.add_argument('--min-rows', type=int, default=0, help='Nur Tabellen mit mindestens X Zeilen')
     parser.add_argument('--dry-run', action='store_true', help='Nur anzeigen, nicht syncen')
     parser.add_argument('--no-skip', action='store_true', help='Auch uebersprungene Tabellen syncen')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Parallele Tabellen (Default: 4)')
+    parser.add_argument('--mode', choices=['full', 'auto', 'incremental'], default='full',
+                        help='full (Default, nächtlich): alles voll; auto: Delta-Strategie wo möglich; '
+                             'incremental: nur Delta-Tabellen')
     args = parser.parse_args()
 
     log("=" * 60)
@@ -341,27 +768,39 @@ def main():
     log("=" * 60)
     log(f"QUELLE: Locosoft PostgreSQL ({get_locosoft_credentials()['host']})")
     log(f"ZIEL:   Greiner Portal PostgreSQL ({TARGET_DB_CONFIG['host']}:{TARGET_DB_CONFIG['port']}/{TARGET_DB_CONFIG['database']})")
+    log(f"WORKER: {args.workers} (COPY-Streaming, Shadow-Swap)")
+    log(f"MODUS:  {args.mode}")
     log("=" * 60)
 
-    # Verbindungen
-    log("\nVerbinde zu Locosoft PostgreSQL (QUELLE)...")
-    source_conn = connect_locosoft()
-
-    log("Verbinde zu Greiner Portal PostgreSQL (ZIEL)...")
+    # Sync-State-Tabelle sicherstellen
     target_conn = connect_target()
+    try:
+        ensure_sync_state_table(target_conn)
+    finally:
+        target_conn.close()
 
     # Tabellen ermitteln
-    if args.tables:
+    if args.mode == 'incremental' and not args.tables:
+        # Nur Tabellen mit Delta-Strategie (kein information_schema-Scan nötig)
+        tables = [{'name': t, 'rows': '?'} for t in SYNC_STRATEGIES]
+    elif args.tables:
         table_names = [t.strip() for t in args.tables.split(',')]
         tables = [{'name': t, 'rows': '?'} for t in table_names]
     else:
         log("Ermittle alle Tabellen aus Locosoft...")
-        tables = get_all_tables(source_conn)
+        source_conn = connect_locosoft()
+        try:
+            tables = get_all_tables(source_conn)
+        finally:
+            source_conn.close()
 
     # Filtern
-    if args.min_rows > 0:
+    if args.min_rows > 0 and args.mode != 'incremental':
         tables = [t for t in tables if isinstance(t['rows'], int) and t['rows'] >= args.min_rows]
 
+    if args.mode == 'incremental':
+        tables = [t for t in tables if t['name'] in SYNC_STRATEGIES]
+
     if not args.no_skip:
         tables = [t for t in tables if t['name'] not in SKIP_TABLES]
 
@@ -377,43 +816,31 @@ def main():
         log(f"\nGesamt: {total_rows:,} Zeilen")
         return
 
-    # Sync durchfuehren
+    # Sync durchfuehren (grösste Tabellen zuerst – get_all_tables sortiert absteigend)
     log("\n" + "=" * 60)
     log("SYNC STARTEN")
     log("=" * 60)
 
     stats = {'success': 0, 'failed': 0, 'rows': 0}
     errors = []
-
-    for i, table in enumerate(tables, 1):
-        table_name = table['name']
-        log(f"\n[{i}/{len(tables)}] {table_name}...")
-
-        try:
-            # Spalten holen
-            columns = get_table_columns(source_conn, table_name)
-            if not columns:
-                log(f"  Keine Spalten gefunden - uebersprungen")
-                continue
-
-            # Tabelle erstellen
-            create_target_table(target_conn, table_name, columns)
-
-            # Daten kopieren
-            rows = sync_table(source_conn, target_conn, table_name, columns)
-
-            # Indizes erstellen
-            create_indexes(target_conn, table_name, columns)
-
-            log(f"  OK: {rows:,} Zeilen")
-            stats['success'] += 1
-            stats['rows'] += rows
-
-        except Exception as e:
-            log(f"  FEHLER: {e}", "ERROR")
-            errors.append(f"{table_name}: {e}")
-            stats['failed'] += 1
-            target_conn.rollback()
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix='mirror') as executor:
+        futures = {executor.submit(sync_one_table, t['name'], args.mode): t['name'] for t in tables}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            table_name = result['table']
+            if result['skipped']:
+                log(f"[{done}/{len(tables)}] {table_name}: übersprungen ({result['error']})", "WARN")
+            elif result['error']:
+                log(f"[{done}/{len(tables)}] {table_name}: FEHLER: {result['error']}", "ERROR")
+                errors.append(f"{table_name}: {result['error']}")
+                stats['failed'] += 1
+            else:
+                log(f"[{done}/{len(tables)}] {table_name}: OK {result['rows']:,} Zeilen "
+                    f"({result['mode']}, {result['seconds']}s)")
+                stats['success'] += 1
+                stats['rows'] += result['rows']
 
     # Zusammenfassung
     log("\n" + "=" * 60)
@@ -422,6 +849,7 @@ def main():
     log(f"Tabellen synchronisiert: {stats['success']}")
     log(f"Tabellen fehlgeschlagen: {stats['failed']}")
     log(f"Zeilen gesamt:           {stats['rows']:,}")
+    log(f"Dauer:                   {time.monotonic() - started:.0f}s")
 
     if errors:
         log(f"\nFehler ({len(errors)}):", "ERROR")
@@ -430,10 +858,6 @@ def main():
 
     log("\nMirror abgeschlossen!")
 
-    # Cleanup
-    source_conn.close()
-    target_conn.close()
-
 if __name__ == '__main__':
     try:
         main()
@@ -222,6 +222,31 @@ async function loadLetzteTransaktionen() {
     }
 }
 
+// TAG 220: KI-Kategorisierung läuft als Celery-Job → Status pollen
+function pollKiKategorisierung(jobId, versuch) {
+    versuch = versuch || 0;
+    if (versuch > 120) return;  // max. ~10 Minuten
+    setTimeout(async function() {
+        try {
+            const res = await fetch('/api/bankenspiegel/transaktionen/kategorisieren/ki/' + encodeURIComponent(jobId));
+            const data = await parseJsonResponse(res);
+            if (!data.fertig) {
+                pollKiKategorisierung(jobId, versuch + 1);
+                return;
+            }
+            const e = data.ergebnis || {};
+            if (data.success && e.success !== false) {
+                showToast((e.ki_aktualisiert || 0) + ' per KI (LM Studio) kategorisiert.', false);
+                loadDashboard();
+            } else {
+                showToast('KI-Kategorisierung fehlgeschlagen: ' + (data.error || e.error || 'Unbekannt'), true);
+            }
+        } catch (err) {
+            console.error('KI-Kategorisierung Status:', err);
+        }
+    }, 5000);
+}
+
 async function runKategorisieren() {
     const btn = document.getElementById('btnKategorisieren');
     if (!btn) return;
@@ -247,12 +272,14 @@ async function runKategorisieren() {
             const sonstigeN = (r.sonstige_neu_pruefen && r.sonstige_neu_pruefen.aktualisiert) ? r.sonstige_neu_pruefen.aktualisiert : 0;
             var msg = n + ' per Regeln';
             if (ki > 0) msg += ', ' + ki + ' per KI (LM Studio)';
-            else if (mitKi) msg += '. Keine weiteren unkategorisierten für KI.';
+            else if (r.ki_job_id) msg += '. KI (LM Studio) läuft im Hintergrund…';
+            else if (mitKi) msg += '. KI konnte nicht gestartet werden' + (r.ki_fehler ? ': ' + r.ki_fehler : '.');
             if (sonstigeN > 0) msg += ' · ' + sonstigeN + ' aus Sonstige neu zugeordnet.';
             btn.disabled = false;
             btn.innerHTML = '<i class="bi bi-tags me-1"></i>Kategorisieren';
             showToast(msg, false);
             loadDashboard();
+            if (r.ki_job_id) pollKiKategorisierung(r.ki_job_id);
         } else {
             showToast('Fehler: ' + (data.error || 'Unbekannt'), true);
         }
@@ -0,0 +1,68 @@
+/**
+ * DriveJobs - Client für langsame Endpunkte mit Job-Offload (api/job_offload.py)
+ * ============================================================================
+ *
+ * DriveJobs.fetch(url, options) verhält sich wie fetch(), sendet aber
+ * 'Prefer: respond-async'. Antwortet der Server mit 202 + job_id, wird der
+ * Job-Status gepollt und am Ende eine Response mit dem Ergebnis der View
+ * (JSON, ursprünglicher HTTP-Status) geliefert. Der Gunicorn-Worker ist
+ * währenddessen frei.
+ *
+ * Verwendung:
+ *   DriveJobs.fetch('/api/ai/query', { method: 'POST', body: ... }).then(r => r.json())
+ *
+ * TAG 220
+ */
+
+const DriveJobs = (function() {
+    const POLL_START_MS = 500;
+    const POLL_MAX_MS = 2000;
+    const TIMEOUT_MS = 10 * 60 * 1000;
+
+    function sleep(ms) {
+        return new Promise(function(resolve) { setTimeout(resolve, ms); });
+    }
+
+    function jsonResponse(payload, status) {
+        return new Response(JSON.stringify(payload), {
+            status: status || 200,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+
+    async function waitFor(statusUrl) {
+        const start = Date.now();
+        let interval = POLL_START_MS;
+        while (Date.now() - start < TIMEOUT_MS) {
+            await sleep(interval);
+            interval = Math.min(interval * 1.5, POLL_MAX_MS);
+
+            const r = await fetch(statusUrl, { credentials: 'same-origin' });
+            if (r.status === 404) {
+                return jsonResponse({ success: false, error: 'Job nicht gefunden oder abgelaufen' }, 404);
+            }
+            const job = await r.json();
+            if (job.status === 'done') {
+                return jsonResponse(job.ergebnis, job.http_status);
+            }
+            if (job.status === 'error') {
+                return jsonResponse({ success: false, error: job.error || 'Job fehlgeschlagen' }, 500);
+            }
+        }
+        return jsonResponse({ success: false, error: 'Zeitüberschreitung beim Warten auf das Ergebnis' }, 504);
+    }
+
+    async function jobFetch(url, options) {
+        options = Object.assign({ credentials: 'same-origin' }, options || {});
+        options.headers = Object.assign({}, options.headers || {}, { 'Prefer': 'respond-async' });
+
+        const response = await fetch(url, options);
+        if (response.status !== 202) {
+            return response;
+        }
+        const job = await response.json();
+        return waitFor(job.status_url);
+    }
+
+    return { fetch: jobFetch };
+})();
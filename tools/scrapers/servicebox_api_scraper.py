@@ -7,6 +7,13 @@ Verwendet API-Endpoint statt Selenium für bessere Performance.
 - Selenium nur für Login (Session-Cookies)
 - Requests für API-Calls (viel schneller)
 - BeautifulSoup für HTML-Parsing
+
+TAG 220: einzige ServiceBox-Bestellungs-Engine (inkrementell, parallel, mit
+Checkpoint und laufendem DB-Schreiben) – siehe Abschnitt CRAWL-ENGINE.
+
+Verwendung:
+    python3 tools/scrapers/servicebox_api_scraper.py                 # inkrementell
+    python3 tools/scrapers/servicebox_api_scraper.py --voll --budget 3500
 """
 
 import os
@@ -14,7 +21,12 @@ import sys
 import time
 import json
 import re
+import queue
+import hashlib
+import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from bs4 import BeautifulSoup
 from selenium import webdriver
@@ -151,9 +163,12 @@ def extract_bestellungen_from_html(html):
                 url = f"https://servicebox.mpsa.com/panier/{href}"
             
             if not any(b['nummer'] == bestellnummer for b in bestellungen):
+                # TAG 220: Zeilentext der Liste (Status, Datum, Beträge) für den Inkrementell-Modus
+                zeile = link.find_parent('tr')
                 bestellungen.append({
                     'nummer': bestellnummer,
-                    'url': url
+                    'url': url,
+                    'zeile': zeile.get_text(' ', strip=True) if zeile else text
                 })
 
     # Methode 2: Fallback - Regex auf gesamter Seite
@@ -268,8 +283,15 @@ def fetch_bestellungen_page(session, rrdi, page=0):
         return None, None
 
 
-def fetch_all_bestellungen(session, rrdi, max_pages=500):
-    """Hole alle Bestellungen über alle Seiten"""
+def fetch_all_bestellungen(session, rrdi, max_pages=500, checkpoint=None, deadline=None):
+    """
+    Hole alle Bestellungen über alle Seiten.
+
+    TAG 220: mit checkpoint wird nach jeder Seite gesichert; ein Folgelauf setzt bei der
+    nächsten Seite fort (Seite 1 wird immer geladen – sie initialisiert den Pager der
+    Server-Session und enthält die neuesten Bestellungen). Nach deadline (time.monotonic())
+    wird abgebrochen, ohne die Liste als fertig zu markieren.
+    """
     log("\n📋 HOLE ALLE BESTELLUNGEN")
     log("="*80)
     
@@ -277,6 +299,14 @@ def fetch_all_bestellungen(session, rrdi, max_pages=500):
     page = 0
     seen_bestellnummern = set()
     total_expected = None
+    fortsetzen_ab = 0
+    
+    if checkpoint is not None and checkpoint.bestellungen:
+        all_bestellungen = list(checkpoint.bestellungen)
+        seen_bestellnummern = {b['nummer'] for b in all_bestellungen}
+        total_expected = checkpoint.total
+        fortsetzen_ab = checkpoint.naechste_seite
+        log(f"   ↪️  Fortsetzung: {len(all_bestellungen)} Bestellungen, weiter ab Seite {fortsetzen_ab + 1}")
     
     while page < max_pages:
         bestellungen, pagination = fetch_bestellungen_page(session, rrdi, page)
@@ -300,7 +330,7 @@ def fetch_all_bestellungen(session, rrdi, max_pages=500):
                 if len(all_bestellungen) <= 20:  # Nur erste 20 loggen
                     log(f"   ✅ {b['nummer']}")
         
-        if new_count == 0:
+        if new_count == 0 and page >= fortsetzen_ab:
             log(f"   ⚠️  Keine neuen Bestellungen auf Seite {page + 1} (alle bereits vorhanden)")
             # Wenn keine neuen Bestellungen UND wir haben die erwartete Anzahl erreicht
             if total_expected and len(all_bestellungen) >= total_expected:
@@ -325,26 +355,30 @@ def fetch_all_bestellungen(session, rrdi, max_pages=500):
             log(f"   ✅ Erwartete Anzahl ({total_expected}) erreicht")
             break
         
-        page += 1
-        time.sleep(0.5)  # Kurze Pause zwischen Requests
+        # Fortsetzung: direkt zur ersten noch nicht geladenen Seite springen
+        page = max(page + 1, fortsetzen_ab)
+        if checkpoint is not None:
+            checkpoint.liste_sichern(page, all_bestellungen, total_expected)
+            if deadline is not None and time.monotonic() > deadline:
+                log(f"   ⏸️  Budget abgelaufen vor Seite {page + 1}")
+                return all_bestellungen
+        time.sleep(0.5)  # Kurze Pause zwischen Requests (Pager ist Server-Zustand → sequenziell)
     
     log(f"\n📊 GESAMT: {len(all_bestellungen)} eindeutige Bestellungen auf {page + 1} Seiten")
     if total_expected:
         log(f"   Erwartet waren: {total_expected} Bestellungen")
     
+    if checkpoint is not None:
+        checkpoint.liste_sichern(page + 1, all_bestellungen, total_expected, fertig=True)
+    
     return all_bestellungen
 
 
-def extract_bestellung_details(session, bestellung_info):
-    """Extrahiere Details für eine Bestellung (aus HTML)"""
-    bestellnummer = bestellung_info['nummer']
-    detail_url = bestellung_info.get('url')
-    
-    log(f"   🔍 Details für {bestellnummer}...")
-    
-    details = {
-        'bestellnummer': bestellnummer,
-        'url': detail_url,
+def leere_details(bestellung_info):
+    """Detail-Struktur ohne Inhalte (auch Ergebnis bei Fehlern)"""
+    return {
+        'bestellnummer': bestellung_info['nummer'],
+        'url': bestellung_info.get('url'),
         'absender': {},
         'empfaenger': {},
         'historie': {},
@@ -352,6 +386,16 @@ def extract_bestellung_details(session, bestellung_info):
         'summen': {},
         'kommentare': {}
     }
+
+
+def extract_bestellung_details(session, bestellung_info):
+    """Extrahiere Details für eine Bestellung (aus HTML)"""
+    bestellnummer = bestellung_info['nummer']
+    detail_url = bestellung_info.get('url')
+    
+    log(f"   🔍 Details für {bestellnummer}...")
+    
+    details = leere_details(bestellung_info)
     
     if not detail_url:
         log(f"      ⚠️  Keine URL vorhanden")
@@ -364,8 +408,20 @@ def extract_bestellung_details(session, bestellung_info):
             log(f"      ⚠️  Status {resp.status_code}")
             return details
         
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        page_text = resp.text
+        return parse_bestellung_details(bestellung_info, resp.text)
+        
+    except Exception as e:
+        log(f"      ⚠️  Fehler: {e}")
+    
+    return details
+
+
+def parse_bestellung_details(bestellung_info, page_text):
+    """Details einer Bestellung aus dem HTML der Detailseite"""
+    details = leere_details(bestellung_info)
+    
+    try:
+        soup = BeautifulSoup(page_text, 'html.parser')
         
         # Absender extrahieren
         absender_code_match = re.search(r'Code Vertragspartner\s*:\s*</td>\s*<td[^>]*>\s*([A-Z0-9]+)', page_text)
@@ -535,43 +591,418 @@ def extract_bestellung_details(session, bestellung_info):
     return details
 
 
-def scrape_all_details(session, bestellungen, max_orders=None):
-    """Extrahiere Details für alle Bestellungen"""
-    log("\n🔍 EXTRAHIERE DETAILS")
-    log("="*80)
-    
+# =============================================================================
+# CRAWL-ENGINE (TAG 220)
+# =============================================================================
+# Bisher: Liste (bis 500 Seiten) und danach jede Detailseite einzeln mit 0,5s Pause,
+# Ergebnis erst am Ende als ein JSON-Dump – ein Timeout im servicebox_master-Task
+# (3600s) verwarf den ganzen Lauf.
+#
+# Jetzt:
+# - Details parallel über einen begrenzten Worker-Pool; jeder Worker leiht sich eine
+#   Session aus dem Pool (alle mit den Cookies des einen Selenium-Logins)
+# - Inkrementell (Standard): Bestellungen, deren Listenzeile seit dem letzten Lauf
+#   unverändert ist, werden nicht erneut geladen; unveränderte Details (detail_hash)
+#   werden nicht neu geschrieben. --voll lädt alle Details.
+# - Checkpoint nach jeder Listenseite und alle DB_COMMIT_EVERY Details; ein
+#   abgebrochener Lauf (Timeout/--budget) setzt beim nächsten Start dort fort
+# - Details werden laufend in stellantis_bestellungen/_positionen geschrieben.
+#   OUTPUT_FILE (Eingabe des Matchers) entsteht am Ende eines vollständigen Laufs
+#   aus den in diesem Lauf geschriebenen Bestellungen.
+
+CHECKPOINT_FILE = f"{BASE_DIR}/logs/servicebox_crawl_checkpoint.json"
+SPOOL_FILE = f"{BASE_DIR}/logs/servicebox_crawl_details.jsonl"
+
+# Checkpoints älter als das werden verworfen (neuer Lauf)
+CHECKPOINT_MAX_AGE_HOURS = 12
+
+DETAIL_WORKERS = int(os.environ.get('SERVICEBOX_DETAIL_WORKERS', '4'))
+DB_COMMIT_EVERY = 20
+
+
+def _hash(value):
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def _atomar_schreiben(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    """Fortschritt eines Laufs (Listenseite, gesammelte Bestellungen, erledigte Details)"""
+
+    def __init__(self, path, modus):
+        self.path = path
+        self.modus = modus
+        self.gestartet = datetime.now()
+        self.liste_fertig = False
+        self.naechste_seite = 0
+        self.total = None
+        self.bestellungen = []
+        self.erledigt = set()
+
+    def laden(self):
+        """True, wenn ein passender, nicht zu alter Checkpoint übernommen wurde"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            gestartet = datetime.fromisoformat(data['gestartet'])
+        except (OSError, ValueError, KeyError) as e:
+            log(f"⚠️  Checkpoint unlesbar ({e}) - starte neu")
+            return False
+        if data.get('modus') != self.modus:
+            return False
+        if (datetime.now() - gestartet).total_seconds() > CHECKPOINT_MAX_AGE_HOURS * 3600:
+            log(f"ℹ️  Checkpoint von {gestartet:%d.%m. %H:%M} zu alt - starte neu")
+            return False
+        self.gestartet = gestartet
+        self.liste_fertig = data.get('liste_fertig', False)
+        self.naechste_seite = data.get('naechste_seite', 0)
+        self.total = data.get('total')
+        self.bestellungen = data.get('bestellungen', [])
+        self.erledigt = set(data.get('erledigt', []))
+        return True
+
+    def liste_sichern(self, naechste_seite, bestellungen, total, fertig=False):
+        self.naechste_seite = naechste_seite
+        self.bestellungen = list(bestellungen)
+        self.total = total
+        self.liste_fertig = fertig
+        self.sichern()
+
+    def sichern(self):
+        _atomar_schreiben(self.path, {
+            'modus': self.modus,
+            'gestartet': self.gestartet.isoformat(),
+            'liste_fertig': self.liste_fertig,
+            'naechste_seite': self.naechste_seite,
+            'total': self.total,
+            'bestellungen': self.bestellungen,
+            'erledigt': sorted(self.erledigt),
+        })
+
+    def loeschen(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SessionPool:
+    """requests-Sessions mit den Cookies eines Logins; je Request wird eine ausgeliehen"""
+
+    def __init__(self, cookies, size):
+        self._sessions = queue.Queue()
+        for _ in range(size):
+            self._sessions.put(create_requests_session(cookies))
+
+    @contextmanager
+    def session(self):
+        s = self._sessions.get()
+        try:
+            yield s
+        finally:
+            self._sessions.put(s)
+
+
+class DetailWriter:
+    """Schreibt geparste Details laufend in stellantis_bestellungen / stellantis_positionen"""
+
+    def __init__(self):
+        sys.path.insert(0, BASE_DIR)
+        from api.db_connection import get_db, sql_placeholder
+        from scripts.imports import import_servicebox_to_db as importer
+
+        self.conn = get_db()
+        self.cursor = self.conn.cursor()
+        self.ph = sql_placeholder()
+        self.importer = importer
+
+    @staticmethod
+    def _wert(row, key, index):
+        return row[key] if isinstance(row, dict) else row[index]
+
+    def bekannte_bestellungen(self):
+        """{bestellnummer: listen_hash} aller Bestellungen mit gespeicherten Details"""
+        self.cursor.execute("""
+            SELECT bestellnummer, listen_hash FROM stellantis_bestellungen
+            WHERE detail_hash IS NOT NULL
+        """)
+        return {self._wert(r, 'bestellnummer', 0): self._wert(r, 'listen_hash', 1)
+                for r in self.cursor.fetchall()}
+
+    def schreiben(self, details, listen_hash):
+        """Upsert einer Bestellung inkl. Positionen. False, wenn die Details unverändert sind."""
+        # SAVEPOINT: ein fehlerhafter Datensatz bricht nicht die ganze Transaktion ab
+        self.cursor.execute("SAVEPOINT servicebox_detail")
+        try:
+            geaendert = self._schreiben(details, listen_hash)
+        except Exception:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT servicebox_detail")
+            raise
+        self.cursor.execute("RELEASE SAVEPOINT servicebox_detail")
+        return geaendert
+
+    def _schreiben(self, details, listen_hash):
+        ph = self.ph
+        bestellnummer = details['bestellnummer']
+        detail_hash = _hash(details)
+
+        self.cursor.execute(
+            f"SELECT id, detail_hash FROM stellantis_bestellungen WHERE bestellnummer = {ph}",
+            (bestellnummer,))
+        existing = self.cursor.fetchone()
+
+        if existing and self._wert(existing, 'detail_hash', 1) == detail_hash:
+            self.cursor.execute(f"""
+                UPDATE stellantis_bestellungen SET listen_hash = {ph}, detail_abgerufen_am = NOW()
+                WHERE id = {ph}
+            """, (listen_hash, self._wert(existing, 'id', 0)))
+            return False
+
+        historie = details.get('historie', {})
+        absender = details.get('absender', {})
+        empfaenger = details.get('empfaenger', {})
+        parsed = details.get('parsed', {})
+        kommentare = details.get('kommentare', {})
+        werte = (
+            self.importer.parse_datum(historie.get('bestelldatum')),
+            absender.get('code'),
+            absender.get('name'),
+            empfaenger.get('code'),
+            parsed.get('lokale_nr') or kommentare.get('lokale_nr'),
+            details.get('url'),
+            kommentare.get('werkstatt') or kommentare.get('kommentar'),
+            parsed.get('kundennummer'),
+            parsed.get('vin'),
+            parsed.get('werkstattauftrag'),
+            listen_hash,
+            detail_hash,
+        )
+
+        if existing:
+            bestellung_id = self._wert(existing, 'id', 0)
+            self.cursor.execute(f"""
+                UPDATE stellantis_bestellungen SET
+                    bestelldatum = {ph}, absender_code = {ph}, absender_name = {ph},
+                    empfaenger_code = {ph}, lokale_nr = {ph}, url = {ph},
+                    kommentar_werkstatt = {ph}, parsed_kundennummer = {ph}, parsed_vin = {ph},
+                    parsed_werkstattauftrag = {ph}, listen_hash = {ph}, detail_hash = {ph},
+                    detail_abgerufen_am = NOW(), import_timestamp = NOW()
+                WHERE id = {ph}
+            """, werte + (bestellung_id,))
+        else:
+            self.cursor.execute(f"""
+                INSERT INTO stellantis_bestellungen (
+                    bestellnummer, bestelldatum, absender_code, absender_name,
+                    empfaenger_code, lokale_nr, url, kommentar_werkstatt,
+                    parsed_kundennummer, parsed_vin, parsed_werkstattauftrag,
+                    listen_hash, detail_hash, detail_abgerufen_am
+                ) VALUES ({', '.join([ph] * 13)}, NOW())
+                RETURNING id
+            """, (bestellnummer,) + werte)
+            bestellung_id = self._wert(self.cursor.fetchone(), 'id', 0)
+
+        # Positionen wie import_servicebox_to_db: nur ersetzen, wenn welche geparst wurden
+        positionen = self.importer.dedupliziere_positionen(details.get('positionen', []))
+        if positionen:
+            self.cursor.execute(f"DELETE FROM stellantis_positionen WHERE bestellung_id = {ph}",
+                                (bestellung_id,))
+            zeile = f"({', '.join([ph] * 12)})"
+            params = []
+            for pos in positionen:
+                params.extend([
+                    bestellung_id,
+                    pos.get('teilenummer'),
+                    pos.get('beschreibung'),
+                    self.importer.parse_menge(pos.get('menge')),
+                    self.importer.parse_menge(pos.get('menge_in_lieferung')),
+                    self.importer.parse_menge(pos.get('menge_in_bestellung')),
+                    pos.get('preis_ohne_mwst'),
+                    pos.get('preis_mit_mwst'),
+                    pos.get('summe_inkl_mwst'),
+                    self.importer.parse_preis(pos.get('preis_ohne_mwst')),
+                    self.importer.parse_preis(pos.get('preis_mit_mwst')),
+                    self.importer.parse_preis(pos.get('summe_inkl_mwst')),
+                ])
+            self.cursor.execute(f"""
+                INSERT INTO stellantis_positionen (
+                    bestellung_id, teilenummer, beschreibung,
+                    menge, menge_in_lieferung, menge_in_bestellung,
+                    preis_ohne_mwst_text, preis_mit_mwst_text, summe_inkl_mwst_text,
+                    preis_ohne_mwst, preis_mit_mwst, summe_inkl_mwst
+                ) VALUES {', '.join([zeile] * len(positionen))}
+            """, params)
+        return True
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def fetch_detail(pool, bestellung_info, deadline=None):
+    """Details einer Bestellung über eine Pool-Session; None bei Fehler oder abgelaufenem Budget"""
+    if deadline is not None and time.monotonic() > deadline:
+        return None
+    if not bestellung_info.get('url'):
+        return None
+    try:
+        with pool.session() as session:
+            resp = session.get(bestellung_info['url'], timeout=30)
+        if resp.status_code != 200:
+            log(f"      ⚠️  {bestellung_info['nummer']}: Status {resp.status_code}")
+            return None
+        return parse_bestellung_details(bestellung_info, resp.text)
+    except Exception as e:
+        log(f"      ⚠️  {bestellung_info['nummer']}: {e}")
+        return None
+
+
+def export_spool(spool_file=None, output_file=None):
+    """Gespoolte Details eines vollständigen Laufs → OUTPUT_FILE (Format wie bisher)"""
+    spool_file = spool_file or SPOOL_FILE
+    output_file = output_file or OUTPUT_FILE
+    details = {}
+    if os.path.exists(spool_file):
+        with open(spool_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    d = json.loads(line)
+                    details[d['bestellnummer']] = d
+    _atomar_schreiben(output_file, {
+        'timestamp': datetime.now().isoformat(),
+        'anzahl_bestellungen': len(details),
+        'bestellungen': list(details.values())
+    })
+    log(f"\n💾 Ergebnisse gespeichert: {output_file} ({len(details)} Bestellungen)")
+
+
+def crawl(session, cookies, rrdi, voll=False, workers=DETAIL_WORKERS, max_orders=None,
+          budget=None, dry_run=False):
+    """
+    Ein Crawl-Lauf (siehe Abschnittskommentar).
+
+    Returns:
+        dict mit Zählern; 'vollstaendig' False, wenn das Budget vor dem Ende ablief
+    """
+    start = time.monotonic()
+    deadline = start + budget if budget else None
+    modus = 'voll' if voll else 'inkrementell'
+
+    checkpoint = Checkpoint(CHECKPOINT_FILE, modus)
+    if checkpoint.laden():
+        log(f"↪️  Setze Lauf vom {checkpoint.gestartet:%d.%m. %H:%M} fort "
+            f"({len(checkpoint.erledigt)} Details erledigt)")
+    elif os.path.exists(SPOOL_FILE):
+        os.remove(SPOOL_FILE)
+
+    # Phase 1: Liste (sequenziell, Pager ist Server-Zustand)
+    if not checkpoint.liste_fertig:
+        fetch_all_bestellungen(session, rrdi, checkpoint=checkpoint, deadline=deadline)
+        if not checkpoint.liste_fertig:
+            log("⏸️  Budget während der Liste abgelaufen - nächster Lauf setzt fort")
+            return {'bestellungen': len(checkpoint.bestellungen), 'vollstaendig': False,
+                    'dauer_sekunden': round(time.monotonic() - start, 1)}
+    bestellungen = checkpoint.bestellungen
     if max_orders:
         bestellungen = bestellungen[:max_orders]
         log(f"⚠️  TEST-MODUS: Nur erste {max_orders} Bestellungen")
-    
-    details_list = []
-    
-    for i, bestellung in enumerate(bestellungen, 1):
-        log(f"\n[{i}/{len(bestellungen)}] {bestellung['nummer']}")
-        details = extract_bestellung_details(session, bestellung)
-        details_list.append(details)
-        time.sleep(0.5)  # Kurze Pause zwischen Requests
-    
-    return details_list
 
+    writer = None if dry_run else DetailWriter()
+    bekannte = writer.bekannte_bestellungen() if writer and not voll else {}
 
-def save_results(details_list):
-    """Speichere Ergebnisse"""
-    data = {
-        'timestamp': datetime.now().isoformat(),
-        'anzahl_bestellungen': len(details_list),
-        'bestellungen': details_list
-    }
-    
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    log(f"\n💾 Ergebnisse gespeichert: {OUTPUT_FILE}")
+    stats = {'bestellungen': len(bestellungen), 'geschrieben': 0, 'unveraendert': 0,
+             'uebersprungen': 0, 'fehler': 0, 'offen': 0}
+    offen = []
+    for b in bestellungen:
+        if b['nummer'] in checkpoint.erledigt:
+            continue
+        b['listen_hash'] = _hash(b.get('zeile') or b['nummer'])
+        if bekannte.get(b['nummer']) == b['listen_hash']:
+            checkpoint.erledigt.add(b['nummer'])
+            stats['uebersprungen'] += 1
+            continue
+        offen.append(b)
+
+    # Phase 2: Details parallel, Schreiben laufend im Haupt-Thread
+    log(f"\n🔍 EXTRAHIERE DETAILS: {len(offen)} Bestellungen, {workers} Worker "
+        f"({stats['uebersprungen']} unverändert in der Liste)")
+    log("="*80)
+    pool = SessionPool(cookies, workers)
+    seit_commit = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor, \
+                open(SPOOL_FILE, 'a', encoding='utf-8') as spool:
+            futures = {executor.submit(fetch_detail, pool, b, deadline): b for b in offen}
+            for i, future in enumerate(as_completed(futures), 1):
+                b = futures[future]
+                details = future.result()
+                if details is None:
+                    if deadline is not None and time.monotonic() > deadline:
+                        stats['offen'] += 1
+                    else:
+                        stats['fehler'] += 1
+                    continue
+
+                try:
+                    geaendert = writer.schreiben(details, b['listen_hash']) if writer else True
+                except Exception as e:
+                    log(f"      ⚠️  {b['nummer']}: DB-Fehler {e}")
+                    stats['fehler'] += 1
+                    continue
+                if geaendert or voll:
+                    spool.write(json.dumps(details, ensure_ascii=False) + '\n')
+                stats['geschrieben' if geaendert else 'unveraendert'] += 1
+                checkpoint.erledigt.add(b['nummer'])
+
+                seit_commit += 1
+                if seit_commit >= DB_COMMIT_EVERY:
+                    # Erst committen, dann Checkpoint – erledigt heißt: in der DB
+                    spool.flush()
+                    if writer:
+                        writer.commit()
+                    checkpoint.sichern()
+                    seit_commit = 0
+                    log(f"   [{i}/{len(offen)}] {stats['geschrieben']} geschrieben, "
+                        f"{stats['unveraendert']} unverändert")
+    finally:
+        if writer:
+            writer.commit()
+            writer.close()
+        checkpoint.sichern()
+
+    stats['vollstaendig'] = stats['offen'] == 0
+    stats['dauer_sekunden'] = round(time.monotonic() - start, 1)
+    if stats['vollstaendig']:
+        export_spool()
+        checkpoint.loeschen()
+        if os.path.exists(SPOOL_FILE):
+            os.remove(SPOOL_FILE)
+    else:
+        log(f"⏸️  Budget abgelaufen: {stats['offen']} Bestellungen offen - nächster Lauf setzt fort")
+    log(f"📊 {stats}")
+    return stats
 
 
 def main():
+    parser = argparse.ArgumentParser(description='ServiceBox Bestellungen crawlen (TAG 220)')
+    parser.add_argument('--voll', action='store_true', help='Alle Details laden (sonst inkrementell)')
+    parser.add_argument('--workers', type=int, default=DETAIL_WORKERS, help='Parallele Detail-Requests')
+    parser.add_argument('--budget', type=int, default=None,
+                        help='Zeitbudget in Sekunden (danach Checkpoint, Fortsetzung im nächsten Lauf)')
+    parser.add_argument('--max-orders', type=int, default=None, help='Nur die ersten N Bestellungen (Test)')
+    parser.add_argument('--dry-run', action='store_true', help='Nicht in die DB schreiben')
+    args = parser.parse_args()
+
     log("\n" + "="*80)
-    log("🚀 SERVICEBOX API SCRAPER - TAG 173")
+    log(f"🚀 SERVICEBOX API SCRAPER - TAG 220 ({'voll' if args.voll else 'inkrementell'})")
     log("="*80)
 
     try:
@@ -584,24 +1015,19 @@ def main():
             log("❌ Login fehlgeschlagen!")
             return False
         
-        # 2. Erstelle requests Session
+        # 2. Session für die Liste; Details über den Session-Pool
         session = create_requests_session(cookies)
         
-        # 3. Hole alle Bestellungen
-        bestellungen = fetch_all_bestellungen(session, rrdi)
+        # 3. Liste + Details (Checkpoint, laufendes Schreiben)
+        stats = crawl(session, cookies, rrdi, voll=args.voll, workers=args.workers,
+                      max_orders=args.max_orders, budget=args.budget, dry_run=args.dry_run)
         
-        if not bestellungen:
+        if not stats['bestellungen']:
             log("❌ Keine Bestellungen gefunden!")
             return False
         
-        # 4. Extrahiere Details
-        details = scrape_all_details(session, bestellungen)
-        
-        # 5. Speichere Ergebnisse
-        save_results(details)
-        
         log("\n" + "="*80)
-        log("✅ API-SCRAPER ERFOLGREICH!")
+        log("✅ API-SCRAPER ERFOLGREICH!" if stats['vollstaendig'] else "⏸️  API-SCRAPER UNTERBROCHEN (Checkpoint)")
         log("="*80)
         
         return True